@@ -7,10 +7,15 @@ import time
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 
+from shared.agent_client import ServiceUnavailableError, get_agent_client, get_agent_client_stats
+from shared.job_queue import INTERRUPTED, PENDING_STATES, RUNNING, get_job_queue
+from shared.service_registry import get_service_registry
+
 app = Flask(__name__)
 CORS(app)
 
-# Chemins vers les fichiers de stockage
+# Chemins vers les fichiers de stockage (les tâches sont dans la file persistante shared/job_queue.py;
+# l'ancien fichier pending_tasks.json n'est lu qu'une fois, pour import)
 TASKS_STORE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pending_tasks.json')
 PROMPTS_HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts_history.json')
 
@@ -69,6 +74,23 @@ def execute_command():
     except Exception as e:
         return jsonify({'success': False, 'message': f'Exception: {str(e)}'}), 500
 
+def get_circuit_states():
+    """
+    État des disjoncteurs des appels inter-agents, par identifiant d'agent.
+    
+    Les circuits vers les agents sont ceux du Chef de Projet (lus sur son
+    /api/llm_stats); celui du Chef de Projet est celui du serveur d'administration.
+    """
+    circuits = {}
+    try:
+        response = get_agent_client('chef-projet').get("/api/llm_stats", timeout=2)
+        if response.status_code == 200:
+            circuits.update(response.json().get('stats', {}).get('agent_clients', {}))
+    except Exception as e:
+        print(f"État des circuits du Chef de Projet indisponible: {str(e)}")
+    circuits.update(get_agent_client_stats())
+    return circuits
+
 @app.route('/api/status')
 def get_status():
     """Récupère l'état de tous les agents"""
@@ -128,77 +150,48 @@ def get_status():
         
         return jsonify({
             'success': True,
-            'statuses': agent_statuses
+            'statuses': agent_statuses,
+            'circuits': get_circuit_states()
         })
     
     except Exception as e:
         return jsonify({'success': False, 'message': f'Exception: {str(e)}'}), 500
 
+@app.route('/api/services')
+def get_services():
+    """Liste les instances enregistrées dans le registre des services, avec leur disponibilité"""
+    registry = get_service_registry()
+    if registry is None:
+        return jsonify({'success': False, 'message': 'Registre des services désactivé'})
+    return jsonify({'success': True, 'instances': registry.instances()})
+
 @app.route('/api/forward-request', methods=['POST'])
 def forward_request():
     """Transmet une demande à l'agent Chef de Projet"""
     data = request.json
     
     try:
-        import requests
-        import socket
         from requests.exceptions import ConnectTimeout, ReadTimeout, ConnectionError
         
-        # Vérifier si le service est accessible
-        try:
-            # Étape 1: Essayer de créer une connexion au socket pour vérifier si le service est disponible
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(2)  # Timeout court pour le test de connexion
-            result = sock.connect_ex(('localhost', 5000))
-            sock.close()
-            
-            if result != 0:
-                # Le port n'est pas ouvert, le service n'est probablement pas disponible
-                print(f"Chef de Projet service is not accessible on port 5000 (socket test result: {result})")
-                return jsonify({
-                    'success': False,
-                    'message': 'L\'agent Chef de Projet n\'est pas accessible. Veuillez vérifier qu\'il est bien démarré.',
-                    'details': 'Le port 5000 n\'est pas ouvert sur localhost.'
-                }), 503  # Service Unavailable
-                
-            # Étape 2: Vérifier que le service répond correctement avec une requête de santé
-            try:
-                health_check_url = "http://localhost:5000/"
-                health_check_response = requests.get(health_check_url, timeout=5)
-                
-                if health_check_response.status_code != 200:
-                    print(f"Chef de Projet health check failed with status code: {health_check_response.status_code}")
-                    return jsonify({
-                        'success': False,
-                        'message': 'L\'agent Chef de Projet est en cours d\'exécution mais ne répond pas correctement.',
-                        'details': f'Le service a retourné le code d\'état {health_check_response.status_code}.'
-                    }), 503
-                    
-                print(f"Chef de Projet health check passed with status code: {health_check_response.status_code}")
-            except Exception as health_err:
-                print(f"Chef de Projet health check error: {str(health_err)}")
-                # Continuer malgré l'échec du health check car le socket est ouvert
-                pass
-                
-        except Exception as sock_err:
-            print(f"Error during socket test: {str(sock_err)}")
-        
-        # URL de l'agent Chef de Projet
-        chef_projet_url = "http://localhost:5000/project_request"
+        # Adresse du Chef de Projet résolue via le registre des services (disponibilité en cache,
+        # sans sonde réseau): la demande est soumise comme un travail, l'identifiant est
+        # retourné aussitôt (suivi via /api/jobs/<job_id>)
+        chef_projet_url = '/project_jobs'
         
         print(f"Sending request to Chef de Projet at {chef_projet_url}")
         print(f"Request data: {data}")
         
-        # Envoyer la requête avec un délai d'attente très long (120 secondes)
-        response = requests.post(chef_projet_url, json=data, timeout=120)
+        response = get_agent_client('chef-projet').post(chef_projet_url, json=data, timeout=10)
         
         # Vérifier la réponse
-        if response.status_code == 200:
+        if response.status_code in (200, 202):
             print(f"Request to Chef de Projet succeeded with status {response.status_code}")
+            job = response.json()
             return jsonify({
                 'success': True,
                 'message': 'Demande transmise avec succès',
-                'response': response.json()
+                'job_id': job.get('job_id'),
+                'response': job
             })
         else:
             print(f"Request to Chef de Projet failed with status {response.status_code}")
@@ -209,6 +202,14 @@ def forward_request():
                 'details': response.text
             })
     
+    except ServiceUnavailableError as su:
+        print(f"Chef de Projet unavailable: {str(su)}")
+        return jsonify({
+            'success': False,
+            'message': 'L\'agent Chef de Projet n\'est pas accessible. Veuillez vérifier qu\'il est bien démarré.',
+            'details': 'Aucune instance active dans le registre des services.'
+        }), 503  # Service Unavailable
+    
     except ConnectTimeout as ct:
         print(f"Connection timeout to Chef de Projet: {str(ct)}")
         return jsonify({
@@ -241,26 +242,50 @@ def forward_request():
             'details': 'Une erreur inattendue s\'est produite lors de la communication avec l\'agent Chef de Projet.'
         }), 500
 
-# Gestion des tâches en attente
-def load_pending_tasks():
-    """Charge les tâches en attente depuis le fichier de stockage."""
-    if os.path.exists(TASKS_STORE_FILE):
-        try:
-            with open(TASKS_STORE_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Erreur lors du chargement des tâches en attente: {str(e)}")
-    return []
+@app.route('/api/jobs/<job_id>')
+def get_job_status(job_id):
+    """Retourne l'état d'un travail soumis au Chef de Projet (phases terminées et résultat)"""
+    try:
+        response = get_agent_client('chef-projet').get(f"/project_jobs/{job_id}", timeout=5)
+        return jsonify(response.json()), response.status_code
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Exception: {str(e)}'}), 503
 
-def save_pending_tasks(tasks):
-    """Sauvegarde les tâches en attente dans le fichier de stockage."""
+# Gestion des tâches en attente
+def migrate_pending_tasks_file():
+    """Importe les tâches de l'ancien pending_tasks.json dans la file persistante (état interrompu)."""
+    if not os.path.exists(TASKS_STORE_FILE):
+        return
     try:
-        with open(TASKS_STORE_FILE, 'w') as f:
-            json.dump(tasks, f, indent=2)
-        return True
+        with open(TASKS_STORE_FILE, 'r') as f:
+            tasks = json.load(f)
     except Exception as e:
-        print(f"Erreur lors de la sauvegarde des tâches en attente: {str(e)}")
-        return False
+        print(f"Erreur lors du chargement des tâches en attente: {str(e)}")
+        return
+    
+    queue = get_job_queue()
+    for task in tasks:
+        if queue.get(task['id']) is None:
+            queue.enqueue('project', task.get('data', {}), job_id=task['id'], state=INTERRUPTED,
+                          created_at=task.get('started_at', time.time() * 1000) / 1000)
+    os.replace(TASKS_STORE_FILE, TASKS_STORE_FILE + '.migrated')
+    print(f"{len(tasks)} tâche(s) importée(s) depuis {TASKS_STORE_FILE}")
+
+def load_pending_tasks():
+    """Liste les travaux non terminés de la file persistante, au format attendu par l'interface."""
+    return [
+        {
+            'id': job['id'],
+            'description': (job['payload'] or {}).get('description', 'Tâche sans description'),
+            'data': job['payload'],
+            'started_at': int(job['created_at'] * 1000),  # Timestamp en millisecondes
+            'status': job['state'],
+            'attempts': job['attempts'],
+            'completed_phases': job['checkpoints'],
+            'error': job['error']
+        }
+        for job in get_job_queue().list(states=PENDING_STATES)
+    ]
 
 @app.route('/api/check-pending-tasks')
 def check_pending_tasks():
@@ -283,15 +308,13 @@ def resume_tasks():
         })
     
     try:
-        # Envoi les tâches au Chef de Projet pour reprise
-        import requests
-        chef_projet_url = "http://localhost:5000/resume_tasks"
+        # Envoi les tâches au Chef de Projet pour reprise: les travaux interrompus ou
+        # échoués repartent de leurs points de contrôle, ceux en cours ne sont pas touchés
+        chef_projet_url = "/resume_tasks"
         
-        # On passe toutes les tâches au Chef de Projet
-        response = requests.post(chef_projet_url, json={'tasks': tasks}, timeout=30)
+        response = get_agent_client('chef-projet').post(chef_projet_url, json={'tasks': tasks}, timeout=30)
         
         if response.status_code == 200:
-            # Ne pas effacer les tâches, elles seront mises à jour par les agents
             return jsonify({
                 'success': True,
                 'message': 'Tâches reprises avec succès',
@@ -312,20 +335,45 @@ def resume_tasks():
 
 @app.route('/api/clear-tasks', methods=['POST'])
 def clear_tasks():
-    """Efface les tâches en attente."""
-    # Supprimer le fichier de tâches s'il existe
-    if os.path.exists(TASKS_STORE_FILE):
-        try:
-            os.remove(TASKS_STORE_FILE)
-            return jsonify({
-                'success': True,
-                'message': 'Tâches effacées avec succès'
-            })
-        except Exception as e:
-            return jsonify({
-                'success': False,
-                'message': f'Erreur lors de la suppression du fichier: {str(e)}'
-            }), 500
+    """
+    Efface les tâches en attente (les travaux non terminés sont annulés).
+    
+    L'annulation passe par le Chef de Projet, seul à pouvoir arrêter un travail
+    en cours et à terminer son suivi. S'il est injoignable, seuls les travaux qui
+    ne s'exécutent pas sont annulés directement dans la file.
+    """
+    queue = get_job_queue()
+    cancelled = []
+    running = []
+    chef_reachable = True
+    for job in queue.list(PENDING_STATES, limit=1000):
+        if chef_reachable:
+            try:
+                response = get_agent_client('chef-projet').post(f"/project_jobs/{job['id']}/cancel", timeout=5)
+                if response.status_code == 200:
+                    cancelled.append(job['id'])
+                    continue
+            except Exception as e:
+                print(f"Chef de Projet injoignable pour l'annulation des tâches: {str(e)}")
+                chef_reachable = False
+        if job['state'] == RUNNING:
+            # Le travail continuerait d'appeler les agents: il n'est pas marqué annulé sans être arrêté
+            running.append(job['id'])
+        else:
+            cancelled += queue.cancel([job['id']])
+    
+    if running:
+        return jsonify({
+            'success': False,
+            'message': f"{len(cancelled)} tâche(s) effacée(s); {len(running)} tâche(s) en cours non arrêtée(s): "
+                       f"l'agent Chef de Projet n'est pas accessible",
+            'running': running
+        })
+    if cancelled:
+        return jsonify({
+            'success': True,
+            'message': f'{len(cancelled)} tâche(s) effacée(s) avec succès'
+        })
     else:
         return jsonify({
             'success': True,
@@ -380,22 +428,11 @@ def get_latest_prompt():
 # Modification de la route forward-request pour sauvegarder la tâche et le prompt
 @app.route('/api/forward-request-with-save', methods=['POST'])
 def forward_request_with_save():
-    """Transmet une demande à l'agent Chef de Projet et sauvegarde la tâche et le prompt."""
+    """Transmet une demande à l'agent Chef de Projet et sauvegarde le prompt."""
     data = request.json
     
-    # Sauvegarde de la tâche
+    # La tâche elle-même est enregistrée dans la file persistante par le Chef de Projet
     timestamp = int(time.time())
-    task = {
-        'id': str(timestamp),
-        'description': data.get('description', 'Tâche sans description'),
-        'data': data,
-        'started_at': timestamp * 1000,  # Timestamp en millisecondes
-        'status': 'pending'
-    }
-    
-    tasks = load_pending_tasks()
-    tasks.append(task)
-    save_pending_tasks(tasks)
     
     # Sauvegarde du prompt dans l'historique
     prompt_entry = {
@@ -418,4 +455,5 @@ def forward_request_with_save():
     return forward_request()
 
 if __name__ == '__main__':
+    migrate_pending_tasks_file()
     app.run(host='0.0.0.0', port=8080, debug=True)
\ No newline at end of file
@@ -7,20 +7,18 @@ except ImportError:
 
 import json
 import os
-import re
 import sys
 import threading
 import time
 import requests
 import logging
-from threading import Event
 from dotenv import load_dotenv
 from pathlib import Path
 
 import boto3
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, rooms
 
 # Configuration des logs
 log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'logs')
@@ -42,6 +40,26 @@ logger = logging.getLogger(__name__)
 dotenv_path = Path(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env'))
 load_dotenv(dotenv_path=dotenv_path)
 
+# Modules partagés entre agents (racine du dépôt)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.admission import admission_control
+from shared.agent_client import get_agent_client
+from shared.bedrock_client import get_bedrock_client
+from shared.dag import DagExecutor
+from shared.emitter import get_event_emitter
+from shared.job_context import (JobCancelledError, JobContext, current_job_context, find_job_contexts,
+                                get_job_context, job_context, room_for)
+from shared.job_queue import JobWorkerPool, get_job_queue
+from shared.jobs import get_job_registry, sse_events
+from shared.llm import invoke_bedrock
+from shared.llm_stream import open_llm_stream
+from shared.log_tail import read_log_entries
+from shared.model_router import invoke_routed
+from shared.structured_output import StructuredOutputError, invoke_structured, make_tool
+from shared.service_registry import register_service
+from shared.stats import register_stats_route
+from shared.telemetry import instrument_llm_call, register_metrics_route
+
 # Configuration AWS - utiliser le profil spécifié dans le .env ou utiliser les identifiants par défaut si non spécifié
 aws_profile = os.getenv("AWS_PROFILE")
 if aws_profile:
@@ -58,92 +76,231 @@ else:
 REGION_NAME = os.getenv("REGION_NAME", "eu-west-3")
 MODEL_ID = os.getenv("MODEL_ID", "anthropic.claude-3-sonnet-20240229-v1:0")  # Utilise la valeur du .env ou la valeur par défaut
 
-# Configuration des URL des agents
-AGENT_DEV_PYTHON_URL = "http://localhost:5001/code_request"  # Agent Développeur Python
-AGENT_QA_URL = "http://localhost:5002/qa_api_request"  # Agent QAClaude
-AGENT_FRONTEND_URL = "http://localhost:5003/frontend_request"  # Agent Développeur Frontend
-AGENT_GO_BACKEND_URL = "http://localhost:5001/go_code_request"  # Agent Développeur Go Backend - Corrigé pour port 5001
-AGENT_DEVOPS_CONFIG_URL = "http://localhost:5005/api/devops_config"  # Agent DevOps
-AGENT_DEVOPS_CICD_URL = "http://localhost:5005/api/ci_cd_pipeline"  # Agent DevOps
-
-# Alias pour la clarté du code
-AGENT_DEV_URL = AGENT_GO_BACKEND_URL  # Pour la compatibilité avec interface_with_developer_agent
-AGENT_PERF_URL = "http://localhost:5006/api/performance_audit"  # Agent Performance
-AGENT_ML_URL = "http://localhost:5007/api/ml_analysis"  # Agent Machine Learning
-AGENT_ANALYTICS_URL = "http://localhost:5008/api/analytics_monitoring"  # Agent Analytics/Monitoring
-AGENT_PRODUCT_OWNER_URL = "http://localhost:5009/api/product_requirements"  # Agent Product Owner
-AGENT_UX_DESIGNER_URL = "http://localhost:5010/api/ux_design"  # Agent UX Designer
-AGENT_IOS_URL = "http://localhost:5013/code_request"  # Agent Développeur iOS
-AGENT_ANDROID_URL = "http://localhost:5014/code_request"  # Agent Développeur Android
+# Adresses des agents: chaque agent s'enregistre auprès du registre des services
+# (shared/service_registry.py); les appels passent par get_agent_client(<service>).post('<chemin>'),
+# résolu à partir des instances disponibles. Avec plusieurs réplicas, l'appel va à la moins
+# chargée, ou toujours à la même pour un projet (sticky=project_name) afin que ses fichiers
+# restent dans le même espace de travail.
 
 # Dictionnaire des agents disponibles avec leurs descriptions
 AVAILABLE_AGENTS = {
     "python": {
         "name": "Développeur Python",
         "description": "Développement d'applications Python, création de scripts, traitement de données, backend web",
-        "url": AGENT_DEV_PYTHON_URL
+        "service": "dev-python"
     },
     "qa": {
         "name": "QAClaude",
         "description": "Tests fonctionnels et automatisés d'applications web",
-        "url": AGENT_QA_URL
+        "service": "qa"
     },
     "frontend": {
         "name": "Développeur Frontend",
         "description": "Développement d'interfaces utilisateur avec HTML, CSS, JavaScript, React, Vue, Angular",
-        "url": AGENT_FRONTEND_URL
+        "service": "dev-frontend"
     },
     "go": {
         "name": "Développeur Go Backend",
         "description": "Développement de services et API backend en Go, microservices performants",
-        "url": AGENT_GO_BACKEND_URL
+        "service": "dev-go"
     },
     "devops": {
         "name": "DevOps",
         "description": "Configuration Docker, Kubernetes, CI/CD, infrastructure as code",
-        "url": AGENT_DEVOPS_CONFIG_URL
+        "service": "devops"
     },
     "performance": {
         "name": "Performance",
         "description": "Audit et optimisation des performances d'applications web",
-        "url": AGENT_PERF_URL
+        "service": "perf"
     },
     "ml": {
         "name": "Machine Learning",
         "description": "Modèles ML, analyse prédictive, traitement du langage naturel, vision par ordinateur",
-        "url": AGENT_ML_URL
+        "service": "ml"
     },
     "analytics": {
         "name": "Analytics & Monitoring",
         "description": "Mise en place d'outils d'analytics, dashboards, monitoring et alerting",
-        "url": AGENT_ANALYTICS_URL
+        "service": "analytics"
     },
     "product_owner": {
         "name": "Product Owner",
         "description": "Définition des exigences produit, priorisation des fonctionnalités, user stories",
-        "url": AGENT_PRODUCT_OWNER_URL
+        "service": "product-owner"
     },
     "ux_designer": {
         "name": "UX Designer",
         "description": "Design d'interfaces, wireframes, prototypes, tests d'utilisabilité",
-        "url": AGENT_UX_DESIGNER_URL
+        "service": "ux-designer"
     },
     "ios": {
         "name": "Développeur iOS",
         "description": "Développement d'applications mobiles pour iOS (iPhone, iPad) en Swift",
-        "url": AGENT_IOS_URL
+        "service": "dev-ios"
     },
     "android": {
         "name": "Développeur Android",
         "description": "Développement d'applications mobiles pour Android en Kotlin ou Java",
-        "url": AGENT_ANDROID_URL
+        "service": "dev-android"
     }
 }
 
+# Schémas JSON des sorties de planification, imposés au modèle via un appel d'outil
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+_AGENT_CHOICE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "string", "enum": list(AVAILABLE_AGENTS)},
+        "name": {"type": "string"},
+        "relevance": {"type": "integer", "minimum": 0, "maximum": 100},
+        "justification": {"type": "string"}
+    },
+    "required": ["id", "name", "relevance", "justification"]
+}
+
+IMPROVEMENTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "original_request": {"type": "string"},
+        "analysis": {"type": "string"},
+        "suggestions": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "description": {"type": "string"},
+                    "improved_request": {"type": "string"}
+                },
+                "required": ["title", "description", "improved_request"]
+            }
+        },
+        "comprehensive_improvement": {"type": "string"}
+    },
+    "required": ["original_request", "analysis", "suggestions", "comprehensive_improvement"]
+}
+
+AGENTS_SELECTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "project_analysis": {"type": "string"},
+        "recommended_agents": {"type": "array", "items": _AGENT_CHOICE_SCHEMA},
+        "optional_agents": {"type": "array", "items": _AGENT_CHOICE_SCHEMA}
+    },
+    "required": ["project_analysis", "recommended_agents", "optional_agents"]
+}
+
+SPECIFICATIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "minLength": 1},
+        "description": {"type": "string"},
+        "objectives": _STRING_LIST,
+        "functional_requirements": _STRING_LIST,
+        "technical_requirements": _STRING_LIST,
+        "constraints": _STRING_LIST,
+        "required_testing": _STRING_LIST
+    },
+    "required": ["title", "description", "objectives", "functional_requirements", "technical_requirements"]
+}
+
+CODING_TASKS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "architecture": {"type": "string"},
+        "components": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "description": {"type": "string"},
+                    "technical_details": {"type": "string"},
+                    "implementation_notes": {"type": "string"}
+                },
+                "required": ["name", "description"]
+            }
+        },
+        "implementation_phases": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "phase": {"type": "string"},
+                    "tasks": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "task_name": {"type": "string"},
+                                "description": {"type": "string"},
+                                "technical_requirements": {"type": "string"},
+                                "acceptance_criteria": _STRING_LIST,
+                                "estimated_effort": {"type": "string"}
+                            },
+                            "required": ["task_name", "description"]
+                        }
+                    }
+                },
+                "required": ["phase", "tasks"]
+            }
+        },
+        "technical_considerations": _STRING_LIST
+    },
+    "required": ["architecture", "components", "implementation_phases"]
+}
+
+TESTING_PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "test_strategy": {"type": "string"},
+        "test_environments": _STRING_LIST,
+        "test_categories": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "category": {"type": "string"},
+                    "description": {"type": "string"},
+                    "test_cases": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "id": {"type": "string"},
+                                "title": {"type": "string"},
+                                "description": {"type": "string"},
+                                "preconditions": _STRING_LIST,
+                                "steps": _STRING_LIST,
+                                "expected_results": _STRING_LIST,
+                                "priority": {"type": "string"},
+                                "feature_coverage": {"type": "string"}
+                            },
+                            "required": ["title", "description"]
+                        }
+                    }
+                },
+                "required": ["category", "test_cases"]
+            }
+        },
+        "automation_recommendations": _STRING_LIST
+    },
+    "required": ["test_strategy", "test_categories"]
+}
+
 app = Flask(__name__)
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
-user_action_event = Event()
+emitter = get_event_emitter(socketio, logger)
+register_stats_route(app, 'chef_projet')
+register_metrics_route(app, 'chef_projet')
+# Attente de confirmation hors d'un travail; chaque travail a la sienne (shared.job_context)
+console_context = JobContext('console')
 
 @app.route('/')
 def index():
@@ -163,114 +320,82 @@ def handle_connect():
         logger.error(f"Erreur lors de la gestion de la connexion: {str(e)}")
 
 @socketio.on('request_logs')
-def handle_request_logs():
-    """Gestionnaire d'événement pour la demande de logs"""
-    try:
-        logger.info("Demande de logs reçue")
-        # Envoyer un accusé de réception
-        safe_emit('log', {'type': 'info', 'message': "Chargement des logs en cours..."})
-        
-        # Lire les dernières entrées du fichier de log pour les afficher dans l'interface
-        try:
-            log_path = os.path.join(log_dir, 'chef_projet.log')
-            if os.path.exists(log_path):
-                with open(log_path, 'r') as log_file:
-                    # Lire les 50 dernières lignes du fichier
-                    lines = log_file.readlines()
-                    last_lines = lines[-50:] if len(lines) > 50 else lines
-                    
-                    for line in last_lines:
-                        # Ajouter un petit délai pour éviter la saturation
-                        time.sleep(0.01)
-                        
-                        # Déterminer le type de log (info, error, warning) basé sur le contenu
-                        log_type = 'info'
-                        if '[ERROR]' in line:
-                            log_type = 'error'
-                        elif '[WARNING]' in line:
-                            log_type = 'warning'
-                        elif 'SUCCESS' in line:
-                            log_type = 'success'
-                        
-                        # Extraire le message (tout après le niveau de log)
-                        message_match = re.search(r'\[(INFO|ERROR|WARNING)\]\s*(.*)', line)
-                        if message_match:
-                            message = message_match.group(2)
-                        else:
-                            message = line.strip()
-                        
-                        # Envoyer au client
-                        safe_emit('log', {'type': log_type, 'message': f"[LOG] {message}"})
-                
-                safe_emit('log', {'type': 'info', 'message': "---- Fin des logs précédents ----"})
-            else:
-                safe_emit('log', {'type': 'warning', 'message': "Fichier de log introuvable"})
-        except Exception as log_err:
-            logger.error(f"Erreur lors de la lecture des logs: {str(log_err)}")
-            safe_emit('log', {'type': 'error', 'message': f"Impossible de charger les logs précédents: {str(log_err)}"})
+def handle_request_logs(data=None):
+    """
+    Gestionnaire d'événement pour la demande de logs.
     
+    Renvoie au seul client demandeur, en un événement log_replay, les dernières
+    lignes du fichier de log; avec le curseur d'une demande précédente
+    ({'cursor': ...}), seulement les lignes écrites depuis.
+    """
+    try:
+        cursor = data.get('cursor') if isinstance(data, dict) else None
+        emit('log_replay', read_log_entries(os.path.join(log_dir, 'chef_projet.log'), cursor))
     except Exception as e:
-        logger.error(f"Erreur lors du traitement de la demande de logs: {str(e)}")
+        logger.error(f"Erreur lors de la lecture des logs: {str(e)}")
+        emit('log', {'type': 'error', 'message': f"Impossible de charger les logs précédents: {str(e)}"})
 
 def wait_for_user_confirmation():
-    """Met en pause le script jusqu'à confirmation de l'utilisateur."""
-    user_action_event.clear()
-    safe_emit('wait_for_user_action', {})
-    user_action_event.wait()
+    """Met en pause le travail en cours jusqu'à confirmation de l'utilisateur."""
+    context = current_job_context() or console_context
+    context.wait_for_action(prompt=lambda: safe_emit('wait_for_user_action', {}))
     time.sleep(1)
 
 @socketio.on('user_action_done')
-def handle_user_action_done():
-    """Déclenchement après confirmation de l'utilisateur."""
-    user_action_event.set()
+def handle_user_action_done(data=None):
+    """
+    Déclenchement après confirmation de l'utilisateur.
+    
+    Seul le travail désigné (job_id) ou ceux dont le client suit la salle sont réveillés.
+    """
+    job_id = (data or {}).get('job_id') if isinstance(data, dict) else None
+    contexts = [get_job_context(job_id)] if job_id else find_job_contexts(rooms())
+    for context in [context for context in contexts if context is not None] or [console_context]:
+        context.action_done()
+
+@socketio.on('join_job')
+def handle_join_job(data=None):
+    """Abonne le client aux événements d'un travail (salle job:<id>)."""
+    job_id = (data or {}).get('job_id') if isinstance(data, dict) else None
+    if job_id:
+        join_room(room_for(job_id))
+
+def subscribe_client(job_id, socket_id):
+    """
+    Abonne un client Socket.IO à la salle d'un travail, depuis une requête HTTP.
+    
+    Args:
+        job_id (str): Identifiant du travail
+        socket_id (str): Identifiant Socket.IO du client (socket.id côté page)
+    """
+    if not socket_id:
+        return
+    try:
+        join_room(room_for(job_id), sid=socket_id, namespace='/')
+    except Exception as e:
+        logger.warning(f"Impossible d'abonner le client {socket_id} au travail {job_id}: {str(e)}")
 
 def safe_emit(event, data=None):
     """
-    Émet un événement SocketIO de manière sécurisée, en capturant les erreurs potentielles.
+    Émet un événement SocketIO sans bloquer l'appelant.
+    
+    L'événement est mis en file; le thread d'émission (shared/emitter.py) l'envoie,
+    regroupe les journaux en trames et les écrit dans le fichier de log.
+    Pendant un travail, l'événement n'est envoyé qu'aux clients abonnés à sa salle
+    et porte son identifiant (job_id); sinon, il est diffusé à tous les clients.
     
     Args:
         event (str): Nom de l'événement à émettre
         data (dict, optional): Données à envoyer avec l'événement
     """
-    try:
-        # Émettre l'événement à tous les clients
-        socketio.emit(event, data)
-        time.sleep(0.01)  # Petit délai pour permettre à l'événement d'être traité
-        
-        # Journalisation des événements
-        if event == 'log' and data and 'type' in data and 'message' in data:
-            log_type = data['type']
-            message = data['message']
-            
-            if log_type == 'error':
-                logger.error(message)
-            elif log_type == 'warning':
-                logger.warning(message)
-            elif log_type == 'success':
-                logger.info(f"SUCCESS: {message}")
-            else:
-                logger.info(message)
-        else:
-            # Journaliser les autres événements
-            if data is not None:
-                logger.debug(f"Event émis: {event}, data: {str(data)[:200]}...")
-            else:
-                logger.debug(f"Event émis: {event}, data: None")
-            
-    except Exception as e:
-        error_msg = f"Erreur lors de l'émission de l'événement {event}: {str(e)}"
-        logger.error(error_msg)
-        
-        # Tentative de réémission avec un délai
-        try:
-            time.sleep(0.5)  # Attendre un peu avant de réessayer
-            socketio.emit(event, data)
-            logger.info(f"Réémission réussie de l'événement {event}")
-        except Exception as retry_err:
-            logger.error(f"Échec de la réémission de l'événement {event}: {str(retry_err)}")
-            # Continuer l'exécution malgré l'erreur
+    context = current_job_context()
+    room = context.room if context is not None else None
+    if context is not None and isinstance(data, dict):
+        data = dict(data, job_id=context.job_id)
+    emitter.emit(event, data, to=room)
 
-def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7):
+@instrument_llm_call
+def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7, use_cache=True, stream=True, on_block=None, model_id=None, tool=None):
     """
     Invoque Claude via AWS Bedrock avec le prompt fourni.
     
@@ -279,105 +404,55 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7):
         system_prompt (str, optional): Instructions système pour guider le comportement du modèle
         max_tokens (int, optional): Nombre maximum de tokens pour la réponse
         temperature (float, optional): Niveau de créativité (0.0-1.0)
+        use_cache (bool, optional): False pour ignorer le cache des réponses et forcer un appel au modèle
+        stream (bool, optional): False pour ne pas diffuser la réponse en continu sur Socket.IO
+        on_block (callable, optional): Appelé avec chaque bloc de code terminé, avant la fin de la génération
+        model_id (str, optional): Modèle Bedrock à utiliser (défaut: MODEL_ID, voir shared.model_router)
+        tool (dict, optional): Outil imposé pour une sortie structurée; le contenu retourné est alors son argument JSON
     
     Returns:
         dict: Dictionnaire contenant la réponse ou l'erreur
               Format: {"success": bool, "content": str, "error": str}
     """
+    context = current_job_context()
+    if context is not None:
+        # Travail annulé: pas de nouvel appel au modèle
+        context.check()
     safe_emit('loading_start')
     safe_emit('log', {'type': 'info', 'message': "Invocation de Claude en cours..."})
+    model_id = model_id or MODEL_ID
     
-    # Mode de test sans AWS - simuler une réponse pour permettre le test de communication
-    safe_emit('log', {'type': 'warning', 'message': "Fonctionnement en mode test sans AWS"})
-    safe_emit('loading_end')
-    
-    # Simuler une réponse pour le type de prompt
-    if "analyse" in prompt.lower():
-        return {
-            "success": True, 
-            "content": json.dumps({
-                "recommended_agents": ["go"],
-                "project_framework": "Go API",
-                "project_complexity": "Simple"
-            })
-        }
-    elif "plan de" in prompt.lower() or "planification" in prompt.lower():
-        # Simuler une réponse pour la planification
-        return {
-            "success": True,
-            "content": json.dumps({
-                "phases": [{"phase": "Phase 1", "tasks": [{"task_name": "Mise en place", "description": "Structure du projet"}]}],
-                "architecture": "Architecture REST simple",
-                "components": [{"name": "API Server", "description": "Serveur HTTP simple"}],
-                "implementation_phases": [{"phase": "Développement", "tasks": [{"task_name": "Endpoints", "description": "Créer les endpoints", "technical_requirements": "Utiliser net/http standard"}]}],
-                "technical_considerations": ["Go standard library", "RESTful principles"]
-            })
-        }
-    elif "test" in prompt.lower():
-        # Simuler une réponse pour le plan de test
-        return {
-            "success": True,
-            "content": json.dumps({
-                "test_strategy": "Tests unitaires et d'intégration",
-                "test_categories": [
-                    {"category": "API Tests", "test_cases": [{"title": "Test Hello Endpoint", "description": "Vérifier que /hello renvoie le bon message"}]}
-                ]
-            })
-        }
-    else:
-        # Réponse par défaut
-        return {
-            "success": True,
-            "content": "Réponse simulée pour prompt: " + prompt[:50] + "..."
-        }
+    # Diffusion de la réponse vers l'interface au fil de la génération (salle du travail en cours)
+    llm_stream = open_llm_stream(socketio, enabled=stream and tool is None, on_block=on_block,
+                                 room=context.room if context is not None else None)
     
     try:
-        # Création du client Bedrock avec des logs pour le débogage
-        logger.info(f"Création du client Bedrock avec region_name={REGION_NAME}")
-        try:
-            bedrock_client = boto3.client(
-                service_name='bedrock-runtime',
-                region_name=REGION_NAME
-            )
-            logger.info("Client Bedrock créé avec succès")
-        except Exception as client_err:
-            logger.error(f"Erreur lors de la création du client Bedrock: {str(client_err)}")
-            raise
-        
-        # Construction du corps de la requête
-        request_body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ]
-        }
-        
-        # Ajout du système prompt si fourni
-        if system_prompt:
-            request_body["system"] = system_prompt
-
         safe_emit('log', {'type': 'info', 'message': f"Send prompt à Claude en cours... (system_prompt: {system_prompt})"})
-        logger.info(f"Invocation du modèle avec MODEL_ID={MODEL_ID}")
-        logger.info(f"Requête: {json.dumps(request_body)[:500]}...")  # Log partiel pour éviter d'afficher des prompts trop longs
+        logger.info(f"Invocation du modèle avec model_id={model_id}")
+        logger.info(f"Prompt: {prompt[:500]}...")  # Log partiel pour éviter d'afficher des prompts trop longs
         
-        # Invocation du modèle avec timeout
+        # Invocation du modèle (client Bedrock partagé et cache des réponses)
         try:
-            # Invocation du modèle
-            response = bedrock_client.invoke_model(
-                modelId=MODEL_ID,
-                body=json.dumps(request_body)
+            generated_text = invoke_bedrock(
+                prompt,
+                system_prompt=system_prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                model_id=model_id,
+                region_name=REGION_NAME,
+                use_cache=use_cache,
+                stream_callback=llm_stream,
+                # Flux interactif: prioritaire sur les agents en arrière-plan
+                priority='interactive',
+                tool=tool
             )
+            if llm_stream is not None:
+                llm_stream.finish()
             logger.info("Réponse brute reçue du modèle")
         except Exception as invoke_err:
             logger.error(f"Erreur lors de l'invocation du modèle: {str(invoke_err)}")
             raise
         
-        # Traitement de la réponse
-        response_body = json.loads(response.get('body').read())
-        generated_text = response_body.get('content')[0].get('text')
-        
         # Log de la réponse pour debug (en tronquant si trop longue)
         truncated_response = generated_text[:500] + "..." if len(generated_text) > 500 else generated_text
         logger.info(f"Réponse de Bedrock reçue: {truncated_response}")
@@ -388,22 +463,24 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7):
         return {"success": True, "content": generated_text, "error": None}
     
     except Exception as e:
+        if llm_stream is not None:
+            llm_stream.finish(error=str(e))
         error_message = f"Erreur lors de l'invocation de Claude: {str(e)}"
         logger.error(f"Exception détaillée: {type(e).__name__} - {str(e)}")
         
         # Détection d'erreurs spécifiques d'AWS
         if "Unable to locate credentials" in str(e):
-            error_message = f"Erreur d'identification AWS: Impossible de trouver les credentials. Vérifiez la configuration AWS dans .env. Modèle: {MODEL_ID}, Région: {REGION_NAME}, Profil AWS: {aws_profile or 'Non spécifié (utilisant credentials par défaut)'}"
-            logger.error(f"Credentials AWS non trouvés. Modèle: {MODEL_ID}, Région: {REGION_NAME}, Profil AWS: {aws_profile or 'Non spécifié'}")
+            error_message = f"Erreur d'identification AWS: Impossible de trouver les credentials. Vérifiez la configuration AWS dans .env. Modèle: {model_id}, Région: {REGION_NAME}, Profil AWS: {aws_profile or 'Non spécifié (utilisant credentials par défaut)'}"
+            logger.error(f"Credentials AWS non trouvés. Modèle: {model_id}, Région: {REGION_NAME}, Profil AWS: {aws_profile or 'Non spécifié'}")
         elif "AccessDenied" in str(e):
             error_message = "Erreur d'accès AWS: vérifiez les permissions du profil et les clés d'API."
             logger.error("Problème d'authentification AWS détecté")
         elif "ResourceNotFoundException" in str(e):
-            error_message = f"Modèle non trouvé: {MODEL_ID}. Vérifiez l'ID du modèle dans le fichier .env."
-            logger.error(f"Le modèle {MODEL_ID} n'existe pas ou n'est pas accessible")
+            error_message = f"Modèle non trouvé: {model_id}. Vérifiez l'ID du modèle dans le fichier .env."
+            logger.error(f"Le modèle {model_id} n'existe pas ou n'est pas accessible")
         elif "ValidationException" in str(e) and "model" in str(e).lower():
-            error_message = f"Format d'ID de modèle invalide: {MODEL_ID}. Vérifiez le format dans le fichier .env."
-            logger.error(f"Format d'ID de modèle invalide: {MODEL_ID}")
+            error_message = f"Format d'ID de modèle invalide: {model_id}. Vérifiez le format dans le fichier .env."
+            logger.error(f"Format d'ID de modèle invalide: {model_id}")
         elif "ExpiredTokenException" in str(e) or "InvalidSignatureException" in str(e):
             error_message = "Jetons AWS expirés. Les informations d'identification doivent être renouvelées."
             logger.error("Problème de jetons/credentials AWS")
@@ -423,6 +500,44 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7):
         
         return {"success": False, "content": None, "error": error_message}
 
+def invoke_claude_structured(prompt, system_prompt, tool_name, schema, description=None, max_tokens=4096, model_id=None):
+    """
+    Invoque Claude avec un schéma de sortie imposé (appel d'outil).
+    
+    La réponse est validée contre le schéma; un appel de réparation ciblé n'est
+    fait qu'en cas d'écart (voir shared.structured_output).
+    
+    Args:
+        prompt (str): Le prompt principal à envoyer au modèle
+        system_prompt (str): Instructions système
+        tool_name (str): Nom de l'outil que le modèle doit appeler
+        schema (dict): Schéma JSON de la sortie attendue
+        description (str, optional): Description de l'outil pour le modèle
+        max_tokens (int, optional): Nombre maximum de tokens pour la réponse
+        model_id (str, optional): Modèle Bedrock à utiliser (défaut: MODEL_ID)
+    
+    Returns:
+        dict: {"success": bool, "data": dict, "error": str, "schema_errors": list, "raw": str}
+    """
+    tool = make_tool(tool_name, schema, description)
+    
+    def call(request):
+        response = invoke_claude(request, system_prompt, max_tokens=max_tokens, model_id=model_id, tool=tool)
+        if not response["success"]:
+            raise RuntimeError(response["error"])
+        return response["content"]
+    
+    try:
+        data = invoke_structured(call, prompt, schema)
+    except StructuredOutputError as e:
+        safe_emit('log', {'type': 'warning', 'message': f"Réponse non conforme au schéma {tool_name}: {'; '.join(e.errors[:3])}"})
+        return {"success": False, "data": None, "error": str(e), "schema_errors": e.errors, "raw": e.raw}
+    except RuntimeError as e:
+        # Erreur d'invocation: déjà signalée à l'interface par invoke_claude
+        return {"success": False, "data": None, "error": str(e), "schema_errors": [], "raw": None}
+    
+    return {"success": True, "data": data, "error": None, "schema_errors": [], "raw": None}
+
 def analyze_and_suggest_improvements(project_description):
     """
     Analyse la demande et suggère des améliorations potentielles.
@@ -488,11 +603,27 @@ def analyze_and_suggest_improvements(project_description):
     Proposez également une version complète qui intègre toutes vos suggestions.
     """
     
-    # Invocation de Claude
-    claude_response = invoke_claude(prompt, system_prompt)
+    # Invocation de Claude: sortie imposée par le schéma (modèle rapide; grand modèle si la
+    # réponse reste non conforme). Une erreur d'appel n'est pas un échec de validation.
+    claude_response = invoke_routed(
+        'analyze_and_suggest_improvements', invoke_claude_structured, prompt, system_prompt,
+        'suggest_improvements', IMPROVEMENTS_SCHEMA,
+        description="Enregistre l'analyse de la demande et les suggestions d'amélioration.",
+        validate=lambda response: response["success"] or not response["schema_errors"]
+    )
     
     # Vérifier si l'appel a réussi
     if not claude_response["success"]:
+        if claude_response["schema_errors"]:
+            safe_emit('log', {'type': 'warning', 'message': "Réponse non conforme au schéma, utilisation de la réponse brute"})
+            return {
+                "original_request": project_description,
+                "analysis": "Analyse non disponible",
+                "suggestions": [],
+                "comprehensive_improvement": project_description,
+                "raw_response": claude_response["raw"]
+            }
+        
         # Une erreur critique s'est produite - arrêter le traitement
         error_message = claude_response["error"]
         safe_emit('log', {'type': 'error', 'message': f"Erreur lors de l'analyse du projet: {error_message}"})
@@ -507,41 +638,8 @@ def analyze_and_suggest_improvements(project_description):
             "comprehensive_improvement": project_description
         }
     
-    # Si l'appel a réussi, continuer avec le traitement normal
-    response = claude_response["content"]
-    
-    # Extraction du JSON de la réponse
-    try:
-        json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
-        if json_match:
-            suggestions_json = json.loads(json_match.group(1))
-            safe_emit('log', {'type': 'success', 'message': "Suggestions d'amélioration générées avec succès"})
-            return suggestions_json
-        else:
-            # Tenter de trouver un JSON sans les backticks
-            json_match = re.search(r'({.*})', response, re.DOTALL)
-            if json_match:
-                suggestions_json = json.loads(json_match.group(1))
-                return suggestions_json
-            else:
-                safe_emit('log', {'type': 'warning', 'message': "Format JSON non trouvé, utilisation de la réponse brute"})
-                return {
-                    "original_request": project_description,
-                    "analysis": "Analyse non disponible",
-                    "suggestions": [],
-                    "comprehensive_improvement": project_description,
-                    "raw_response": response
-                }
-    except Exception as e:
-        safe_emit('log', {'type': 'error', 'message': f"Erreur lors du parsing JSON: {str(e)}"})
-        logger.error(f"Traceback de l'erreur JSON: Type de response = {type(response)}, Début de response = {str(response)[:200]}")
-        return {
-            "original_request": project_description,
-            "analysis": "Erreur lors de l'analyse",
-            "suggestions": [],
-            "comprehensive_improvement": project_description,
-            "raw_response": response
-        }
+    safe_emit('log', {'type': 'success', 'message': "Suggestions d'amélioration générées avec succès"})
+    return claude_response["data"]
 
 def determine_relevant_agents(project_description):
     """
@@ -618,11 +716,21 @@ def determine_relevant_agents(project_description):
     (0-100) à chaque agent que vous jugez utile et justifiez votre choix.
     """
     
-    # Invocation de Claude
-    claude_response = invoke_claude(prompt, system_prompt)
+    # Invocation de Claude: sortie imposée par le schéma (modèle rapide; grand modèle si la
+    # réponse reste non conforme). Une erreur d'appel n'est pas un échec de validation.
+    claude_response = invoke_routed(
+        'determine_relevant_agents', invoke_claude_structured, prompt, system_prompt,
+        'select_agents', AGENTS_SELECTION_SCHEMA,
+        description="Enregistre l'analyse du projet et les agents à impliquer.",
+        validate=lambda response: response["success"] or not response["schema_errors"]
+    )
     
     # Vérifier si l'appel a réussi
     if not claude_response["success"]:
+        if claude_response["schema_errors"]:
+            safe_emit('log', {'type': 'warning', 'message': "Réponse non conforme au schéma, utilisation de la réponse brute"})
+            return {"raw_analysis": claude_response["raw"], "recommended_agents": [], "optional_agents": []}
+        
         # Une erreur critique s'est produite - arrêter le traitement
         error_message = claude_response["error"]
         safe_emit('log', {'type': 'error', 'message': f"Erreur lors de la détermination des agents: {error_message}"})
@@ -636,84 +744,38 @@ def determine_relevant_agents(project_description):
             "optional_agents": []
         }
     
-    # Si l'appel a réussi, continuer avec le traitement normal
-    response = claude_response["content"]
+    agents_json = claude_response["data"]
+    safe_emit('log', {'type': 'success', 'message': "Agents pertinents identifiés avec succès"})
     
-    # Extraction du JSON de la réponse
-    try:
-        json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
-        if json_match:
-            agents_json = json.loads(json_match.group(1))
-            safe_emit('log', {'type': 'success', 'message': "Agents pertinents identifiés avec succès"})
-            
-            # Vérifier si c'est une demande valide de projet technique
-            project_analysis = agents_json.get("project_analysis", "")
-            recommended_agents = agents_json.get("recommended_agents", [])
-            
-            # Si l'analyse indique qu'il n'y a pas de projet ou si aucun agent n'est recommandé
-            if (("Il n'y a pas de projet" in project_analysis or 
-                 "n'est pas un projet" in project_analysis or 
-                 "question générale" in project_analysis or 
-                 "demande non technique" in project_analysis) and
-                len(recommended_agents) == 0):
-                
-                # Notifier l'utilisateur que sa demande n'est pas un projet valide
-                safe_emit('log', {'type': 'warning', 'message': "La demande ne semble pas décrire un projet technique valide."})
-                safe_emit('critical_error', {
-                    'message': "Votre demande ne semble pas décrire un projet technique. Veuillez fournir des détails spécifiques sur le projet que vous souhaitez développer.",
-                    'title': 'Demande non technique détectée',
-                    'details': project_analysis
-                })
-                
-                # Retourner un objet d'erreur pour arrêter le traitement
-                return {
-                    "error": True,
-                    "message": "Demande non technique détectée",
-                    "project_analysis": project_analysis,
-                    "recommended_agents": [],
-                    "optional_agents": []
-                }
-            
-            return agents_json
-        else:
-            # Tenter de trouver un JSON sans les backticks
-            json_match = re.search(r'({.*})', response, re.DOTALL)
-            if json_match:
-                agents_json = json.loads(json_match.group(1))
-                
-                # Même vérification pour cette méthode d'extraction
-                project_analysis = agents_json.get("project_analysis", "")
-                recommended_agents = agents_json.get("recommended_agents", [])
-                
-                if (("Il n'y a pas de projet" in project_analysis or 
-                     "n'est pas un projet" in project_analysis or 
-                     "question générale" in project_analysis or 
-                     "demande non technique" in project_analysis) and
-                    len(recommended_agents) == 0):
-                    
-                    safe_emit('log', {'type': 'warning', 'message': "La demande ne semble pas décrire un projet technique valide."})
-                    safe_emit('critical_error', {
-                        'message': "Votre demande ne semble pas décrire un projet technique. Veuillez fournir des détails spécifiques sur le projet que vous souhaitez développer.",
-                        'title': 'Demande non technique détectée',
-                        'details': project_analysis
-                    })
-                    
-                    return {
-                        "error": True,
-                        "message": "Demande non technique détectée",
-                        "project_analysis": project_analysis,
-                        "recommended_agents": [],
-                        "optional_agents": []
-                    }
-                
-                return agents_json
-            else:
-                safe_emit('log', {'type': 'warning', 'message': "Format JSON non trouvé, utilisation de la réponse brute"})
-                return {"raw_analysis": response, "recommended_agents": [], "optional_agents": []}
-    except Exception as e:
-        safe_emit('log', {'type': 'error', 'message': f"Erreur lors du parsing JSON: {str(e)}"})
-        logger.error(f"Traceback de l'erreur JSON: Type de response = {type(response)}, Début de response = {str(response)[:200]}")
-        return {"raw_analysis": response, "recommended_agents": [], "optional_agents": []}
+    # Vérifier si c'est une demande valide de projet technique
+    project_analysis = agents_json.get("project_analysis", "")
+    recommended_agents = agents_json.get("recommended_agents", [])
+    
+    # Si l'analyse indique qu'il n'y a pas de projet ou si aucun agent n'est recommandé
+    if (("Il n'y a pas de projet" in project_analysis or 
+         "n'est pas un projet" in project_analysis or 
+         "question générale" in project_analysis or 
+         "demande non technique" in project_analysis) and
+        len(recommended_agents) == 0):
+        
+        # Notifier l'utilisateur que sa demande n'est pas un projet valide
+        safe_emit('log', {'type': 'warning', 'message': "La demande ne semble pas décrire un projet technique valide."})
+        safe_emit('critical_error', {
+            'message': "Votre demande ne semble pas décrire un projet technique. Veuillez fournir des détails spécifiques sur le projet que vous souhaitez développer.",
+            'title': 'Demande non technique détectée',
+            'details': project_analysis
+        })
+        
+        # Retourner un objet d'erreur pour arrêter le traitement
+        return {
+            "error": True,
+            "message": "Demande non technique détectée",
+            "project_analysis": project_analysis,
+            "recommended_agents": [],
+            "optional_agents": []
+        }
+    
+    return agents_json
 
 def extract_specifications(project_description):
     """
@@ -761,11 +823,18 @@ def extract_specifications(project_description):
     raisonnables basées sur le contexte.
     """
     
-    # Invocation de Claude
-    claude_response = invoke_claude(prompt, system_prompt)
+    # Invocation de Claude: sortie imposée par le schéma, réparée au besoin
+    claude_response = invoke_claude_structured(
+        prompt, system_prompt, 'save_specifications', SPECIFICATIONS_SCHEMA,
+        description="Enregistre les spécifications structurées du projet."
+    )
     
     # Vérifier si l'appel a réussi
     if not claude_response["success"]:
+        if claude_response["schema_errors"]:
+            safe_emit('log', {'type': 'warning', 'message': "Réponse non conforme au schéma, utilisation de la réponse brute"})
+            return {"raw_specs": claude_response["raw"]}
+        
         # Une erreur critique s'est produite - arrêter le traitement
         error_message = claude_response["error"]
         safe_emit('log', {'type': 'error', 'message': f"Erreur lors de l'extraction des spécifications: {error_message}"})
@@ -777,29 +846,8 @@ def extract_specifications(project_description):
             "raw_specs": "Erreur lors de l'extraction des spécifications - Impossible de continuer"
         }
     
-    # Si l'appel a réussi, continuer avec le traitement normal
-    response = claude_response["content"]
-    
-    # Extraction du JSON de la réponse
-    try:
-        json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
-        if json_match:
-            specs_json = json.loads(json_match.group(1))
-            safe_emit('log', {'type': 'success', 'message': "Spécifications extraites avec succès"})
-            return specs_json
-        else:
-            # Tenter de trouver un JSON sans les backticks
-            json_match = re.search(r'({.*})', response, re.DOTALL)
-            if json_match:
-                specs_json = json.loads(json_match.group(1))
-                return specs_json
-            else:
-                safe_emit('log', {'type': 'warning', 'message': "Format JSON non trouvé, utilisation de la réponse brute"})
-                return {"raw_specs": response}
-    except Exception as e:
-        safe_emit('log', {'type': 'error', 'message': f"Erreur lors du parsing JSON: {str(e)}"})
-        logger.error(f"Traceback de l'erreur JSON: Type de response = {type(response)}, Début de response = {str(response)[:200]}")
-        return {"raw_specs": response}
+    safe_emit('log', {'type': 'success', 'message': "Spécifications extraites avec succès"})
+    return claude_response["data"]
 
 def create_coding_tasks(specs):
     """
@@ -861,11 +909,18 @@ def create_coding_tasks(specs):
     détaillé avec des tâches spécifiques selon le format demandé.
     """
     
-    # Invocation de Claude
-    claude_response = invoke_claude(prompt, system_prompt)
+    # Invocation de Claude: sortie imposée par le schéma, réparée au besoin
+    claude_response = invoke_claude_structured(
+        prompt, system_prompt, 'save_coding_tasks', CODING_TASKS_SCHEMA,
+        description="Enregistre le plan de développement et ses tâches."
+    )
     
     # Vérifier si l'appel a réussi
     if not claude_response["success"]:
+        if claude_response["schema_errors"]:
+            safe_emit('log', {'type': 'warning', 'message': "Réponse non conforme au schéma, utilisation de la réponse brute"})
+            return {"raw_tasks": claude_response["raw"]}
+        
         # Une erreur critique s'est produite - arrêter le traitement
         error_message = claude_response["error"]
         safe_emit('log', {'type': 'error', 'message': f"Erreur lors de la création des tâches de développement: {error_message}"})
@@ -877,29 +932,8 @@ def create_coding_tasks(specs):
             "raw_tasks": "Erreur lors de la création des tâches de développement - Impossible de continuer"
         }
     
-    # Si l'appel a réussi, continuer avec le traitement normal
-    response = claude_response["content"]
-    
-    # Extraction du JSON de la réponse
-    try:
-        json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
-        if json_match:
-            tasks_json = json.loads(json_match.group(1))
-            safe_emit('log', {'type': 'success', 'message': "Tâches de développement créées avec succès"})
-            return tasks_json
-        else:
-            # Tenter de trouver un JSON sans les backticks
-            json_match = re.search(r'({.*})', response, re.DOTALL)
-            if json_match:
-                tasks_json = json.loads(json_match.group(1))
-                return tasks_json
-            else:
-                safe_emit('log', {'type': 'warning', 'message': "Format JSON non trouvé, utilisation de la réponse brute"})
-                return {"raw_tasks": response}
-    except Exception as e:
-        safe_emit('log', {'type': 'error', 'message': f"Erreur lors du parsing JSON: {str(e)}"})
-        logger.error(f"Traceback de l'erreur JSON: Type de response = {type(response)}, Début de response = {str(response)[:200]}")
-        return {"raw_tasks": response}
+    safe_emit('log', {'type': 'success', 'message': "Tâches de développement créées avec succès"})
+    return claude_response["data"]
 
 def create_testing_plan(specs, coding_tasks):
     """
@@ -963,11 +997,18 @@ def create_testing_plan(specs, coding_tasks):
     Veuillez créer un plan de test complet selon le format demandé.
     """
     
-    # Invocation de Claude
-    claude_response = invoke_claude(prompt, system_prompt)
+    # Invocation de Claude: sortie imposée par le schéma, réparée au besoin
+    claude_response = invoke_claude_structured(
+        prompt, system_prompt, 'save_testing_plan', TESTING_PLAN_SCHEMA,
+        description="Enregistre le plan de test du projet."
+    )
     
     # Vérifier si l'appel a réussi
     if not claude_response["success"]:
+        if claude_response["schema_errors"]:
+            safe_emit('log', {'type': 'warning', 'message': "Réponse non conforme au schéma, utilisation de la réponse brute"})
+            return {"raw_test_plan": claude_response["raw"]}
+        
         # Une erreur critique s'est produite - arrêter le traitement
         error_message = claude_response["error"]
         safe_emit('log', {'type': 'error', 'message': f"Erreur lors de la création du plan de test: {error_message}"})
@@ -979,29 +1020,8 @@ def create_testing_plan(specs, coding_tasks):
             "raw_test_plan": "Erreur lors de la création du plan de test - Impossible de continuer"
         }
     
-    # Si l'appel a réussi, continuer avec le traitement normal
-    response = claude_response["content"]
-    
-    # Extraction du JSON de la réponse
-    try:
-        json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
-        if json_match:
-            test_plan_json = json.loads(json_match.group(1))
-            safe_emit('log', {'type': 'success', 'message': "Plan de test créé avec succès"})
-            return test_plan_json
-        else:
-            # Tenter de trouver un JSON sans les backticks
-            json_match = re.search(r'({.*})', response, re.DOTALL)
-            if json_match:
-                test_plan_json = json.loads(json_match.group(1))
-                return test_plan_json
-            else:
-                safe_emit('log', {'type': 'warning', 'message': "Format JSON non trouvé, utilisation de la réponse brute"})
-                return {"raw_test_plan": response}
-    except Exception as e:
-        safe_emit('log', {'type': 'error', 'message': f"Erreur lors du parsing JSON: {str(e)}"})
-        logger.error(f"Traceback de l'erreur JSON: Type de response = {type(response)}, Début de response = {str(response)[:200]}")
-        return {"raw_test_plan": response}
+    safe_emit('log', {'type': 'success', 'message': "Plan de test créé avec succès"})
+    return claude_response["data"]
 
 def interface_with_developer_agent(coding_tasks):
     """
@@ -1056,9 +1076,10 @@ def interface_with_developer_agent(coding_tasks):
         project_name = "go-project"  # Le nom de projet est maintenant requis pour l'agent Go Backend
         
         # Envoi de la requête à l'agent développeur Go Backend
-        dev_response = requests.post(
-            AGENT_DEV_URL,
+        dev_response = get_agent_client('dev-go').post(
+            '/go_code_request',
             json={"project_name": project_name, "specs": specs, "requirements": requirements},
+            sticky=project_name,
             timeout=300  # Délai augmenté car la génération de code Go peut prendre plus de temps
         )
         
@@ -1109,8 +1130,8 @@ def interface_with_qa_agent(test_plan, url):
     
     try:
         # Envoi de la requête à l'agent QAClaude
-        qa_response = requests.post(
-            AGENT_QA_URL,
+        qa_response = get_agent_client('qa').post(
+            '/qa_api_request',
             json={"url": url, "input": test_request},
             timeout=300  # Délai augmenté car QAClaude peut prendre plus de temps pour les tests
         )
@@ -1144,8 +1165,8 @@ def interface_with_performance_agent(url, audit_type='full'):
     
     try:
         # Envoi de la requête à l'agent Performance
-        perf_response = requests.post(
-            AGENT_PERF_URL,
+        perf_response = get_agent_client('perf').post(
+            '/api/performance_audit',
             json={"url": url, "audit_type": audit_type},
             timeout=300  # Timeout plus long car l'audit complet peut prendre du temps
         )
@@ -1186,13 +1207,14 @@ def interface_with_devops_agent(project_name, specifications, config_type='compl
     
     try:
         # Envoi de la requête à l'agent DevOps
-        devops_response = requests.post(
-            AGENT_DEVOPS_CONFIG_URL,
+        devops_response = get_agent_client('devops').post(
+            '/api/devops_config',
             json={
                 "project_name": project_name,
                 "specs": specs_text,
                 "config_type": config_type
             },
+            sticky=project_name,
             timeout=300  # Timeout plus long car la génération peut prendre du temps
         )
         
@@ -1226,13 +1248,14 @@ def manage_ci_cd_pipeline(project_name, action='status', environment='dev'):
     
     try:
         # Envoi de la requête à l'agent DevOps
-        cicd_response = requests.post(
-            AGENT_DEVOPS_CICD_URL,
+        cicd_response = get_agent_client('devops').post(
+            '/api/ci_cd_pipeline',
             json={
                 "project_name": project_name,
                 "action": action,
                 "environment": environment
             },
+            sticky=project_name,
             timeout=60
         )
         
@@ -1271,12 +1294,13 @@ def interface_with_ml_agent(project_name, specifications):
     
     try:
         # Envoi de la requête à l'agent ML
-        ml_response = requests.post(
-            AGENT_ML_URL,
+        ml_response = get_agent_client('ml').post(
+            '/api/ml_analysis',
             json={
                 "project_name": project_name,
                 "specs": specs_text
             },
+            sticky=project_name,
             timeout=300  # Timeout plus long car la génération ML peut prendre du temps
         )
         
@@ -1326,9 +1350,10 @@ def interface_with_python_agent(project_name, specifications, requirements=None)
     
     try:
         # Envoi de la requête à l'agent Python
-        python_response = requests.post(
-            AGENT_DEV_PYTHON_URL,
+        python_response = get_agent_client('dev-python').post(
+            '/code_request',
             json=request_body,
+            sticky=project_name,
             timeout=300  # Timeout plus long car la génération de code peut prendre du temps
         )
         
@@ -1378,9 +1403,10 @@ def interface_with_analytics_monitoring_agent(project_name, specifications, stac
     
     try:
         # Envoi de la requête à l'agent Analytics & Monitoring
-        analytics_response = requests.post(
-            AGENT_ANALYTICS_URL,
+        analytics_response = get_agent_client('analytics').post(
+            '/api/analytics_monitoring',
             json=request_body,
+            sticky=project_name,
             timeout=300  # Timeout plus long car la génération de configurations peut prendre du temps
         )
         
@@ -1413,8 +1439,8 @@ def interface_with_frontend_agent(specifications, open_cursor=False):
     
     try:
         # Envoi de la requête à l'agent frontend
-        frontend_response = requests.post(
-            AGENT_FRONTEND_URL,
+        frontend_response = get_agent_client('dev-frontend').post(
+            '/frontend_request',
             json={"specs": specifications, "open_cursor": open_cursor},
             timeout=300  # Timeout plus long car la génération de code frontend peut prendre du temps
         )
@@ -1449,13 +1475,14 @@ def test_interface_with_go_backend(project_name, specifications):
     
     try:
         # Simplifier au maximum pour éviter les erreurs
-        response = requests.post(
-            AGENT_GO_BACKEND_URL,
+        response = get_agent_client('dev-go').post(
+            '/go_code_request',
             json={
                 "project_name": str(project_name),
                 "specs": str(specifications),
                 "requirements": "API REST simple en Go"
             },
+            sticky=str(project_name),
             timeout=30
         )
         
@@ -1506,13 +1533,14 @@ def interface_with_go_backend_agent(project_name, specifications, requirements):
             specs_text = str(specifications)
         
         # Envoi de la requête à l'agent Go backend
-        go_response = requests.post(
-            AGENT_GO_BACKEND_URL,
+        go_response = get_agent_client('dev-go').post(
+            '/go_code_request',
             json={
                 "project_name": project_name,
                 "specs": specs_text,
                 "requirements": requirements
             },
+            sticky=project_name,
             timeout=300  # Timeout plus long car la génération de code peut prendre du temps
         )
         
@@ -1551,12 +1579,13 @@ def interface_with_product_owner_agent(project_name, specifications):
     
     try:
         # Envoi de la requête à l'agent Product Owner
-        po_response = requests.post(
-            AGENT_PRODUCT_OWNER_URL,
+        po_response = get_agent_client('product-owner').post(
+            '/api/product_requirements',
             json={
                 "project_name": project_name,
                 "specs": specs_text
             },
+            sticky=project_name,
             timeout=300  # Timeout plus long car l'analyse peut prendre du temps
         )
         
@@ -1606,9 +1635,10 @@ def interface_with_ux_designer_agent(project_name, specifications, user_personas
     
     try:
         # Envoi de la requête à l'agent UX Designer
-        ux_response = requests.post(
-            AGENT_UX_DESIGNER_URL,
+        ux_response = get_agent_client('ux-designer').post(
+            '/api/ux_design',
             json=request_body,
+            sticky=project_name,
             timeout=300  # Timeout plus long car la génération de designs peut prendre du temps
         )
         
@@ -1658,9 +1688,10 @@ def interface_with_ios_agent(project_name, specifications, requirements=None):
     
     try:
         # Envoi de la requête à l'agent iOS
-        ios_response = requests.post(
-            AGENT_IOS_URL,
+        ios_response = get_agent_client('dev-ios').post(
+            '/code_request',
             json=request_body,
+            sticky=project_name,
             timeout=300  # Timeout plus long car la génération de code peut prendre du temps
         )
         
@@ -1710,9 +1741,10 @@ def interface_with_android_agent(project_name, specifications, requirements=None
     
     try:
         # Envoi de la requête à l'agent Android
-        android_response = requests.post(
-            AGENT_ANDROID_URL,
+        android_response = get_agent_client('dev-android').post(
+            '/code_request',
             json=request_body,
+            sticky=project_name,
             timeout=300  # Timeout plus long car la génération de code peut prendre du temps
         )
         
@@ -1756,333 +1788,577 @@ def analyze_request():
         safe_emit('log', {'type': 'error', 'message': error_message})
         return jsonify({'error': error_message, 'status': 'error'})
 
-@app.route('/project_request', methods=['POST'])
-def project_request():
-    """Endpoint pour recevoir et traiter les demandes de projet"""
-    safe_emit('log', {'type': 'info', 'message': "Traitement de la demande de projet"})
+class ProjectAborted(Exception):
+    """Analyse des agents en erreur (ou demande non technique): le projet n'est pas traité."""
     
-    # Capturer l'exception au niveau le plus élevé pour garantir une réponse
-    try:
-        data = request.json or {}  # Éviter None si request.json est None
-        project_description = data.get('description', '')
-        app_url = data.get('app_url', '')
-        project_name = data.get('project_name', 'my-project')
-        project_type = data.get('type', '')
+    def __init__(self, analysis):
+        super().__init__(analysis.get('message', 'Erreur non spécifiée'))
+        self.analysis = analysis
+
+def recommended_ids(agents_analysis, key='recommended_agents'):
+    """
+    Retourne les identifiants des agents d'une analyse.
+    
+    Args:
+        agents_analysis (dict): Résultat de determine_relevant_agents
+        key (str, optional): 'recommended_agents' ou 'optional_agents'
+    
+    Returns:
+        list: Identifiants des agents (les entrées peuvent être des objets ou des identifiants)
+    """
+    return [agent['id'] if isinstance(agent, dict) else agent for agent in (agents_analysis or {}).get(key, [])]
+
+def technical_requirements(coding_tasks):
+    """Extrait les exigences techniques communes à partir des tâches de développement."""
+    tech_requirements = ""
+    if "technical_considerations" in coding_tasks:
+        tech_requirements += "# Considérations techniques\n"
+        for consideration in coding_tasks['technical_considerations']:
+            tech_requirements += f"- {consideration}\n"
+    return tech_requirements
+
+def run_project(data, on_phase=None, checkpoints=None):
+    """
+    Traite une demande de projet de bout en bout (analyse, spécifications, agents).
+    
+    Args:
+        data (dict): Données de la demande (description, project_name, app_url, launch_*...)
+        on_phase (callable, optional): on_phase(nom, état, timings, valeur), appelé à chaque
+            changement d'état d'une phase (voir shared.dag)
+        checkpoints (dict, optional): Résultats des phases terminées lors d'une tentative
+            précédente (nom -> valeur); ces phases ne sont pas refaites
+    
+    Returns:
+        dict: Réponse complète du projet, avec les timings de chaque phase
+    """
+    project_description = data.get('description', '')
+    app_url = data.get('app_url', '')
+    project_name = data.get('project_name', 'my-project')
+    project_type = data.get('type', '')
+    
+    # Log des données reçues
+    safe_emit('log', {'type': 'info', 'message': f"Données de la requête reçues: project_name={project_name}, type={project_type}"})
+    
+    # Pour les projets de type Go, utiliser un flux simplifié
+    if project_type == 'go':
+        safe_emit('log', {'type': 'info', 'message': "Projet Go détecté, traitement simplifié"})
         
-        # Log des données reçues
-        safe_emit('log', {'type': 'info', 'message': f"Données de la requête reçues: project_name={project_name}, type={project_type}"})
+        # Préparer les données pour l'agent Go
+        go_specs = project_description
+        go_requirements = "Utiliser la bibliothèque standard Go pour créer une API REST simple"
         
-        # Pour les projets de type Go, utiliser un flux simplifié
-        if project_type == 'go':
-            safe_emit('log', {'type': 'info', 'message': "Projet Go détecté, traitement simplifié"})
-            
-            # Préparer les données pour l'agent Go
-            go_specs = project_description
-            go_requirements = "Utiliser la bibliothèque standard Go pour créer une API REST simple"
-            
-            # Appel direct à l'agent Go
-            safe_emit('log', {'type': 'info', 'message': f"Envoi de la demande à l'agent Go sur {AGENT_GO_BACKEND_URL}"})
+        # Appel direct à l'agent Go
+        safe_emit('log', {'type': 'info', 'message': "Envoi de la demande à l'agent Go (service dev-go)"})
+        
+        try:
+            # Utiliser requests directement pour éviter les couches intermédiaires
+            response = get_agent_client('dev-go').post(
+                '/go_code_request',
+                json={
+                    "project_name": project_name,
+                    "specs": go_specs,
+                    "requirements": go_requirements
+                },
+                sticky=project_name,
+                timeout=60
+            )
             
-            try:
-                # Utiliser requests directement pour éviter les couches intermédiaires
-                response = requests.post(
-                    AGENT_GO_BACKEND_URL,
-                    json={
-                        "project_name": project_name,
-                        "specs": go_specs,
-                        "requirements": go_requirements
-                    },
-                    timeout=60
-                )
+            if response.status_code == 200:
+                safe_emit('log', {'type': 'success', 'message': "Réponse reçue de l'agent Go"})
+                go_response = response.json()
                 
-                if response.status_code == 200:
-                    safe_emit('log', {'type': 'success', 'message': "Réponse reçue de l'agent Go"})
-                    go_response = response.json()
-                    
-                    return jsonify({
-                        "success": True,
-                        "message": "Projet Go généré avec succès",
-                        "dev_response": go_response
-                    })
-                else:
-                    error_msg = f"Erreur HTTP {response.status_code} de l'agent Go"
-                    safe_emit('log', {'type': 'error', 'message': error_msg})
-                    return jsonify({
-                        "success": False,
-                        "error": error_msg,
-                        "status_code": response.status_code
-                    })
-            except Exception as e:
-                error_msg = f"Erreur de communication avec l'agent Go: {str(e)}"
+                return {
+                    "success": True,
+                    "message": "Projet Go généré avec succès",
+                    "dev_response": go_response
+                }
+            else:
+                error_msg = f"Erreur HTTP {response.status_code} de l'agent Go"
                 safe_emit('log', {'type': 'error', 'message': error_msg})
-                return jsonify({
+                return {
                     "success": False,
-                    "error": error_msg
-                })
-        
-        # Pour les autres types de projets, continuer avec le flux normal
-        # Vérifier si on utilise une suggestion améliorée
-        selected_suggestion = data.get('selected_suggestion', None)
-        if selected_suggestion:
-            # Vérifier que selected_suggestion est bien un dictionnaire
-            if isinstance(selected_suggestion, dict):
-                safe_emit('log', {'type': 'info', 'message': f"Utilisation de la suggestion améliorée: {selected_suggestion.get('title', 'Sans titre')}"})
-                project_description = selected_suggestion.get('improved_request', project_description)
-            else:
-                # Si c'est une chaîne, la traiter différemment ou logger l'erreur
-                safe_emit('log', {'type': 'warning', 'message': "Format de suggestion invalide, utilisation de la description originale"})
-        
-        # Si ce n'est pas un test Go, continuer avec le flux normal
+                    "error": error_msg,
+                    "status_code": response.status_code
+                }
+        except Exception as e:
+            error_msg = f"Erreur de communication avec l'agent Go: {str(e)}"
+            safe_emit('log', {'type': 'error', 'message': error_msg})
+            return {
+                "success": False,
+                "error": error_msg
+            }
+    
+    # Pour les autres types de projets, continuer avec le flux normal
+    # Vérifier si on utilise une suggestion améliorée
+    selected_suggestion = data.get('selected_suggestion', None)
+    if selected_suggestion:
+        # Vérifier que selected_suggestion est bien un dictionnaire
+        if isinstance(selected_suggestion, dict):
+            safe_emit('log', {'type': 'info', 'message': f"Utilisation de la suggestion améliorée: {selected_suggestion.get('title', 'Sans titre')}"})
+            project_description = selected_suggestion.get('improved_request', project_description)
+        else:
+            # Si c'est une chaîne, la traiter différemment ou logger l'erreur
+            safe_emit('log', {'type': 'warning', 'message': "Format de suggestion invalide, utilisation de la description originale"})
+    
+    # Si ce n'est pas un test Go, continuer avec le flux normal.
+    # Les phases forment un graphe de dépendances: les agents indépendants sont
+    # appelés en parallèle, seules les vraies dépendances restent séquentielles
+    # (Product Owner -> spécifications -> tâches -> plan de test).
+    context = current_job_context()
+    dag = DagExecutor(name="project", listener=on_phase,
+                      cancelled=(lambda: context.cancelled) if context is not None else None)
+    
+    def launch(agent_id, flag):
+        """Condition d'exécution: agent recommandé ou lancement demandé explicitement."""
+        return lambda results: data.get(flag, False) or agent_id in recommended_ids(results['agents_analysis'])
+    
+    def run_agents_analysis(results):
         safe_emit('log', {'type': 'info', 'message': "Appel de determine_relevant_agents..."})
-        
-        # En mode de test ou de développement, simuler la réponse pour éviter les erreurs
-        agents_analysis = {
-            "recommended_agents": ["python", "frontend"],
-            "project_framework": "Application web",
-            "project_complexity": "Moyenne"
-        }
+        agents_analysis = determine_relevant_agents(project_description)
         
         # Vérifier si une erreur s'est produite ou si ce n'est pas un projet technique
         if agents_analysis.get('error', False):
-            error_message = agents_analysis.get('message', 'Erreur non spécifiée')
-            project_analysis = agents_analysis.get('project_analysis', 'Analyse non disponible')
-            
-            safe_emit('log', {'type': 'warning', 'message': f"Traitement arrêté: {error_message}"})
-            
-            # Si ce n'est pas déjà fait, envoyer une notification critique à l'interface utilisateur
-            if "Demande non technique détectée" in error_message:
-                # Notification déjà envoyée par determine_relevant_agents()
-                pass
-            else:
-                safe_emit('critical_error', {
-                    'message': f"Le traitement a été interrompu: {error_message}",
-                    'title': 'Traitement arrêté',
-                    'details': project_analysis
-                })
-            
-            return jsonify({"success": False, "message": error_message})
+            raise ProjectAborted(agents_analysis)
         
         safe_emit('agents_analysis_update', {'agents_analysis': agents_analysis})
-        
-        # Créer une liste d'IDs des agents recommandés
-        recommended_agent_ids = [agent['id'] for agent in agents_analysis.get('recommended_agents', [])]
-        optional_agent_ids = [agent['id'] for agent in agents_analysis.get('optional_agents', [])]
-        
-        # Phase 1: Extraction des spécifications
+        return agents_analysis
+    
+    # Phase 1: Extraction des spécifications (en parallèle de l'analyse des agents)
+    def run_specifications(results):
         specifications = extract_specifications(project_description)
         safe_emit('specifications_update', {'specifications': specifications})
-        
-        # Phase 2: Interface avec l'agent Product Owner (si recommandé ou demandé explicitement)
-        product_owner_response = None
-        if data.get('launch_product_owner', False) or 'product_owner' in recommended_agent_ids:
-            product_owner_response = interface_with_product_owner_agent(project_name, specifications)
-            safe_emit('product_owner_response_update', {'product_owner_response': product_owner_response})
-            
-            # Mise à jour des spécifications si des améliorations sont proposées
-            if product_owner_response and 'refined_specs' in product_owner_response:
-                specifications = product_owner_response['refined_specs']
-                safe_emit('specifications_update', {'specifications': specifications})
-        
-        # Phase 3: Interface avec l'agent UX Designer (si recommandé ou demandé explicitement)
-        ux_designer_response = None
-        if data.get('launch_ux_designer', False) or 'ux_designer' in recommended_agent_ids:
-            # Extraire les informations utilisateurs si disponibles
-            user_personas = None
-            if "user_requirements" in specifications:
-                user_personas = specifications["user_requirements"]
-            
-            ux_designer_response = interface_with_ux_designer_agent(project_name, specifications, user_personas)
-            safe_emit('ux_designer_response_update', {'ux_designer_response': ux_designer_response})
-        
-        # Phase 4: Création des tâches de développement
-        coding_tasks = create_coding_tasks(specifications)
+        return specifications
+    
+    # Phase 2: Interface avec l'agent Product Owner (si recommandé ou demandé explicitement)
+    def run_product_owner(results):
+        product_owner_response = interface_with_product_owner_agent(project_name, results['specifications'])
+        safe_emit('product_owner_response_update', {'product_owner_response': product_owner_response})
+        return product_owner_response
+    
+    # Mise à jour des spécifications si des améliorations sont proposées
+    def run_refined_specifications(results):
+        product_owner_response = results['product_owner']
+        if product_owner_response and 'refined_specs' in product_owner_response:
+            safe_emit('specifications_update', {'specifications': product_owner_response['refined_specs']})
+            return product_owner_response['refined_specs']
+        return results['specifications']
+    
+    # Phase 3: Interface avec l'agent UX Designer (si recommandé ou demandé explicitement)
+    def run_ux_designer(results):
+        specifications = results['refined_specifications']
+        # Extraire les informations utilisateurs si disponibles
+        user_personas = None
+        if "user_requirements" in specifications:
+            user_personas = specifications["user_requirements"]
+        
+        ux_designer_response = interface_with_ux_designer_agent(project_name, specifications, user_personas)
+        safe_emit('ux_designer_response_update', {'ux_designer_response': ux_designer_response})
+        return ux_designer_response
+    
+    # Phase 4: Création des tâches de développement
+    def run_coding_tasks(results):
+        coding_tasks = create_coding_tasks(results['refined_specifications'])
         safe_emit('tasks_update', {'tasks': coding_tasks})
-        
-        # Phase 5: Création du plan de test
-        test_plan = create_testing_plan(specifications, coding_tasks)
+        return coding_tasks
+    
+    # Phase 5: Création du plan de test
+    def run_test_plan(results):
+        test_plan = create_testing_plan(results['refined_specifications'], results['coding_tasks'])
         safe_emit('test_plan_update', {'test_plan': test_plan})
-        
-        # Extraire les exigences techniques communes à partir des tâches de développement
-        tech_requirements = ""
+        return test_plan
+    
+    # Phase 6: Interface avec les agents de développement selon les recommandations
+    
+    # Agent développeur Go Backend
+    def run_dev(results):
+        dev_response = interface_with_developer_agent(results['coding_tasks'])
+        safe_emit('dev_response_update', {'dev_response': dev_response})
+        return dev_response
+    
+    # Agent développeur Go backend (ancienne méthode)
+    def run_go(results):
+        go_response = interface_with_go_backend_agent(
+            project_name, 
+            results['refined_specifications'], 
+            technical_requirements(results['coding_tasks'])
+        )
+        safe_emit('go_response_update', {'go_response': go_response})
+        return go_response
+    
+    # Agent développeur frontend
+    def run_frontend(results):
+        frontend_response = interface_with_frontend_agent(results['refined_specifications'], data.get('open_cursor', False))
+        safe_emit('frontend_response_update', {'frontend_response': frontend_response})
+        return frontend_response
+    
+    # Agent Développeur Python
+    def run_python(results):
+        python_response = interface_with_python_agent(
+            project_name, 
+            results['refined_specifications'], 
+            technical_requirements(results['coding_tasks'])
+        )
+        safe_emit('python_response_update', {'python_response': python_response})
+        return python_response
+    
+    # Agent Développeur iOS
+    def run_ios(results):
+        ios_response = interface_with_ios_agent(
+            project_name, 
+            results['refined_specifications'], 
+            technical_requirements(results['coding_tasks'])
+        )
+        safe_emit('ios_response_update', {'ios_response': ios_response})
+        return ios_response
+    
+    # Agent Développeur Android
+    def run_android(results):
+        android_response = interface_with_android_agent(
+            project_name, 
+            results['refined_specifications'], 
+            technical_requirements(results['coding_tasks'])
+        )
+        safe_emit('android_response_update', {'android_response': android_response})
+        return android_response
+    
+    # Phase 7: Agents de test et qualité
+    
+    # Agent QAClaude
+    def run_qa(results):
+        qa_response = interface_with_qa_agent(results['test_plan'], app_url)
+        safe_emit('qa_response_update', {'qa_response': qa_response})
+        return qa_response
+    
+    # Agent Performance (audit de l'URL fournie, indépendant du code généré)
+    def run_performance(results):
+        audit_type = data.get('audit_type', 'full')
+        performance_response = interface_with_performance_agent(app_url, audit_type)
+        safe_emit('performance_response_update', {'performance_response': performance_response})
+        return performance_response
+    
+    # Phase 8: Agents d'infrastructure et opérations
+    
+    # Agent DevOps pour les configurations
+    def run_devops(results):
+        config_type = data.get('devops_config_type', 'complete')
+        devops_response = interface_with_devops_agent(project_name, results['refined_specifications'], config_type)
+        safe_emit('devops_response_update', {'devops_response': devops_response})
+        return devops_response
+    
+    # Agent DevOps pour le CI/CD
+    def run_cicd(results):
+        cicd_action = data.get('cicd_action', 'status')
+        cicd_environment = data.get('cicd_environment', 'dev')
+        cicd_response = manage_ci_cd_pipeline(project_name, cicd_action, cicd_environment)
+        safe_emit('cicd_response_update', {'cicd_response': cicd_response})
+        return cicd_response
+    
+    # Phase 9: Agents spécialisés
+    
+    # Agent Machine Learning
+    def run_ml(results):
+        ml_response = interface_with_ml_agent(project_name, results['refined_specifications'])
+        safe_emit('ml_response_update', {'ml_response': ml_response})
+        return ml_response
+    
+    # Agent Analytics & Monitoring
+    def run_analytics(results):
+        coding_tasks = results['coding_tasks']
+        # Extraire les informations de stack technique
+        stack_info = ""
         if "technical_considerations" in coding_tasks:
-            tech_requirements += "# Considérations techniques\n"
+            stack_info += "# Stack technique\n"
             for consideration in coding_tasks['technical_considerations']:
-                tech_requirements += f"- {consideration}\n"
-        
-        # Phase 6: Interface avec les agents de développement selon les recommandations
-        
-        # Agent développeur Go Backend
-        dev_response = None
-        if data.get('launch_dev', False) or 'go' in recommended_agent_ids:
-            dev_response = interface_with_developer_agent(coding_tasks)
-            safe_emit('dev_response_update', {'dev_response': dev_response})
-        
-        # Agent développeur Go backend (ancienne méthode)
-        go_response = None
-        if data.get('launch_go', False) or ('go' in recommended_agent_ids and 'go' not in data.keys()):
-            go_response = interface_with_go_backend_agent(
-                project_name, 
-                specifications, 
-                tech_requirements
-            )
-            safe_emit('go_response_update', {'go_response': go_response})
-        
-        # Agent développeur frontend
-        frontend_response = None
-        if data.get('launch_frontend', False) or 'frontend' in recommended_agent_ids:
-            frontend_response = interface_with_frontend_agent(specifications, data.get('open_cursor', False))
-            safe_emit('frontend_response_update', {'frontend_response': frontend_response})
-        
-        # Agent Développeur Python
-        python_response = None
-        if data.get('launch_python', False) or 'python' in recommended_agent_ids:
-            python_response = interface_with_python_agent(
-                project_name, 
-                specifications, 
-                tech_requirements
-            )
-            safe_emit('python_response_update', {'python_response': python_response})
-        
-        # Agent Développeur iOS
-        ios_response = None
-        if data.get('launch_ios', False) or 'ios' in recommended_agent_ids:
-            ios_response = interface_with_ios_agent(
-                project_name, 
-                specifications, 
-                tech_requirements
-            )
-            safe_emit('ios_response_update', {'ios_response': ios_response})
-        
-        # Agent Développeur Android
-        android_response = None
-        if data.get('launch_android', False) or 'android' in recommended_agent_ids:
-            android_response = interface_with_android_agent(
-                project_name, 
-                specifications, 
-                tech_requirements
-            )
-            safe_emit('android_response_update', {'android_response': android_response})
-        
-        # Phase 7: Agents de test et qualité
-        
-        # Agent QAClaude
-        qa_response = None
-        if (data.get('launch_qa', False) or 'qa' in recommended_agent_ids) and app_url:
-            qa_response = interface_with_qa_agent(test_plan, app_url)
-            safe_emit('qa_response_update', {'qa_response': qa_response})
-        
-        # Agent Performance
-        performance_response = None
-        if (data.get('launch_performance', False) or 'performance' in recommended_agent_ids) and app_url:
-            audit_type = data.get('audit_type', 'full')
-            performance_response = interface_with_performance_agent(app_url, audit_type)
-            safe_emit('performance_response_update', {'performance_response': performance_response})
-        
-        # Phase 8: Agents d'infrastructure et opérations
-        
-        # Agent DevOps pour les configurations
-        devops_response = None
-        if data.get('launch_devops', False) or 'devops' in recommended_agent_ids:
-            config_type = data.get('devops_config_type', 'complete')
-            devops_response = interface_with_devops_agent(project_name, specifications, config_type)
-            safe_emit('devops_response_update', {'devops_response': devops_response})
-        
-        # Agent DevOps pour le CI/CD
-        cicd_response = None
-        if data.get('launch_cicd', False) or ('devops' in recommended_agent_ids and not devops_response):
-            cicd_action = data.get('cicd_action', 'status')
-            cicd_environment = data.get('cicd_environment', 'dev')
-            cicd_response = manage_ci_cd_pipeline(project_name, cicd_action, cicd_environment)
-            safe_emit('cicd_response_update', {'cicd_response': cicd_response})
-        
-        # Phase 9: Agents spécialisés
-        
-        # Agent Machine Learning
-        ml_response = None
-        if data.get('launch_ml', False) or 'ml' in recommended_agent_ids:
-            ml_response = interface_with_ml_agent(project_name, specifications)
-            safe_emit('ml_response_update', {'ml_response': ml_response})
-        
-        # Agent Analytics & Monitoring
-        analytics_response = None
-        if data.get('launch_analytics', False) or 'analytics' in recommended_agent_ids:
-            # Extraire les informations de stack technique
-            stack_info = ""
-            if "technical_considerations" in coding_tasks:
-                stack_info += "# Stack technique\n"
-                for consideration in coding_tasks['technical_considerations']:
-                    if any(tech in consideration.lower() for tech in 
-                           ["frontend", "backend", "database", "infrastructure", "framework", 
-                            "language", "server", "cloud", "kubernetes", "docker"]):
-                        stack_info += f"- {consideration}\n"
-            
-            analytics_response = interface_with_analytics_monitoring_agent(
-                project_name,
-                specifications,
-                stack_info
-            )
-            safe_emit('analytics_response_update', {'analytics_response': analytics_response})
-        
-        # Préparation de la réponse complète
-        response = {
-            'agents_analysis': agents_analysis,
-            'specifications': specifications,
-            'coding_tasks': coding_tasks,
-            'test_plan': test_plan
-        }
-        
-        # Ajouter chaque réponse d'agent si disponible
-        if product_owner_response:
-            response['product_owner_response'] = product_owner_response
-            
-        if ux_designer_response:
-            response['ux_designer_response'] = ux_designer_response
-            
-        if dev_response:
-            response['dev_response'] = dev_response
-        
-        if go_response:
-            response['go_response'] = go_response
+                if any(tech in consideration.lower() for tech in 
+                       ["frontend", "backend", "database", "infrastructure", "framework", 
+                        "language", "server", "cloud", "kubernetes", "docker"]):
+                    stack_info += f"- {consideration}\n"
+        
+        analytics_response = interface_with_analytics_monitoring_agent(
+            project_name,
+            results['refined_specifications'],
+            stack_info
+        )
+        safe_emit('analytics_response_update', {'analytics_response': analytics_response})
+        return analytics_response
+    
+    specs = 'refined_specifications'
+    dag.add('agents_analysis', run_agents_analysis)
+    dag.add('specifications', run_specifications)
+    dag.add('product_owner', run_product_owner, ['agents_analysis', 'specifications'],
+            when=launch('product_owner', 'launch_product_owner'))
+    dag.add(specs, run_refined_specifications, ['specifications', 'product_owner'])
+    dag.add('ux_designer', run_ux_designer, ['agents_analysis', specs], when=launch('ux_designer', 'launch_ux_designer'))
+    dag.add('coding_tasks', run_coding_tasks, [specs])
+    dag.add('test_plan', run_test_plan, [specs, 'coding_tasks'])
+    dag.add('dev', run_dev, ['agents_analysis', 'coding_tasks'], when=launch('go', 'launch_dev'))
+    dag.add('go', run_go, ['agents_analysis', specs, 'coding_tasks'],
+            when=lambda results: data.get('launch_go', False) or ('go' in recommended_ids(results['agents_analysis']) and 'go' not in data.keys()))
+    dag.add('frontend', run_frontend, ['agents_analysis', specs], when=launch('frontend', 'launch_frontend'))
+    dag.add('python', run_python, ['agents_analysis', specs, 'coding_tasks'], when=launch('python', 'launch_python'))
+    dag.add('ios', run_ios, ['agents_analysis', specs, 'coding_tasks'], when=launch('ios', 'launch_ios'))
+    dag.add('android', run_android, ['agents_analysis', specs, 'coding_tasks'], when=launch('android', 'launch_android'))
+    dag.add('qa', run_qa, ['agents_analysis', 'test_plan'],
+            when=lambda results: bool(app_url) and launch('qa', 'launch_qa')(results))
+    dag.add('performance', run_performance, ['agents_analysis'],
+            when=lambda results: bool(app_url) and launch('performance', 'launch_performance')(results))
+    dag.add('devops', run_devops, ['agents_analysis', specs], when=launch('devops', 'launch_devops'))
+    dag.add('cicd', run_cicd, ['agents_analysis', 'devops'],
+            when=lambda results: data.get('launch_cicd', False) or ('devops' in recommended_ids(results['agents_analysis']) and not results['devops']))
+    dag.add('ml', run_ml, ['agents_analysis', specs], when=launch('ml', 'launch_ml'))
+    dag.add('analytics', run_analytics, ['agents_analysis', specs, 'coding_tasks'], when=launch('analytics', 'launch_analytics'))
+    
+    if checkpoints:
+        safe_emit('log', {'type': 'info', 'message': f"Reprise du projet: phases déjà terminées: {', '.join(checkpoints)}"})
+    results, timings = dag.run(restored=checkpoints)
+    if context is not None:
+        # Annulation en cours de route: les phases non démarrées ont été annulées
+        context.check()
+    errors = dag.errors()
+    logger.info(f"Projet traité en {timings['wall_ms']} ms (somme des phases: {timings['sum_ms']} ms, "
+                f"chemin critique: {' -> '.join(timings['critical_path'])})")
+    
+    if isinstance(errors.get('agents_analysis'), ProjectAborted):
+        agents_analysis = errors['agents_analysis'].analysis
+        error_message = agents_analysis.get('message', 'Erreur non spécifiée')
+        project_analysis = agents_analysis.get('project_analysis', 'Analyse non disponible')
+        
+        safe_emit('log', {'type': 'warning', 'message': f"Traitement arrêté: {error_message}"})
+        
+        # Si ce n'est pas déjà fait, envoyer une notification critique à l'interface utilisateur
+        if "Demande non technique détectée" in error_message:
+            # Notification déjà envoyée par determine_relevant_agents()
+            pass
+        else:
+            safe_emit('critical_error', {
+                'message': f"Le traitement a été interrompu: {error_message}",
+                'title': 'Traitement arrêté',
+                'details': project_analysis
+            })
         
-        if frontend_response:
-            response['frontend_response'] = frontend_response
-            
-        if python_response:
-            response['python_response'] = python_response
-            
-        if ios_response:
-            response['ios_response'] = ios_response
-            
-        if android_response:
-            response['android_response'] = android_response
+        return {"success": False, "message": error_message, "timings": timings}
+    
+    if errors:
+        # Même comportement qu'auparavant: une exception interrompt le traitement du projet
+        raise next(iter(errors.values()))
+    
+    # Préparation de la réponse complète
+    response = {
+        'agents_analysis': results['agents_analysis'],
+        'specifications': results[specs],
+        'coding_tasks': results['coding_tasks'],
+        'test_plan': results['test_plan'],
+        'timings': timings
+    }
+    
+    # Ajouter chaque réponse d'agent si disponible
+    for node_name in ('product_owner', 'ux_designer', 'dev', 'go', 'frontend', 'python', 'ios', 'android',
+                      'qa', 'performance', 'devops', 'cicd', 'ml', 'analytics'):
+        if results.get(node_name):
+            response[f'{node_name}_response'] = results[node_name]
+    
+    safe_emit('log', {'type': 'success', 'message': "Projet traité avec succès"})
+    safe_emit('project_complete')
+    
+    return response
+
+@app.route('/project_request', methods=['POST'])
+@admission_control('project_request')
+def project_request():
+    """Endpoint pour recevoir et traiter les demandes de projet (réponse à la fin du traitement)"""
+    data = request.json or {}  # Éviter None si request.json est None
+    
+    # Contexte propre à ce projet: salle Socket.IO, annulation et confirmations
+    context = JobContext(data.get('job_id'))
+    subscribe_client(context.job_id, data.get('socket_id'))
+    
+    with job_context(context):
+        safe_emit('log', {'type': 'info', 'message': "Traitement de la demande de projet"})
         
-        if qa_response:
-            response['qa_response'] = qa_response
-            
-        if performance_response:
-            response['performance_response'] = performance_response
-            
-        if devops_response:
-            response['devops_response'] = devops_response
-            
-        if cicd_response:
-            response['cicd_response'] = cicd_response
-            
-        if ml_response:
-            response['ml_response'] = ml_response
-            
-        if analytics_response:
-            response['analytics_response'] = analytics_response
+        # Capturer l'exception au niveau le plus élevé pour garantir une réponse
+        try:
+            return jsonify(dict(run_project(data), job_id=context.job_id))
         
-        safe_emit('log', {'type': 'success', 'message': "Projet traité avec succès"})
-        safe_emit('project_complete')
+        except JobCancelledError:
+            safe_emit('log', {'type': 'warning', 'message': "Traitement du projet annulé"})
+            return jsonify({'error': "Traitement du projet annulé", 'status': 'cancelled', 'job_id': context.job_id})
         
-        return jsonify(response)
+        except Exception as e:
+            error_message = f"Erreur lors du traitement du projet: {str(e)}"
+            safe_emit('log', {'type': 'error', 'message': error_message})
+            return jsonify({'error': error_message, 'job_id': context.job_id})
+
+def run_project_job(job):
+    """
+    Exécute une demande de projet soumise via /project_jobs.
     
-    except Exception as e:
-        error_message = f"Erreur lors du traitement du projet: {str(e)}"
-        safe_emit('log', {'type': 'error', 'message': error_message})
-        return jsonify({'error': error_message})
+    Chaque changement d'état d'une phase est publié dans le travail, avec le
+    résultat de la phase dès qu'elle est terminée. Chaque phase terminée est
+    aussi enregistrée comme point de contrôle dans la file persistante: une
+    nouvelle tentative repart de ces résultats. Le travail s'exécute dans son
+    propre contexte (salle Socket.IO job:<id>, annulation, confirmations).
+    
+    Args:
+        job (Job): Travail suivi par le registre (payload: données de la demande)
+    
+    Returns:
+        dict: Réponse complète du projet
+    """
+    registry = get_job_registry()
+    queue = get_job_queue()
+    
+    def on_phase(name, status, timings, value):
+        registry.update_phase(job, name, status, timings, value if status == 'success' else None)
+        if status == 'success' and not timings.get('restored'):
+            queue.save_checkpoint(job.id, name, value)
+    
+    with job_context(JobContext(job.id)):
+        return run_project(job.payload, on_phase=on_phase, checkpoints=queue.checkpoints(job.id))
+
+def process_queued_project(queued):
+    """
+    Traite un travail réservé dans la file persistante par un worker.
+    
+    Args:
+        queued (dict): Travail réservé (id, payload, attempts, max_attempts...)
+    
+    Returns:
+        dict: Réponse complète du projet, enregistrée comme résultat du travail
+    """
+    registry = get_job_registry()
+    job = registry.track('project', queued['payload'], queued['id'])
+    attempts_left = queued['attempts'] < queued['max_attempts']
+    return registry.run(job, run_project_job,
+                        will_retry=lambda error: attempts_left and not isinstance(error, JobCancelledError))
+
+_project_workers = None
+
+def start_project_workers():
+    """Démarre le pool de workers qui consomme les demandes de projet de la file persistante."""
+    global _project_workers
+    if _project_workers is None:
+        _project_workers = JobWorkerPool(get_job_queue(), ['project'], process_queued_project,
+                                         name='project-worker').start()
+    return _project_workers
+
+@app.route('/project_jobs', methods=['POST'])
+def submit_project_job():
+    """Ajoute une demande de projet à la file persistante et retourne immédiatement l'identifiant du travail"""
+    data = request.json or {}
+    job_id = get_job_queue().enqueue('project', data)
+    if job_id is None:
+        return jsonify({'success': False, 'error': "File de travaux inaccessible", 'status': 'error'}), 503
+    
+    job = get_job_registry().track('project', data, job_id)
+    subscribe_client(job.id, data.get('socket_id'))
+    start_project_workers().wake()
+    safe_emit('log', {'type': 'info', 'message': f"Demande de projet mise en file d'attente (travail {job.id})"})
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'state': job.state,
+        'status_url': f"/project_jobs/{job.id}",
+        'events_url': f"/project_jobs/{job.id}/events"
+    }), 202
+
+@app.route('/resume_tasks', methods=['POST'])
+def resume_tasks():
+    """
+    Reprend des travaux interrompus ou échoués, à partir de leurs points de contrôle.
+    
+    Corps: {"tasks": [{"id": ...}, ...]} (format de l'interface d'administration)
+    ou {"job_ids": [...]}; sans identifiant, tous les travaux reprenables sont repris.
+    Une tâche inconnue de la file mais accompagnée de ses données est ajoutée.
+    """
+    data = request.json or {}
+    tasks = data.get('tasks') or []
+    job_ids = data.get('job_ids') or [task['id'] for task in tasks if task.get('id')]
+    queue = get_job_queue()
+    
+    resumed = queue.resume(job_ids or None)
+    for task in tasks:
+        if task.get('id') and task.get('data') and task['id'] not in resumed and queue.get(task['id']) is None:
+            if queue.enqueue('project', task['data'], job_id=task['id']):
+                resumed.append(task['id'])
+    
+    registry = get_job_registry()
+    for job_id in resumed:
+        queued = queue.get(job_id)
+        if queued is not None:
+            registry.track(queued['kind'], queued['payload'], job_id)
+    start_project_workers().wake()
+    safe_emit('log', {'type': 'info', 'message': f"{len(resumed)} travail(s) repris depuis la file persistante"})
+    
+    return jsonify({
+        'success': True,
+        'resumed': resumed,
+        'jobs': [{'job_id': job_id, 'status_url': f"/project_jobs/{job_id}"} for job_id in resumed]
+    })
+
+@app.route('/project_jobs', methods=['GET'])
+def list_project_jobs():
+    """Liste les travaux de la file persistante, sans leurs résultats"""
+    return jsonify({'jobs': get_job_queue().list()})
+
+@app.route('/project_jobs/<job_id>/cancel', methods=['POST'])
+def cancel_project_job(job_id):
+    """Annule un travail: retiré de la file s'il y attend, arrêté avant sa prochaine phase s'il s'exécute"""
+    cancelled = job_id in get_job_queue().cancel([job_id])
+    context = get_job_context(job_id)
+    if context is not None:
+        context.cancel()
+    else:
+        # Travail encore en file: terminé aussitôt dans le registre (fin du flux SSE et du suivi)
+        job = get_job_registry().get(job_id)
+        if job is not None:
+            cancelled = get_job_registry().cancel(job) or cancelled
+    if not cancelled and context is None:
+        return jsonify({'error': f"Travail inconnu ou déjà terminé: {job_id}", 'status': 'error'}), 404
+    
+    safe_emit('log', {'type': 'warning', 'message': f"Annulation du travail {job_id} demandée"})
+    return jsonify({'success': True, 'job_id': job_id, 'running': context is not None})
+
+@app.route('/project_jobs/<job_id>', methods=['GET'])
+def get_project_job(job_id):
+    """État d'un travail: phases terminées avec leurs résultats, puis résultat final"""
+    job = get_job_registry().get(job_id)
+    queued = get_job_queue().get(job_id)
+    if job is None and queued is None:
+        return jsonify({'error': f"Travail inconnu: {job_id}", 'status': 'error'}), 404
+    if job is None:
+        # Travail exécuté avant le redémarrage de l'agent: état lu dans la file
+        return jsonify(dict(queued, job_id=job_id))
+    
+    status = job.to_dict()
+    if queued is not None:
+        status.update(attempts=queued['attempts'], max_attempts=queued['max_attempts'],
+                      queue_state=queued['state'], checkpoints=queued['checkpoints'])
+    return jsonify(status)
+
+@app.route('/project_jobs/<job_id>/events', methods=['GET'])
+def stream_project_job(job_id):
+    """Flux Server-Sent Events des phases et de l'état d'un travail"""
+    registry = get_job_registry()
+    job = registry.get(job_id)
+    if job is None:
+        queued = get_job_queue().get(job_id)
+        if queued is None or queued['state'] not in ('queued', 'running'):
+            return jsonify({'error': f"Travail inconnu: {job_id}", 'status': 'error'}), 404
+        job = registry.track(queued['kind'], queued['payload'], job_id)
+    
+    # Reprise après reconnexion: le navigateur renvoie le dernier identifiant reçu
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id', '0')
+    try:
+        last_event_id = int(last_event_id)
+    except ValueError:
+        last_event_id = 0
+    
+    return Response(
+        sse_events(registry, job, last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/devops_request', methods=['POST'])
 def devops_request():
@@ -2170,6 +2446,12 @@ def start_socketio():
     # Écrire le PID dans le fichier
     write_pid_file()
     
+    # Enregistrement auprès du registre des services (battements de cœur en arrière-plan)
+    register_service('chef-projet', port)
+    
+    # Consommer les demandes de projet en file, y compris celles laissées par une exécution précédente
+    start_project_workers()
+    
     try:
         # Vérifier si eventlet est disponible (il a déjà été importé et configuré au début du fichier)
         if 'eventlet' in sys.modules:
@@ -2213,10 +2495,7 @@ def start_socketio():
 if __name__ == '__main__':
     try:
         # Initialiser le client Bedrock
-        bedrock_client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=REGION_NAME,
-        )
+        bedrock_client = get_bedrock_client(REGION_NAME)
     except Exception as e:
         logger.warning(f"Impossible d'initialiser le client Bedrock: {str(e)}")
         logger.info("Fonctionnement en mode dégradé sans AWS")
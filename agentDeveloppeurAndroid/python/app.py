@@ -1,11 +1,11 @@
 import logging
 import re
 import time
-import json
 import re
 import threading
 import time
 import os
+import sys
 from threading import Event
 from dotenv import load_dotenv
 from pathlib import Path
@@ -19,6 +19,19 @@ from flask_socketio import SocketIO, emit
 dotenv_path = Path(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env'))
 load_dotenv(dotenv_path=dotenv_path)
 
+# Modules partagés entre agents (racine du dépôt)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.admission import admission_control
+from shared.bedrock_client import get_bedrock_client
+from shared.emitter import get_event_emitter
+from shared.llm import invoke_bedrock
+from shared.llm_stream import open_llm_stream
+from shared.log_tail import read_log_entries
+from shared.model_router import invoke_routed
+from shared.service_registry import register_service
+from shared.stats import register_stats_route
+from shared.telemetry import instrument_llm_call, register_metrics_route
+
 # Configuration AWS - utiliser le profil spécifié dans le .env ou utiliser les identifiants par défaut si non spécifié
 aws_profile = os.getenv("AWS_PROFILE")
 if aws_profile:
@@ -57,52 +70,22 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*")
+emitter = get_event_emitter(socketio, logger)
+register_stats_route(app, 'developpeurandroid')
+register_metrics_route(app, 'developpeurandroid')
 
 def safe_emit(event, data=None):
     """
-    Émet un événement SocketIO de manière sécurisée, en capturant les erreurs potentielles.
+    Émet un événement SocketIO sans bloquer l'appelant.
+    
+    L'événement est mis en file; le thread d'émission (shared/emitter.py) l'envoie,
+    regroupe les journaux en trames et les écrit dans le fichier de log.
     
     Args:
         event (str): Nom de l'événement à émettre
         data (dict, optional): Données à envoyer avec l'événement
     """
-    try:
-        # Émettre l'événement à tous les clients
-        socketio.emit(event, data)
-        time.sleep(0.01)  # Petit délai pour permettre à l'événement d'être traité
-        
-        # Journalisation des événements
-        if event == 'log' and data and 'type' in data and 'message' in data:
-            log_type = data['type']
-            message = data['message']
-            
-            if log_type == 'error':
-                logger.error(message)
-            elif log_type == 'warning':
-                logger.warning(message)
-            elif log_type == 'success':
-                logger.info(f"SUCCESS: {message}")
-            else:
-                logger.info(message)
-        else:
-            # Journaliser les autres événements
-            if data is not None:
-                logger.debug(f"Event émis: {event}, data: {str(data)[:200]}...")
-            else:
-                logger.debug(f"Event émis: {event}, data: None")
-            
-    except Exception as e:
-        error_msg = f"Erreur lors de l'émission de l'événement {event}: {str(e)}"
-        logger.error(error_msg)
-        
-        # Tentative de réémission avec un délai
-        try:
-            time.sleep(0.5)  # Attendre un peu avant de réessayer
-            socketio.emit(event, data)
-            logger.info(f"Réémission réussie de l'événement {event}")
-        except Exception as retry_err:
-            logger.error(f"Échec de la réémission de l'événement {event}: {str(retry_err)}")
-            # Continuer l'exécution malgré l'erreur
+    emitter.emit(event, data)
 
 user_action_event = Event()
 
@@ -114,7 +97,8 @@ if not os.path.exists(WORKSPACE_DIR):
 def index():
     return render_template('index.html')
 
-def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7, max_retries=3, retry_delay=2):
+@instrument_llm_call
+def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7, max_retries=3, retry_delay=2, use_cache=True, stream=True, on_block=None, model_id=None):
     """
     Invoque Claude via AWS Bedrock avec le prompt fourni et une logique de retry automatique.
     
@@ -125,6 +109,10 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7,
         temperature (float, optional): Niveau de créativité (0.0-1.0)
         max_retries (int, optional): Nombre maximum de tentatives en cas d'échec
         retry_delay (int, optional): Délai en secondes entre les tentatives
+        use_cache (bool, optional): False pour ignorer le cache des réponses et forcer un appel au modèle
+        stream (bool, optional): False pour ne pas diffuser la réponse en continu sur Socket.IO
+        on_block (callable, optional): Appelé avec chaque bloc de code terminé, avant la fin de la génération
+        model_id (str, optional): Modèle Bedrock à utiliser (défaut: MODEL_ID, voir shared.model_router)
     
     Returns:
         str: Réponse du modèle
@@ -132,44 +120,32 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7,
     socketio.emit('loading_start')
     socketio.emit('log', {'type': 'info', 'message': "Invocation de Claude en cours..."})
     
-    # Construction du corps de la requête
-    request_body = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": max_tokens,
-        "temperature": temperature,
-        "messages": [
-            {"role": "user", "content": prompt}
-        ]
-    }
-    
-    # Ajout du système prompt si fourni
-    if system_prompt:
-        request_body["system"] = system_prompt
-    
     # Tentatives avec retry automatique
     attempts = 0
     last_error = None
+    llm_stream = None
     
     while attempts < max_retries:
         try:
             # Incrémentation du compteur de tentatives
             attempts += 1
             
-            # Création du client Bedrock (peut être regénéré à chaque tentative en cas de problème de session)
-            bedrock_client = boto3.client(
-                service_name='bedrock-runtime',
-                region_name=REGION_NAME
-            )
-            
-            # Invocation du modèle
-            response = bedrock_client.invoke_model(
-                modelId=MODEL_ID,
-                body=json.dumps(request_body)
+            # Diffusion de la réponse vers l'interface au fil de la génération
+            llm_stream = open_llm_stream(socketio, enabled=stream, on_block=on_block)
+
+            # Invocation du modèle (client Bedrock partagé et cache des réponses)
+            generated_text = invoke_bedrock(
+                prompt,
+                system_prompt=system_prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                model_id=model_id or MODEL_ID,
+                region_name=REGION_NAME,
+                use_cache=use_cache,
+                stream_callback=llm_stream
             )
-            
-            # Traitement de la réponse
-            response_body = json.loads(response.get('body').read())
-            generated_text = response_body.get('content')[0].get('text')
+            if llm_stream is not None:
+                llm_stream.finish()
             
             # Vérification que le texte généré est valide et non vide
             if not generated_text or len(generated_text.strip()) == 0:
@@ -181,6 +157,8 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7,
             return generated_text
         
         except Exception as e:
+            if llm_stream is not None:
+                llm_stream.finish(error=str(e))
             last_error = str(e)
             remaining_attempts = max_retries - attempts
             
@@ -196,9 +174,6 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7,
                     reduced_length = int(original_length * 0.8)
                     half_length = reduced_length // 2
                     prompt = prompt[:half_length] + "\n...[contenu réduit pour respecter les limites de tokens]...\n" + prompt[-half_length:]
-                    
-                    # Mettre à jour le corps de la requête
-                    request_body["messages"][0]["content"] = prompt
                     socketio.emit('log', {'type': 'info', 'message': "Prompt réduit pour la nouvelle tentative"})
                 
                 # Attendre avant la prochaine tentative
@@ -628,8 +603,8 @@ def analyze_android_problem(specs, requirements=None):
     qui résout ce problème. Précisez les noms des fichiers à créer et leur contenu.
     """
     
-    # Invoquer Claude pour l'analyse
-    analysis = invoke_claude(prompt, system_prompt, max_tokens=8000)
+    # Invoquer Claude pour l'analyse (grand modèle et plafond de tokens de la route "code_generation")
+    analysis = invoke_routed('analyze_android_problem', invoke_claude, prompt, system_prompt)
     
     socketio.emit('log', {'type': 'success', 'message': "Analyse Android terminée"})
     
@@ -697,6 +672,7 @@ def android_request():
         return jsonify({'error': error_message, 'status': 'error'})
 
 @app.route('/code_request', methods=['POST'])
+@admission_control('code_request')
 def code_request():
     """API endpoint pour les demandes de code Android provenant d'autres agents"""
     data = request.json
@@ -739,7 +715,11 @@ def code_request():
 
 def start_socketio():
     """Démarre le serveur SocketIO en arrière-plan."""
-    socketio.run(app, debug=True, use_reloader=False, port=5014)
+    # Port d'écoute: AGENT_PORT permet de lancer plusieurs réplicas (voir make start-replica)
+    port = int(os.getenv('AGENT_PORT', '5014'))
+    # Enregistrement auprès du registre des services (battements de cœur en arrière-plan)
+    register_service('dev-android', port)
+    socketio.run(app, debug=True, use_reloader=False, port=port)
 
 
 @socketio.on('connect')
@@ -756,61 +736,24 @@ def handle_connect():
         logger.error(f"Erreur lors de la gestion de la connexion: {str(e)}")
 
 @socketio.on('request_logs')
-def handle_request_logs():
-    """Gestionnaire d'événement pour la demande de logs"""
-    try:
-        logger.info("Demande de logs reçue")
-        # Envoyer un accusé de réception
-        safe_emit('log', {'type': 'info', 'message': "Chargement des logs en cours..."})
-        
-        # Lire les dernières entrées du fichier de log pour les afficher dans l'interface
-        try:
-            log_path = os.path.join(log_dir, 'developpeurandroid.log')
-            if os.path.exists(log_path):
-                with open(log_path, 'r') as log_file:
-                    # Lire les 50 dernières lignes du fichier
-                    lines = log_file.readlines()
-                    last_lines = lines[-50:] if len(lines) > 50 else lines
-                    
-                    for line in last_lines:
-                        # Ajouter un petit délai pour éviter la saturation
-                        time.sleep(0.01)
-                        
-                        # Déterminer le type de log (info, error, warning) basé sur le contenu
-                        log_type = 'info'
-                        if '[ERROR]' in line:
-                            log_type = 'error'
-                        elif '[WARNING]' in line:
-                            log_type = 'warning'
-                        elif 'SUCCESS' in line:
-                            log_type = 'success'
-                        
-                        # Extraire le message (tout après le niveau de log)
-                        message_match = re.search(r'\[(INFO|ERROR|WARNING)\]\s*(.*)', line)
-                        if message_match:
-                            message = message_match.group(2)
-                        else:
-                            message = line.strip()
-                        
-                        # Envoyer au client
-                        safe_emit('log', {'type': log_type, 'message': f"[LOG] {message}"})
-                
-                safe_emit('log', {'type': 'info', 'message': "---- Fin des logs précédents ----"})
-            else:
-                safe_emit('log', {'type': 'warning', 'message': "Fichier de log introuvable"})
-        except Exception as log_err:
-            logger.error(f"Erreur lors de la lecture des logs: {str(log_err)}")
-            safe_emit('log', {'type': 'error', 'message': f"Impossible de charger les logs précédents: {str(log_err)}"})
+def handle_request_logs(data=None):
+    """
+    Gestionnaire d'événement pour la demande de logs.
     
+    Renvoie au seul client demandeur, en un événement log_replay, les dernières
+    lignes du fichier de log; avec le curseur d'une demande précédente
+    ({'cursor': ...}), seulement les lignes écrites depuis.
+    """
+    try:
+        cursor = data.get('cursor') if isinstance(data, dict) else None
+        emit('log_replay', read_log_entries(os.path.join(log_dir, 'developpeurandroid.log'), cursor))
     except Exception as e:
-        logger.error(f"Erreur lors du traitement de la demande de logs: {str(e)}")
+        logger.error(f"Erreur lors de la lecture des logs: {str(e)}")
+        emit('log', {'type': 'error', 'message': f"Impossible de charger les logs précédents: {str(e)}"})
 
 if __name__ == '__main__':
     # Initialiser le client Bedrock
-    bedrock_client = boto3.client(
-        service_name='bedrock-runtime',
-        region_name=REGION_NAME,
-    )
+    bedrock_client = get_bedrock_client(REGION_NAME)
     
     # Créer le dossier workspace s'il n'existe pas
     if not os.path.exists(WORKSPACE_DIR):
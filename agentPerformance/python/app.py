@@ -1,12 +1,11 @@
 import logging
-import re
 import time
 import json
-import re
 import threading
 import time
 import base64
 import os
+import sys
 import asyncio
 import requests
 from threading import Event
@@ -24,6 +23,22 @@ from browser_use import Browser
 dotenv_path = Path(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env'))
 load_dotenv(dotenv_path=dotenv_path)
 
+# Modules partagés entre agents (racine du dépôt)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.admission import admission_control
+from shared.bedrock_client import get_bedrock_client
+from shared.emitter import get_event_emitter
+from shared.llm import invoke_bedrock
+from shared.llm_async import run_in_llm_executor
+from shared.llm_stream import open_llm_stream
+from shared.load_cluster import MAX_WORKERS, REMOTE_WORKERS, run_distributed
+from shared.load_engine import MAX_DURATION, MAX_RPS, MAX_USERS, MODES, LoadTest, compare_results
+from shared.load_scenario import ScenarioError, ScenarioLoadTest, load_scenario_file, load_scenarios
+from shared.log_tail import read_log_entries
+from shared.service_registry import register_service
+from shared.stats import register_stats_route
+from shared.telemetry import instrument_llm_call, register_metrics_route
+
 # Configuration AWS - utiliser le profil spécifié dans le .env ou utiliser les identifiants par défaut si non spécifié
 aws_profile = os.getenv("AWS_PROFILE")
 if aws_profile:
@@ -59,52 +74,22 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*")
+emitter = get_event_emitter(socketio, logger)
+register_stats_route(app, 'performance')
+register_metrics_route(app, 'performance')
 
 def safe_emit(event, data=None):
     """
-    Émet un événement SocketIO de manière sécurisée, en capturant les erreurs potentielles.
+    Émet un événement SocketIO sans bloquer l'appelant.
+    
+    L'événement est mis en file; le thread d'émission (shared/emitter.py) l'envoie,
+    regroupe les journaux en trames et les écrit dans le fichier de log.
     
     Args:
         event (str): Nom de l'événement à émettre
         data (dict, optional): Données à envoyer avec l'événement
     """
-    try:
-        # Émettre l'événement à tous les clients
-        socketio.emit(event, data)
-        time.sleep(0.01)  # Petit délai pour permettre à l'événement d'être traité
-        
-        # Journalisation des événements
-        if event == 'log' and data and 'type' in data and 'message' in data:
-            log_type = data['type']
-            message = data['message']
-            
-            if log_type == 'error':
-                logger.error(message)
-            elif log_type == 'warning':
-                logger.warning(message)
-            elif log_type == 'success':
-                logger.info(f"SUCCESS: {message}")
-            else:
-                logger.info(message)
-        else:
-            # Journaliser les autres événements
-            if data is not None:
-                logger.debug(f"Event émis: {event}, data: {str(data)[:200]}...")
-            else:
-                logger.debug(f"Event émis: {event}, data: None")
-            
-    except Exception as e:
-        error_msg = f"Erreur lors de l'émission de l'événement {event}: {str(e)}"
-        logger.error(error_msg)
-        
-        # Tentative de réémission avec un délai
-        try:
-            time.sleep(0.5)  # Attendre un peu avant de réessayer
-            socketio.emit(event, data)
-            logger.info(f"Réémission réussie de l'événement {event}")
-        except Exception as retry_err:
-            logger.error(f"Échec de la réémission de l'événement {event}: {str(retry_err)}")
-            # Continuer l'exécution malgré l'erreur
+    emitter.emit(event, data)
 
 user_action_event = Event()
 
@@ -128,7 +113,8 @@ def handle_user_action_done():
     """Déclenchement après confirmation de l'utilisateur."""
     user_action_event.set()
 
-def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7):
+@instrument_llm_call
+def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7, use_cache=True, stream=True, on_block=None):
     """
     Invoque Claude via AWS Bedrock avec le prompt fourni.
     
@@ -137,6 +123,9 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7):
         system_prompt (str, optional): Instructions système pour guider le comportement du modèle
         max_tokens (int, optional): Nombre maximum de tokens pour la réponse
         temperature (float, optional): Niveau de créativité (0.0-1.0)
+        use_cache (bool, optional): False pour ignorer le cache des réponses et forcer un appel au modèle
+        stream (bool, optional): False pour ne pas diffuser la réponse en continu sur Socket.IO
+        on_block (callable, optional): Appelé avec chaque bloc de code terminé, avant la fin de la génération
     
     Returns:
         str: Réponse du modèle
@@ -144,35 +133,23 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7):
     socketio.emit('loading_start')
     socketio.emit('log', {'type': 'info', 'message': "Invocation de Claude en cours..."})
     
+    # Diffusion de la réponse vers l'interface au fil de la génération
+    llm_stream = open_llm_stream(socketio, enabled=stream, on_block=on_block)
+    
     try:
-        bedrock_client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=REGION_NAME
-        )
-        
-        # Construction du corps de la requête
-        request_body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ]
-        }
-        
-        # Ajout du système prompt si fourni
-        if system_prompt:
-            request_body["system"] = system_prompt
-        
-        # Invocation du modèle
-        response = bedrock_client.invoke_model(
-            modelId=MODEL_ID,
-            body=json.dumps(request_body)
+        # Invocation du modèle (client Bedrock partagé et cache des réponses)
+        generated_text = invoke_bedrock(
+            prompt,
+            system_prompt=system_prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            model_id=MODEL_ID,
+            region_name=REGION_NAME,
+            use_cache=use_cache,
+            stream_callback=llm_stream
         )
-        
-        # Traitement de la réponse
-        response_body = json.loads(response.get('body').read())
-        generated_text = response_body.get('content')[0].get('text')
+        if llm_stream is not None:
+            llm_stream.finish()
         
         socketio.emit('log', {'type': 'success', 'message': "Réponse de Claude reçue"})
         socketio.emit('loading_end')
@@ -180,11 +157,30 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7):
         return generated_text
     
     except Exception as e:
+        if llm_stream is not None:
+            llm_stream.finish(error=str(e))
         error_message = f"Erreur lors de l'invocation de Claude: {str(e)}"
         socketio.emit('log', {'type': 'error', 'message': error_message})
         socketio.emit('loading_end')
         return error_message
 
+async def invoke_claude_async(prompt, system_prompt=None, **kwargs):
+    """
+    Version awaitable de invoke_claude pour les coroutines.
+    
+    L'appel est exécuté dans le pool de threads LLM: la boucle asyncio (navigateur,
+    captures d'écran, sondage du DOM) continue de tourner pendant la réponse du modèle.
+    
+    Args:
+        prompt (str): Le prompt principal à envoyer au modèle
+        system_prompt (str, optional): Instructions système pour guider le comportement du modèle
+        **kwargs: Autres arguments de invoke_claude
+    
+    Returns:
+        str: Réponse du modèle
+    """
+    return await run_in_llm_executor(invoke_claude, prompt, system_prompt, **kwargs)
+
 async def initialize_browser():
     """Initialise l'instance du navigateur BrowserUse."""
     global browser
@@ -598,105 +594,101 @@ async def performance_audit(url, audit_name=None):
         
         return {"error": error_message}
 
-async def run_stress_test(url, concurrent_users=10, duration_seconds=30):
+async def run_stress_test(url, concurrent_users=10, duration_seconds=30, mode='closed', target_rps=None, scenario=None):
     """
-    Exécute un test de charge simple sur une URL.
+    Exécute un test de charge sur une URL (moteur asynchrone de shared/load_engine.py).
     
     Args:
         url (str): URL à tester
-        concurrent_users (int): Nombre d'utilisateurs simultanés simulés
+        concurrent_users (int): Nombre d'utilisateurs simultanés simulés (modèle fermé)
         duration_seconds (int): Durée du test en secondes
+        mode (str, optional): "closed" (utilisateurs simultanés) ou "open" (débit cible)
+        target_rps (float, optional): Requêtes par seconde visées (modèle ouvert)
+        scenario (ScenarioSet, optional): Parcours exécutés à la place d'une requête vers l'URL (shared/load_scenario.py)
     
     Returns:
         dict: Résultats du test de charge
     """
-    socketio.emit('log', {'type': 'info', 'message': f"Démarrage du test de charge: {concurrent_users} utilisateurs pendant {duration_seconds}s"})
+    if mode == 'open':
+        socketio.emit('log', {'type': 'info', 'message': f"Démarrage du test de charge: {target_rps} requêtes/s pendant {duration_seconds}s"})
+    else:
+        socketio.emit('log', {'type': 'info', 'message': f"Démarrage du test de charge: {concurrent_users} utilisateurs pendant {duration_seconds}s"})
     
     try:
-        async def load_page():
-            try:
-                start_time = time.time()
-                response = requests.get(url)
-                response_time = time.time() - start_time
-                return {
-                    "status_code": response.status_code,
-                    "response_time": response_time,
-                    "content_size": len(response.content)
-                }
-            except Exception as e:
-                return {"error": str(e)}
-        
-        results = []
-        start_time = time.time()
-        end_time = start_time + duration_seconds
-        
-        # Créer un pool de tâches pour simuler des utilisateurs concurrents
-        tasks = []
-        current_time = time.time()
-        
-        while current_time < end_time:
-            if len(tasks) < concurrent_users:
-                # Ajouter de nouvelles tâches jusqu'à atteindre le nombre d'utilisateurs concurrents
-                while len(tasks) < concurrent_users:
-                    tasks.append(asyncio.create_task(load_page()))
-                    
-            # Vérifier les tâches terminées
-            completed_tasks = []
-            for task in tasks:
-                if task.done():
-                    results.append(task.result())
-                    completed_tasks.append(task)
-            
-            # Retirer les tâches terminées de la liste
-            for task in completed_tasks:
-                tasks.remove(task)
-            
-            # Petite pause pour éviter de surcharger le CPU
-            await asyncio.sleep(0.1)
-            current_time = time.time()
-        
-        # Attendre que toutes les tâches restantes se terminent
-        for task in tasks:
-            if not task.done():
-                try:
-                    results.append(await task)
-                except Exception as e:
-                    results.append({"error": str(e)})
-        
-        # Analyser les résultats
-        total_requests = len(results)
-        successful_requests = sum(1 for r in results if "status_code" in r and 200 <= r["status_code"] < 400)
-        failed_requests = total_requests - successful_requests
-        
-        if successful_requests > 0:
-            avg_response_time = sum(r.get("response_time", 0) for r in results if "response_time" in r) / successful_requests
-            min_response_time = min((r.get("response_time", float('inf')) for r in results if "response_time" in r), default=0)
-            max_response_time = max((r.get("response_time", 0) for r in results if "response_time" in r), default=0)
-        else:
-            avg_response_time = min_response_time = max_response_time = 0
-        
-        stress_results = {
-            "url": url,
-            "concurrent_users": concurrent_users,
-            "duration_seconds": duration_seconds,
-            "total_requests": total_requests,
-            "requests_per_second": total_requests / duration_seconds,
-            "successful_requests": successful_requests,
-            "failed_requests": failed_requests,
-            "success_rate": (successful_requests / total_requests) * 100 if total_requests > 0 else 0,
-            "avg_response_time": avg_response_time,
-            "min_response_time": min_response_time,
-            "max_response_time": max_response_time
-        }
-        
-        socketio.emit('log', {'type': 'success', 'message': f"Test de charge terminé - {successful_requests}/{total_requests} requêtes réussies"})
-        return stress_results
+        test = ScenarioLoadTest(scenario) if scenario is not None else LoadTest(url)
+        stress_results = await test.run(mode, users=concurrent_users, rate=target_rps, duration=duration_seconds)
+        return report_stress_results(url, stress_results)
     
     except Exception as e:
         error_message = f"Erreur lors du test de charge: {str(e)}"
         socketio.emit('log', {'type': 'error', 'message': error_message})
         return {"error": error_message}
 
+def run_distributed_stress_test(url, concurrent_users=10, duration_seconds=30, mode='closed', target_rps=None, workers=1, scenario=None):
+    """
+    Exécute un test de charge réparti entre des processus locaux et les workers distants configurés
+    (shared/load_cluster.py), en diffusant les résultats partiels fusionnés.
+    
+    Args:
+        url (str): URL à tester
+        concurrent_users (int): Nombre d'utilisateurs simultanés au total (modèle fermé)
+        duration_seconds (int): Durée du test en secondes
+        mode (str, optional): "closed" (utilisateurs simultanés) ou "open" (débit cible)
+        target_rps (float, optional): Requêtes par seconde visées au total (modèle ouvert)
+        workers (int, optional): Nombre de processus générateurs locaux
+        scenario (ScenarioSet, optional): Parcours exécutés à la place d'une requête vers l'URL
+    
+    Returns:
+        dict: Résultats fusionnés du test de charge, avec le détail par worker
+    """
+    remote = f" et {len(REMOTE_WORKERS)} worker(s) distant(s)" if REMOTE_WORKERS else ""
+    socketio.emit('log', {'type': 'info', 'message': f"Démarrage du test de charge réparti sur {workers} processus local(aux){remote} pendant {duration_seconds}s"})
+    
+    def on_progress(results):
+        safe_emit('stress_test_update', {
+            'requests': results.requests,
+            'errors': results.failures,
+            'elapsed_seconds': round(results.elapsed, 1),
+            'p99_ms': round(results.latency.percentile(99) / 1000, 1),
+        })
+    
+    try:
+        stress_results = run_distributed(url, mode, users=concurrent_users, rate=target_rps, duration=duration_seconds,
+                                         local_workers=workers, scenario=scenario, on_progress=on_progress)
+        for worker in stress_results['workers']:
+            if worker['error']:
+                socketio.emit('log', {'type': 'warning', 'message': f"Worker de charge {worker['worker']}: {worker['error']}"})
+        return report_stress_results(url, stress_results)
+    
+    except Exception as e:
+        error_message = f"Erreur lors du test de charge: {str(e)}"
+        socketio.emit('log', {'type': 'error', 'message': error_message})
+        return {"error": error_message}
+
+def report_stress_results(url, stress_results):
+    """Complète les résultats d'un test de charge et en journalise le bilan."""
+    stress_results['url'] = url
+    
+    generator = stress_results['generator']
+    if generator['missed_sends']:
+        socketio.emit('log', {'type': 'warning', 'message': f"Cible saturée: {generator['missed_sends']} requêtes prévues n'ont pas pu être envoyées avant la fin du test (limite de requêtes en vol atteinte)"})
+    if generator['late_sends'] or generator['max_loop_lag_ms'] > 100:
+        socketio.emit('log', {'type': 'warning', 'message': f"Générateur de charge en retard ({generator['late_sends']} envois en retard, boucle: {generator['max_loop_lag_ms']} ms): le débit mesuré peut être limité par le générateur"})
+    
+    corrected = stress_results.get('corrected_latency_ms')
+    if corrected and corrected['p99'] > 1.5 * stress_results['latency_ms']['p99']:
+        # Latence depuis l'heure d'envoi prévue: inclut l'attente des requêtes que le générateur n'a pas pu envoyer à temps
+        socketio.emit('log', {'type': 'warning', 'message': f"Cible saturée au débit demandé: p99 corrigé {corrected['p99']} ms contre {stress_results['latency_ms']['p99']} ms mesuré depuis l'envoi réel"})
+    
+    iterations = stress_results.get('iterations')
+    if iterations:
+        socketio.emit('log', {'type': 'info', 'message': f"Parcours: {iterations['completed']} terminés, {iterations['failed']} en échec, {iterations['interrupted']} interrompus"})
+        for message, count in stress_results.get('scenario_errors', {}).items():
+            socketio.emit('log', {'type': 'warning', 'message': f"Parcours en échec ({count}): {message}"})
+    
+    socketio.emit('log', {'type': 'success', 'message': f"Test de charge terminé - {stress_results['successful_requests']}/{stress_results['total_requests']} requêtes réussies ({stress_results['requests_per_second']:.1f} requêtes/s)"})
+    return stress_results
+
 async def generate_recommendations(audit_results):
     """
     Génère des recommandations d'optimisation de performance basées sur les résultats d'audit.
@@ -792,7 +784,7 @@ async def generate_recommendations(audit_results):
     """
     
     # Invocation de Claude
-    recommendations = invoke_claude(prompt, system_prompt)
+    recommendations = await invoke_claude_async(prompt, system_prompt)
     socketio.emit('log', {'type': 'success', 'message': "Recommandations générées avec succès"})
     
     return recommendations
@@ -833,21 +825,63 @@ def stress_test():
     url = data.get('url', '')
     concurrent_users = int(data.get('concurrent_users', 10))
     duration_seconds = int(data.get('duration_seconds', 30))
+    mode = data.get('mode', 'closed')
+    target_rps = float(data.get('target_rps') or 0)
+    workers = int(data.get('workers', 1))
     
-    if not url:
+    # Scénario en plusieurs étapes (objet, texte YAML/JSON, ou fichier de LOAD_SCENARIO_DIR)
+    scenario = None
+    try:
+        if data.get('scenario'):
+            scenario = load_scenarios(data['scenario'], base_url=url or None)
+        elif data.get('scenario_file'):
+            scenario = load_scenario_file(data['scenario_file'], base_url=url or None)
+    except ScenarioError as e:
+        return jsonify({'error': f"Scénario invalide: {str(e)}"})
+    if scenario is not None:
+        url = scenario.base_url or url
+    
+    if not url and scenario is None:
         return jsonify({'error': "L'URL de la page web est requise"})
     
-    # Valider les paramètres
-    if concurrent_users <= 0 or concurrent_users > 100:
-        return jsonify({'error': "Le nombre d'utilisateurs simultanés doit être entre 1 et 100"})
+    # Valider les paramètres (bornes: LOAD_MAX_USERS, LOAD_MAX_RPS, LOAD_MAX_DURATION, LOAD_MAX_WORKERS)
+    if mode not in MODES:
+        return jsonify({'error': "Le mode de test doit être 'closed' (utilisateurs simultanés) ou 'open' (débit cible)"})
+    
+    if mode == 'closed' and (concurrent_users <= 0 or concurrent_users > MAX_USERS):
+        return jsonify({'error': f"Le nombre d'utilisateurs simultanés doit être entre 1 et {MAX_USERS}"})
+    
+    if mode == 'open' and (target_rps <= 0 or target_rps > MAX_RPS):
+        return jsonify({'error': f"Le débit cible doit être entre 1 et {MAX_RPS:g} requêtes par seconde"})
     
-    if duration_seconds <= 0 or duration_seconds > 300:
-        return jsonify({'error': "La durée du test doit être entre 1 et 300 secondes"})
+    if duration_seconds <= 0 or duration_seconds > MAX_DURATION:
+        return jsonify({'error': f"La durée du test doit être entre 1 et {MAX_DURATION} secondes"})
     
-    # Exécuter le test de charge
-    return jsonify(run_async_task(run_stress_test(url, concurrent_users, duration_seconds)))
+    if workers <= 0 or workers > MAX_WORKERS:
+        return jsonify({'error': f"Le nombre de processus générateurs doit être entre 1 et {MAX_WORKERS}"})
+    
+    # Exécuter le test de charge: dans ce processus, ou réparti entre plusieurs générateurs
+    if workers > 1 or REMOTE_WORKERS:
+        return jsonify(run_distributed_stress_test(url, concurrent_users, duration_seconds, mode, target_rps, workers, scenario))
+    return jsonify(run_async_task(run_stress_test(url, concurrent_users, duration_seconds, mode, target_rps, scenario)))
+
+@app.route('/stress_test/compare', methods=['POST'])
+def stress_test_compare():
+    """Compare deux résultats de /stress_test (débit, erreurs et percentiles de latence)."""
+    data = request.json or {}
+    baseline = data.get('baseline')
+    candidate = data.get('candidate')
+    
+    if not isinstance(baseline, dict) or not isinstance(candidate, dict):
+        return jsonify({'error': "Les résultats 'baseline' et 'candidate' sont requis"})
+    
+    try:
+        return jsonify(compare_results(baseline, candidate))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f"Résultats de test de charge invalides: {str(e)}"})
 
 @app.route('/api/performance_audit', methods=['POST'])
+@admission_control('performance_audit')
 def api_performance_audit():
     """API endpoint pour les demandes d'audit de performance provenant d'autres agents."""
     data = request.json
@@ -898,7 +932,11 @@ def api_performance_audit():
 
 def start_socketio():
     """Démarre le serveur SocketIO en arrière-plan."""
-    socketio.run(app, debug=True, use_reloader=False, port=5004, allow_unsafe_werkzeug=True)
+    # Port d'écoute: AGENT_PORT permet de lancer plusieurs réplicas (voir make start-replica)
+    port = int(os.getenv('AGENT_PORT', '5006'))
+    # Enregistrement auprès du registre des services (battements de cœur en arrière-plan)
+    register_service('perf', port)
+    socketio.run(app, debug=True, use_reloader=False, port=port, allow_unsafe_werkzeug=True)
 
 
 @socketio.on('connect')
@@ -915,61 +953,24 @@ def handle_connect():
         logger.error(f"Erreur lors de la gestion de la connexion: {str(e)}")
 
 @socketio.on('request_logs')
-def handle_request_logs():
-    """Gestionnaire d'événement pour la demande de logs"""
-    try:
-        logger.info("Demande de logs reçue")
-        # Envoyer un accusé de réception
-        safe_emit('log', {'type': 'info', 'message': "Chargement des logs en cours..."})
-        
-        # Lire les dernières entrées du fichier de log pour les afficher dans l'interface
-        try:
-            log_path = os.path.join(log_dir, 'performance.log')
-            if os.path.exists(log_path):
-                with open(log_path, 'r') as log_file:
-                    # Lire les 50 dernières lignes du fichier
-                    lines = log_file.readlines()
-                    last_lines = lines[-50:] if len(lines) > 50 else lines
-                    
-                    for line in last_lines:
-                        # Ajouter un petit délai pour éviter la saturation
-                        time.sleep(0.01)
-                        
-                        # Déterminer le type de log (info, error, warning) basé sur le contenu
-                        log_type = 'info'
-                        if '[ERROR]' in line:
-                            log_type = 'error'
-                        elif '[WARNING]' in line:
-                            log_type = 'warning'
-                        elif 'SUCCESS' in line:
-                            log_type = 'success'
-                        
-                        # Extraire le message (tout après le niveau de log)
-                        message_match = re.search(r'\[(INFO|ERROR|WARNING)\]\s*(.*)', line)
-                        if message_match:
-                            message = message_match.group(2)
-                        else:
-                            message = line.strip()
-                        
-                        # Envoyer au client
-                        safe_emit('log', {'type': log_type, 'message': f"[LOG] {message}"})
-                
-                safe_emit('log', {'type': 'info', 'message': "---- Fin des logs précédents ----"})
-            else:
-                safe_emit('log', {'type': 'warning', 'message': "Fichier de log introuvable"})
-        except Exception as log_err:
-            logger.error(f"Erreur lors de la lecture des logs: {str(log_err)}")
-            safe_emit('log', {'type': 'error', 'message': f"Impossible de charger les logs précédents: {str(log_err)}"})
+def handle_request_logs(data=None):
+    """
+    Gestionnaire d'événement pour la demande de logs.
     
+    Renvoie au seul client demandeur, en un événement log_replay, les dernières
+    lignes du fichier de log; avec le curseur d'une demande précédente
+    ({'cursor': ...}), seulement les lignes écrites depuis.
+    """
+    try:
+        cursor = data.get('cursor') if isinstance(data, dict) else None
+        emit('log_replay', read_log_entries(os.path.join(log_dir, 'performance.log'), cursor))
     except Exception as e:
-        logger.error(f"Erreur lors du traitement de la demande de logs: {str(e)}")
+        logger.error(f"Erreur lors de la lecture des logs: {str(e)}")
+        emit('log', {'type': 'error', 'message': f"Impossible de charger les logs précédents: {str(e)}"})
 
 if __name__ == '__main__':
     # Initialiser le client Bedrock
-    bedrock_client = boto3.client(
-        service_name='bedrock-runtime',
-        region_name=REGION_NAME,
-    )
+    bedrock_client = get_bedrock_client(REGION_NAME)
     
     # Démarrer le serveur Flask avec SocketIO
     start_socketio()
\ No newline at end of file
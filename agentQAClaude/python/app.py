@@ -8,6 +8,7 @@ import time
 from threading import Event
 import base64
 import os
+import sys
 import asyncio
 from browser_use import Browser
 from pathlib import Path
@@ -22,6 +23,20 @@ from flask_socketio import SocketIO, emit
 dotenv_path = Path(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env'))
 load_dotenv(dotenv_path=dotenv_path)
 
+# Modules partagés entre agents (racine du dépôt)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.admission import admission_control
+from shared.bedrock_client import get_bedrock_client
+from shared.emitter import get_event_emitter
+from shared.llm import invoke_bedrock
+from shared.llm_async import run_in_llm_executor
+from shared.llm_stream import open_llm_stream
+from shared.log_tail import read_log_entries
+from shared.model_router import invoke_routed
+from shared.service_registry import register_service
+from shared.stats import register_stats_route
+from shared.telemetry import instrument_llm_call, register_metrics_route
+
 # Configuration AWS - utiliser le profil spécifié dans le .env ou utiliser les identifiants par défaut si non spécifié
 aws_profile = os.getenv("AWS_PROFILE")
 if aws_profile:
@@ -58,52 +73,22 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*")
+emitter = get_event_emitter(socketio, logger)
+register_stats_route(app, 'qaclaude')
+register_metrics_route(app, 'qaclaude')
 
 def safe_emit(event, data=None):
     """
-    Émet un événement SocketIO de manière sécurisée, en capturant les erreurs potentielles.
+    Émet un événement SocketIO sans bloquer l'appelant.
+    
+    L'événement est mis en file; le thread d'émission (shared/emitter.py) l'envoie,
+    regroupe les journaux en trames et les écrit dans le fichier de log.
     
     Args:
         event (str): Nom de l'événement à émettre
         data (dict, optional): Données à envoyer avec l'événement
     """
-    try:
-        # Émettre l'événement à tous les clients
-        socketio.emit(event, data)
-        time.sleep(0.01)  # Petit délai pour permettre à l'événement d'être traité
-        
-        # Journalisation des événements
-        if event == 'log' and data and 'type' in data and 'message' in data:
-            log_type = data['type']
-            message = data['message']
-            
-            if log_type == 'error':
-                logger.error(message)
-            elif log_type == 'warning':
-                logger.warning(message)
-            elif log_type == 'success':
-                logger.info(f"SUCCESS: {message}")
-            else:
-                logger.info(message)
-        else:
-            # Journaliser les autres événements
-            if data is not None:
-                logger.debug(f"Event émis: {event}, data: {str(data)[:200]}...")
-            else:
-                logger.debug(f"Event émis: {event}, data: None")
-            
-    except Exception as e:
-        error_msg = f"Erreur lors de l'émission de l'événement {event}: {str(e)}"
-        logger.error(error_msg)
-        
-        # Tentative de réémission avec un délai
-        try:
-            time.sleep(0.5)  # Attendre un peu avant de réessayer
-            socketio.emit(event, data)
-            logger.info(f"Réémission réussie de l'événement {event}")
-        except Exception as retry_err:
-            logger.error(f"Échec de la réémission de l'événement {event}: {str(retry_err)}")
-            # Continuer l'exécution malgré l'erreur
+    emitter.emit(event, data)
 
 user_action_event = Event()
 
@@ -130,7 +115,8 @@ def handle_user_action_done():
     user_action_event.set()
     socketio.emit('log', {'type': 'info', 'message': "Confirmation utilisateur reçue, mais non requise - l'agent est autonome."})
 
-def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7, max_retries=3, retry_delay=2):
+@instrument_llm_call
+def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7, max_retries=3, retry_delay=2, use_cache=True, stream=True, on_block=None, model_id=None):
     """
     Invoque Claude via AWS Bedrock avec le prompt fourni et une logique de retry automatique.
     
@@ -141,6 +127,10 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7,
         temperature (float, optional): Niveau de créativité (0.0-1.0)
         max_retries (int, optional): Nombre maximum de tentatives en cas d'échec
         retry_delay (int, optional): Délai en secondes entre les tentatives
+        use_cache (bool, optional): False pour ignorer le cache des réponses et forcer un appel au modèle
+        stream (bool, optional): False pour ne pas diffuser la réponse en continu sur Socket.IO
+        on_block (callable, optional): Appelé avec chaque bloc de code terminé, avant la fin de la génération
+        model_id (str, optional): Modèle Bedrock à utiliser (défaut: MODEL_ID, voir shared.model_router)
     
     Returns:
         str: Réponse du modèle
@@ -148,44 +138,32 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7,
     socketio.emit('loading_start')
     socketio.emit('log', {'type': 'info', 'message': "Invocation de Claude en cours..."})
     
-    # Construction du corps de la requête
-    request_body = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": max_tokens,
-        "temperature": temperature,
-        "messages": [
-            {"role": "user", "content": prompt}
-        ]
-    }
-    
-    # Ajout du système prompt si fourni
-    if system_prompt:
-        request_body["system"] = system_prompt
-    
     # Tentatives avec retry automatique
     attempts = 0
     last_error = None
+    llm_stream = None
     
     while attempts < max_retries:
         try:
             # Incrémentation du compteur de tentatives
             attempts += 1
             
-            # Création du client Bedrock (peut être regénéré à chaque tentative en cas de problème de session)
-            bedrock_client = boto3.client(
-                service_name='bedrock-runtime',
-                region_name=REGION_NAME
-            )
-            
-            # Invocation du modèle
-            response = bedrock_client.invoke_model(
-                modelId=MODEL_ID,
-                body=json.dumps(request_body)
+            # Diffusion de la réponse vers l'interface au fil de la génération
+            llm_stream = open_llm_stream(socketio, enabled=stream, on_block=on_block)
+
+            # Invocation du modèle (client Bedrock partagé et cache des réponses)
+            generated_text = invoke_bedrock(
+                prompt,
+                system_prompt=system_prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                model_id=model_id or MODEL_ID,
+                region_name=REGION_NAME,
+                use_cache=use_cache,
+                stream_callback=llm_stream
             )
-            
-            # Traitement de la réponse
-            response_body = json.loads(response.get('body').read())
-            generated_text = response_body.get('content')[0].get('text')
+            if llm_stream is not None:
+                llm_stream.finish()
             
             # Vérification que le texte généré est valide et non vide
             if not generated_text or len(generated_text.strip()) == 0:
@@ -197,6 +175,8 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7,
             return generated_text
         
         except Exception as e:
+            if llm_stream is not None:
+                llm_stream.finish(error=str(e))
             last_error = str(e)
             remaining_attempts = max_retries - attempts
             
@@ -212,9 +192,6 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7,
                     reduced_length = int(original_length * 0.8)
                     half_length = reduced_length // 2
                     prompt = prompt[:half_length] + "\n...[contenu réduit pour respecter les limites de tokens]...\n" + prompt[-half_length:]
-                    
-                    # Mettre à jour le corps de la requête
-                    request_body["messages"][0]["content"] = prompt
                     socketio.emit('log', {'type': 'info', 'message': "Prompt réduit pour la nouvelle tentative"})
                 
                 # Attendre avant la prochaine tentative
@@ -245,6 +222,23 @@ def invoke_claude(prompt, system_prompt=None, max_tokens=4096, temperature=0.7,
     socketio.emit('loading_end')
     return "Erreur inattendue lors de l'invocation du modèle"
 
+async def invoke_claude_async(prompt, system_prompt=None, **kwargs):
+    """
+    Version awaitable de invoke_claude pour les coroutines.
+    
+    L'appel est exécuté dans le pool de threads LLM: la boucle asyncio (navigateur,
+    captures d'écran, sondage du DOM) continue de tourner pendant la réponse du modèle.
+    
+    Args:
+        prompt (str): Le prompt principal à envoyer au modèle
+        system_prompt (str, optional): Instructions système pour guider le comportement du modèle
+        **kwargs: Autres arguments de invoke_claude
+    
+    Returns:
+        str: Réponse du modèle
+    """
+    return await run_in_llm_executor(invoke_claude, prompt, system_prompt, **kwargs)
+
 async def initialize_browser(max_retries=3, retry_delay=2):
     """
     Initialise l'instance du navigateur BrowserUse avec retry automatique.
@@ -433,6 +427,21 @@ async def navigate_to_url(url, max_retries=3, retry_delay=2):
     
     return None  # Ne devrait jamais être atteint, mais par sécurité
 
+def is_valid_task_analysis(response):
+    """
+    Vérifie qu'une analyse de tâche est exploitable: non vide, et pas la réponse
+    de secours renvoyée par invoke_claude après des échecs répétés.
+    
+    Args:
+        response (str): Réponse du modèle
+    
+    Returns:
+        bool: True si l'analyse peut être utilisée telle quelle
+    """
+    if not response or len(response.strip()) < 80:
+        return False
+    return "Je n'ai pas pu générer une réponse complète" not in response
+
 async def extract_task_description(task):
     """
     Extrait une description détaillée de la tâche à partir de l'entrée utilisateur.
@@ -468,8 +477,11 @@ async def extract_task_description(task):
     3. Comment je saurai que le test est réussi
     """
     
-    # Invoquer Claude pour analyser la tâche
-    response = invoke_claude(prompt, system_prompt)
+    # Invoquer Claude pour analyser la tâche (modèle rapide; grand modèle si la réponse est inexploitable)
+    response = await run_in_llm_executor(
+        invoke_routed, 'extract_task_description', invoke_claude, prompt, system_prompt,
+        validate=is_valid_task_analysis
+    )
     socketio.emit('task_analysis', {'analysis': response})
     
     return response
@@ -559,7 +571,7 @@ async def execute_browser_action(action_description, html_context, max_attempts=
             """
             
             # Invoquer Claude pour générer le code
-            response = invoke_claude(prompt, system_prompt)
+            response = await invoke_claude_async(prompt, system_prompt)
             
             # Extraire le code de la réponse
             code_match = re.search(r'CODE:\s*(.*?)(?=\s*CODE:|$)', response, re.DOTALL)
@@ -706,7 +718,7 @@ async def analyze_results(task_description, test_results):
     """
     
     # Invoquer Claude pour analyser les résultats
-    report = invoke_claude(prompt, system_prompt)
+    report = await invoke_claude_async(prompt, system_prompt)
     
     return report
 
@@ -759,7 +771,7 @@ async def claude_qa_request():
         3. ...
         """
         
-        action_plan = invoke_claude(action_plan_prompt)
+        action_plan = await invoke_claude_async(action_plan_prompt)
         socketio.emit('action_plan', {'plan': action_plan})
         
         # Phase 5: Extraire les actions individuelles du plan
@@ -799,7 +811,7 @@ async def claude_qa_request():
                 Générez un code browser_use différent qui pourrait contourner ce problème.
                 """
                 
-                retry_response = invoke_claude(retry_prompt, system_prompt=None)
+                retry_response = await invoke_claude_async(retry_prompt, system_prompt=None)
                 
                 # Extraire le code alternatif
                 retry_code_match = re.search(r'CODE:\s*(.*?)(?=\s*CODE:|$)', retry_response, re.DOTALL)
@@ -929,7 +941,7 @@ async def qa_claude_request():
         3. ...
         """
         
-        action_plan = invoke_claude(action_plan_prompt)
+        action_plan = await invoke_claude_async(action_plan_prompt)
         socketio.emit('action_plan', {'plan': action_plan})
         
         # Phase 5: Extraire les actions individuelles du plan
@@ -969,7 +981,7 @@ async def qa_claude_request():
                 Générez un code browser_use différent qui pourrait contourner ce problème.
                 """
                 
-                retry_response = invoke_claude(retry_prompt, system_prompt=None)
+                retry_response = await invoke_claude_async(retry_prompt, system_prompt=None)
                 
                 # Extraire le code alternatif
                 retry_code_match = re.search(r'CODE:\s*(.*?)(?=\s*CODE:|$)', retry_response, re.DOTALL)
@@ -1055,6 +1067,7 @@ def qa_request():
     return run_async_task(claude_qa_request())
 
 @app.route('/qa_api_request', methods=['POST'])
+@admission_control('qa_api_request')
 def qa_api_request():
     # Log explicite ajouté ici
     with open('/home/adrien.parrochia/go/src/github.com/agentsIA/logs/qaclaude.log', 'a') as log_file:
@@ -1067,7 +1080,11 @@ def qa_api_request():
 
 def start_socketio():
     """Démarre le serveur SocketIO en arrière-plan."""
-    socketio.run(app, debug=True, use_reloader=False, port=5002, allow_unsafe_werkzeug=True)
+    # Port d'écoute: AGENT_PORT permet de lancer plusieurs réplicas (voir make start-replica)
+    port = int(os.getenv('AGENT_PORT', '5002'))
+    # Enregistrement auprès du registre des services (battements de cœur en arrière-plan)
+    register_service('qa', port)
+    socketio.run(app, debug=True, use_reloader=False, port=port, allow_unsafe_werkzeug=True)
 
 
 @socketio.on('connect')
@@ -1084,61 +1101,24 @@ def handle_connect():
         logger.error(f"Erreur lors de la gestion de la connexion: {str(e)}")
 
 @socketio.on('request_logs')
-def handle_request_logs():
-    """Gestionnaire d'événement pour la demande de logs"""
-    try:
-        logger.info("Demande de logs reçue")
-        # Envoyer un accusé de réception
-        safe_emit('log', {'type': 'info', 'message': "Chargement des logs en cours..."})
-        
-        # Lire les dernières entrées du fichier de log pour les afficher dans l'interface
-        try:
-            log_path = os.path.join(log_dir, 'qaclaude.log')
-            if os.path.exists(log_path):
-                with open(log_path, 'r') as log_file:
-                    # Lire les 50 dernières lignes du fichier
-                    lines = log_file.readlines()
-                    last_lines = lines[-50:] if len(lines) > 50 else lines
-                    
-                    for line in last_lines:
-                        # Ajouter un petit délai pour éviter la saturation
-                        time.sleep(0.01)
-                        
-                        # Déterminer le type de log (info, error, warning) basé sur le contenu
-                        log_type = 'info'
-                        if '[ERROR]' in line:
-                            log_type = 'error'
-                        elif '[WARNING]' in line:
-                            log_type = 'warning'
-                        elif 'SUCCESS' in line:
-                            log_type = 'success'
-                        
-                        # Extraire le message (tout après le niveau de log)
-                        message_match = re.search(r'\[(INFO|ERROR|WARNING)\]\s*(.*)', line)
-                        if message_match:
-                            message = message_match.group(2)
-                        else:
-                            message = line.strip()
-                        
-                        # Envoyer au client
-                        safe_emit('log', {'type': log_type, 'message': f"[LOG] {message}"})
-                
-                safe_emit('log', {'type': 'info', 'message': "---- Fin des logs précédents ----"})
-            else:
-                safe_emit('log', {'type': 'warning', 'message': "Fichier de log introuvable"})
-        except Exception as log_err:
-            logger.error(f"Erreur lors de la lecture des logs: {str(log_err)}")
-            safe_emit('log', {'type': 'error', 'message': f"Impossible de charger les logs précédents: {str(log_err)}"})
+def handle_request_logs(data=None):
+    """
+    Gestionnaire d'événement pour la demande de logs.
     
+    Renvoie au seul client demandeur, en un événement log_replay, les dernières
+    lignes du fichier de log; avec le curseur d'une demande précédente
+    ({'cursor': ...}), seulement les lignes écrites depuis.
+    """
+    try:
+        cursor = data.get('cursor') if isinstance(data, dict) else None
+        emit('log_replay', read_log_entries(os.path.join(log_dir, 'qaclaude.log'), cursor))
     except Exception as e:
-        logger.error(f"Erreur lors du traitement de la demande de logs: {str(e)}")
+        logger.error(f"Erreur lors de la lecture des logs: {str(e)}")
+        emit('log', {'type': 'error', 'message': f"Impossible de charger les logs précédents: {str(e)}"})
 
 if __name__ == '__main__':
     # Initialiser le client Bedrock
-    bedrock_client = boto3.client(
-        service_name='bedrock-runtime',
-        region_name=REGION_NAME,
-    )
+    bedrock_client = get_bedrock_client(REGION_NAME)
     
     # Démarrer le serveur Flask avec SocketIO
     start_socketio()
\ No newline at end of file
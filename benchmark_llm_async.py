@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Mesure le gel de la boucle asyncio pendant un appel LLM.
+
+Compare un appel bloquant (invoke_claude appelé directement depuis une
+coroutine, comportement historique des agents QA et Performance) avec
+``run_in_llm_executor`` (invoke_claude_async). Une coroutine « battement »
+se réveille toutes les 10 ms, comme le ferait le sondage du DOM ou une capture
+d'écran; on mesure son retard maximum et cumulé.
+
+L'appel Bedrock est simulé par une attente bloquante de durée configurable,
+ou réel avec --real (credentials AWS requis).
+
+Usage:
+    python benchmark_llm_async.py [--latency 2.0] [--calls 3] [--real]
+"""
+
+import argparse
+import asyncio
+import time
+
+from shared.llm_async import run_in_llm_executor
+
+TICK = 0.01
+
+
+async def heartbeat(stop, lags):
+    """Se réveille toutes les TICK secondes et note le retard de chaque réveil."""
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(time.perf_counter() - expected, 0.0))
+
+
+async def run_scenario(call, use_executor, calls):
+    stop = asyncio.Event()
+    lags = []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    if use_executor:
+        await asyncio.gather(*(run_in_llm_executor(call) for _ in range(calls)))
+    else:
+        for _ in range(calls):
+            call()
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await beat
+    return {
+        "elapsed_s": elapsed,
+        "max_stall_ms": max(lags) * 1000 if lags else 0.0,
+        "total_stall_ms": sum(lags) * 1000,
+        "heartbeats": len(lags),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gel de la boucle asyncio pendant les appels LLM")
+    parser.add_argument("--latency", type=float, default=2.0, help="Durée simulée d'un appel Bedrock (s)")
+    parser.add_argument("--calls", type=int, default=3, help="Nombre d'appels par scénario")
+    parser.add_argument("--real", action="store_true", help="Appeler réellement Bedrock (sans cache)")
+    args = parser.parse_args()
+
+    if args.real:
+        from dotenv import load_dotenv
+        load_dotenv()
+        from shared.llm import invoke_bedrock
+
+        def call():
+            return invoke_bedrock("Réponds simplement 'ok'.", max_tokens=16, use_cache=False)
+    else:
+        def call():
+            time.sleep(args.latency)
+            return "ok"
+
+    print(f"{'mode':<24}{'durée (s)':>12}{'gel max (ms)':>16}{'gel cumulé (ms)':>18}{'battements':>12}")
+    for label, use_executor in (("invoke_claude", False), ("invoke_claude_async", True)):
+        result = asyncio.run(run_scenario(call, use_executor, args.calls))
+        print(f"{label:<24}{result['elapsed_s']:>12.2f}{result['max_stall_ms']:>16.1f}"
+              f"{result['total_stall_ms']:>18.1f}{result['heartbeats']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+Modules partagés entre les agents.
+
+Chaque agent est lancé depuis son propre dossier (``agentX/python/app.py``) et
+ajoute la racine du dépôt à ``sys.path`` pour pouvoir importer ce paquet.
+"""
@@ -0,0 +1,256 @@
+"""
+Contrôle d'admission des endpoints coûteux: limite de concurrence et file d'attente bornée.
+
+Rien ne limitait le nombre de demandes acceptées par un agent: sous une rafale,
+chaque demande lançait ses appels au modèle en même temps que les autres, et
+toutes ralentissaient ou expiraient ensemble. Chaque endpoint protégé a ici:
+
+- une limite de requêtes traitées simultanément;
+- une file d'attente bornée, servie dans l'ordre d'arrivée, avec une attente
+  maximum;
+- un refus immédiat (HTTP 429 avec ``Retry-After``) quand la file est pleine ou
+  que l'attente dépasse le maximum: l'appelant réessaie plus tard ou sur un
+  autre réplica au lieu de faire s'écrouler le débit utile de tous.
+
+Le délai ``Retry-After`` est estimé à partir de la durée moyenne de traitement
+(moyenne mobile exponentielle) et de la longueur de la file. La profondeur de
+file, les requêtes en cours et les temps d'attente (histogramme HDR) sont
+exposés dans ``GET /api/llm_stats`` et ``GET /metrics``.
+
+Variables d'environnement:
+    ADMISSION_ENABLED: Active le contrôle d'admission (défaut: 1)
+    ADMISSION_CONCURRENCY: Requêtes traitées simultanément par endpoint (défaut: 4)
+    ADMISSION_QUEUE: Requêtes en attente au maximum par endpoint (défaut: 8)
+    ADMISSION_MAX_WAIT: Attente maximum dans la file, en secondes (défaut: 30)
+    ADMISSION_LIMITS: Réglages par endpoint, en JSON
+        (ex: {"project_request": {"concurrency": 2, "queue": 4, "max_wait": 60}})
+"""
+
+import functools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from shared.histogram import Histogram
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1").lower() not in ("0", "false", "no")
+CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "4"))
+QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE", "8"))
+MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "30"))
+
+try:
+    LIMITS = json.loads(os.getenv("ADMISSION_LIMITS") or "{}")
+except ValueError:
+    logger.warning("ADMISSION_LIMITS ignoré: JSON invalide")
+    LIMITS = {}
+
+# Bornes du délai Retry-After annoncé, en secondes
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 120
+
+# Poids d'une nouvelle mesure dans la moyenne mobile de la durée de traitement
+SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Requête refusée: file pleine ou attente trop longue."""
+
+    def __init__(self, message, reason, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limite de concurrence et file d'attente FIFO bornée d'un endpoint."""
+
+    def __init__(self, name, concurrency=CONCURRENCY, queue_size=QUEUE_SIZE, max_wait=MAX_WAIT):
+        """
+        Args:
+            name (str): Nom de l'endpoint (clé de ADMISSION_LIMITS et des statistiques)
+            concurrency (int, optional): Requêtes traitées simultanément
+            queue_size (int, optional): Requêtes en attente au maximum
+            max_wait (float, optional): Attente maximum dans la file, en secondes
+        """
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self.queue_size = max(0, int(queue_size))
+        self.max_wait = float(max_wait)
+        self._running = 0
+        self._waiters = deque()
+        self._service_time = None
+        self._lock = threading.Lock()
+        self._wait_ms = Histogram()
+        self._service_ms = Histogram()
+        self._stats = {
+            "admitted": 0,
+            "queued_total": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+        }
+
+    def _retry_after(self):
+        """Délai conseillé avant une nouvelle tentative (appelé sous verrou)."""
+        service_time = self._service_time or 1.0
+        estimate = service_time * (len(self._waiters) + 1) / self.concurrency
+        return int(min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(estimate))))
+
+    def acquire(self):
+        """
+        Réserve une place de traitement, en attendant dans la file si besoin.
+
+        Raises:
+            AdmissionRejected: Si la file est pleine, ou si l'attente dépasse max_wait
+        """
+        start = time.time()
+        with self._lock:
+            if self._running < self.concurrency and not self._waiters:
+                self._running += 1
+                self._stats["admitted"] += 1
+                self._wait_ms.record(0)
+                return
+            if len(self._waiters) >= self.queue_size:
+                self._stats["rejected_queue_full"] += 1
+                raise AdmissionRejected(f"{self.name}: file d'attente pleine ({self.queue_size})",
+                                        "queue_full", self._retry_after())
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+            self._stats["queued_total"] += 1
+
+        waiter.wait(self.max_wait)
+        with self._lock:
+            # La place est transmise sous verrou par release: l'état de l'événement fait foi
+            if not waiter.is_set():
+                self._waiters.remove(waiter)
+                self._stats["rejected_timeout"] += 1
+                raise AdmissionRejected(f"{self.name}: attente maximum dépassée ({self.max_wait:g} s)",
+                                        "queue_timeout", self._retry_after())
+            self._stats["admitted"] += 1
+            self._wait_ms.record((time.time() - start) * 1000)
+
+    def release(self, service_time=None):
+        """
+        Libère une place; elle est transmise directement à la plus ancienne requête en attente.
+
+        Args:
+            service_time (float, optional): Durée de traitement de la requête, en secondes
+        """
+        with self._lock:
+            if service_time is not None:
+                self._service_ms.record(service_time * 1000)
+                if self._service_time is None:
+                    self._service_time = service_time
+                else:
+                    self._service_time += SERVICE_TIME_ALPHA * (service_time - self._service_time)
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._running -= 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: Réglages, requêtes en cours et en file, refus et temps d'attente/traitement (ms)
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                running=self._running,
+                queued=len(self._waiters),
+                concurrency=self.concurrency,
+                queue_size=self.queue_size,
+                max_wait_s=self.max_wait,
+                retry_after_s=self._retry_after(),
+                wait_ms=self._wait_ms.summary(percentiles=(50, 90, 99)),
+                service_ms=self._service_ms.summary(percentiles=(50, 90, 99)),
+            )
+        return stats
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_admission_controller(name):
+    """
+    Retourne le contrôleur d'un endpoint, en le créant au besoin.
+
+    Args:
+        name (str): Nom de l'endpoint (ex: "go_code_request")
+
+    Returns:
+        AdmissionController: Contrôleur partagé du processus, ou None si le contrôle est désactivé
+    """
+    if not ADMISSION_ENABLED:
+        return None
+    controller = _controllers.get(name)
+    if controller is None:
+        with _controllers_lock:
+            controller = _controllers.get(name)
+            if controller is None:
+                limits = LIMITS.get(name, {})
+                controller = _controllers[name] = AdmissionController(
+                    name,
+                    concurrency=limits.get("concurrency", CONCURRENCY),
+                    queue_size=limits.get("queue", QUEUE_SIZE),
+                    max_wait=limits.get("max_wait", MAX_WAIT),
+                )
+    return controller
+
+
+def admission_control(name):
+    """
+    Décorateur de vue Flask: applique le contrôle d'admission de l'endpoint.
+
+    Une requête refusée reçoit aussitôt une réponse 429 avec l'en-tête
+    ``Retry-After``, sans exécuter la vue.
+
+    Args:
+        name (str): Nom de l'endpoint (clé de ADMISSION_LIMITS)
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import jsonify
+
+            controller = get_admission_controller(name)
+            if controller is None:
+                return view(*args, **kwargs)
+            try:
+                controller.acquire()
+            except AdmissionRejected as e:
+                logger.warning(f"Requête refusée ({e.reason}): {str(e)}")
+                response = jsonify({
+                    'error': f"Agent surchargé, réessayer dans {e.retry_after} s",
+                    'status': 'overloaded',
+                    'reason': e.reason,
+                    'retry_after': e.retry_after,
+                })
+                return response, 429, {'Retry-After': str(e.retry_after)}
+            start = time.time()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                controller.release(time.time() - start)
+        return wrapper
+    return decorator
+
+
+def get_admission_stats():
+    """
+    Returns:
+        dict: Endpoint -> statistiques du contrôleur
+    """
+    with _controllers_lock:
+        controllers = dict(_controllers)
+    return {name: controller.stats() for name, controller in controllers.items()}
+
+
+register_stats_provider("admission", get_admission_stats)
@@ -0,0 +1,445 @@
+"""
+Client HTTP entre agents: sessions keep-alive, délais, nouvelles tentatives et disjoncteur.
+
+Chaque appel ``interface_with_*_agent`` du ChefProjet et chaque transfert du
+serveur d'administration passait par un ``requests.post`` nu: nouvelle
+connexion TCP à chaque appel, et un agent arrêté coûtait le délai complet à
+chaque projet. Ici, chaque agent cible a son client:
+
+- une ``requests.Session`` avec un pool de connexions keep-alive;
+- un délai de connexion court et un délai de lecture propre à l'agent;
+- de nouvelles tentatives, avec attente exponentielle et gigue, uniquement
+  quand la requête n'a pas pu être traitée (connexion refusée, 502/503/504):
+  une génération longue n'est jamais relancée sur un simple délai de lecture;
+- un disjoncteur: après ``AGENT_CIRCUIT_FAILURES`` échecs consécutifs, les
+  appels vers l'instance échouent immédiatement (``CircuitOpenError``) pendant
+  ``AGENT_CIRCUIT_RESET`` secondes; un seul appel d'essai est ensuite laissé
+  passer (état semi-ouvert) pour refermer ou rouvrir le circuit.
+
+Une URL réduite à un chemin (``client.post("/go_code_request")``) est résolue
+via le registre des services (``shared.service_registry``), sous le nom du
+client. Si le service est enregistré mais qu'aucune instance n'est disponible,
+l'appel échoue aussitôt (``ServiceUnavailableError``), sans sonde réseau.
+
+Quand plusieurs réplicas d'un agent sont enregistrés, chaque appel va à
+l'instance qui a le moins de requêtes en cours, ou, avec une clé d'affinité
+(``sticky``, ex: le nom du projet), toujours à la même instance pour que les
+fichiers d'un projet restent dans le même espace de travail. Chaque instance
+a son propre disjoncteur: un réplica arrêté ne coupe pas les autres.
+
+Une réponse 429 (agent surchargé, voir ``shared.admission``) ne compte pas
+comme un échec du circuit: la requête part aussitôt vers un autre réplica, ou,
+s'il n'y en a pas, après le délai ``Retry-After`` annoncé s'il est raisonnable.
+
+``CircuitOpenError`` et ``ServiceUnavailableError`` héritent de
+``requests.exceptions.ConnectionError``: les gestionnaires
+``except requests.exceptions.RequestException`` existants les traitent comme un
+agent injoignable.
+
+Variables d'environnement:
+    AGENT_HTTP_POOL_SIZE: Connexions keep-alive conservées par instance (défaut: 10)
+    AGENT_HTTP_CONNECT_TIMEOUT: Délai de connexion en secondes (défaut: 2)
+    AGENT_HTTP_READ_TIMEOUT: Délai de lecture par défaut en secondes (défaut: 300)
+    AGENT_HTTP_TIMEOUTS: Délais de lecture par agent, en JSON (ex: {"dev-go": 600})
+    AGENT_HTTP_RETRIES: Nouvelles tentatives après un échec de connexion (défaut: 2)
+    AGENT_HTTP_BACKOFF: Attente de base avant une nouvelle tentative, en secondes (défaut: 0.2)
+    AGENT_HTTP_MAX_RETRY_AFTER: Attente Retry-After maximum acceptée après un 429, en secondes (défaut: 10)
+    AGENT_CIRCUIT_FAILURES: Échecs consécutifs qui ouvrent le circuit (défaut: 3)
+    AGENT_CIRCUIT_RESET: Durée d'ouverture du circuit avant un appel d'essai, en secondes (défaut: 30)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from shared.service_registry import get_service_registry, resolve_urls
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("AGENT_HTTP_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.getenv("AGENT_HTTP_CONNECT_TIMEOUT", "2"))
+READ_TIMEOUT = float(os.getenv("AGENT_HTTP_READ_TIMEOUT", "300"))
+RETRIES = int(os.getenv("AGENT_HTTP_RETRIES", "2"))
+BACKOFF = float(os.getenv("AGENT_HTTP_BACKOFF", "0.2"))
+MAX_RETRY_AFTER = float(os.getenv("AGENT_HTTP_MAX_RETRY_AFTER", "10"))
+CIRCUIT_FAILURES = int(os.getenv("AGENT_CIRCUIT_FAILURES", "3"))
+CIRCUIT_RESET = float(os.getenv("AGENT_CIRCUIT_RESET", "30"))
+
+try:
+    READ_TIMEOUTS = json.loads(os.getenv("AGENT_HTTP_TIMEOUTS") or "{}")
+except ValueError:
+    logger.warning("AGENT_HTTP_TIMEOUTS ignoré: JSON invalide")
+    READ_TIMEOUTS = {}
+
+# Codes qui signalent une requête non traitée par l'agent: nouvelle tentative possible
+RETRY_STATUSES = (502, 503, 504)
+
+# Agent surchargé (shared.admission): la requête n'a pas été traitée, l'instance reste saine
+OVERLOADED_STATUS = 429
+
+# États du disjoncteur
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Appel refusé sans contacter l'agent: son circuit est ouvert."""
+
+
+class ServiceUnavailableError(requests.exceptions.ConnectionError):
+    """Appel refusé sans contacter l'agent: aucune instance disponible dans le registre des services."""
+
+
+class CircuitBreaker:
+    """Disjoncteur à trois états (fermé, ouvert, semi-ouvert) d'un agent."""
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURES, reset_timeout=CIRCUIT_RESET):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Indique si un appel peut partir.
+
+        Returns:
+            bool: False si le circuit est ouvert, ou semi-ouvert avec un appel d'essai déjà en cours
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.time() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                logger.info(f"Circuit {self.name}: semi-ouvert, appel d'essai")
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit {self.name}: refermé")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self, error):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = error
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"Circuit {self.name}: ouvert après {self.consecutive_failures} échec(s) ({error})")
+                self.state = OPEN
+                self.opened_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.time() - self.opened_at)), 1)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_in_s": retry_in,
+                "last_error": self.last_error,
+            }
+
+
+def _retry_after(response):
+    """Délai Retry-After d'une réponse, en secondes (1 s si absent ou illisible)."""
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "1")))
+    except ValueError:
+        return 1.0
+
+
+class AgentClient:
+    """Sessions HTTP vers les instances d'un agent, avec un disjoncteur par instance."""
+
+    def __init__(self, name, read_timeout=None, retries=RETRIES, backoff=BACKOFF, pool_size=POOL_SIZE):
+        """
+        Args:
+            name (str): Identifiant de l'agent cible (nom de service, clé des statistiques et de AGENT_HTTP_TIMEOUTS)
+            read_timeout (float, optional): Délai de lecture par défaut (défaut: AGENT_HTTP_TIMEOUTS ou AGENT_HTTP_READ_TIMEOUT)
+            retries (int, optional): Nouvelles tentatives après un échec de connexion
+            backoff (float, optional): Attente de base avant une nouvelle tentative
+            pool_size (int, optional): Connexions keep-alive conservées par instance
+        """
+        self.name = name
+        self.read_timeout = float(read_timeout or READ_TIMEOUTS.get(name, READ_TIMEOUT))
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self._outstanding = {}
+        self._served = {}
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "short_circuited": 0,
+            "unavailable": 0,
+            "overloaded": 0,
+            "sticky_requests": 0,
+            "wall_time_s": 0.0,
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def _timeout(self, timeout):
+        """Délai (connexion, lecture); un délai unique fourni par l'appelant est le délai de lecture."""
+        if isinstance(timeout, tuple):
+            return timeout
+        return (min(CONNECT_TIMEOUT, timeout or self.read_timeout), timeout or self.read_timeout)
+
+    def _breaker(self, base_url):
+        with self._lock:
+            breaker = self._breakers.get(base_url)
+            if breaker is None:
+                breaker = self._breakers[base_url] = CircuitBreaker(f"{self.name}@{base_url}")
+            return breaker
+
+    def _targets(self, url):
+        """
+        Instances candidates et chemin de la requête.
+
+        Returns:
+            tuple: (adresses de base des instances, chemin)
+        """
+        if not url.startswith("/"):
+            parts = urlsplit(url)
+            base_url = f"{parts.scheme}://{parts.netloc}"
+            return [base_url], url[len(base_url):]
+        base_urls = resolve_urls(self.name)
+        if not base_urls:
+            self._count("unavailable")
+            raise ServiceUnavailableError(f"Agent {self.name} indisponible (aucune instance active): {url}")
+        return base_urls, url
+
+    def _order(self, base_urls, sticky):
+        """
+        Ordre de préférence des instances.
+
+        Avec une clé d'affinité, hachage par rendez-vous: la même clé désigne
+        toujours la même instance, et seules les clés d'une instance qui
+        disparaît changent de cible. Sinon, l'instance qui a le moins de
+        requêtes en cours (égalités départagées au hasard).
+        """
+        if sticky is not None:
+            return sorted(base_urls, key=lambda base_url: hashlib.sha1(f"{sticky}|{base_url}".encode()).digest(),
+                          reverse=True)
+        with self._lock:
+            return sorted(base_urls, key=lambda base_url: (self._outstanding.get(base_url, 0), random.random()))
+
+    def _select(self, base_urls, sticky, excluded):
+        """Première instance, dans l'ordre de préférence, dont le circuit laisse passer l'appel."""
+        for base_url in self._order(base_urls, sticky):
+            if base_url not in excluded and self._breaker(base_url).allow():
+                return base_url
+        return None
+
+    def request(self, method, url, timeout=None, sticky=None, **kwargs):
+        """
+        Envoie une requête à une instance de l'agent.
+
+        Args:
+            method (str): Méthode HTTP
+            url (str): URL complète, ou chemin résolu via le registre des services
+            timeout (float|tuple, optional): Délai de lecture, ou (connexion, lecture)
+            sticky (str, optional): Clé d'affinité (ex: nom du projet): les requêtes de même
+                clé vont à la même instance tant qu'elle est disponible
+            **kwargs: Arguments de requests (json, params, headers...)
+
+        Returns:
+            requests.Response: Réponse de l'agent (y compris les codes d'erreur HTTP)
+
+        Raises:
+            CircuitOpenError: Si le circuit de toutes les instances est ouvert
+            ServiceUnavailableError: Si aucune instance du service n'est disponible
+            requests.exceptions.RequestException: Si l'agent reste injoignable
+        """
+        base_urls, path = self._targets(url)
+        timeout = self._timeout(timeout)
+        start = time.time()
+        self._count("requests")
+        if sticky is not None:
+            self._count("sticky_requests")
+        failed = set()
+        attempt = 0
+        try:
+            while True:
+                # Après un échec de connexion, une autre instance est essayée si possible
+                base_url = self._select(base_urls, sticky, failed if len(failed) < len(base_urls) else set())
+                if base_url is None:
+                    self._count("short_circuited")
+                    raise CircuitOpenError(f"Agent {self.name} indisponible (circuit ouvert), appel non envoyé: {path}")
+                breaker = self._breaker(base_url)
+
+                with self._lock:
+                    self._outstanding[base_url] = self._outstanding.get(base_url, 0) + 1
+                    self._served[base_url] = self._served.get(base_url, 0) + 1
+                try:
+                    response = self.session.request(method, base_url + path, timeout=timeout, **kwargs)
+                except requests.exceptions.ConnectionError as e:
+                    # Connexion refusée ou impossible: la requête n'a pas été traitée, et
+                    # l'état des instances dans le registre est relu au prochain appel
+                    error, response = e, None
+                    registry = get_service_registry()
+                    if registry is not None:
+                        registry.invalidate(self.name)
+                except requests.exceptions.RequestException as e:
+                    # Délai de lecture dépassé: l'agent a peut-être traité la requête, pas de nouvel envoi
+                    self._count("failures")
+                    breaker.record_failure(f"{type(e).__name__}: {str(e)[:200]}")
+                    raise
+                else:
+                    error = None
+                    if response.status_code == OVERLOADED_STATUS:
+                        # Instance surchargée (contrôle d'admission), mais joignable
+                        breaker.record_success()
+                        self._count("overloaded")
+                    elif response.status_code not in RETRY_STATUSES:
+                        # L'agent a répondu, même avec une erreur applicative: il est joignable
+                        breaker.record_success()
+                        return response
+                finally:
+                    with self._lock:
+                        self._outstanding[base_url] -= 1
+
+                overloaded = response is not None and response.status_code == OVERLOADED_STATUS
+                if not overloaded:
+                    breaker.record_failure(
+                        f"{type(error).__name__}: {str(error)[:200]}" if error else f"HTTP {response.status_code}"
+                    )
+                failed.add(base_url)
+                retry_after = _retry_after(response) if overloaded else None
+                if attempt >= self.retries or (retry_after is not None and retry_after > MAX_RETRY_AFTER
+                                               and len(failed) >= len(base_urls)):
+                    # Plus de tentative, ou attente annoncée trop longue: la réponse 429 est rendue à l'appelant
+                    self._count("failures")
+                    if error is not None:
+                        raise error
+                    return response
+
+                attempt += 1
+                self._count("retries")
+                if overloaded and len(failed) < len(base_urls):
+                    # Un autre réplica peut prendre la requête tout de suite
+                    continue
+                if retry_after is not None:
+                    time.sleep(retry_after)
+                else:
+                    # Attente exponentielle avec gigue complète
+                    time.sleep(random.uniform(0, self.backoff * (2 ** (attempt - 1))))
+        finally:
+            self._count("wall_time_s", time.time() - start)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def stats(self):
+        """
+        Retourne l'état des disjoncteurs et les compteurs du client.
+
+        L'état global est "closed" tant qu'au moins une instance est joignable,
+        "open" quand toutes les instances ont leur circuit ouvert.
+
+        Returns:
+            dict: État global, requêtes, nouvelles tentatives, échecs, appels refusés et détail par instance
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            breakers = dict(self._breakers)
+            outstanding = dict(self._outstanding)
+            served = dict(self._served)
+        stats["wall_time_s"] = round(stats["wall_time_s"], 3)
+        stats["read_timeout_s"] = self.read_timeout
+
+        instances = {}
+        for base_url, breaker in breakers.items():
+            instances[base_url] = dict(breaker.snapshot(), outstanding=outstanding.get(base_url, 0),
+                                       requests=served.get(base_url, 0))
+        states = [instance["state"] for instance in instances.values()]
+        unhealthy = [instance for instance in instances.values() if instance["state"] != CLOSED]
+        if not states or CLOSED in states:
+            stats["state"] = CLOSED
+        else:
+            stats["state"] = HALF_OPEN if HALF_OPEN in states else OPEN
+        stats["open_instances"] = len(unhealthy)
+        stats["outstanding"] = sum(outstanding.values())
+        retry_in = [instance["retry_in_s"] for instance in unhealthy if instance["retry_in_s"] is not None]
+        stats["retry_in_s"] = min(retry_in) if retry_in else None
+        stats["last_error"] = unhealthy[0]["last_error"] if unhealthy else None
+        stats["instances"] = instances
+        return stats
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_agent_client(name):
+    """
+    Retourne le client d'un agent cible, en le créant au besoin.
+
+    Args:
+        name (str): Identifiant de l'agent (ex: "dev-go", "qa", "chef-projet")
+
+    Returns:
+        AgentClient: Client partagé du processus pour cet agent
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = AgentClient(name)
+    return client
+
+
+def get_agent_client_stats():
+    """
+    Retourne l'état des clients inter-agents du processus.
+
+    Returns:
+        dict: Identifiant de l'agent -> état du circuit et compteurs
+    """
+    with _clients_lock:
+        clients = dict(_clients)
+    return {name: client.stats() for name, client in clients.items()}
+
+
+register_stats_provider("agent_clients", get_agent_client_stats)
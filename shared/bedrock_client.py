@@ -0,0 +1,234 @@
+"""
+Client Bedrock mutualisé pour tous les agents.
+
+Un seul client ``bedrock-runtime`` est conservé par processus (et par région),
+avec un pool de connexions keep-alive dimensionné pour les appels concurrents.
+Le client n'est reconstruit qu'en cas d'erreur d'identification ou de session
+(jetons expirés, signature invalide, credentials introuvables).
+
+Variables d'environnement:
+    BEDROCK_MAX_POOL_CONNECTIONS: Taille du pool de connexions (défaut: 20)
+    BEDROCK_CONNECT_TIMEOUT: Délai de connexion en secondes (défaut: 5)
+    BEDROCK_READ_TIMEOUT: Délai de lecture en secondes (défaut: 300)
+    BEDROCK_SDK_MAX_ATTEMPTS: Tentatives internes de botocore (défaut: 2)
+    BEDROCK_ENDPOINT_URL: Point d'accès à utiliser à la place de Bedrock, par exemple
+        le serveur local ``shared.bedrock_standin`` (défaut: point d'accès AWS)
+"""
+
+import logging
+import os
+import threading
+import time
+
+import boto3
+from botocore import awsrequest
+from botocore.config import Config
+
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+MAX_POOL_CONNECTIONS = int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "20"))
+CONNECT_TIMEOUT = float(os.getenv("BEDROCK_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("BEDROCK_READ_TIMEOUT", "300"))
+SDK_MAX_ATTEMPTS = int(os.getenv("BEDROCK_SDK_MAX_ATTEMPTS", "2"))
+ENDPOINT_URL = os.getenv("BEDROCK_ENDPOINT_URL") or None
+
+# Fragments de messages indiquant que la session ou les credentials sont à renouveler
+SESSION_ERROR_MARKERS = (
+    "ExpiredToken",
+    "InvalidSignature",
+    "UnrecognizedClient",
+    "InvalidClientTokenId",
+    "RequestExpired",
+    "security token",
+    "Unable to locate credentials",
+    "NoCredentialsError",
+    "PartialCredentialsError",
+    "CredentialRetrievalError",
+)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "clients_created": 0,
+    "rebuilds": 0,
+    "requests": 0,
+    "new_connections": 0,
+    "connect_time_total_ms": 0.0,
+    "connect_time_max_ms": 0.0,
+}
+
+_probe_installed = False
+
+
+def _record(key, value=1):
+    with _stats_lock:
+        _stats[key] += value
+
+
+def _count_request(**kwargs):
+    """Compte chaque requête HTTP envoyée par le client (événement botocore before-send)."""
+    _record("requests")
+    # Ne rien retourner: une valeur non nulle remplacerait la réponse HTTP
+    return None
+
+
+def _install_connection_probe():
+    """
+    Instrumente l'ouverture des connexions botocore pour mesurer le nombre de
+    connexions établies et le temps de connexion (TCP + TLS).
+    """
+    global _probe_installed
+    if _probe_installed:
+        return
+
+    for connection_cls in (awsrequest.AWSHTTPConnection, awsrequest.AWSHTTPSConnection):
+        original_connect = connection_cls.connect
+
+        def connect(self, _original_connect=original_connect):
+            start = time.perf_counter()
+            try:
+                return _original_connect(self)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                with _stats_lock:
+                    _stats["new_connections"] += 1
+                    _stats["connect_time_total_ms"] += elapsed_ms
+                    _stats["connect_time_max_ms"] = max(_stats["connect_time_max_ms"], elapsed_ms)
+
+        connection_cls.connect = connect
+
+    _probe_installed = True
+
+
+def _create_session():
+    """Crée une session boto3 neuve pour forcer une nouvelle résolution des credentials."""
+    aws_profile = os.getenv("AWS_PROFILE")
+    if aws_profile:
+        try:
+            return boto3.session.Session(profile_name=aws_profile)
+        except Exception as e:
+            logger.warning(f"Impossible d'utiliser le profil AWS spécifié ({aws_profile}): {str(e)}")
+    return boto3.session.Session()
+
+
+def _create_client(region_name):
+    """Crée un client bedrock-runtime avec un pool de connexions keep-alive."""
+    _install_connection_probe()
+
+    config = Config(
+        region_name=region_name,
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        tcp_keepalive=True,
+        retries={"max_attempts": SDK_MAX_ATTEMPTS, "mode": "standard"},
+    )
+    session = _create_session()
+    credentials = {}
+    if ENDPOINT_URL and session.get_credentials() is None:
+        # Le serveur local n'en vérifie pas la signature: des credentials factices suffisent
+        credentials = {"aws_access_key_id": "standin", "aws_secret_access_key": "standin"}
+    client = session.client(service_name='bedrock-runtime', config=config, endpoint_url=ENDPOINT_URL, **credentials)
+    client.meta.events.register('before-send.bedrock-runtime', _count_request)
+
+    _record("clients_created")
+    logger.info(f"Client Bedrock créé (région={region_name}, pool={MAX_POOL_CONNECTIONS}, endpoint={ENDPOINT_URL or 'AWS'})")
+    return client
+
+
+def get_bedrock_client(region_name=None):
+    """
+    Retourne le client Bedrock partagé du processus, en le créant au besoin.
+
+    Args:
+        region_name (str, optional): Région AWS (défaut: REGION_NAME du .env)
+
+    Returns:
+        botocore.client.BaseClient: Client bedrock-runtime réutilisable entre threads
+    """
+    region_name = region_name or os.getenv("REGION_NAME", "eu-west-3")
+
+    client = _clients.get(region_name)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(region_name)
+        if client is None:
+            client = _create_client(region_name)
+            _clients[region_name] = client
+        return client
+
+
+def is_session_error(error):
+    """
+    Indique si une erreur nécessite de reconstruire le client (credentials ou session).
+
+    Args:
+        error (Exception): Erreur levée lors de l'appel à Bedrock
+
+    Returns:
+        bool: True si le client doit être reconstruit
+    """
+    description = f"{type(error).__name__}: {str(error)}"
+    return any(marker in description for marker in SESSION_ERROR_MARKERS)
+
+
+def invalidate_bedrock_client(error=None, region_name=None):
+    """
+    Supprime le client partagé si l'erreur concerne les credentials ou la session.
+    Le prochain appel à ``get_bedrock_client`` en recréera un.
+
+    Args:
+        error (Exception, optional): Erreur observée; si None, l'invalidation est forcée
+        region_name (str, optional): Région du client à invalider (défaut: toutes)
+
+    Returns:
+        bool: True si le client a été invalidé
+    """
+    if error is not None and not is_session_error(error):
+        return False
+
+    with _clients_lock:
+        if region_name:
+            removed = _clients.pop(region_name, None) is not None
+        else:
+            removed = bool(_clients)
+            _clients.clear()
+
+    if removed:
+        _record("rebuilds")
+        logger.warning(f"Client Bedrock invalidé, il sera reconstruit au prochain appel ({error})")
+    return removed
+
+
+def get_pool_stats():
+    """
+    Retourne les statistiques du pool de connexions Bedrock.
+
+    Returns:
+        dict: Compteurs bruts, taux de réutilisation et temps de connexion moyen
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+
+    requests_count = stats["requests"]
+    new_connections = stats["new_connections"]
+    reused = max(requests_count - new_connections, 0)
+
+    stats["reused_connections"] = reused
+    stats["reuse_ratio"] = round(reused / requests_count, 4) if requests_count else 0.0
+    stats["connect_time_avg_ms"] = round(stats["connect_time_total_ms"] / new_connections, 2) if new_connections else 0.0
+    stats["connect_time_total_ms"] = round(stats["connect_time_total_ms"], 2)
+    stats["connect_time_max_ms"] = round(stats["connect_time_max_ms"], 2)
+    stats["max_pool_connections"] = MAX_POOL_CONNECTIONS
+    stats["active_clients"] = len(_clients)
+    stats["endpoint_url"] = ENDPOINT_URL
+    return stats
+
+
+register_stats_provider("bedrock_pool", get_pool_stats)
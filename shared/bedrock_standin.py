@@ -0,0 +1,396 @@
+"""
+Serveur local imitant l'API ``bedrock-runtime`` pour les tests hors ligne.
+
+Il répond à ``InvokeModel`` (``POST /model/<modelId>/invoke``) et à
+``InvokeModelWithResponseStream`` (``POST /model/<modelId>/invoke-with-response-stream``)
+avec le même format que Bedrock (JSON Anthropic Messages, flux
+``application/vnd.amazon.eventstream``). Les agents l'utilisent dès que
+``BEDROCK_ENDPOINT_URL`` pointe vers lui, sans autre modification.
+
+Le comportement est décrit par un script JSON:
+
+    {
+      "defaults": {
+        "latency": {"distribution": "lognormal", "median_ms": 800, "sigma": 0.5},
+        "tokens_per_second": 80,
+        "throttle_rate": 0.0,
+        "error_rate": 0.0,
+        "stream_error_rate": 0.0
+      },
+      "rules": [
+        {"match": "(?i)plan de", "response": "...", "latency": {"distribution": "constant", "ms": 200}},
+        {"match": "(?i)analyse", "response_file": "reponses/analyse.json", "throttle_rate": 0.1}
+      ],
+      "default_response": "Réponse simulée."
+    }
+
+``match`` est une expression régulière appliquée au prompt système puis au
+prompt; la première règle qui correspond fournit la réponse et peut surcharger
+les réglages par défaut. La latence décrit le délai avant le premier token;
+la génération dure ensuite ``tokens de sortie / tokens_per_second`` secondes.
+``throttle_rate`` et ``error_rate`` renvoient une erreur HTTP (429 ThrottlingException,
+500 InternalServerException); ``stream_error_rate`` interrompt un flux à mi-parcours
+par un événement ``modelStreamErrorException``.
+
+Distributions de latence: ``constant`` (ms), ``uniform`` (min_ms, max_ms),
+``normal`` (mean_ms, stddev_ms), ``lognormal`` (median_ms, sigma) et
+``exponential`` (mean_ms).
+
+Usage:
+    python -m shared.bedrock_standin --port 5099 --script shared/bedrock_standin_script.json
+    BEDROCK_ENDPOINT_URL=http://localhost:5099 make start
+"""
+
+import argparse
+import base64
+import binascii
+import json
+import logging
+import os
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = int(os.getenv("BEDROCK_STANDIN_PORT", "5099"))
+CHARS_PER_TOKEN = 4
+
+DEFAULT_SETTINGS = {
+    "latency": {"distribution": "lognormal", "median_ms": 800, "sigma": 0.5},
+    "tokens_per_second": 80,
+    "throttle_rate": 0.0,
+    "error_rate": 0.0,
+    "stream_error_rate": 0.0,
+}
+
+_PATH_PATTERN = re.compile(r"^/model/(?P<model>[^/]+)/(?P<action>invoke|invoke-with-response-stream)$")
+
+
+def sample_latency(spec):
+    """
+    Tire un délai (en secondes) selon une distribution de latence.
+
+    Args:
+        spec (dict): Description de la distribution (voir l'en-tête du module)
+
+    Returns:
+        float: Délai en secondes
+    """
+    distribution = spec.get("distribution", "constant")
+    if distribution == "constant":
+        value = spec.get("ms", 0)
+    elif distribution == "uniform":
+        value = random.uniform(spec.get("min_ms", 0), spec.get("max_ms", 0))
+    elif distribution == "normal":
+        value = random.gauss(spec.get("mean_ms", 0), spec.get("stddev_ms", 0))
+    elif distribution == "lognormal":
+        value = random.lognormvariate(0, spec.get("sigma", 0.5)) * spec.get("median_ms", 0)
+    elif distribution == "exponential":
+        mean = spec.get("mean_ms", 0)
+        value = random.expovariate(1 / mean) if mean > 0 else 0
+    else:
+        raise ValueError(f"Distribution de latence inconnue: {distribution}")
+    return max(value, 0) / 1000.0
+
+
+class StandinScript:
+    """Règles de réponse et réglages de latence/erreurs chargés depuis un script JSON."""
+
+    def __init__(self, script=None, base_dir="."):
+        script = script or {}
+        self.defaults = dict(DEFAULT_SETTINGS, **script.get("defaults", {}))
+        self.default_response = script.get("default_response", "Réponse simulée par le serveur Bedrock local.")
+        self.rules = []
+        for rule in script.get("rules", []):
+            rule = dict(rule)
+            rule["pattern"] = re.compile(rule["match"])
+            if "response_file" in rule:
+                with open(os.path.join(base_dir, rule["response_file"]), encoding="utf-8") as f:
+                    rule["response"] = f.read()
+            self.rules.append(rule)
+
+    @classmethod
+    def load(cls, path):
+        """Charge un script JSON; un chemin vide donne les réglages par défaut."""
+        if not path:
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), base_dir=os.path.dirname(os.path.abspath(path)))
+
+    def resolve(self, system_prompt, prompt):
+        """
+        Choisit la réponse et les réglages applicables à une requête.
+
+        Returns:
+            tuple: (texte de la réponse, réglages fusionnés)
+        """
+        for rule in self.rules:
+            if rule["pattern"].search(system_prompt or "") or rule["pattern"].search(prompt):
+                settings = dict(self.defaults)
+                settings.update({k: v for k, v in rule.items() if k in DEFAULT_SETTINGS})
+                response = rule.get("response", self.default_response)
+                if not isinstance(response, str):
+                    # Les réponses JSON peuvent être écrites directement comme objets
+                    response = json.dumps(response, ensure_ascii=False)
+                return response, settings
+        return self.default_response, dict(self.defaults)
+
+
+# ----------------------------------------------------------------------
+# Encodage application/vnd.amazon.eventstream
+# ----------------------------------------------------------------------
+
+def _encode_headers(headers):
+    encoded = b""
+    for name, value in headers.items():
+        name_bytes = name.encode("utf-8")
+        value_bytes = value.encode("utf-8")
+        # Type 7: chaîne de caractères
+        encoded += struct.pack("!B", len(name_bytes)) + name_bytes + struct.pack("!BH", 7, len(value_bytes)) + value_bytes
+    return encoded
+
+
+def encode_event_message(headers, payload):
+    """
+    Encode un message du protocole event-stream d'AWS.
+
+    Args:
+        headers (dict): En-têtes chaîne (``:event-type``, ``:message-type``...)
+        payload (bytes): Contenu du message
+
+    Returns:
+        bytes: Message prêt à être écrit sur la connexion
+    """
+    header_bytes = _encode_headers(headers)
+    total_length = 12 + len(header_bytes) + len(payload) + 4
+    prelude = struct.pack("!II", total_length, len(header_bytes))
+    prelude += struct.pack("!I", binascii.crc32(prelude) & 0xFFFFFFFF)
+    message = prelude + header_bytes + payload
+    return message + struct.pack("!I", binascii.crc32(message) & 0xFFFFFFFF)
+
+
+def chunk_event(event):
+    """Message ``chunk`` contenant un événement Anthropic encodé en base64."""
+    payload = json.dumps({"bytes": base64.b64encode(json.dumps(event).encode("utf-8")).decode("ascii")})
+    return encode_event_message(
+        {":event-type": "chunk", ":content-type": "application/json", ":message-type": "event"},
+        payload.encode("utf-8"),
+    )
+
+
+def exception_event(exception_type, message):
+    """Message d'exception en cours de flux (throttlingException...)."""
+    return encode_event_message(
+        {":exception-type": exception_type, ":content-type": "application/json", ":message-type": "exception"},
+        json.dumps({"message": message}).encode("utf-8"),
+    )
+
+
+# ----------------------------------------------------------------------
+# Serveur HTTP
+# ----------------------------------------------------------------------
+
+def _message_content(text, tool_choice=None):
+    """
+    Construit le contenu de la réponse: un appel d'outil si la requête en impose un
+    et que la réponse scriptée est un objet JSON, du texte sinon.
+
+    Returns:
+        tuple: (blocs de contenu, stop_reason)
+    """
+    if isinstance(tool_choice, dict) and tool_choice.get("type") == "tool":
+        try:
+            arguments = json.loads(text)
+        except ValueError:
+            arguments = None
+        if isinstance(arguments, dict):
+            return [{
+                "type": "tool_use",
+                "id": f"toolu_{uuid.uuid4().hex[:24]}",
+                "name": tool_choice.get("name"),
+                "input": arguments,
+            }], "tool_use"
+    return [{"type": "text", "text": text}], "end_turn"
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Gestionnaire des requêtes InvokeModel et InvokeModelWithResponseStream."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "BedrockStandin/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.server.stats())
+        else:
+            self._send_error(404, "UnknownOperationException", f"Chemin inconnu: {self.path}")
+
+    def do_POST(self):
+        match = _PATH_PATTERN.match(self.path.split("?")[0])
+        length = int(self.headers.get("Content-Length", 0))
+        raw_body = self.rfile.read(length) if length else b""
+        if match is None:
+            self._send_error(404, "UnknownOperationException", f"Chemin inconnu: {self.path}")
+            return
+
+        try:
+            body = json.loads(raw_body or b"{}")
+            prompt = "\n".join(
+                block if isinstance(block, str) else block.get("text", "")
+                for message in body.get("messages", [])
+                for block in ([message.get("content")] if isinstance(message.get("content"), str) else message.get("content", []))
+            )
+        except (ValueError, AttributeError) as e:
+            self._send_error(400, "ValidationException", f"Corps de requête invalide: {str(e)}")
+            return
+
+        system_prompt = body.get("system") or ""
+        if not isinstance(system_prompt, str):
+            system_prompt = " ".join(block.get("text", "") for block in system_prompt)
+        text, settings = self.server.script.resolve(system_prompt, prompt)
+        text = text[:int(body.get("max_tokens", 4096)) * CHARS_PER_TOKEN]
+        model_id = match.group("model")
+        stream = match.group("action") == "invoke-with-response-stream"
+        self.server.record("requests")
+
+        # Injection d'erreurs, avant tout délai comme le ferait Bedrock
+        roll = random.random()
+        if roll < settings["throttle_rate"]:
+            self.server.record("throttled")
+            self._send_error(429, "ThrottlingException", "Too many requests, please wait before trying again.")
+            return
+        if roll < settings["throttle_rate"] + settings["error_rate"]:
+            self.server.record("errors")
+            self._send_error(500, "InternalServerException", "Erreur interne simulée.")
+            return
+
+        input_tokens = max(1, (len(prompt) + len(system_prompt)) // CHARS_PER_TOKEN)
+        output_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+        time.sleep(sample_latency(settings["latency"]))
+        tokens_per_second = float(settings["tokens_per_second"] or 0)
+
+        if stream:
+            fail_midway = random.random() < settings["stream_error_rate"]
+            self._stream_response(model_id, text, input_tokens, output_tokens, tokens_per_second, fail_midway)
+        else:
+            if tokens_per_second > 0:
+                time.sleep(output_tokens / tokens_per_second)
+            content, stop_reason = _message_content(text, body.get("tool_choice"))
+            self._send_json(200, {
+                "id": f"msg_{uuid.uuid4().hex[:24]}",
+                "type": "message",
+                "role": "assistant",
+                "model": model_id,
+                "content": content,
+                "stop_reason": stop_reason,
+                "stop_sequence": None,
+                "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+            })
+
+    def _stream_response(self, model_id, text, input_tokens, output_tokens, tokens_per_second, fail_midway=False):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("x-amzn-RequestId", str(uuid.uuid4()))
+        self.end_headers()
+
+        def write(message):
+            self.wfile.write(f"{len(message):x}\r\n".encode("ascii") + message + b"\r\n")
+            self.wfile.flush()
+
+        write(chunk_event({
+            "type": "message_start",
+            "message": {"id": f"msg_{uuid.uuid4().hex[:24]}", "type": "message", "role": "assistant",
+                        "model": model_id, "content": [], "usage": {"input_tokens": input_tokens, "output_tokens": 0}},
+        }))
+        write(chunk_event({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}))
+
+        # Un fragment tous les 4 tokens environ, au rythme demandé
+        step = CHARS_PER_TOKEN * 4
+        delay = 4 / tokens_per_second if tokens_per_second > 0 else 0
+        for start in range(0, len(text), step):
+            if fail_midway and start >= len(text) // 2:
+                self.server.record("errors")
+                write(exception_event("modelStreamErrorException", "Erreur de flux simulée."))
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+                return
+            write(chunk_event({"type": "content_block_delta", "index": 0,
+                               "delta": {"type": "text_delta", "text": text[start:start + step]}}))
+            if delay:
+                time.sleep(delay)
+
+        write(chunk_event({"type": "content_block_stop", "index": 0}))
+        write(chunk_event({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                           "usage": {"output_tokens": output_tokens}}))
+        write(chunk_event({"type": "message_stop"}))
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("x-amzn-RequestId", str(uuid.uuid4()))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, error_type, message):
+        data = json.dumps({"message": message}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("x-amzn-ErrorType", f"{error_type}:http://internal.amazon.com/coral/com.amazon.bedrock/")
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StandinServer(ThreadingHTTPServer):
+    """Serveur multi-thread portant le script et les compteurs."""
+
+    daemon_threads = True
+
+    def __init__(self, address, script):
+        super().__init__(address, StandinHandler)
+        self.script = script
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "throttled": 0, "errors": 0}
+
+    def record(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur Bedrock local pour les tests hors ligne")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--script", default=os.getenv("BEDROCK_STANDIN_SCRIPT", ""), help="Script JSON des réponses")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    server = StandinServer((args.host, args.port), StandinScript.load(args.script))
+    logger.info(f"Serveur Bedrock local sur http://{args.host}:{args.port} (script: {args.script or 'aucun'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Exécution d'un graphe de tâches (DAG) sur un pool de threads borné.
+
+Chaque nœud déclare les nœuds dont il dépend; il démarre dès que ceux-ci sont
+terminés, en parallèle des autres nœuds prêts. La durée totale tend ainsi vers
+celle du chemin critique au lieu de la somme des durées.
+
+Un nœud peut porter une condition (``when``), évaluée une fois ses dépendances
+terminées: si elle est fausse, le nœud est sauté et sa valeur est None (ses
+dépendants s'exécutent quand même). Un nœud qui lève une exception annule ses
+dépendants; avec ``fail_fast``, plus aucun nœud n'est démarré ensuite.
+
+Un ``listener`` optionnel est prévenu de chaque changement d'état (démarrage,
+fin, saut, annulation), ce qui permet de publier l'avancement au fil de l'eau.
+
+Des valeurs déjà calculées (points de contrôle d'une exécution précédente)
+peuvent être fournies à ``run``: les nœuds correspondants sont marqués réussis
+sans être exécutés.
+
+Chaque nœud s'exécute dans une copie du contexte (``contextvars``) du thread
+qui appelle ``run``: le contexte du travail en cours (``shared.job_context``)
+reste visible dans les phases. Une fonction ``cancelled`` optionnelle permet
+d'arrêter le graphe entre deux nœuds: les nœuds pas encore démarrés sont annulés.
+
+Variables d'environnement:
+    DAG_MAX_WORKERS: Nombre maximum de nœuds exécutés simultanément (défaut: 6)
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+DAG_MAX_WORKERS = int(os.getenv("DAG_MAX_WORKERS", "6"))
+
+# États d'un nœud
+PENDING = "pending"
+RUNNING = "running"
+SUCCESS = "success"
+FAILED = "failed"
+SKIPPED = "skipped"
+CANCELLED = "cancelled"
+
+_stats_lock = threading.Lock()
+_stats = {
+    "runs": 0,
+    "nodes_run": 0,
+    "nodes_failed": 0,
+    "nodes_restored": 0,
+    "wall_time_s": 0.0,
+    "node_time_s": 0.0,
+}
+
+
+class DagNode:
+    """Nœud du graphe: une fonction, ses dépendances et sa condition d'exécution."""
+
+    def __init__(self, name, func, deps=(), when=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.when = when
+        self.status = PENDING
+        self.value = None
+        self.error = None
+        self.start = None
+        self.end = None
+        self.restored = False
+
+
+class DagExecutor:
+    """Planifie les nœuds prêts sur un pool de threads et mesure chaque nœud."""
+
+    def __init__(self, max_workers=None, fail_fast=True, name="dag", listener=None, cancelled=None):
+        """
+        Args:
+            max_workers (int, optional): Taille du pool (défaut: DAG_MAX_WORKERS)
+            fail_fast (bool, optional): Ne plus démarrer de nœud après un échec
+            name (str, optional): Nom du graphe (journaux et noms de threads)
+            listener (callable, optional): listener(nom, état, timings, valeur) à chaque changement d'état
+            cancelled (callable, optional): cancelled() -> bool; plus aucun nœud n'est démarré dès qu'il retourne True
+        """
+        self.max_workers = max_workers or DAG_MAX_WORKERS
+        self.fail_fast = fail_fast
+        self.name = name
+        self.listener = listener
+        self.cancelled = cancelled
+        self.nodes = {}
+        self.results = {}
+        self._origin = None
+
+    def add(self, name, func, deps=(), when=None):
+        """
+        Ajoute un nœud au graphe.
+
+        Args:
+            name (str): Nom unique du nœud, clé de son résultat
+            func (callable): func(results) -> valeur; results contient les valeurs des nœuds terminés
+            deps (iterable, optional): Noms des nœuds à terminer avant celui-ci
+            when (callable, optional): when(results) -> bool; le nœud est sauté si False
+        """
+        if name in self.nodes:
+            raise ValueError(f"Nœud déjà défini: {name}")
+        self.nodes[name] = DagNode(name, func, deps, when)
+        return self
+
+    def _check(self):
+        """Vérifie que toutes les dépendances existent et que le graphe est acyclique."""
+        for node in self.nodes.values():
+            for dep in node.deps:
+                if dep not in self.nodes:
+                    raise ValueError(f"Dépendance inconnue pour {node.name}: {dep}")
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle détecté dans le graphe au nœud {name}")
+            visiting.add(name)
+            for dep in self.nodes[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.nodes:
+            visit(name)
+
+    def _run_node(self, node):
+        try:
+            node.value = node.func(self.results)
+            node.status = SUCCESS
+        except Exception as e:
+            node.error = e
+            node.status = FAILED
+            logger.error(f"{self.name}: échec du nœud {node.name}: {str(e)}")
+        finally:
+            node.end = time.perf_counter()
+        return node
+
+    def _entry(self, node, status=None):
+        """État et timings d'un nœud, relatifs au démarrage du graphe."""
+        entry = {"status": status or node.status, "deps": list(node.deps)}
+        if node.start is not None and self._origin is not None:
+            entry["start_ms"] = round((node.start - self._origin) * 1000, 1)
+            if node.end is not None:
+                entry["duration_ms"] = round((node.end - node.start) * 1000, 1)
+        if node.restored:
+            entry["restored"] = True
+        if node.error is not None:
+            entry["error"] = f"{type(node.error).__name__}: {str(node.error)[:200]}"
+        return entry
+
+    def _notify(self, node, status=None):
+        if self.listener is None:
+            return
+        try:
+            self.listener(node.name, status or node.status, self._entry(node, status), node.value)
+        except Exception as e:
+            logger.warning(f"{self.name}: erreur du listener pour {node.name}: {str(e)}")
+
+    def _ready(self, node):
+        return all(self.nodes[dep].status != PENDING for dep in node.deps)
+
+    def run(self, restored=None):
+        """
+        Exécute le graphe jusqu'au bout.
+
+        Args:
+            restored (dict, optional): Valeurs de nœuds déjà calculées (nom -> valeur);
+                ces nœuds ne sont pas exécutés
+
+        Returns:
+            tuple: (dict nom -> valeur, rapport de timings; voir ``report``)
+        """
+        self._check()
+        self._origin = time.perf_counter()
+        aborted = False
+        running = {}
+
+        for name, value in (restored or {}).items():
+            node = self.nodes.get(name)
+            if node is None:
+                continue
+            node.status = SUCCESS
+            node.value = value
+            node.restored = True
+            self.results[name] = value
+            self._notify(node)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name) as pool:
+            while True:
+                # Démarrer (ou résoudre) tous les nœuds dont les dépendances sont terminées
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for node in self.nodes.values():
+                        if node.status != PENDING or node.name in running or not self._ready(node):
+                            continue
+                        progressed = True
+                        if not aborted and self.cancelled is not None and self.cancelled():
+                            aborted = True
+                        if aborted or any(self.nodes[dep].status in (FAILED, CANCELLED) for dep in node.deps):
+                            node.status = CANCELLED
+                            self._notify(node)
+                            continue
+                        try:
+                            skip = node.when is not None and not node.when(self.results)
+                        except Exception as e:
+                            node.error = e
+                            node.status = FAILED
+                            self._notify(node)
+                            aborted = aborted or self.fail_fast
+                            continue
+                        if skip:
+                            node.status = SKIPPED
+                            self.results[node.name] = None
+                            self._notify(node)
+                            continue
+                        node.start = time.perf_counter()
+                        running[node.name] = pool.submit(contextvars.copy_context().run, self._run_node, node)
+                        self._notify(node, RUNNING)
+
+                if not running:
+                    break
+
+                finished, _ = wait(list(running.values()), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    node = future.result()
+                    del running[node.name]
+                    if node.status == SUCCESS:
+                        self.results[node.name] = node.value
+                    elif self.fail_fast:
+                        aborted = True
+                    self._notify(node)
+
+        report = self.report()
+        with _stats_lock:
+            _stats["runs"] += 1
+            _stats["nodes_run"] += sum(1 for n in self.nodes.values()
+                                       if n.status in (SUCCESS, FAILED) and not n.restored)
+            _stats["nodes_failed"] += sum(1 for n in self.nodes.values() if n.status == FAILED)
+            _stats["nodes_restored"] += sum(1 for n in self.nodes.values() if n.restored)
+            _stats["wall_time_s"] += report["wall_ms"] / 1000
+            _stats["node_time_s"] += report["sum_ms"] / 1000
+        return self.results, report
+
+    def errors(self):
+        """Retourne les exceptions levées, par nom de nœud."""
+        return {name: node.error for name, node in self.nodes.items() if node.status == FAILED}
+
+    def report(self):
+        """
+        Rapport d'exécution: état et timings de chaque nœud, chemin critique.
+
+        Returns:
+            dict: {"nodes": {nom: {...}}, "wall_ms", "sum_ms", "critical_path", "critical_path_ms"}
+        """
+        origin = self._origin
+        nodes = {}
+        last_end = origin
+        for name, node in self.nodes.items():
+            nodes[name] = self._entry(node)
+            if node.end is not None:
+                last_end = max(last_end, node.end)
+
+        # Chemin critique: plus longue chaîne de durées le long des dépendances
+        longest = {}
+
+        def chain(name):
+            if name not in longest:
+                node = self.nodes[name]
+                duration = nodes[name].get("duration_ms", 0.0)
+                best = max((chain(dep) for dep in node.deps), key=lambda c: c[0], default=(0.0, []))
+                longest[name] = (best[0] + duration, best[1] + [name])
+            return longest[name]
+
+        critical = max((chain(name) for name in self.nodes), key=lambda c: c[0], default=(0.0, []))
+        return {
+            "nodes": nodes,
+            "wall_ms": round(((last_end or 0) - (origin or 0)) * 1000, 1),
+            "sum_ms": round(sum(entry.get("duration_ms", 0.0) for entry in nodes.values()), 1),
+            "critical_path": [name for name in critical[1] if nodes[name].get("duration_ms") is not None],
+            "critical_path_ms": round(critical[0], 1),
+        }
+
+
+def get_dag_stats():
+    """
+    Retourne les compteurs cumulés des exécutions de graphes.
+
+    Returns:
+        dict: Exécutions, nœuds exécutés, temps mur et somme des temps des nœuds
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["max_workers"] = DAG_MAX_WORKERS
+    stats["wall_time_s"] = round(stats["wall_time_s"], 3)
+    stats["node_time_s"] = round(stats["node_time_s"], 3)
+    return stats
+
+
+register_stats_provider("dag", get_dag_stats)
@@ -0,0 +1,312 @@
+"""
+Émission non bloquante des événements Socket.IO, avec regroupement des journaux.
+
+Le ``safe_emit`` de chaque agent appelait ``time.sleep(0.01)`` après chaque
+``socketio.emit`` et, en cas d'erreur, attendait 0,5 s avant de réessayer, dans
+le thread de l'appelant: les centaines d'événements de journal d'un projet
+ajoutaient des secondes d'attente pure au chemin critique. Ici, ``emit`` ne fait
+que déposer l'événement dans une file bornée; un thread d'émission la vide:
+
+- les événements ``log`` consécutifs destinés aux mêmes clients partent en une
+  seule trame ``log_batch`` (liste d'événements ``log``);
+- un événement d'état (``*_update``) encore en file est remplacé par le plus
+  récent au lieu d'être envoyé deux fois;
+- quand la file est pleine, les journaux de faible priorité (info, debug) sont
+  abandonnés en premier; les erreurs et les autres événements sont conservés;
+- l'écriture des journaux dans le fichier de log se fait dans ce thread;
+- une émission en échec est retentée une fois, à la trame suivante.
+
+Variables d'environnement:
+    EMIT_QUEUE_SIZE: Événements en attente au-delà desquels les journaux de faible priorité sont abandonnés (défaut: 1000)
+    EMIT_INTERVAL: Délai maximum avant l'envoi d'un événement, en secondes (défaut: 0.05)
+    EMIT_MAX_BATCH: Événements log au maximum par trame log_batch (défaut: 100)
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv("EMIT_QUEUE_SIZE", "1000"))
+INTERVAL = float(os.getenv("EMIT_INTERVAL", "0.05"))
+MAX_BATCH = int(os.getenv("EMIT_MAX_BATCH", "100"))
+
+LOG_EVENT = 'log'
+BATCH_EVENT = 'log_batch'
+
+# Journaux abandonnés en premier quand la file est pleine
+LOW_PRIORITY_LOG_TYPES = ('info', 'debug')
+
+
+class _Pending:
+    __slots__ = ("event", "data", "to", "attempts")
+
+    def __init__(self, event, data, to):
+        self.event = event
+        self.data = data
+        self.to = to
+        self.attempts = 0
+
+    @property
+    def low_priority(self):
+        return (self.event == LOG_EVENT and isinstance(self.data, dict)
+                and self.data.get('type', 'info') in LOW_PRIORITY_LOG_TYPES)
+
+    @property
+    def mergeable(self):
+        return self.event.endswith('_update')
+
+
+class EventEmitter:
+    """File d'événements Socket.IO vidée par un thread d'émission."""
+
+    def __init__(self, socketio, event_logger=None, queue_size=QUEUE_SIZE, interval=INTERVAL, max_batch=MAX_BATCH):
+        """
+        Args:
+            socketio (SocketIO): Instance Socket.IO de l'agent
+            event_logger (logging.Logger, optional): Journal où écrire les événements log (défaut: aucun)
+            queue_size (int, optional): Taille de la file au-delà de laquelle les journaux de faible priorité sont abandonnés
+            interval (float, optional): Délai maximum avant l'envoi d'un événement, en secondes
+            max_batch (int, optional): Événements log au maximum par trame
+        """
+        self.socketio = socketio
+        self.event_logger = event_logger
+        self.queue_size = queue_size
+        self.interval = interval
+        self.max_batch = max_batch
+        self._queue = deque()
+        self._dropped = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._started = False
+        self._stats = {
+            "queued": 0,
+            "emitted": 0,
+            "frames": 0,
+            "batched_logs": 0,
+            "merged": 0,
+            "dropped": 0,
+            "retries": 0,
+            "errors": 0,
+            "max_depth": 0,
+            "enqueue_time_s": 0.0,
+        }
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.socketio.start_background_task(self._run)
+        atexit.register(self.flush, 2.0)
+
+    def emit(self, event, data=None, to=None):
+        """
+        Met un événement en file et retourne aussitôt.
+
+        Args:
+            event (str): Nom de l'événement
+            data (optional): Données de l'événement
+            to (str, optional): Salle ou client destinataire (défaut: tous les clients)
+        """
+        start = time.perf_counter()
+        if not self._started:
+            self._start()
+        item = _Pending(event, data, to)
+        with self._lock:
+            self._stats["queued"] += 1
+            if item.mergeable and self._merge(item):
+                self._stats["merged"] += 1
+            elif len(self._queue) >= self.queue_size and not self._make_room(item):
+                self._drop(item)
+            else:
+                self._queue.append(item)
+                self._stats["max_depth"] = max(self._stats["max_depth"], len(self._queue))
+            self._idle.clear()
+            depth = len(self._queue)
+            self._stats["enqueue_time_s"] += time.perf_counter() - start
+        # Les journaux attendent la trame suivante; les autres événements partent tout de suite
+        if event != LOG_EVENT or depth >= self.max_batch:
+            self._wake.set()
+
+    def _merge(self, item):
+        """Remplace un événement d'état identique encore en file (appelé sous verrou)."""
+        for index in range(len(self._queue) - 1, -1, -1):
+            queued = self._queue[index]
+            if queued.event == item.event and queued.to == item.to:
+                self._queue[index] = item
+                return True
+        return False
+
+    def _make_room(self, item):
+        """
+        File pleine: abandonne le plus ancien journal de faible priorité (appelé sous verrou).
+
+        Returns:
+            bool: False si l'événement lui-même doit être abandonné
+        """
+        for index, queued in enumerate(self._queue):
+            if queued.low_priority:
+                del self._queue[index]
+                self._drop(queued)
+                return True
+        # Aucun journal à sacrifier: un événement important dépasse la taille de la file
+        return not item.low_priority
+
+    def _drop(self, item):
+        """Événement non envoyé: il reste écrit dans le fichier de log (appelé sous verrou)."""
+        self._stats["dropped"] += 1
+        self._dropped.append(item)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self._drain()
+            except Exception as e:
+                logger.error(f"Erreur du thread d'émission: {str(e)}")
+
+    def _drain(self):
+        with self._lock:
+            items = list(self._queue)
+            self._queue.clear()
+            dropped, self._dropped = self._dropped, []
+        if dropped:
+            # Journaux abandonnés: écrits dans le fichier, et signalés aux clients concernés
+            counts = {}
+            for item in dropped:
+                self._log(item)
+                counts[item.to] = counts.get(item.to, 0) + 1
+            notices = [_Pending(LOG_EVENT, {'type': 'warning', 'message': f"{count} message(s) de journal non "
+                                            f"affiché(s): file d'émission saturée"}, to)
+                       for to, count in counts.items()]
+            items = notices + items
+        if not items:
+            self._idle.set()
+            return
+
+        failed = []
+        index = 0
+        while index < len(items):
+            item = items[index]
+            if item.event != LOG_EVENT:
+                self._send(item.event, item.data, item.to, [item], failed)
+                index += 1
+                continue
+            # Journaux consécutifs vers les mêmes clients: une seule trame
+            batch = [item]
+            index += 1
+            while (index < len(items) and len(batch) < self.max_batch
+                   and items[index].event == LOG_EVENT and items[index].to == item.to):
+                batch.append(items[index])
+                index += 1
+            if len(batch) == 1:
+                self._send(LOG_EVENT, item.data, item.to, batch, failed)
+            else:
+                self._send(BATCH_EVENT, [queued.data for queued in batch], item.to, batch, failed)
+                with self._lock:
+                    self._stats["batched_logs"] += len(batch)
+
+        with self._lock:
+            # Les émissions en échec repartent en tête de file, dans l'ordre
+            self._queue.extendleft(reversed(failed))
+            if not self._queue:
+                self._idle.set()
+
+    def _send(self, event, data, to, items, failed):
+        for item in items:
+            item.attempts += 1
+            if item.attempts == 1:
+                self._log(item)
+        try:
+            self.socketio.emit(event, data, to=to)
+        except Exception as e:
+            retry = [item for item in items if item.attempts < 2]
+            with self._lock:
+                self._stats["errors"] += 1
+                self._stats["retries"] += len(retry)
+            logger.error(f"Erreur lors de l'émission de l'événement {event}: {str(e)}")
+            failed.extend(retry)
+            return
+        with self._lock:
+            self._stats["frames"] += 1
+            self._stats["emitted"] += len(items)
+
+    def _log(self, item):
+        """Écrit un événement dans le journal de l'agent (thread d'émission)."""
+        if self.event_logger is None:
+            return
+        data = item.data
+        if item.event == LOG_EVENT and isinstance(data, dict) and 'type' in data and 'message' in data:
+            log_type = data['type']
+            message = data['message']
+            if log_type == 'error':
+                self.event_logger.error(message)
+            elif log_type == 'warning':
+                self.event_logger.warning(message)
+            elif log_type == 'success':
+                self.event_logger.info(f"SUCCESS: {message}")
+            else:
+                self.event_logger.info(message)
+        elif data is not None:
+            self.event_logger.debug(f"Event émis: {item.event}, data: {str(data)[:200]}...")
+        else:
+            self.event_logger.debug(f"Event émis: {item.event}, data: None")
+
+    def flush(self, timeout=5.0):
+        """
+        Attend que la file soit vide (arrêt de l'agent, tests).
+
+        Returns:
+            bool: True si tout a été émis avant le délai
+        """
+        if not self._started:
+            return True
+        self._wake.set()
+        return self._idle.wait(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["depth"] = len(self._queue)
+        stats["enqueue_us_avg"] = round(stats.pop("enqueue_time_s") / stats["queued"] * 1e6, 2) if stats["queued"] else 0.0
+        return stats
+
+
+_emitter = None
+_emitter_lock = threading.Lock()
+
+
+def get_event_emitter(socketio, event_logger=None):
+    """
+    Retourne l'émetteur du processus, en le créant au besoin.
+
+    Args:
+        socketio (SocketIO): Instance Socket.IO de l'agent
+        event_logger (logging.Logger, optional): Journal où écrire les événements log
+
+    Returns:
+        EventEmitter: Émetteur partagé du processus
+    """
+    global _emitter
+    if _emitter is None:
+        with _emitter_lock:
+            if _emitter is None:
+                _emitter = EventEmitter(socketio, event_logger)
+    return _emitter
+
+
+def _emitter_stats():
+    return _emitter.stats() if _emitter is not None else {"queued": 0}
+
+
+register_stats_provider("emitter", _emitter_stats)
@@ -0,0 +1,143 @@
+"""
+Histogramme de latences à précision relative constante (style HDR).
+
+Les valeurs entières (millisecondes, microsecondes...) sont rangées dans des
+intervalles dont la largeur croît avec la valeur: avec ``significant_bits=7``,
+l'erreur relative sur un percentile reste inférieure à 1 %, de la milliseconde
+à plusieurs heures, pour quelques centaines d'intervalles au plus.
+
+Le stockage est creux (dict intervalle -> nombre), ce qui rend l'histogramme
+facile à sérialiser en JSON et à fusionner entre processus ou machines.
+"""
+
+import math
+
+
+class Histogram:
+    """Histogramme HDR simplifié, fusionnable et sérialisable."""
+
+    def __init__(self, significant_bits=7):
+        self.significant_bits = significant_bits
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        """Borne inférieure de l'intervalle contenant la valeur."""
+        if value <= 0:
+            return 0
+        shift = max(value.bit_length() - self.significant_bits, 0)
+        return (value >> shift) << shift
+
+    def _bucket_width(self, bucket):
+        if bucket <= 0:
+            return 1
+        return 1 << max(bucket.bit_length() - self.significant_bits, 0)
+
+    def record(self, value, count=1):
+        """
+        Enregistre une valeur.
+
+        Args:
+            value (int | float): Valeur positive (arrondie à l'entier)
+            count (int, optional): Nombre d'occurrences
+        """
+        value = max(int(round(value)), 0)
+        bucket = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """
+        Ajoute le contenu d'un autre histogramme (même précision) à celui-ci.
+
+        Args:
+            other (Histogram): Histogramme à fusionner
+        """
+        if other.significant_bits != self.significant_bits:
+            raise ValueError("Impossible de fusionner des histogrammes de précisions différentes")
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def percentile(self, percent):
+        """
+        Retourne la valeur au percentile demandé.
+
+        Args:
+            percent (float): Percentile entre 0 et 100
+
+        Returns:
+            int: Valeur estimée (milieu de l'intervalle), 0 si l'histogramme est vide
+        """
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(self.total * percent / 100.0))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                value = bucket + (self._bucket_width(bucket) - 1) // 2
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.total if self.total else 0.0
+
+    def count_at_or_below(self, value):
+        """Nombre de valeurs inférieures ou égales à ``value`` (à la précision près)."""
+        return sum(count for bucket, count in self.counts.items() if bucket <= value)
+
+    def summary(self, percentiles=(50, 90, 95, 99, 99.9)):
+        """
+        Résumé lisible: nombre, min, moyenne, max et percentiles.
+
+        Returns:
+            dict: Statistiques de l'histogramme
+        """
+        summary = {
+            "count": self.total,
+            "min": self.min or 0,
+            "mean": round(self.mean, 2),
+            "max": self.max or 0,
+        }
+        for percent in percentiles:
+            summary[f"p{percent:g}"] = self.percentile(percent)
+        return summary
+
+    def to_dict(self):
+        """Représentation JSON de l'histogramme."""
+        return {
+            "significant_bits": self.significant_bits,
+            "counts": {str(bucket): count for bucket, count in self.counts.items()},
+            "total": self.total,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Reconstruit un histogramme depuis ``to_dict``."""
+        histogram = cls(significant_bits=data.get("significant_bits", 7))
+        histogram.counts = {int(bucket): count for bucket, count in data.get("counts", {}).items()}
+        histogram.total = data.get("total", sum(histogram.counts.values()))
+        histogram.sum = data.get("sum", 0)
+        histogram.min = data.get("min")
+        histogram.max = data.get("max")
+        return histogram
+
+    def copy(self):
+        return Histogram(self.significant_bits).merge(self)
@@ -0,0 +1,209 @@
+"""
+Contexte d'exécution d'un travail: identifiant, salle Socket.IO, annulation et confirmation.
+
+Le ChefProjet n'avait qu'un ``user_action_event`` global et diffusait chaque
+événement Socket.IO à tous les clients: deux projets simultanés se réveillaient
+l'un l'autre et mélangeaient leurs journaux. Chaque travail a ici son propre
+``JobContext``:
+
+- une salle Socket.IO (``job:<id>``) à laquelle les clients du projet
+  s'abonnent; les événements émis pendant le travail n'y sont envoyés qu'à eux;
+- un jeton d'annulation, consulté entre les phases (``check``);
+- son propre événement d'attente de confirmation (``wait_for_action``).
+
+Le contexte courant est porté par une ``contextvars.ContextVar``: il suit
+l'exécution dans le thread du travail et dans les threads des phases
+(``shared.dag`` copie le contexte à chaque nœud), sans être passé en argument
+à chaque fonction.
+
+Variables d'environnement:
+    JOB_ACTION_TIMEOUT: Attente maximum d'une confirmation utilisateur, en secondes (défaut: 3600)
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+ACTION_TIMEOUT = float(os.getenv("JOB_ACTION_TIMEOUT", "3600"))
+
+ROOM_PREFIX = "job:"
+
+_current = contextvars.ContextVar("job_context", default=None)
+_active = {}
+_lock = threading.Lock()
+_stats = {"started": 0, "cancelled": 0, "action_waits": 0, "action_timeouts": 0}
+
+
+class JobCancelledError(Exception):
+    """Le travail a été annulé pendant son exécution."""
+
+
+class JobContext:
+    """État propre à un travail en cours: salle Socket.IO, annulation et attente de confirmation."""
+
+    def __init__(self, job_id=None, room=None):
+        """
+        Args:
+            job_id (str, optional): Identifiant du travail (sinon un UUID)
+            room (str, optional): Salle Socket.IO des événements du travail (défaut: "job:<id>")
+        """
+        self.job_id = job_id or uuid.uuid4().hex
+        self.room = room or room_for(self.job_id)
+        self.created_at = time.time()
+        self.waiting = False
+        self._cancelled = threading.Event()
+        self._action = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Demande l'annulation du travail et réveille une attente de confirmation en cours."""
+        if not self._cancelled.is_set():
+            with _lock:
+                _stats["cancelled"] += 1
+            logger.info(f"Travail {self.job_id}: annulation demandée")
+        self._cancelled.set()
+        self._action.set()
+
+    def check(self):
+        """
+        Raises:
+            JobCancelledError: Si l'annulation du travail a été demandée
+        """
+        if self._cancelled.is_set():
+            raise JobCancelledError(f"Travail {self.job_id} annulé")
+
+    def wait_for_action(self, prompt=None, timeout=ACTION_TIMEOUT):
+        """
+        Attend la confirmation de l'utilisateur pour ce travail.
+
+        Args:
+            prompt (callable, optional): Appelé une fois prêt à recevoir la confirmation
+                (ex: émission de l'événement qui la demande à l'interface)
+            timeout (float, optional): Attente maximum, en secondes
+
+        Returns:
+            bool: True si l'utilisateur a confirmé, False si le délai a expiré
+
+        Raises:
+            JobCancelledError: Si le travail est annulé pendant l'attente
+        """
+        self.check()
+        self._action.clear()
+        self.waiting = True
+        with _lock:
+            _stats["action_waits"] += 1
+        try:
+            if prompt is not None:
+                prompt()
+            confirmed = self._action.wait(timeout)
+        finally:
+            self.waiting = False
+        self.check()
+        if not confirmed:
+            with _lock:
+                _stats["action_timeouts"] += 1
+        return confirmed
+
+    def action_done(self):
+        """Confirmation de l'utilisateur: réveille l'attente de ce travail uniquement."""
+        self._action.set()
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "room": self.room,
+            "cancelled": self.cancelled,
+            "waiting": self.waiting,
+            "age_s": round(time.time() - self.created_at, 1),
+        }
+
+
+def room_for(job_id):
+    """Salle Socket.IO des événements d'un travail."""
+    return f"{ROOM_PREFIX}{job_id}"
+
+
+def current_job_context():
+    """
+    Retourne le contexte du travail en cours d'exécution.
+
+    Returns:
+        JobContext: Contexte courant, ou None hors d'un travail
+    """
+    return _current.get()
+
+
+@contextmanager
+def job_context(context):
+    """
+    Exécute un bloc dans le contexte d'un travail.
+
+    Le contexte est retrouvable par identifiant (``get_job_context``) tant que
+    le bloc s'exécute, pour l'annulation et les confirmations.
+
+    Args:
+        context (JobContext): Contexte du travail
+
+    Yields:
+        JobContext: Le contexte activé
+    """
+    token = _current.set(context)
+    with _lock:
+        _active[context.job_id] = context
+        _stats["started"] += 1
+    try:
+        yield context
+    finally:
+        with _lock:
+            if _active.get(context.job_id) is context:
+                del _active[context.job_id]
+        _current.reset(token)
+
+
+def get_job_context(job_id):
+    """Contexte d'un travail en cours d'exécution, ou None."""
+    with _lock:
+        return _active.get(job_id)
+
+
+def find_job_contexts(rooms):
+    """
+    Contextes des travaux en cours dont la salle fait partie de ``rooms``.
+
+    Args:
+        rooms (iterable): Salles Socket.IO d'un client
+
+    Returns:
+        list: Contextes correspondants
+    """
+    rooms = set(rooms)
+    with _lock:
+        return [context for context in _active.values() if context.room in rooms]
+
+
+def get_job_context_stats():
+    """
+    Returns:
+        dict: Travaux en cours, annulations, attentes de confirmation et détail par travail
+    """
+    with _lock:
+        stats = dict(_stats)
+        contexts = list(_active.values())
+    stats["active"] = len(contexts)
+    stats["waiting"] = sum(1 for context in contexts if context.waiting)
+    stats["jobs"] = [context.to_dict() for context in contexts]
+    return stats
+
+
+register_stats_provider("job_contexts", get_job_context_stats)
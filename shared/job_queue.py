@@ -0,0 +1,610 @@
+"""
+File de travaux persistante (SQLite WAL), avec baux, reprises et points de contrôle.
+
+L'interface d'administration conservait les demandes en cours dans
+``pending_tasks.json``, relu et réécrit en entier à chaque sauvegarde, et la
+reprise visait une route ``/resume_tasks`` inexistante. Ici, chaque travail est
+une ligne de la table ``jobs``:
+
+- ``queued``: en attente d'un worker (``available_at`` repousse les nouvelles tentatives);
+- ``running``: réservé par un worker pour la durée d'un bail, renouvelé tant que
+  le travail avance. Un bail expiré (processus arrêté ou bloqué) remet le
+  travail en file, dans la limite de ``max_attempts`` tentatives;
+- ``succeeded`` / ``failed``: terminé, avec le résultat ou la dernière erreur;
+- ``interrupted``: importé de l'ancien ``pending_tasks.json``, repris sur demande;
+- ``cancelled``: abandonné depuis l'interface d'administration.
+
+Chaque phase terminée d'un travail est enregistrée dans ``job_checkpoints``: un
+travail repris ou relancé après un échec repart de ces résultats au lieu de
+refaire tous les appels LLM.
+
+``JobWorkerPool`` consomme la file avec un nombre fixe de threads.
+
+Variables d'environnement:
+    JOB_QUEUE_PATH: Fichier SQLite (défaut: <racine>/cache/job_queue.sqlite3)
+    JOB_QUEUE_LEASE: Durée d'un bail en secondes, renouvelé au tiers de sa durée (défaut: 60)
+    JOB_QUEUE_MAX_ATTEMPTS: Nombre maximum de tentatives par travail (défaut: 3)
+    JOB_QUEUE_RETRY_DELAY: Délai avant une nouvelle tentative, doublé à chaque échec (défaut: 10)
+    JOB_QUEUE_WORKERS: Nombre de workers par processus consommateur (défaut: 4)
+    JOB_QUEUE_POLL_INTERVAL: Intervalle d'interrogation de la file vide, en secondes (défaut: 1)
+    JOB_QUEUE_RETENTION: Conservation des travaux terminés, en secondes (défaut: 604800)
+"""
+
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(ROOT_DIR, "cache", "job_queue.sqlite3"))
+LEASE_DURATION = float(os.getenv("JOB_QUEUE_LEASE", "60"))
+MAX_ATTEMPTS = int(os.getenv("JOB_QUEUE_MAX_ATTEMPTS", "3"))
+RETRY_DELAY = float(os.getenv("JOB_QUEUE_RETRY_DELAY", "10"))
+WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "4"))
+POLL_INTERVAL = float(os.getenv("JOB_QUEUE_POLL_INTERVAL", "1"))
+RETENTION = float(os.getenv("JOB_QUEUE_RETENTION", "604800"))
+
+HOSTNAME = socket.gethostname()
+
+# États d'un travail dans la file
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+# Travaux présentés comme « en attente » par l'interface d'administration
+PENDING_STATES = (QUEUED, RUNNING, FAILED, INTERRUPTED)
+RESUMABLE_STATES = (FAILED, INTERRUPTED, CANCELLED)
+
+_COLUMNS = ("id", "kind", "payload", "state", "attempts", "max_attempts", "lease_owner", "lease_expires_at",
+            "available_at", "created_at", "started_at", "finished_at", "error", "result")
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _loads(text):
+    return json.loads(text) if text is not None else None
+
+
+class JobQueue:
+    """File de travaux partagée entre processus, stockée dans une base SQLite."""
+
+    def __init__(self, path=JOB_QUEUE_PATH, lease_duration=LEASE_DURATION, max_attempts=MAX_ATTEMPTS,
+                 retry_delay=RETRY_DELAY, retention=RETENTION):
+        self.path = path
+        self.lease_duration = lease_duration
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retention = retention
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "claimed": 0,
+            "succeeded": 0,
+            "retried": 0,
+            "failed": 0,
+            "expired_leases": 0,
+            "lost_leases": 0,
+            "checkpoints_saved": 0,
+            "checkpoints_loaded": 0,
+            "errors": 0,
+        }
+
+    def _connection(self):
+        """Retourne la connexion SQLite du thread courant (une connexion par thread)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    available_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    error TEXT,
+                    result TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, available_at)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_checkpoints (
+                    job_id TEXT NOT NULL,
+                    phase TEXT NOT NULL,
+                    value TEXT,
+                    saved_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, phase)
+                )
+                """
+            )
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, operation, default=None):
+        """Exécute une opération dans une transaction exclusive; une erreur SQLite retourne default."""
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = operation(conn, time.time())
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        except (sqlite3.Error, OSError) as e:
+            self._count("errors")
+            logger.warning(f"File de travaux: erreur SQLite ({self.path}): {str(e)}")
+            return default
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    @staticmethod
+    def _row_to_job(row):
+        job = dict(zip(_COLUMNS, row))
+        job["payload"] = _loads(job["payload"])
+        job["result"] = _loads(job["result"])
+        return job
+
+    # ------------------------------------------------------------------
+    # Producteurs
+    # ------------------------------------------------------------------
+
+    def enqueue(self, kind, payload, job_id=None, max_attempts=None, state=QUEUED, created_at=None):
+        """
+        Ajoute un travail à la file.
+
+        Args:
+            kind (str): Type de travail (ex: "project"), filtre des workers
+            payload (dict): Données de la demande (sérialisables en JSON)
+            job_id (str, optional): Identifiant imposé (sinon un UUID)
+            max_attempts (int, optional): Nombre maximum de tentatives (défaut: JOB_QUEUE_MAX_ATTEMPTS)
+            state (str, optional): État initial (QUEUED, ou INTERRUPTED pour une reprise manuelle)
+            created_at (float, optional): Horodatage de création, conservé lors d'un import
+
+        Returns:
+            str: Identifiant du travail, ou None si la base est inaccessible
+        """
+        job_id = job_id or uuid.uuid4().hex
+
+        def operation(conn, now):
+            # Élagage des travaux terminés trop anciens
+            expired = now - self.retention
+            conn.execute(
+                "DELETE FROM job_checkpoints WHERE job_id IN "
+                "(SELECT id FROM jobs WHERE state IN (?, ?, ?) AND finished_at < ?)",
+                (*FINISHED_STATES, expired),
+            )
+            conn.execute("DELETE FROM jobs WHERE state IN (?, ?, ?) AND finished_at < ?", (*FINISHED_STATES, expired))
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, state, max_attempts, available_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, _dumps(payload), state, max_attempts or self.max_attempts, now, created_at or now),
+            )
+            return job_id
+
+        result = self._transaction(operation)
+        if result is not None:
+            self._count("enqueued")
+        return result
+
+    def resume(self, job_ids=None):
+        """
+        Remet en file des travaux échoués, interrompus ou annulés, avec un nouveau crédit de tentatives.
+
+        Les points de contrôle sont conservés: les phases déjà terminées ne seront pas refaites.
+
+        Args:
+            job_ids (list, optional): Travaux à reprendre (défaut: tous les travaux reprenables)
+
+        Returns:
+            list: Identifiants des travaux remis en file
+        """
+        def operation(conn, now):
+            placeholders = ", ".join("?" for _ in RESUMABLE_STATES)
+            rows = conn.execute(f"SELECT id FROM jobs WHERE state IN ({placeholders})", RESUMABLE_STATES).fetchall()
+            ids = [row[0] for row in rows if job_ids is None or row[0] in job_ids]
+            conn.executemany(
+                "UPDATE jobs SET state = ?, attempts = 0, available_at = ?, error = NULL, finished_at = NULL, "
+                "lease_owner = NULL, lease_expires_at = NULL WHERE id = ?",
+                [(QUEUED, now, job_id) for job_id in ids],
+            )
+            return ids
+        return self._transaction(operation, default=[])
+
+    def cancel(self, job_ids=None):
+        """
+        Annule des travaux non terminés.
+
+        Un travail en cours d'exécution va jusqu'au bout de sa phase, mais son
+        résultat n'est plus enregistré.
+
+        Args:
+            job_ids (list, optional): Travaux à annuler (défaut: tous les travaux en attente)
+
+        Returns:
+            list: Identifiants des travaux annulés
+        """
+        def operation(conn, now):
+            placeholders = ", ".join("?" for _ in PENDING_STATES)
+            rows = conn.execute(f"SELECT id FROM jobs WHERE state IN ({placeholders})", PENDING_STATES).fetchall()
+            ids = [row[0] for row in rows if job_ids is None or row[0] in job_ids]
+            conn.executemany(
+                "UPDATE jobs SET state = ?, finished_at = ?, lease_owner = NULL, lease_expires_at = NULL WHERE id = ?",
+                [(CANCELLED, now, job_id) for job_id in ids],
+            )
+            return ids
+        return self._transaction(operation, default=[])
+
+    # ------------------------------------------------------------------
+    # Consommateurs
+    # ------------------------------------------------------------------
+
+    def claim(self, kinds, owner):
+        """
+        Réserve le prochain travail disponible pour la durée d'un bail.
+
+        Les baux expirés sont d'abord libérés: le travail repart en file, ou
+        échoue s'il a épuisé ses tentatives.
+
+        Args:
+            kinds (iterable): Types de travaux acceptés
+            owner (str): Identifiant du worker
+
+        Returns:
+            dict: Travail réservé (payload décodé, attempts incrémenté), ou None
+        """
+        kinds = tuple(kinds)
+
+        def operation(conn, now):
+            expired = conn.execute(
+                "SELECT id, attempts, max_attempts FROM jobs WHERE state = ? AND lease_expires_at < ?",
+                (RUNNING, now),
+            ).fetchall()
+            for job_id, attempts, max_attempts in expired:
+                logger.warning(f"File de travaux: bail expiré pour le travail {job_id} (tentative {attempts})")
+                self._count("expired_leases")
+                if attempts >= max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET state = ?, finished_at = ?, error = ?, lease_owner = NULL WHERE id = ?",
+                        (FAILED, now, "Bail expiré: worker arrêté ou bloqué", job_id),
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET state = ?, available_at = ?, lease_owner = NULL WHERE id = ?",
+                        (QUEUED, now, job_id),
+                    )
+
+            placeholders = ", ".join("?" for _ in kinds)
+            row = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE state = ? AND available_at <= ? "
+                f"AND kind IN ({placeholders}) ORDER BY available_at, created_at LIMIT 1",
+                (QUEUED, now, *kinds),
+            ).fetchone()
+            if row is None:
+                return None
+            job = self._row_to_job(row)
+            job.update(state=RUNNING, attempts=job["attempts"] + 1, lease_owner=owner,
+                       lease_expires_at=now + self.lease_duration, started_at=now)
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = ?, lease_owner = ?, lease_expires_at = ?, started_at = ? "
+                "WHERE id = ?",
+                (RUNNING, job["attempts"], owner, job["lease_expires_at"], now, job["id"]),
+            )
+            return job
+
+        job = self._transaction(operation)
+        if job is not None:
+            self._count("claimed")
+        return job
+
+    def heartbeat(self, job_id, owner):
+        """
+        Renouvelle le bail d'un travail en cours.
+
+        Returns:
+            bool: False si le bail a été perdu (expiré et repris, ou travail annulé)
+        """
+        def operation(conn, now):
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+                (now + self.lease_duration, job_id, RUNNING, owner),
+            )
+            return cursor.rowcount == 1
+        alive = self._transaction(operation, default=True)
+        if not alive:
+            self._count("lost_leases")
+        return alive
+
+    def complete(self, job_id, owner, result=None):
+        """Marque un travail réservé comme réussi et enregistre son résultat."""
+        def operation(conn, now):
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, result = ?, error = NULL, lease_owner = NULL, "
+                "lease_expires_at = NULL WHERE id = ? AND state = ? AND lease_owner = ?",
+                (SUCCEEDED, now, _dumps(result), job_id, RUNNING, owner),
+            )
+            return cursor.rowcount == 1
+        if self._transaction(operation, default=False):
+            self._count("succeeded")
+
+    def fail(self, job_id, owner, error):
+        """
+        Enregistre l'échec d'une tentative.
+
+        Le travail repart en file après un délai croissant (avec gigue), ou
+        échoue définitivement s'il a épuisé ses tentatives.
+
+        Returns:
+            str: Nouvel état du travail (QUEUED ou FAILED), ou None si le bail était perdu
+        """
+        def operation(conn, now):
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND state = ? AND lease_owner = ?",
+                (job_id, RUNNING, owner),
+            ).fetchone()
+            if row is None:
+                return None
+            attempts, max_attempts = row
+            if attempts >= max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET state = ?, finished_at = ?, error = ?, lease_owner = NULL, "
+                    "lease_expires_at = NULL WHERE id = ?",
+                    (FAILED, now, error, job_id),
+                )
+                return FAILED
+            delay = self.retry_delay * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            conn.execute(
+                "UPDATE jobs SET state = ?, available_at = ?, error = ?, lease_owner = NULL, "
+                "lease_expires_at = NULL WHERE id = ?",
+                (QUEUED, now + delay, error, job_id),
+            )
+            return QUEUED
+
+        state = self._transaction(operation)
+        if state == FAILED:
+            self._count("failed")
+        elif state == QUEUED:
+            self._count("retried")
+        return state
+
+    # ------------------------------------------------------------------
+    # Points de contrôle par phase
+    # ------------------------------------------------------------------
+
+    def save_checkpoint(self, job_id, phase, value):
+        """Enregistre le résultat d'une phase terminée (sérialisable en JSON)."""
+        def operation(conn, now):
+            conn.execute(
+                "INSERT OR REPLACE INTO job_checkpoints (job_id, phase, value, saved_at) VALUES (?, ?, ?, ?)",
+                (job_id, phase, _dumps(value), now),
+            )
+            return True
+        if self._transaction(operation, default=False):
+            self._count("checkpoints_saved")
+
+    def checkpoints(self, job_id):
+        """
+        Retourne les résultats des phases déjà terminées d'un travail.
+
+        Returns:
+            dict: Nom de phase -> résultat
+        """
+        def operation(conn, now):
+            rows = conn.execute("SELECT phase, value FROM job_checkpoints WHERE job_id = ?", (job_id,)).fetchall()
+            return {phase: _loads(value) for phase, value in rows}
+        restored = self._transaction(operation, default={})
+        self._count("checkpoints_loaded", len(restored))
+        return restored
+
+    # ------------------------------------------------------------------
+    # Consultation
+    # ------------------------------------------------------------------
+
+    def get(self, job_id):
+        """
+        Retourne un travail et la liste de ses phases enregistrées.
+
+        Returns:
+            dict: Colonnes du travail et "checkpoints" (noms de phases), ou None s'il est inconnu
+        """
+        def operation(conn, now):
+            row = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = self._row_to_job(row)
+            phases = conn.execute(
+                "SELECT phase FROM job_checkpoints WHERE job_id = ? ORDER BY saved_at", (job_id,)
+            ).fetchall()
+            job["checkpoints"] = [phase for (phase,) in phases]
+            return job
+        return self._transaction(operation)
+
+    def list(self, states=None, limit=100):
+        """
+        Liste les travaux, du plus récent au plus ancien, sans leurs résultats.
+
+        Args:
+            states (iterable, optional): États retenus (défaut: tous)
+            limit (int, optional): Nombre maximum de travaux
+
+        Returns:
+            list: Travaux (dict), avec "checkpoints" le nombre de phases enregistrées
+        """
+        states = tuple(states or ())
+
+        def operation(conn, now):
+            columns = ", ".join(f"j.{column}" for column in _COLUMNS if column != "result")
+            where = f"WHERE j.state IN ({', '.join('?' for _ in states)})" if states else ""
+            rows = conn.execute(
+                f"SELECT {columns}, (SELECT COUNT(*) FROM job_checkpoints c WHERE c.job_id = j.id) "
+                f"FROM jobs j {where} ORDER BY j.created_at DESC LIMIT ?",
+                (*states, limit),
+            ).fetchall()
+            jobs = []
+            for row in rows:
+                job = dict(zip([column for column in _COLUMNS if column != "result"], row[:-1]))
+                job["payload"] = _loads(job["payload"])
+                job["checkpoints"] = row[-1]
+                jobs.append(job)
+            return jobs
+        return self._transaction(operation, default=[])
+
+    def stats(self):
+        """
+        Retourne les compteurs de la file et le nombre de travaux par état.
+
+        Returns:
+            dict: Travaux ajoutés, réservés, réussis, relancés, échoués, baux expirés, points de contrôle
+        """
+        def operation(conn, now):
+            return dict(conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        states = self._transaction(operation, default={})
+        with self._lock:
+            stats = dict(self._stats)
+        stats["states"] = states
+        stats["lease_duration_s"] = self.lease_duration
+        return stats
+
+
+class JobWorkerPool:
+    """Threads qui réservent les travaux de la file et les exécutent en renouvelant leur bail."""
+
+    def __init__(self, queue, kinds, handler, workers=WORKERS, poll_interval=POLL_INTERVAL, name="job-worker"):
+        """
+        Args:
+            queue (JobQueue): File consommée
+            kinds (iterable): Types de travaux traités par ce pool
+            handler (callable): handler(job) -> résultat; une exception compte comme un échec de tentative
+            workers (int, optional): Nombre de threads (défaut: JOB_QUEUE_WORKERS)
+            poll_interval (float, optional): Attente entre deux interrogations d'une file vide
+            name (str, optional): Préfixe des noms de threads
+        """
+        self.queue = queue
+        self.kinds = tuple(kinds)
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.name = name
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._busy = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Démarre les workers (sans effet s'ils tournent déjà)."""
+        if self._threads:
+            return self
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"File de travaux: {self.workers} workers démarrés pour {', '.join(self.kinds)}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Réveille les workers en attente, après l'ajout d'un travail."""
+        self._wake.set()
+
+    def _loop(self):
+        owner = f"{HOSTNAME}:{os.getpid()}:{threading.current_thread().name}"
+        while not self._stop.is_set():
+            job = self.queue.claim(self.kinds, owner)
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            with self._lock:
+                self._busy += 1
+            try:
+                self._execute(job, owner)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+
+    def _execute(self, job, owner):
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(self.queue.lease_duration / 3):
+                if not self.queue.heartbeat(job["id"], owner):
+                    logger.warning(f"File de travaux: bail perdu pour le travail {job['id']}")
+                    return
+
+        threading.Thread(target=renew, name=f"{self.name}-lease", daemon=True).start()
+        try:
+            result = self.handler(job)
+        except Exception as e:
+            state = self.queue.fail(job["id"], owner, f"{type(e).__name__}: {str(e)}")
+            logger.error(f"File de travaux: travail {job['id']} en échec (tentative {job['attempts']}/"
+                         f"{job['max_attempts']}, nouvel état: {state}): {str(e)}")
+        else:
+            self.queue.complete(job["id"], owner, result)
+        finally:
+            done.set()
+
+    def stats(self):
+        with self._lock:
+            return {"workers": len(self._threads), "busy": self._busy}
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """
+    Retourne la file de travaux du processus, en la créant au besoin.
+
+    Returns:
+        JobQueue: File partagée (même base pour tous les processus de la machine)
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
+
+
+def _job_queue_stats():
+    return get_job_queue().stats() if _queue is not None else {"states": {}}
+
+
+register_stats_provider("job_queue", _job_queue_stats)
@@ -0,0 +1,333 @@
+"""
+Travaux asynchrones: soumission immédiate, état consultable et flux d'événements.
+
+``/project_request`` gardait la connexion HTTP ouverte pendant toute l'exécution
+multi-agents, et l'interface d'administration abandonnait au bout de 120 s. Un
+travail est ici enregistré (``track``) et son identifiant retourné aussitôt; il
+est exécuté par les workers de la file persistante ``shared.job_queue``
+(``run``, dont le nombre est réglé par ``JOB_QUEUE_WORKERS``). Chaque phase
+publie son état et son résultat, consultables par interrogation
+(``Job.to_dict``) ou suivis en continu en Server-Sent Events (``sse_events``).
+
+Variables d'environnement:
+    JOBS_RETENTION: Conservation en mémoire d'un travail terminé, en secondes (défaut: 3600)
+    JOBS_SSE_KEEPALIVE: Intervalle des commentaires de maintien du flux SSE, en secondes (défaut: 15)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from shared.job_context import JobCancelledError
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+JOBS_RETENTION = float(os.getenv("JOBS_RETENTION", "3600"))
+SSE_KEEPALIVE = float(os.getenv("JOBS_SSE_KEEPALIVE", "15"))
+
+# États d'un travail
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class Job:
+    """Travail soumis: état, phases, résultat et journal d'événements."""
+
+    def __init__(self, kind, payload, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.payload = payload
+        self.state = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.phases = {}
+        self.result = None
+        self.error = None
+        self.events = []
+        self.changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    def to_dict(self, include_result=True):
+        """
+        Représentation JSON de l'état du travail.
+
+        Args:
+            include_result (bool, optional): Inclure le résultat final et celui de chaque phase
+
+        Returns:
+            dict: Identifiant, état, horodatages, phases et résultat
+        """
+        with self.changed:
+            phases = {
+                name: dict(phase) if include_result else {k: v for k, v in phase.items() if k != "result"}
+                for name, phase in self.phases.items()
+            }
+            data = {
+                "job_id": self.id,
+                "kind": self.kind,
+                "state": self.state,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "phases": phases,
+                "error": self.error,
+                "events": len(self.events),
+            }
+            if include_result:
+                data["result"] = self.result
+        return data
+
+
+class JobRegistry:
+    """Conserve en mémoire l'état des travaux exécutés par les workers de la file."""
+
+    def __init__(self, retention=JOBS_RETENTION):
+        self.retention = retention
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+
+    def _purge(self, now):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and now - job.finished_at > self.retention]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def track(self, kind, payload, job_id=None):
+        """
+        Enregistre un travail sans l'exécuter (exécution par un worker de la file, voir ``run``).
+
+        Un travail déjà connu est retourné tel quel.
+
+        Args:
+            kind (str): Type de travail (ex: "project")
+            payload (dict): Données de la demande
+            job_id (str, optional): Identifiant imposé (sinon un UUID)
+
+        Returns:
+            Job: Travail suivi par le registre
+        """
+        with self._lock:
+            job = self._jobs.get(job_id) if job_id else None
+            if job is not None:
+                return job
+            job = Job(kind, payload, job_id)
+            self._purge(time.time())
+            self._jobs[job.id] = job
+            self._stats["submitted"] += 1
+        self.publish(job, "state", {"state": QUEUED})
+        return job
+
+    def run(self, job, func, will_retry=False):
+        """
+        Exécute un travail dans le thread courant et publie ses changements d'état.
+
+        Args:
+            job (Job): Travail suivi par le registre
+            func (callable): func(job) -> résultat
+            will_retry (bool|callable, optional): En cas d'échec, le travail repart en file
+                (état "queued") au lieu d'être terminé; will_retry(exception) -> bool pour
+                décider selon l'erreur
+
+        Un travail annulé (``JobCancelledError``, ou ``cancel`` avant son démarrage)
+        termine à l'état "cancelled", sans nouvelle tentative.
+
+        Returns:
+            Le résultat de func
+
+        Raises:
+            Exception: L'exception de func, après publication de l'échec
+            JobCancelledError: Si le travail a été annulé avant son démarrage
+        """
+        if job.state == CANCELLED:
+            raise JobCancelledError(f"Travail {job.id} annulé")
+        self._set_state(job, RUNNING)
+        try:
+            result = func(job)
+        except JobCancelledError as e:
+            logger.warning(f"Travail {job.id} annulé")
+            with job.changed:
+                job.error = str(e)
+            self._set_state(job, CANCELLED)
+            raise
+        except Exception as e:
+            logger.error(f"Travail {job.id} en échec: {str(e)}")
+            with job.changed:
+                job.error = f"{type(e).__name__}: {str(e)}"
+            retry = will_retry(e) if callable(will_retry) else will_retry
+            self._set_state(job, QUEUED if retry else FAILED)
+            raise
+        with job.changed:
+            job.result = result
+            job.error = None
+        self._set_state(job, SUCCEEDED)
+        return result
+
+    def cancel(self, job):
+        """
+        Termine un travail qui n'a pas démarré (annulé pendant son attente dans la file).
+
+        Un travail en cours est terminé par ``run``, quand son exécution lève ``JobCancelledError``.
+
+        Args:
+            job (Job): Travail concerné
+
+        Returns:
+            bool: True si le travail a été annulé, False s'il était déjà en cours ou terminé
+        """
+        with job.changed:
+            if job.state != QUEUED:
+                return False
+            job.error = f"Travail {job.id} annulé"
+        self._set_state(job, CANCELLED)
+        return True
+
+    def _set_state(self, job, state):
+        with job.changed:
+            job.state = state
+            now = time.time()
+            if state == RUNNING:
+                job.started_at = now
+            elif state in FINISHED_STATES:
+                job.finished_at = now
+        if state in FINISHED_STATES:
+            with self._lock:
+                self._stats[state] += 1
+        data = {"state": state}
+        if state in (FAILED, CANCELLED) or (state == QUEUED and job.error):
+            data["error"] = job.error
+        elif state == SUCCEEDED:
+            data["result"] = job.result
+        self.publish(job, "state", data)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        """Travaux connus, du plus récent au plus ancien."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def publish(self, job, event, data):
+        """
+        Ajoute un événement au journal du travail et réveille les lecteurs.
+
+        Args:
+            job (Job): Travail concerné
+            event (str): Nom de l'événement ("state", "phase"...)
+            data (dict): Contenu JSON de l'événement
+        """
+        with job.changed:
+            job.events.append((len(job.events) + 1, event, data))
+            job.changed.notify_all()
+
+    def update_phase(self, job, name, status, timings=None, result=None):
+        """
+        Met à jour une phase du travail et publie l'événement correspondant.
+
+        Args:
+            job (Job): Travail concerné
+            name (str): Nom de la phase
+            status (str): État de la phase (running, success, failed, skipped...)
+            timings (dict, optional): Début, durée et erreur éventuelle de la phase
+            result (optional): Résultat de la phase, une fois terminée
+        """
+        phase = dict(timings or {}, status=status)
+        if result is not None:
+            phase["result"] = result
+        with job.changed:
+            job.phases[name] = phase
+        self.publish(job, "phase", dict(phase, name=name))
+
+    def wait_events(self, job, after=0, timeout=SSE_KEEPALIVE):
+        """
+        Attend des événements postérieurs au numéro ``after``.
+
+        Returns:
+            list: Événements (numéro, nom, données); vide si le délai expire
+        """
+        deadline = time.time() + timeout
+        with job.changed:
+            while len(job.events) <= after and not job.finished:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                job.changed.wait(remaining)
+            return job.events[after:]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            states = [job.state for job in self._jobs.values()]
+        stats["queued"] = states.count(QUEUED)
+        stats["running"] = states.count(RUNNING)
+        stats["retained"] = len(states)
+        return stats
+
+
+def sse_events(registry, job, last_event_id=0):
+    """
+    Générateur du flux Server-Sent Events d'un travail.
+
+    Les événements déjà publiés sont rejoués à partir de ``last_event_id``
+    (en-tête Last-Event-ID lors d'une reconnexion); le flux se termine après
+    l'événement de fin du travail.
+
+    Yields:
+        str: Blocs "id/event/data" au format text/event-stream
+    """
+    cursor = last_event_id
+    yield "retry: 3000\n\n"
+    while True:
+        events = registry.wait_events(job, cursor)
+        if not events:
+            if job.finished:
+                return
+            # Commentaire de maintien: évite la fermeture par les proxys inactifs
+            yield ": keep-alive\n\n"
+            continue
+        for seq, event, data in events:
+            cursor = seq
+            yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+        if job.finished and cursor >= len(job.events):
+            return
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_job_registry():
+    """
+    Retourne le registre de travaux du processus, en le créant au besoin.
+
+    Returns:
+        JobRegistry: Registre partagé du processus
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = JobRegistry()
+    return _registry
+
+
+def _job_stats():
+    return get_job_registry().stats() if _registry is not None else {"retained": 0}
+
+
+register_stats_provider("jobs", _job_stats)
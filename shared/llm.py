@@ -0,0 +1,237 @@
+"""
+Appel commun au modèle Claude via AWS Bedrock.
+
+Les fonctions ``invoke_claude`` de chaque agent conservent leur propre logique de
+journalisation, de nouvelles tentatives et de réponse de secours, mais délèguent
+l'appel réseau à ``invoke_bedrock``, qui se charge du cache des réponses et du
+client Bedrock partagé, ainsi que du limiteur de débit commun à tous les agents.
+Les appels identiques en cours sont regroupés (voir ``shared.single_flight``).
+
+Avec ``stream_callback``, la réponse est lue au fil de l'eau via
+``invoke_model_with_response_stream``: chaque fragment de texte est transmis au
+callback dès sa réception, et le texte complet est toujours retourné.
+
+Avec ``tool``, le modèle est contraint d'appeler cet outil (``tool_choice``) et
+l'argument de l'appel, conforme au schéma ``input_schema`` de l'outil, est
+retourné sous forme de texte JSON (voir ``shared.structured_output``).
+"""
+
+import json
+import logging
+import os
+
+from shared.bedrock_client import get_bedrock_client, invalidate_bedrock_client
+from shared.llm_cache import get_llm_cache, make_cache_key
+from shared.rate_limiter import DEFAULT_PRIORITY, estimate_tokens, get_rate_limiter, is_throttling_error
+from shared.single_flight import get_single_flight
+from shared.telemetry import instrument_llm_call, note_attempt, note_error, note_first_byte, note_result
+
+logger = logging.getLogger(__name__)
+
+ANTHROPIC_VERSION = "bedrock-2023-05-31"
+
+
+def build_request_body(prompt, system_prompt=None, max_tokens=4096, temperature=0.7, tool=None):
+    """
+    Construit le corps d'une requête Bedrock au format Anthropic Messages.
+
+    Args:
+        tool (dict, optional): Outil {"name", "description", "input_schema"} que le modèle doit appeler
+
+    Returns:
+        dict: Corps de la requête
+    """
+    request_body = {
+        "anthropic_version": ANTHROPIC_VERSION,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ]
+    }
+    if system_prompt:
+        request_body["system"] = system_prompt
+    if tool is not None:
+        request_body["tools"] = [tool]
+        request_body["tool_choice"] = {"type": "tool", "name": tool["name"]}
+    return request_body
+
+
+def _response_text(response_body, tool=None):
+    """
+    Extrait le résultat d'une réponse ``invoke_model``.
+
+    Returns:
+        str: Texte généré, ou argument JSON de l'appel d'outil si ``tool`` est fourni
+    """
+    content = response_body.get('content') or []
+    if tool is not None:
+        for block in content:
+            if block.get('type') == 'tool_use' and block.get('name') == tool["name"]:
+                return json.dumps(block.get('input'), ensure_ascii=False)
+        # Modèle ou serveur sans appel d'outil: le texte est validé tel quel par l'appelant
+        logger.warning(f"Aucun appel de l'outil {tool['name']} dans la réponse, utilisation du texte")
+    return "".join(block.get('text', '') for block in content if block.get('type', 'text') == 'text')
+
+
+def _read_stream(response, stream_callback):
+    """
+    Assemble le texte d'une réponse ``invoke_model_with_response_stream``.
+
+    Args:
+        response (dict): Réponse de Bedrock (le champ ``body`` est un flux d'événements)
+        stream_callback (callable): Appelé avec chaque fragment de texte reçu
+
+    Returns:
+        tuple: (texte complet généré par le modèle, usage en tokens)
+    """
+    parts = []
+    usage = {}
+    for event in response.get('body'):
+        chunk = event.get('chunk')
+        if chunk is None:
+            # Les erreurs en cours de flux arrivent comme des événements dédiés
+            # (throttlingException, modelStreamErrorException...)
+            for name, detail in event.items():
+                raise RuntimeError(f"{name}: {detail.get('message', detail) if isinstance(detail, dict) else detail}")
+            continue
+
+        payload = json.loads(chunk.get('bytes'))
+        event_type = payload.get('type')
+        if event_type == 'message_start':
+            usage.update(payload.get('message', {}).get('usage', {}))
+        elif event_type == 'message_delta':
+            usage.update(payload.get('usage', {}))
+        elif event_type == 'content_block_delta':
+            text = payload.get('delta', {}).get('text')
+            if text:
+                if not parts:
+                    note_first_byte()
+                parts.append(text)
+                stream_callback(text)
+    return "".join(parts), usage
+
+
+def _invoke_model(prompt, system_prompt, max_tokens, temperature, model_id, region_name, stream_callback, priority,
+                  tool=None):
+    """
+    Envoie la requête à Bedrock en passant par le limiteur de débit.
+
+    Returns:
+        str: Texte généré par le modèle
+    """
+    request_body = build_request_body(prompt, system_prompt, max_tokens, temperature, tool)
+
+    limiter = get_rate_limiter()
+    reserved_tokens = estimate_tokens(prompt, system_prompt, max_tokens)
+    if limiter is not None:
+        limiter.acquire(reserved_tokens, priority=priority)
+
+    note_attempt(model_id)
+    try:
+        client = get_bedrock_client(region_name)
+        if stream_callback is not None:
+            response = client.invoke_model_with_response_stream(
+                modelId=model_id,
+                body=json.dumps(request_body)
+            )
+            generated_text, usage = _read_stream(response, stream_callback)
+        else:
+            response = client.invoke_model(
+                modelId=model_id,
+                body=json.dumps(request_body)
+            )
+            note_first_byte()
+            response_body = json.loads(response.get('body').read())
+            generated_text = _response_text(response_body, tool)
+            usage = response_body.get('usage', {})
+    except Exception as e:
+        note_error(e)
+        if limiter is not None:
+            # La requête compte dans le budget, mais pas les tokens réservés
+            limiter.settle(reserved_tokens, 0)
+            if is_throttling_error(e):
+                limiter.on_throttle()
+        invalidate_bedrock_client(e)
+        raise
+
+    if limiter is not None:
+        used_tokens = usage.get('input_tokens', 0) + usage.get('output_tokens', 0)
+        limiter.settle(reserved_tokens, used_tokens or reserved_tokens)
+        limiter.on_success()
+
+    note_result(usage)
+    return generated_text
+
+
+@instrument_llm_call
+def invoke_bedrock(prompt, system_prompt=None, max_tokens=4096, temperature=0.7, model_id=None,
+                   region_name=None, use_cache=True, cache_ttl=None, stream_callback=None,
+                   priority=DEFAULT_PRIORITY, tool=None):
+    """
+    Invoque Claude via AWS Bedrock et retourne le texte généré.
+
+    Args:
+        prompt (str): Le prompt principal à envoyer au modèle
+        system_prompt (str, optional): Instructions système
+        max_tokens (int, optional): Nombre maximum de tokens pour la réponse
+        temperature (float, optional): Niveau de créativité (0.0-1.0)
+        model_id (str, optional): Modèle à utiliser (défaut: MODEL_ID du .env)
+        region_name (str, optional): Région AWS (défaut: REGION_NAME du .env)
+        use_cache (bool, optional): False pour ignorer le cache et forcer un appel au modèle
+        cache_ttl (float, optional): Durée de vie de la réponse en cache, en secondes
+        stream_callback (callable, optional): Reçoit les fragments de texte au fil de la
+            génération; une réponse servie depuis le cache est transmise en un seul fragment
+        priority (str, optional): Classe de priorité pour le limiteur de débit
+            (interactive, normal ou background)
+        tool (dict, optional): Outil que le modèle doit appeler; l'appel n'est alors pas
+            diffusé en continu et son argument est retourné en JSON
+
+    Returns:
+        str: Texte généré par le modèle
+
+    Raises:
+        RateLimitTimeout: Si l'appel attend son tour plus longtemps que LLM_RATE_LIMIT_MAX_WAIT
+        Exception: Toute erreur d'invocation Bedrock est propagée à l'appelant
+    """
+    model_id = model_id or os.getenv("MODEL_ID", "anthropic.claude-3-sonnet-20240229-v1:0")
+    if tool is not None:
+        # L'argument d'un outil arrive en fragments de JSON partiel: rien d'utile à afficher
+        stream_callback = None
+
+    cache = get_llm_cache()
+    cache_key = None
+    if cache is not None:
+        if use_cache:
+            cache_key = make_cache_key(model_id, system_prompt, prompt, temperature, max_tokens, tool)
+            cached_text = cache.get(cache_key)
+            if cached_text is not None:
+                logger.info(f"Réponse LLM servie depuis le cache ({cache_key[:12]})")
+                note_result(cache_hit=True)
+                if stream_callback is not None:
+                    stream_callback(cached_text)
+                return cached_text
+        else:
+            cache.record_bypass()
+
+    def call_model():
+        return _invoke_model(prompt, system_prompt, max_tokens, temperature, model_id, region_name,
+                             stream_callback, priority, tool)
+
+    flight = get_single_flight() if use_cache else None
+    if flight is None:
+        generated_text = call_model()
+    else:
+        # Un appel identique déjà en cours (autre thread ou autre agent) est attendu plutôt que dupliqué
+        request_key = cache_key or make_cache_key(model_id, system_prompt, prompt, temperature, max_tokens, tool)
+        generated_text, executed = flight.do(request_key, call_model)
+        if not executed:
+            note_result(coalesced=True)
+            if stream_callback is not None:
+                stream_callback(generated_text)
+            return generated_text
+
+    if cache_key is not None and generated_text and generated_text.strip():
+        cache.set(cache_key, generated_text, ttl=cache_ttl, model_id=model_id)
+
+    return generated_text
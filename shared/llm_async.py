@@ -0,0 +1,109 @@
+"""
+Appels LLM awaitables pour les agents qui utilisent asyncio (QA, Performance).
+
+``invoke_claude`` est bloquant: appelé depuis une coroutine, il gèle la boucle
+d'événements (navigateur, captures d'écran, sondage du DOM) pendant tout
+l'aller-retour Bedrock. ``run_in_llm_executor`` exécute l'appel dans un pool de
+threads borné et rend la main à la boucle en attendant le résultat.
+
+Variables d'environnement:
+    LLM_ASYNC_WORKERS: Nombre maximum d'appels LLM simultanés hors boucle (défaut: 8)
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from shared.stats import register_stats_provider
+from shared.telemetry import call_site, find_call_site
+
+logger = logging.getLogger(__name__)
+
+ASYNC_WORKERS = int(os.getenv("LLM_ASYNC_WORKERS", "8"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "submitted": 0,
+    "completed": 0,
+    "failed": 0,
+    "running": 0,
+    "max_running": 0,
+}
+
+
+def get_llm_executor():
+    """
+    Retourne le pool de threads dédié aux appels LLM, en le créant au besoin.
+
+    Returns:
+        ThreadPoolExecutor: Pool partagé du processus
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix="llm")
+    return _executor
+
+
+def _tracked(caller, func, *args, **kwargs):
+    with _stats_lock:
+        _stats["running"] += 1
+        _stats["max_running"] = max(_stats["max_running"], _stats["running"])
+    try:
+        # La pile du thread ne contient plus la coroutine appelante: la transmettre à la télémétrie
+        with call_site(caller):
+            result = func(*args, **kwargs)
+    except Exception:
+        with _stats_lock:
+            _stats["failed"] += 1
+        raise
+    else:
+        with _stats_lock:
+            _stats["completed"] += 1
+        return result
+    finally:
+        with _stats_lock:
+            _stats["running"] -= 1
+
+
+async def run_in_llm_executor(func, *args, **kwargs):
+    """
+    Exécute une fonction bloquante dans le pool LLM sans bloquer la boucle asyncio.
+
+    Args:
+        func (callable): Fonction synchrone à exécuter (typiquement invoke_claude)
+        *args: Arguments positionnels de la fonction
+        **kwargs: Arguments nommés de la fonction
+
+    Returns:
+        Le résultat de la fonction
+    """
+    with _stats_lock:
+        _stats["submitted"] += 1
+    caller = find_call_site()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_llm_executor(), functools.partial(_tracked, caller, func, *args, **kwargs))
+
+
+def get_executor_stats():
+    """
+    Retourne les compteurs du pool LLM.
+
+    Returns:
+        dict: Appels soumis, terminés, en cours et en attente d'un thread
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["max_workers"] = ASYNC_WORKERS
+    stats["queued"] = max(stats["submitted"] - stats["completed"] - stats["failed"] - stats["running"], 0)
+    return stats
+
+
+register_stats_provider("llm_executor", get_executor_stats)
@@ -0,0 +1,335 @@
+"""
+Cache des réponses LLM adressé par contenu.
+
+La clé est une empreinte SHA-256 du modèle, du prompt système, du prompt, de la
+température et de max_tokens. Deux niveaux:
+
+1. un LRU en mémoire, borné en nombre d'entrées et en octets, propre au processus;
+2. une base SQLite en mode WAL à la racine du dépôt, partagée par tous les agents.
+
+Chaque entrée a sa propre durée de vie (TTL). Le niveau disque est élagué par
+taille: au-delà de ``LLM_CACHE_MAX_BYTES``, les entrées les moins récemment
+utilisées sont supprimées.
+
+Variables d'environnement:
+    LLM_CACHE_ENABLED: Active le cache (défaut: 1)
+    LLM_CACHE_PATH: Fichier SQLite (défaut: <racine>/cache/llm_cache.sqlite3)
+    LLM_CACHE_TTL: Durée de vie par défaut en secondes (défaut: 86400)
+    LLM_CACHE_MEMORY_ENTRIES: Nombre maximum d'entrées en mémoire (défaut: 256)
+    LLM_CACHE_MEMORY_BYTES: Taille maximum du niveau mémoire (défaut: 32 Mo)
+    LLM_CACHE_MAX_BYTES: Taille maximum du niveau disque (défaut: 256 Mo)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(ROOT_DIR, "cache", "llm_cache.sqlite3"))
+DEFAULT_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+MEMORY_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+MEMORY_MAX_BYTES = int(os.getenv("LLM_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+DISK_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def make_cache_key(model_id, system_prompt, prompt, temperature, max_tokens, tool=None):
+    """
+    Calcule la clé de cache d'un appel LLM.
+
+    Args:
+        tool (dict, optional): Outil imposé pour une sortie structurée (son schéma fait partie de la clé)
+
+    Returns:
+        str: Empreinte hexadécimale SHA-256
+    """
+    fields = [model_id, system_prompt or "", prompt, float(temperature), int(max_tokens)]
+    if tool is not None:
+        fields.append(tool)
+    payload = json.dumps(
+        fields,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Cache à deux niveaux (LRU mémoire + SQLite partagé) pour les réponses LLM."""
+
+    def __init__(self, path=CACHE_PATH, default_ttl=DEFAULT_TTL, memory_max_entries=MEMORY_MAX_ENTRIES,
+                 memory_max_bytes=MEMORY_MAX_BYTES, disk_max_bytes=DISK_MAX_BYTES):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.memory_max_entries = memory_max_entries
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+
+        self._memory = OrderedDict()  # clé -> (valeur, expiration, taille)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._disk_available = True
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "bypass": 0,
+            "expired": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "disk_errors": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Niveau disque
+    # ------------------------------------------------------------------
+
+    def _connection(self):
+        """Retourne la connexion SQLite du thread courant (une connexion par thread)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model_id TEXT,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _disk_call(self, operation, default=None):
+        """Exécute une opération disque sans jamais faire échouer l'appel LLM."""
+        if not self._disk_available:
+            return default
+        try:
+            return operation(self._connection())
+        except sqlite3.Error as e:
+            self._count("disk_errors")
+            logger.warning(f"Cache LLM: erreur SQLite ({self.path}): {str(e)}")
+            return default
+        except OSError as e:
+            # Dossier non accessible en écriture: on continue avec le seul niveau mémoire
+            self._disk_available = False
+            logger.warning(f"Cache LLM: niveau disque désactivé ({str(e)})")
+            return default
+
+    def _disk_get(self, key, now):
+        def operation(conn):
+            row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                self._count("expired")
+                return None
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return row
+        return self._disk_call(operation)
+
+    def _disk_set(self, key, value, model_id, expires_at, now):
+        size = len(value.encode("utf-8"))
+
+        def operation(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model_id, value, size, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model_id, value, size, now, expires_at, now),
+            )
+            conn.commit()
+            self._disk_evict(conn, now)
+        self._disk_call(operation)
+
+    def _disk_evict(self, conn, now):
+        """Supprime les entrées expirées puis les moins récemment utilisées si la taille est dépassée."""
+        conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.disk_max_bytes:
+            conn.commit()
+            return
+
+        # Élaguer jusqu'à 90 % de la limite pour ne pas recommencer à chaque écriture
+        target = int(self.disk_max_bytes * 0.9)
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access ASC").fetchall():
+            if total <= target:
+                break
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        conn.commit()
+        self._count("disk_evictions", evicted)
+
+    # ------------------------------------------------------------------
+    # Niveau mémoire
+    # ------------------------------------------------------------------
+
+    def _memory_put(self, key, value, expires_at):
+        size = len(value.encode("utf-8"))
+        if size > self.memory_max_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous[2]
+            self._memory[key] = (value, expires_at, size)
+            self._memory_bytes += size
+            while self._memory and (len(self._memory) > self.memory_max_entries or self._memory_bytes > self.memory_max_bytes):
+                _, (_, _, evicted_size) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted_size
+                self._stats["memory_evictions"] += 1
+
+    def _memory_get(self, key, now):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._memory[key]
+                self._memory_bytes -= entry[2]
+                self._stats["expired"] += 1
+                return None
+            self._memory.move_to_end(key)
+            return entry[0]
+
+    # ------------------------------------------------------------------
+    # API publique
+    # ------------------------------------------------------------------
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def get(self, key):
+        """
+        Recherche une réponse dans le cache (mémoire puis disque).
+
+        Args:
+            key (str): Clé calculée par make_cache_key
+
+        Returns:
+            str: Réponse en cache, ou None si absente ou expirée
+        """
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+
+        row = self._disk_get(key, now)
+        if row is not None:
+            self._count("disk_hits")
+            self._memory_put(key, row[0], row[1])
+            return row[0]
+
+        self._count("misses")
+        return None
+
+    def set(self, key, value, ttl=None, model_id=None):
+        """
+        Enregistre une réponse dans les deux niveaux du cache.
+
+        Args:
+            key (str): Clé calculée par make_cache_key
+            value (str): Réponse du modèle
+            ttl (float, optional): Durée de vie en secondes (défaut: LLM_CACHE_TTL)
+            model_id (str, optional): Identifiant du modèle, conservé pour diagnostic
+        """
+        if not value:
+            return
+        now = time.time()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        self._memory_put(key, value, expires_at)
+        self._disk_set(key, value, model_id, expires_at, now)
+        self._count("sets")
+
+    def record_bypass(self):
+        """Comptabilise un appel ayant explicitement contourné le cache."""
+        self._count("bypass")
+
+    def clear_memory(self):
+        """Vide le niveau mémoire du processus courant."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def stats(self):
+        """
+        Retourne les compteurs du cache.
+
+        Returns:
+            dict: Hits par niveau, misses, taux de hit et occupation
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_ratio"] = round(hits / lookups, 4) if lookups else 0.0
+        stats["enabled"] = CACHE_ENABLED
+        stats["path"] = self.path
+
+        def disk_usage(conn):
+            return conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        usage = self._disk_call(disk_usage)
+        if usage is not None:
+            stats["disk_entries"], stats["disk_bytes"] = usage
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """
+    Retourne le cache LLM du processus, ou None si le cache est désactivé.
+
+    Returns:
+        LLMCache: Instance partagée du processus
+    """
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
+
+
+def _cache_stats():
+    cache = get_llm_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+
+register_stats_provider("llm_cache", _cache_stats)
@@ -0,0 +1,227 @@
+"""
+Diffusion en continu des réponses de Claude vers l'interface web.
+
+``open_llm_stream`` crée un ``SocketIOStreamForwarder`` à passer comme
+``stream_callback`` à ``invoke_bedrock``. Les fragments reçus sont regroupés
+(par taille ou par délai) pour limiter le nombre d'événements Socket.IO, puis
+émis sur l'événement ``claude_stream``. Les blocs de code Markdown terminés sont
+détectés pendant la génération et émis sur ``claude_stream_block`` et vers le
+callback ``on_block``: l'agent Go backend écrit ainsi chaque fichier généré dès
+que son bloc est terminé, avant la fin de la réponse.
+
+Événements émis:
+    claude_stream: {'stream_id', 'delta', 'done', 'error'}
+    claude_stream_block: {'stream_id', 'index', 'language', 'heading', 'code', 'json'}
+
+Variables d'environnement:
+    LLM_STREAMING: Active la diffusion en continu (défaut: 1)
+    LLM_STREAM_MIN_CHARS: Taille minimum d'un fragment émis (défaut: 64)
+    LLM_STREAM_INTERVAL: Délai maximum entre deux émissions en secondes (défaut: 0.1)
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+STREAMING_ENABLED = os.getenv("LLM_STREAMING", "1").lower() not in ("0", "false", "no")
+STREAM_MIN_CHARS = int(os.getenv("LLM_STREAM_MIN_CHARS", "64"))
+STREAM_INTERVAL = float(os.getenv("LLM_STREAM_INTERVAL", "0.1"))
+
+STREAM_EVENT = 'claude_stream'
+BLOCK_EVENT = 'claude_stream_block'
+
+# Ouverture d'un bloc de code: ``` suivi d'un éventuel langage, en début de ligne
+_FENCE_OPEN = re.compile(r'(?m)^[ \t]*```([\w+#.-]*)[^\n]*\n')
+_FENCE_CLOSE = re.compile(r'(?m)^[ \t]*```[ \t]*$')
+
+
+class IncrementalBlockExtractor:
+    """
+    Détecte les blocs de code Markdown (```langage ... ```) au fur et à mesure
+    que le texte arrive.
+
+    ``feed`` retourne les blocs terminés depuis le dernier appel; un bloc n'est
+    jamais retourné deux fois. Les blocs ``json`` sont décodés quand c'est possible;
+    ``heading`` est la dernière ligne de texte avant le bloc (souvent son nom de fichier).
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._position = 0  # Début de la zone pas encore analysée
+        self._open_match = None
+        self._heading = ""
+        self.blocks = []
+
+    def feed(self, delta):
+        """
+        Ajoute un fragment de texte et retourne les blocs complétés.
+
+        Args:
+            delta (str): Fragment de texte reçu du modèle
+
+        Returns:
+            list: Blocs terminés, sous forme de dict {'index', 'language', 'heading', 'code', 'json'}
+        """
+        self._text += delta
+        completed = []
+        while True:
+            if self._open_match is None:
+                match = _FENCE_OPEN.search(self._text, self._position)
+                if match is None:
+                    break
+                self._open_match = match
+                lines = [line.strip() for line in self._text[self._position:match.start()].splitlines()]
+                self._heading = next((line for line in reversed(lines) if line), "")
+                self._position = match.end()
+
+            close = _FENCE_CLOSE.search(self._text, self._position)
+            # La ligne de fermeture doit être complète pour ne pas couper un ``` plus long
+            if close is None or close.end() == len(self._text):
+                break
+
+            language = self._open_match.group(1).lower()
+            code = self._text[self._position:close.start()].rstrip('\n')
+            block = {
+                'index': len(self.blocks),
+                'language': language,
+                'heading': self._heading,
+                'code': code,
+                'json': _try_parse_json(code) if language == 'json' else None,
+            }
+            self.blocks.append(block)
+            completed.append(block)
+            self._open_match = None
+            self._position = close.end()
+        return completed
+
+    def close(self):
+        """
+        Termine l'analyse: un bloc fermé en toute fin de texte est retourné.
+
+        Returns:
+            list: Derniers blocs terminés
+        """
+        return self.feed("\n")
+
+
+def _try_parse_json(code):
+    try:
+        return json.loads(code)
+    except ValueError:
+        return None
+
+
+class SocketIOStreamForwarder:
+    """
+    Callback de streaming qui relaie les fragments de texte sur Socket.IO.
+
+    Les fragments sont regroupés jusqu'à ``min_chars`` caractères ou
+    ``interval`` secondes. ``finish`` doit être appelé à la fin de l'appel
+    (succès ou échec) pour vider le tampon et signaler la fin du flux.
+    """
+
+    def __init__(self, socketio, event=STREAM_EVENT, block_event=BLOCK_EVENT, on_block=None,
+                 min_chars=STREAM_MIN_CHARS, interval=STREAM_INTERVAL, room=None):
+        self.socketio = socketio
+        self.room = room
+        self.event = event
+        self.block_event = block_event
+        self.on_block = on_block
+        self.min_chars = min_chars
+        self.interval = interval
+        self.stream_id = uuid.uuid4().hex[:12]
+        self.extractor = IncrementalBlockExtractor()
+        self.first_delta_at = None
+        self._started_at = time.time()
+        self._buffer = []
+        self._buffered_chars = 0
+        self._last_emit = self._started_at
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def __call__(self, delta):
+        """Reçoit un fragment de texte du modèle."""
+        with self._lock:
+            if self._finished:
+                return
+            now = time.time()
+            if self.first_delta_at is None:
+                self.first_delta_at = now
+            self._buffer.append(delta)
+            self._buffered_chars += len(delta)
+            if self._buffered_chars >= self.min_chars or now - self._last_emit >= self.interval:
+                self._flush(now)
+            blocks = self.extractor.feed(delta)
+        self._publish_blocks(blocks)
+
+    @property
+    def time_to_first_token(self):
+        """Délai en secondes avant le premier fragment, ou None s'il n'y en a pas eu."""
+        if self.first_delta_at is None:
+            return None
+        return self.first_delta_at - self._started_at
+
+    def _flush(self, now, done=False, error=None):
+        if not self._buffer and not done:
+            return
+        payload = {'stream_id': self.stream_id, 'delta': "".join(self._buffer), 'done': done}
+        if error:
+            payload['error'] = error
+        self._buffer = []
+        self._buffered_chars = 0
+        self._last_emit = now
+        try:
+            self.socketio.emit(self.event, payload, to=self.room)
+        except Exception as e:
+            logger.warning(f"Impossible d'émettre le fragment de streaming: {str(e)}")
+
+    def _publish_blocks(self, blocks):
+        for block in blocks:
+            try:
+                self.socketio.emit(self.block_event, dict(block, stream_id=self.stream_id), to=self.room)
+            except Exception as e:
+                logger.warning(f"Impossible d'émettre le bloc de code: {str(e)}")
+            if self.on_block is not None:
+                try:
+                    self.on_block(block)
+                except Exception as e:
+                    logger.error(f"Erreur dans le traitement du bloc {block['index']}: {str(e)}")
+
+    def finish(self, error=None):
+        """
+        Vide le tampon et signale la fin du flux.
+
+        Args:
+            error (str, optional): Message d'erreur si l'appel a échoué
+        """
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            self._flush(time.time(), done=True, error=error)
+            blocks = self.extractor.close() if error is None else []
+        self._publish_blocks(blocks)
+
+
+def open_llm_stream(socketio, enabled=True, on_block=None, room=None):
+    """
+    Crée le callback de streaming d'un appel à Claude.
+
+    Args:
+        socketio (SocketIO): Instance Socket.IO de l'agent
+        enabled (bool, optional): False pour désactiver le streaming de cet appel
+        on_block (callable, optional): Appelé avec chaque bloc de code terminé
+        room (str, optional): Salle Socket.IO destinataire (défaut: tous les clients)
+
+    Returns:
+        SocketIOStreamForwarder: Callback à passer à invoke_bedrock, ou None si désactivé
+    """
+    if not (enabled and STREAMING_ENABLED):
+        return None
+    return SocketIOStreamForwarder(socketio, on_block=on_block, room=room)
@@ -0,0 +1,339 @@
+"""
+Génération de charge répartie sur plusieurs processus et plusieurs machines.
+
+Un seul processus Python (une boucle asyncio, un cœur) ne suffit pas à saturer
+une cible rapide. Le test est ici réparti entre des générateurs (workers):
+
+- des processus locaux, lancés pour le test (un par cœur utile);
+- des workers distants, lancés à l'avance sur d'autres machines
+  (``python -m shared.load_cluster --listen 0.0.0.0:5098``, ou
+  ``make start-load-worker``) et déclarés dans ``LOAD_REMOTE_WORKERS``.
+
+Le coordinateur (l'agent Performance) se connecte à chaque worker
+(``multiprocessing.connection``, authentifié par ``LOAD_WORKER_AUTHKEY``),
+partage la charge (utilisateurs virtuels, ou débit cible avec des plannings
+entrelacés) et donne à tous le même délai avant le départ. Chaque worker
+exécute ``shared.load_engine.LoadTest`` et renvoie, toutes les
+``LOAD_REPORT_INTERVAL`` secondes, les résultats enregistrés depuis le
+précédent envoi (histogrammes compris); le coordinateur les fusionne en un
+seul rapport, au fil du test. Un test de scénarios (``shared/load_scenario.py``)
+est transmis à chaque worker avec sa part des lignes des feeders.
+
+Variables d'environnement:
+    LOAD_MAX_WORKERS: Processus générateurs locaux au maximum par test (défaut: nombre de cœurs)
+    LOAD_REMOTE_WORKERS: Workers distants, "hôte:port" séparés par des virgules (défaut: aucun)
+    LOAD_WORKER_AUTHKEY: Clé partagée entre le coordinateur et les workers distants (obligatoire pour eux)
+    LOAD_WORKER_PORT: Port d'écoute par défaut d'un worker distant (défaut: 5098)
+    LOAD_REPORT_INTERVAL: Période d'envoi des résultats partiels par les workers, en secondes (défaut: 1)
+    LOAD_START_DELAY: Délai entre l'envoi du test aux workers et son départ, en secondes (défaut: 1)
+
+Usage:
+    LOAD_WORKER_AUTHKEY=... python -m shared.load_cluster --listen 0.0.0.0:5098
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import time
+from multiprocessing.connection import Client, Listener, wait
+
+from shared.load_engine import MAX_IN_FLIGHT, REQUEST_TIMEOUT, LoadResults, LoadTest, steps_summary
+from shared.load_scenario import ScenarioLoadTest, load_scenarios
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = int(os.getenv("LOAD_MAX_WORKERS", str(os.cpu_count() or 1)))
+REMOTE_WORKERS = [address.strip() for address in os.getenv("LOAD_REMOTE_WORKERS", "").split(",") if address.strip()]
+AUTHKEY = os.getenv("LOAD_WORKER_AUTHKEY", "")
+WORKER_PORT = int(os.getenv("LOAD_WORKER_PORT", "5098"))
+REPORT_INTERVAL = float(os.getenv("LOAD_REPORT_INTERVAL", "1"))
+START_DELAY = float(os.getenv("LOAD_START_DELAY", "1"))
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LoadClusterError(Exception):
+    """Worker injoignable ou perdu pendant le test."""
+
+
+def _address(text):
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def split_load(mode, users, rate, workers):
+    """
+    Partage la charge entre les workers.
+
+    Args:
+        mode (str): "closed" ou "open"
+        users (int): Utilisateurs virtuels au total (modèle fermé)
+        rate (float): Débit cible total (modèle ouvert)
+        workers (int): Nombre de workers
+
+    Returns:
+        list: Paramètres de chaque worker ({'users'} ou {'rate', 'phase'}); les workers sans charge sont omis
+    """
+    if mode == "closed":
+        shares = [users // workers + (1 if index < users % workers else 0) for index in range(workers)]
+        return [{"users": share} for share in shares if share]
+    # Plannings entrelacés: le worker k envoie k / débit total après le worker 0
+    return [{"rate": rate / workers, "phase": index / rate} for index in range(workers)]
+
+
+# --- Worker ---
+
+async def _run_test(connection, spec):
+    if spec.get("scenario"):
+        test = ScenarioLoadTest(load_scenarios(spec["scenario"]), spec.get("timeout", REQUEST_TIMEOUT))
+    else:
+        test = LoadTest(spec["url"], spec.get("method", "GET"), spec.get("headers"), spec.get("body"),
+                        spec.get("timeout", REQUEST_TIMEOUT))
+    start_at = time.perf_counter() + spec.get("start_in", 0)
+    interval = spec.get("report_interval", REPORT_INTERVAL)
+
+    async def report():
+        # Résultats partiels: seuls les résultats depuis le précédent envoi partent
+        while True:
+            await asyncio.sleep(interval)
+            if test.results.requests:
+                steps = {key: results.to_dict() for key, results in test.take_step_results().items()}
+                connection.send({"type": "delta", "results": test.take_results().to_dict(), "steps": steps})
+
+    reporter = asyncio.ensure_future(report())
+    try:
+        summary = await test.run(spec["mode"], users=spec.get("users", 1), rate=spec.get("rate"),
+                                 duration=spec["duration"], max_in_flight=spec.get("max_in_flight", MAX_IN_FLIGHT),
+                                 phase=spec.get("phase", 0.0), start_at=start_at)
+    finally:
+        reporter.cancel()
+    connection.send({"type": "done", "results": summary["raw"], "generator": summary["generator"],
+                     "connections": summary["connections"], "steps": summary.get("raw_steps", {}),
+                     "iterations": summary.get("iterations"), "scenario_errors": summary.get("scenario_errors")})
+
+
+def serve(connection):
+    """Exécute le test reçu du coordinateur sur une connexion, en renvoyant les résultats au fil de l'eau."""
+    try:
+        spec = connection.recv()
+        asyncio.run(_run_test(connection, spec))
+    except EOFError:
+        logger.warning("Coordinateur déconnecté avant la fin du test")
+    except Exception as e:
+        logger.error(f"Erreur du worker de charge: {str(e)}")
+        try:
+            connection.send({"type": "error", "message": str(e)})
+        except Exception:
+            pass
+    finally:
+        connection.close()
+
+
+def run_worker(host, port, authkey, once=False):
+    """
+    Attend les tests du coordinateur et les exécute l'un après l'autre.
+
+    Args:
+        host (str): Adresse d'écoute
+        port (int): Port d'écoute (0: port libre, annoncé sur la sortie standard)
+        authkey (bytes): Clé partagée avec le coordinateur
+        once (bool, optional): S'arrêter après un test (worker local lancé par le coordinateur)
+    """
+    with Listener((host, port), authkey=authkey) as listener:
+        print(f"LISTENING {listener.address[1]}", flush=True)
+        logger.info(f"Worker de charge en écoute sur {listener.address[0]}:{listener.address[1]}")
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                # Client non authentifié ou connexion interrompue
+                logger.warning(f"Connexion au worker refusée: {str(e)}")
+                continue
+            serve(connection)
+            if once:
+                return
+
+
+# --- Coordinateur ---
+
+def _spawn_local_workers(count, authkey):
+    """Lance des processus workers locaux; retourne [(processus, adresse d'écoute)]."""
+    env = dict(os.environ, LOAD_WORKER_AUTHKEY=authkey.hex())
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "shared.load_cluster", "--listen", "127.0.0.1:0", "--once", "--hex-authkey"],
+            cwd=ROOT_DIR, env=env, stdout=subprocess.PIPE, text=True,
+        )
+        for _ in range(count)
+    ]
+    started = []
+    for process in processes:
+        # Première ligne du worker: son port d'écoute
+        line = process.stdout.readline()
+        if not line.startswith("LISTENING "):
+            for other in processes:
+                other.kill()
+            raise LoadClusterError("Un worker de charge local n'a pas démarré")
+        started.append((process, ("127.0.0.1", int(line.split()[1]))))
+    return started
+
+
+def run_distributed(url, mode="closed", users=10, rate=None, duration=30, local_workers=1,
+                    remote_workers=None, method="GET", headers=None, body=None, scenario=None, on_progress=None):
+    """
+    Exécute un test de charge réparti entre des workers locaux et distants.
+
+    Args:
+        url (str): URL testée
+        mode (str, optional): "closed" (utilisateurs virtuels) ou "open" (débit cible)
+        users (int, optional): Utilisateurs virtuels au total (modèle fermé)
+        rate (float, optional): Débit cible total (modèle ouvert)
+        duration (float, optional): Durée du test, en secondes
+        local_workers (int, optional): Processus générateurs locaux
+        remote_workers (list, optional): Adresses "hôte:port" des workers distants (défaut: LOAD_REMOTE_WORKERS)
+        method, headers, body (optional): Requête envoyée (voir LoadTest)
+        scenario (ScenarioSet, optional): Scénarios exécutés à la place de la requête unique
+        on_progress (callable, optional): Appelé avec les résultats fusionnés (LoadResults) à chaque envoi d'un worker
+
+    Returns:
+        dict: Rapport fusionné, au format de LoadTest.run, avec le détail par worker
+
+    Raises:
+        LoadClusterError: Si aucun worker n'est joignable
+    """
+    remote_workers = REMOTE_WORKERS if remote_workers is None else remote_workers
+    local_key = secrets.token_bytes(16)
+    processes = []
+    workers = []
+    try:
+        for process, address in _spawn_local_workers(max(local_workers, 0), local_key):
+            processes.append(process)
+            workers.append({"name": f"local:{process.pid}", "address": address, "authkey": local_key})
+        for remote in remote_workers:
+            if not AUTHKEY:
+                raise LoadClusterError("LOAD_WORKER_AUTHKEY est requis pour les workers distants")
+            workers.append({"name": remote, "address": _address(remote), "authkey": AUTHKEY.encode()})
+        if not workers:
+            raise LoadClusterError("Aucun worker de charge")
+
+        connections = {}
+        for worker in workers:
+            try:
+                connections[worker["name"]] = Client(worker["address"], authkey=worker["authkey"])
+            except (OSError, EOFError) as e:
+                logger.warning(f"Worker de charge {worker['name']} injoignable: {str(e)}")
+        if not connections:
+            raise LoadClusterError("Aucun worker de charge joignable")
+
+        shares = split_load(mode, users, rate, len(connections))
+        spec = {"url": url, "method": method, "headers": headers, "body": body, "mode": mode,
+                "duration": duration, "start_in": START_DELAY, "report_interval": REPORT_INTERVAL}
+        active = {}
+        for index, ((name, connection), share) in enumerate(zip(list(connections.items()), shares)):
+            if scenario is not None:
+                share = dict(share, scenario=scenario.to_dict((index, len(connections))))
+            connection.send(dict(spec, **share))
+            active[connection] = name
+        for name, connection in connections.items():
+            if connection not in active:
+                connection.close()
+
+        merged = LoadResults(0.0)
+        merged_steps = {key: LoadResults(0.0) for key in scenario.step_keys()} if scenario is not None else {}
+        iterations = {"completed": 0, "failed": 0, "interrupted": 0}
+        scenario_errors = {}
+        details = {name: {"worker": name, "requests": 0, "generator": None, "error": None}
+                   for name in active.values()}
+        connection_stats = {"opened": 0, "reused": 0, "closed": 0}
+        deadline = time.time() + START_DELAY + duration + REQUEST_TIMEOUT + 10
+        while active and time.time() < deadline:
+            for connection in wait(list(active), timeout=max(deadline - time.time(), 0)):
+                name = active[connection]
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    message = {"type": "error", "message": "connexion perdue"}
+                if message["type"] in ("delta", "done"):
+                    delta = LoadResults.from_dict(message["results"])
+                    merged.merge(delta)
+                    for key, data in message.get("steps", {}).items():
+                        merged_steps.setdefault(key, LoadResults(0.0)).merge(LoadResults.from_dict(data))
+                    details[name]["requests"] += delta.requests
+                    if on_progress is not None:
+                        on_progress(merged)
+                if message["type"] == "done":
+                    details[name]["generator"] = message["generator"]
+                    for key, value in message["connections"].items():
+                        connection_stats[key] = connection_stats.get(key, 0) + value
+                    for key, value in (message.get("iterations") or {}).items():
+                        iterations[key] = iterations.get(key, 0) + value
+                    for key, value in (message.get("scenario_errors") or {}).items():
+                        scenario_errors[key] = scenario_errors.get(key, 0) + value
+                if message["type"] in ("done", "error"):
+                    if message["type"] == "error":
+                        details[name]["error"] = message["message"]
+                        logger.error(f"Worker de charge {name}: {message['message']}")
+                    connection.close()
+                    del active[connection]
+        for connection, name in active.items():
+            details[name]["error"] = "délai dépassé"
+            connection.close()
+    finally:
+        for process in processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    generators = [detail["generator"] for detail in details.values() if detail["generator"]]
+    report = merged.summary()
+    report.update(
+        mode=mode,
+        target_rps=rate if mode == "open" else None,
+        concurrent_users=users if mode == "closed" else None,
+        duration_seconds=duration,
+        connections=connection_stats,
+        generator={
+            "late_sends": sum(generator["late_sends"] for generator in generators),
+            "missed_sends": sum(generator.get("missed_sends", 0) for generator in generators),
+            "max_schedule_lag_ms": max((generator["max_schedule_lag_ms"] for generator in generators), default=0),
+            "max_loop_lag_ms": max((generator["max_loop_lag_ms"] for generator in generators), default=0),
+            "max_in_flight": sum(generator["max_in_flight"] for generator in generators),
+        },
+        workers=list(details.values()),
+        raw=merged.to_dict(),
+    )
+    if merged_steps:
+        report.update(
+            steps=steps_summary(merged_steps),
+            iterations=iterations,
+            scenario_errors=scenario_errors,
+            raw_steps={key: results.to_dict() for key, results in merged_steps.items()},
+        )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de génération de charge de l'agent Performance")
+    parser.add_argument("--listen", default=f"0.0.0.0:{WORKER_PORT}", help="Adresse d'écoute hôte:port")
+    parser.add_argument("--once", action="store_true", help="S'arrêter après un test")
+    parser.add_argument("--hex-authkey", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    if not AUTHKEY:
+        parser.error("LOAD_WORKER_AUTHKEY doit être défini (clé partagée avec le coordinateur)")
+    authkey = bytes.fromhex(AUTHKEY) if args.hex_authkey else AUTHKEY.encode()
+    host, port = _address(args.listen)
+    try:
+        run_worker(host, port, authkey, once=args.once)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,925 @@
+"""
+Moteur asynchrone de génération de charge HTTP (test de charge de l'agent Performance).
+
+``run_stress_test`` appelait ``requests.get`` (bloquant) dans une coroutine: les
+« utilisateurs simultanés » s'exécutaient en fait l'un après l'autre sur la
+boucle d'événements, qui sondait en plus les tâches toutes les 100 ms. Le débit
+mesuré était celui du générateur, pas celui du serveur testé. Ici:
+
+- un client HTTP/1.1 non bloquant (``asyncio.open_connection``) partage un pool
+  de connexions persistantes (keep-alive) entre tous les utilisateurs virtuels;
+- modèle fermé (``closed``): N utilisateurs virtuels enchaînent chacun leurs
+  requêtes, la suivante partant dès la réponse précédente reçue;
+- modèle ouvert (``open``): les requêtes partent à un débit cible, chacune à
+  son heure prévue (``début + i / débit``, sans dérive), qu'importe le temps de
+  réponse des précédentes; le nombre de requêtes en vol reste borné et, si la
+  cible sature, les envois s'arrêtent à la fin du test (``missed_sends``: envois
+  prévus jamais faits, comptés dans la latence corrigée) au lieu de la prolonger;
+- les résultats sont agrégés au fil de l'eau (pas de liste de réponses): un
+  histogramme HDR des latences (p50/p90/p99/p99.9) et une série temporelle par
+  seconde (débit, erreurs, percentiles), en mémoire bornée et sérialisables
+  (``LoadResults.to_dict``) pour comparer les exécutions (``compare_results``);
+- en modèle ouvert, les latences sont aussi mesurées depuis l'heure d'envoi
+  prévue (correction de l'omission coordonnée), à côté des latences mesurées
+  depuis l'envoi réel;
+- le débit est calculé sur la fenêtre réellement mesurée; le retard du générateur
+  sur son planning et la latence de sa boucle sont rapportés, pour distinguer
+  une limite du serveur d'une limite du générateur.
+
+Variables d'environnement:
+    LOAD_REQUEST_TIMEOUT: Délai maximum d'une requête, en secondes (défaut: 30)
+    LOAD_CONNECT_TIMEOUT: Délai maximum d'établissement d'une connexion, en secondes (défaut: 10)
+    LOAD_MAX_IN_FLIGHT: Requêtes en vol au maximum en modèle ouvert (défaut: 1000)
+    LOAD_TIMESERIES_MAX: Intervalles au maximum dans la série temporelle des résultats (défaut: 600)
+    LOAD_MAX_USERS: Utilisateurs simultanés acceptés au maximum par /stress_test (défaut: 100)
+    LOAD_MAX_RPS: Débit cible accepté au maximum par /stress_test, en requêtes/s (défaut: 1000)
+    LOAD_MAX_DURATION: Durée de test acceptée au maximum par /stress_test, en secondes (défaut: 300)
+"""
+
+import asyncio
+import logging
+import math
+import os
+import ssl
+import time
+from urllib.parse import urlsplit
+
+from shared.histogram import Histogram
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = float(os.getenv("LOAD_REQUEST_TIMEOUT", "30"))
+CONNECT_TIMEOUT = float(os.getenv("LOAD_CONNECT_TIMEOUT", "10"))
+MAX_IN_FLIGHT = int(os.getenv("LOAD_MAX_IN_FLIGHT", "1000"))
+TIMESERIES_MAX = int(os.getenv("LOAD_TIMESERIES_MAX", "600"))
+
+# Bornes des paramètres acceptés par /stress_test
+MAX_USERS = int(os.getenv("LOAD_MAX_USERS", "100"))
+MAX_RPS = float(os.getenv("LOAD_MAX_RPS", "1000"))
+MAX_DURATION = int(os.getenv("LOAD_MAX_DURATION", "300"))
+
+MODES = ("closed", "open")
+
+USER_AGENT = "agent-performance-load/1.0"
+
+# Taille des lectures du corps des réponses (non conservé par défaut)
+READ_CHUNK = 65536
+
+# Percentiles de latence rapportés
+PERCENTILES = (50, 90, 99, 99.9)
+
+# Précision des histogrammes de la série temporelle (erreur relative ~3 %, moins d'intervalles)
+TIMESERIES_BITS = 5
+
+# Retard d'envoi au-delà duquel une requête du modèle ouvert est comptée en retard, en secondes
+LATE_SEND_THRESHOLD = 0.005
+
+# Période de la sonde de latence de la boucle d'événements, en secondes
+LOOP_PROBE_INTERVAL = 0.01
+
+
+class HttpClientError(Exception):
+    """Réponse HTTP illisible ou connexion interrompue."""
+
+
+class HttpResponse:
+    """Réponse HTTP reçue par le client de charge."""
+
+    __slots__ = ("status", "headers", "body", "size")
+
+    def __init__(self, status, headers, body, size):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.size = size
+
+    def header(self, name, default=None):
+        """Première valeur d'un en-tête (nom insensible à la casse)."""
+        name = name.lower()
+        for key, value in self.headers:
+            if key == name:
+                return value
+        return default
+
+
+class _Connection:
+    __slots__ = ("key", "reader", "writer", "requests")
+
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.requests = 0
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Connexions HTTP persistantes partagées par les utilisateurs virtuels d'un test."""
+
+    def __init__(self, max_connections, connect_timeout=CONNECT_TIMEOUT):
+        """
+        Args:
+            max_connections (int): Connexions ouvertes simultanément au maximum
+            connect_timeout (float, optional): Délai maximum d'établissement d'une connexion
+        """
+        self.max_connections = max(1, int(max_connections))
+        self.connect_timeout = connect_timeout
+        self._slots = asyncio.Semaphore(self.max_connections)
+        self._idle = {}
+        self._ssl = None
+        self.stats = {"opened": 0, "reused": 0, "closed": 0}
+
+    async def acquire(self, scheme, host, port):
+        """
+        Retourne une connexion libre vers l'hôte, en en ouvrant une au besoin.
+
+        Returns:
+            tuple: (connexion, True si elle a déjà servi)
+        """
+        await self._slots.acquire()
+        key = (scheme, host, port)
+        idle = self._idle.get(key)
+        while idle:
+            connection = idle.pop()
+            if connection.reader.at_eof() or connection.writer.is_closing():
+                self._discard(connection)
+                continue
+            self.stats["reused"] += 1
+            return connection, True
+        try:
+            context = None
+            if scheme == "https":
+                if self._ssl is None:
+                    self._ssl = ssl.create_default_context()
+                context = self._ssl
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=context, server_hostname=host if context else None),
+                self.connect_timeout,
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+        self.stats["opened"] += 1
+        return _Connection(key, reader, writer), False
+
+    def release(self, connection, reusable):
+        """Rend une connexion au pool, ou la ferme si elle ne peut pas resservir."""
+        if reusable:
+            self._idle.setdefault(connection.key, []).append(connection)
+        else:
+            self._discard(connection)
+        self._slots.release()
+
+    def _discard(self, connection):
+        self.stats["closed"] += 1
+        connection.close()
+
+    def close(self):
+        for idle in self._idle.values():
+            for connection in idle:
+                self._discard(connection)
+        self._idle.clear()
+
+
+def _parse_headers(raw):
+    lines = raw.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+        raise HttpClientError(f"Ligne de statut invalide: {lines[0][:80]!r}")
+    try:
+        status = int(parts[1])
+    except ValueError:
+        raise HttpClientError(f"Code de statut invalide: {parts[1][:20]!r}")
+    headers = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, _, value = line.partition(":")
+        headers.append((name.strip().lower(), value.strip()))
+    return parts[0], status, headers
+
+
+async def _read_body(reader, length, keep_body):
+    """Lit ``length`` octets (ou jusqu'à la fin si None); retourne (corps ou None, taille)."""
+    chunks = [] if keep_body else None
+    size = 0
+    while length is None or size < length:
+        chunk = await reader.read(READ_CHUNK if length is None else min(READ_CHUNK, length - size))
+        if not chunk:
+            if length is not None:
+                raise HttpClientError("Connexion fermée avant la fin de la réponse")
+            break
+        size += len(chunk)
+        if keep_body:
+            chunks.append(chunk)
+    return (b"".join(chunks) if keep_body else None), size
+
+
+async def _read_chunked(reader, keep_body):
+    chunks = [] if keep_body else None
+    size = 0
+    while True:
+        line = await reader.readline()
+        if not line.endswith(b"\n"):
+            raise HttpClientError("Connexion fermée pendant une réponse chunked")
+        try:
+            chunk_size = int(line.split(b";", 1)[0].strip(), 16)
+        except ValueError:
+            raise HttpClientError(f"Taille de bloc invalide: {line[:20]!r}")
+        if chunk_size == 0:
+            # En-têtes de fin éventuels, jusqu'à la ligne vide
+            while (await reader.readline()).strip():
+                pass
+            break
+        body, read = await _read_body(reader, chunk_size, keep_body)
+        size += read
+        if keep_body:
+            chunks.append(body)
+        await reader.readexactly(2)
+    return (b"".join(chunks) if keep_body else None), size
+
+
+async def _exchange(connection, request, method, keep_body):
+    """Envoie une requête sur la connexion et lit la réponse; retourne (réponse, connexion réutilisable)."""
+    connection.writer.write(request)
+    await connection.writer.drain()
+    try:
+        raw = await connection.reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        raise ConnectionResetError("Connexion fermée par le serveur") from e
+    version, status, headers = _parse_headers(raw[:-4])
+    response = HttpResponse(status, headers, None, 0)
+
+    connection_header = (response.header("connection") or "").lower()
+    reusable = ("close" not in connection_header
+                and (version != "HTTP/1.0" or "keep-alive" in connection_header))
+
+    if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+        body, size = (b"" if keep_body else None), 0
+    elif "chunked" in (response.header("transfer-encoding") or "").lower():
+        body, size = await _read_chunked(connection.reader, keep_body)
+    elif response.header("content-length") is not None:
+        body, size = await _read_body(connection.reader, int(response.header("content-length")), keep_body)
+    else:
+        # Ni longueur ni découpage: le corps s'arrête à la fermeture de la connexion
+        body, size = await _read_body(connection.reader, None, keep_body)
+        reusable = False
+    response.body = body
+    response.size = size
+    connection.requests += 1
+    return response, reusable
+
+
+async def fetch(pool, method, url, headers=None, body=None, keep_body=False):
+    """
+    Exécute une requête HTTP/1.1 sur une connexion du pool.
+
+    Args:
+        pool (ConnectionPool): Pool de connexions du test
+        method (str): Méthode HTTP
+        url (str): URL absolue (http ou https)
+        headers (dict, optional): En-têtes supplémentaires
+        body (bytes | str, optional): Corps de la requête
+        keep_body (bool, optional): Conserver le corps de la réponse (sinon seule sa taille est retenue)
+
+    Returns:
+        HttpResponse: Réponse reçue (les redirections ne sont pas suivies)
+
+    Raises:
+        HttpClientError, OSError: Réponse invalide ou erreur réseau
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        raise HttpClientError(f"URL non supportée: {url}")
+    host = parts.hostname
+    port = parts.port or (443 if scheme == "https" else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+
+    default_port = port == (443 if scheme == "https" else 80)
+    lines = [
+        f"{method} {path} HTTP/1.1",
+        f"Host: {host if default_port else f'{host}:{port}'}",
+        f"User-Agent: {USER_AGENT}",
+        "Accept: */*",
+    ]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    if body is not None:
+        lines.append(f"Content-Length: {len(body)}")
+    request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b"")
+
+    for attempt in range(2):
+        connection, reused = await pool.acquire(scheme, host, port)
+        reusable = False
+        try:
+            response, reusable = await _exchange(connection, request, method, keep_body)
+            return response
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # Connexion persistante fermée par le serveur entre deux requêtes: une nouvelle tentative
+            if reused and attempt == 0:
+                continue
+            raise
+        finally:
+            pool.release(connection, reusable)
+
+
+class _Interval:
+    """Requêtes terminées pendant un intervalle de la série temporelle."""
+
+    __slots__ = ("requests", "errors", "latency", "corrected")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latency = Histogram(TIMESERIES_BITS)
+        self.corrected = None
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.errors += other.errors
+        self.latency.merge(other.latency)
+        self.corrected = _merge_optional(self.corrected, other.corrected)
+        return self
+
+    def to_dict(self):
+        data = {"requests": self.requests, "errors": self.errors, "latency_us": self.latency.to_dict()}
+        if self.corrected is not None:
+            data["corrected_us"] = self.corrected.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        interval = cls()
+        interval.requests = data.get("requests", 0)
+        interval.errors = data.get("errors", 0)
+        interval.latency = Histogram.from_dict(data["latency_us"])
+        if "corrected_us" in data:
+            interval.corrected = Histogram.from_dict(data["corrected_us"])
+        return interval
+
+
+def _merge_optional(histogram, other):
+    """Fusionne deux histogrammes dont chacun peut être absent (None)."""
+    if other is None:
+        return histogram
+    if histogram is None:
+        return other.copy()
+    return histogram.merge(other)
+
+
+def _ms(microseconds):
+    return round(microseconds / 1000, 3)
+
+
+def latency_summary(histogram):
+    """Résumé d'un histogramme de latences en microsecondes, converti en millisecondes."""
+    return {key: (value if key == "count" else _ms(value))
+            for key, value in histogram.summary(percentiles=PERCENTILES).items()}
+
+
+class LoadResults:
+    """
+    Agrégats d'un test de charge, mis à jour à chaque réponse.
+
+    Les latences des requêtes réussies vont dans un histogramme HDR (en
+    microsecondes) et dans une série temporelle par intervalle de temps. En
+    modèle ouvert, un second histogramme mesure chaque latence depuis l'heure
+    d'envoi prévue plutôt que depuis l'envoi réel (correction de l'omission
+    coordonnée): quand le générateur prend du retard (serveur saturé, requêtes
+    en vol au maximum), l'attente des requêtes retardées y est comptée au lieu
+    de disparaître des mesures. La
+    mémoire ne dépend pas du nombre de requêtes. Au-delà de
+    ``LOAD_TIMESERIES_MAX`` intervalles, leur durée double (intervalles voisins
+    fusionnés): la mémoire reste bornée quelle que soit la durée du test.
+    """
+
+    def __init__(self, origin=None):
+        """
+        Args:
+            origin (float, optional): Début du test (time.perf_counter), référence de la série temporelle
+                (défaut: premier envoi enregistré)
+        """
+        self.origin = origin
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.bytes = 0
+        self.latency = Histogram()
+        self.corrected = None
+        self.status_codes = {}
+        self.errors = {}
+        # Fenêtre mesurée, en secondes depuis l'origine
+        self.first_send = None
+        self.last_done = None
+        self.interval = 1
+        self.timeseries = {}
+
+    def record(self, start, end, status=None, size=0, error=None, scheduled=None, ok=None):
+        """
+        Enregistre une requête terminée.
+
+        Args:
+            start (float): Envoi (time.perf_counter)
+            end (float): Réponse reçue ou échec (time.perf_counter)
+            status (int, optional): Code HTTP de la réponse
+            size (int, optional): Taille du corps de la réponse, en octets
+            error (str, optional): Type d'erreur si aucune réponse n'a été reçue
+            scheduled (float, optional): Heure d'envoi prévue (modèle ouvert), pour la latence corrigée
+            ok (bool, optional): Réponse conforme à l'attendu (défaut: code 2xx ou 3xx)
+        """
+        if self.origin is None:
+            self.origin = start
+        sent, done = start - self.origin, end - self.origin
+        self.requests += 1
+        self.first_send = sent if self.first_send is None else min(self.first_send, sent)
+        self.last_done = done if self.last_done is None else max(self.last_done, done)
+        interval = self._interval(done)
+        interval.requests += 1
+        if error is not None:
+            self.failures += 1
+            interval.errors += 1
+            self.errors[error] = self.errors.get(error, 0) + 1
+            return
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        self.bytes += size
+        if ok is None:
+            ok = 200 <= status < 400
+        if ok:
+            self.successes += 1
+            latency = (end - start) * 1e6
+            self.latency.record(latency)
+            interval.latency.record(latency)
+            if scheduled is not None:
+                corrected = (end - min(scheduled, start)) * 1e6
+                if self.corrected is None:
+                    self.corrected = Histogram()
+                if interval.corrected is None:
+                    interval.corrected = Histogram(TIMESERIES_BITS)
+                self.corrected.record(corrected)
+                interval.corrected.record(corrected)
+        else:
+            self.failures += 1
+            interval.errors += 1
+
+    def record_missed(self, scheduled, end):
+        """
+        Enregistre un envoi prévu jamais fait (modèle ouvert, cible saturée jusqu'à la fin du test).
+
+        Seule la latence corrigée le compte, pour sa valeur minimale (``end - scheduled``): l'ignorer
+        réintroduirait l'omission coordonnée.
+
+        Args:
+            scheduled (float): Heure d'envoi prévue (time.perf_counter)
+            end (float): Fin du test (time.perf_counter)
+        """
+        if self.origin is None:
+            self.origin = scheduled
+        corrected = max(end - scheduled, 0) * 1e6
+        interval = self._interval(end - self.origin)
+        if self.corrected is None:
+            self.corrected = Histogram()
+        if interval.corrected is None:
+            interval.corrected = Histogram(TIMESERIES_BITS)
+        self.corrected.record(corrected)
+        interval.corrected.record(corrected)
+
+    def _interval(self, offset):
+        index = max(int(offset // self.interval), 0)
+        interval = self.timeseries.get(index)
+        if interval is None:
+            while index >= TIMESERIES_MAX:
+                self._coarsen()
+                index //= 2
+            interval = self.timeseries.get(index)
+            if interval is None:
+                interval = self.timeseries[index] = _Interval()
+        return interval
+
+    def _coarsen(self):
+        """Double la durée des intervalles en fusionnant les intervalles voisins."""
+        coarse = {}
+        for index, interval in self.timeseries.items():
+            if index // 2 in coarse:
+                coarse[index // 2].merge(interval)
+            else:
+                coarse[index // 2] = interval
+        self.timeseries = coarse
+        self.interval *= 2
+
+    def merge(self, other):
+        """
+        Ajoute les résultats d'un autre générateur, de même origine (test commun).
+
+        Args:
+            other (LoadResults): Résultats à fusionner
+        """
+        self.requests += other.requests
+        self.successes += other.successes
+        self.failures += other.failures
+        self.bytes += other.bytes
+        self.latency.merge(other.latency)
+        self.corrected = _merge_optional(self.corrected, other.corrected)
+        for status, count in other.status_codes.items():
+            self.status_codes[status] = self.status_codes.get(status, 0) + count
+        for error, count in other.errors.items():
+            self.errors[error] = self.errors.get(error, 0) + count
+        if other.first_send is not None:
+            self.first_send = other.first_send if self.first_send is None else min(self.first_send, other.first_send)
+            self.last_done = other.last_done if self.last_done is None else max(self.last_done, other.last_done)
+        timeseries = other.timeseries
+        if other.interval < self.interval:
+            # Ramène les intervalles de l'autre série à la durée de celle-ci
+            factor = self.interval // other.interval
+            timeseries = {}
+            for index, interval in other.timeseries.items():
+                timeseries.setdefault(index // factor, _Interval()).merge(interval)
+        while other.interval > self.interval:
+            self._coarsen()
+        for index, interval in timeseries.items():
+            self._interval(index * self.interval).merge(interval)
+        return self
+
+    @property
+    def elapsed(self):
+        """Fenêtre mesurée: du premier envoi à la dernière réponse, en secondes."""
+        if self.first_send is None:
+            return 0.0
+        return self.last_done - self.first_send
+
+    def series(self):
+        """
+        Série temporelle lisible: débit, erreurs et percentiles de latence par intervalle.
+
+        Returns:
+            list: Un point par intervalle, depuis le début du test
+        """
+        points = []
+        for index in range(max(self.timeseries, default=-1) + 1):
+            interval = self.timeseries.get(index) or _Interval()
+            point = {
+                "t": index * self.interval,
+                "requests": interval.requests,
+                "rps": round(interval.requests / self.interval, 2),
+                "errors": interval.errors,
+                "p50_ms": _ms(interval.latency.percentile(50)),
+                "p90_ms": _ms(interval.latency.percentile(90)),
+                "p99_ms": _ms(interval.latency.percentile(99)),
+            }
+            if self.corrected is not None:
+                point["corrected_p99_ms"] = _ms(interval.corrected.percentile(99)) if interval.corrected else 0
+            points.append(point)
+        return points
+
+    def summary(self):
+        """
+        Résumé du test: compteurs, débit et percentiles de latence.
+
+        Returns:
+            dict: Résultats lisibles (temps de réponse moyen, min et max en secondes, percentiles en ms).
+                ``latency_ms`` est mesuré depuis l'envoi réel; ``corrected_latency_ms`` (modèle ouvert,
+                sinon None) depuis l'heure d'envoi prévue
+        """
+        elapsed = self.elapsed
+        return {
+            "total_requests": self.requests,
+            "successful_requests": self.successes,
+            "failed_requests": self.failures,
+            "success_rate": (self.successes / self.requests) * 100 if self.requests else 0,
+            "requests_per_second": self.requests / elapsed if elapsed > 0 else 0,
+            "measured_seconds": round(elapsed, 3),
+            "avg_response_time": self.latency.mean / 1e6,
+            "min_response_time": (self.latency.min or 0) / 1e6,
+            "max_response_time": (self.latency.max or 0) / 1e6,
+            "latency_ms": latency_summary(self.latency),
+            "corrected_latency_ms": latency_summary(self.corrected) if self.corrected is not None else None,
+            "bytes_received": self.bytes,
+            "status_codes": {str(status): count for status, count in sorted(self.status_codes.items())},
+            "errors": dict(self.errors),
+            "interval_seconds": self.interval,
+            "timeseries": self.series(),
+        }
+
+    def to_dict(self):
+        """État complet sérialisable en JSON (histogrammes compris), relu par ``from_dict``."""
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "bytes": self.bytes,
+            "latency_us": self.latency.to_dict(),
+            "corrected_us": self.corrected.to_dict() if self.corrected is not None else None,
+            "status_codes": {str(status): count for status, count in self.status_codes.items()},
+            "errors": dict(self.errors),
+            "first_send": self.first_send,
+            "last_done": self.last_done,
+            "interval": self.interval,
+            "timeseries": {str(index): interval.to_dict() for index, interval in self.timeseries.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Reconstruit des résultats depuis ``to_dict``."""
+        results = cls()
+        results.requests = data.get("requests", 0)
+        results.successes = data.get("successes", 0)
+        results.failures = data.get("failures", 0)
+        results.bytes = data.get("bytes", 0)
+        results.latency = Histogram.from_dict(data["latency_us"])
+        if data.get("corrected_us"):
+            results.corrected = Histogram.from_dict(data["corrected_us"])
+        results.status_codes = {int(status): count for status, count in data.get("status_codes", {}).items()}
+        results.errors = dict(data.get("errors", {}))
+        results.first_send = data.get("first_send")
+        results.last_done = data.get("last_done")
+        results.interval = data.get("interval", 1)
+        results.timeseries = {int(index): _Interval.from_dict(interval)
+                              for index, interval in data.get("timeseries", {}).items()}
+        return results
+
+
+def steps_summary(step_results):
+    """
+    Détail par étape d'un scénario: requêtes, échecs et percentiles de latence.
+
+    Args:
+        step_results (dict): Étape ("scénario/étape") -> LoadResults
+
+    Returns:
+        list: Un résumé par étape, dans l'ordre des étapes
+    """
+    return [
+        {"step": key, "requests": results.requests, "failures": results.failures,
+         "latency_ms": latency_summary(results.latency)}
+        for key, results in step_results.items()
+    ]
+
+
+def compare_results(baseline, candidate):
+    """
+    Compare deux exécutions: débit, taux d'erreur et percentiles de latence.
+
+    Args:
+        baseline (dict): Rapport de référence (``LoadTest.run``) ou état ``LoadResults.to_dict``
+        candidate (dict): Rapport ou état de l'exécution comparée
+
+    Returns:
+        dict: Valeurs des deux exécutions et écart relatif (%) par indicateur
+    """
+    def load(data):
+        return LoadResults.from_dict(data.get("raw", data))
+
+    before, after = load(baseline), load(candidate)
+    metrics = {}
+
+    def add(name, old, new):
+        metrics[name] = {
+            "baseline": round(old, 3),
+            "candidate": round(new, 3),
+            "change_percent": round((new - old) / old * 100, 1) if old else None,
+        }
+
+    add("requests_per_second", before.requests / before.elapsed if before.elapsed > 0 else 0,
+        after.requests / after.elapsed if after.elapsed > 0 else 0)
+    add("error_rate_percent", before.failures / before.requests * 100 if before.requests else 0,
+        after.failures / after.requests * 100 if after.requests else 0)
+    add("mean_ms", before.latency.mean / 1000, after.latency.mean / 1000)
+    for percent in PERCENTILES:
+        add(f"p{percent:g}_ms", before.latency.percentile(percent) / 1000, after.latency.percentile(percent) / 1000)
+    if before.corrected is not None and after.corrected is not None:
+        for percent in PERCENTILES:
+            add(f"corrected_p{percent:g}_ms", before.corrected.percentile(percent) / 1000,
+                after.corrected.percentile(percent) / 1000)
+    return metrics
+
+
+class LoadTest:
+    """Test de charge d'une URL, en modèle fermé ou ouvert."""
+
+    def __init__(self, url, method="GET", headers=None, body=None, timeout=REQUEST_TIMEOUT):
+        """
+        Args:
+            url (str): URL testée
+            method (str, optional): Méthode HTTP
+            headers (dict, optional): En-têtes supplémentaires
+            body (bytes | str, optional): Corps des requêtes
+            timeout (float, optional): Délai maximum d'une requête, en secondes
+        """
+        self.url = url
+        self.method = method.upper()
+        self.headers = headers
+        self.body = body
+        self.timeout = timeout
+        self.results = LoadResults()
+        # Résultats par étape (scénarios en plusieurs étapes, voir shared/load_scenario.py)
+        self.step_results = {}
+        self.iterations = {"completed": 0, "failed": 0, "interrupted": 0}
+        self.deadline = None
+        self.pool = None
+        self._generator = {"late_sends": 0, "missed_sends": 0, "max_schedule_lag_ms": 0.0,
+                           "max_loop_lag_ms": 0.0, "max_in_flight": 0}
+        self._in_flight = 0
+
+    async def request(self, method, url, headers=None, body=None, scheduled=None, keep_body=False,
+                      expect=None, step=None):
+        """
+        Envoie une requête chronométrée et l'enregistre dans les résultats du test.
+
+        Args:
+            method (str): Méthode HTTP
+            url (str): URL absolue
+            headers (dict, optional): En-têtes supplémentaires
+            body (bytes | str, optional): Corps de la requête
+            scheduled (float, optional): Heure d'envoi prévue (modèle ouvert), pour la latence corrigée
+            keep_body (bool, optional): Conserver le corps de la réponse
+            expect (collection, optional): Codes HTTP attendus (défaut: 2xx ou 3xx)
+            step (str, optional): Étape (clé de ``step_results``) où enregistrer aussi la requête
+
+        Returns:
+            HttpResponse: Réponse reçue, ou None si la requête a échoué (réseau, délai dépassé)
+        """
+        start = time.perf_counter()
+        response = error = None
+        try:
+            response = await asyncio.wait_for(fetch(self.pool, method, url, headers, body, keep_body), self.timeout)
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except (OSError, HttpClientError, asyncio.IncompleteReadError) as e:
+            error = type(e).__name__
+        end = time.perf_counter()
+        ok = None if response is None or expect is None else response.status in expect
+        # Résultats de l'étape lus à la fin de la requête: take_step_results a pu les remplacer entre-temps
+        for target in (self.results, self.step_results.get(step) if step is not None else None):
+            if target is None:
+                continue
+            if response is None:
+                target.record(start, end, error=error, scheduled=scheduled)
+            else:
+                target.record(start, end, response.status, response.size, scheduled=scheduled, ok=ok)
+        return response
+
+    async def iteration(self, scheduled=None):
+        """Une itération d'un utilisateur virtuel: une requête vers l'URL testée."""
+        await self.request(self.method, self.url, self.headers, self.body, scheduled=scheduled)
+
+    async def _timed(self, scheduled=None):
+        self._in_flight += 1
+        self._generator["max_in_flight"] = max(self._generator["max_in_flight"], self._in_flight)
+        try:
+            await self.iteration(scheduled)
+        finally:
+            self._in_flight -= 1
+
+    async def _closed(self, users, deadline):
+        async def user():
+            while time.perf_counter() < deadline:
+                await self._timed()
+
+        await asyncio.gather(*(user() for _ in range(users)))
+
+    async def _open(self, rate, start, deadline, max_in_flight, phase):
+        slots = asyncio.Semaphore(max_in_flight)
+        tasks = set()
+
+        def done(task):
+            tasks.discard(task)
+            slots.release()
+
+        # Envois prévus avant la fin du test
+        planned = max(math.ceil(round((deadline - start - phase) * rate, 6)), 0)
+        index = 0
+        while index < planned:
+            # Heure d'envoi absolue: un retard ponctuel ne décale pas les envois suivants
+            scheduled = start + phase + index / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                # Cible saturée (max_in_flight requêtes en vol): une place est attendue jusqu'à la fin du test au plus
+                await asyncio.wait_for(slots.acquire(), max(deadline - time.perf_counter(), 0))
+            except asyncio.TimeoutError:
+                break
+            if time.perf_counter() >= deadline:
+                slots.release()
+                break
+            lag = time.perf_counter() - scheduled
+            if lag > LATE_SEND_THRESHOLD:
+                self._generator["late_sends"] += 1
+            self._generator["max_schedule_lag_ms"] = max(self._generator["max_schedule_lag_ms"], lag * 1000)
+            task = asyncio.ensure_future(self._timed(scheduled))
+            tasks.add(task)
+            task.add_done_callback(done)
+            index += 1
+        # Requêtes non envoyées à la fin du test: pas envoyées en retard, mais comptées dans la latence
+        # corrigée (au moins jusqu'à la fin du test) et dans le diagnostic du générateur
+        self._generator["missed_sends"] += planned - index
+        for missed in range(index, planned):
+            self.results.record_missed(start + phase + missed / rate, deadline)
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def _probe_loop(self, stop):
+        """Mesure le retard de réveil de la boucle: un générateur saturé fausse les mesures."""
+        while not stop.is_set():
+            expected = time.perf_counter() + LOOP_PROBE_INTERVAL
+            await asyncio.sleep(LOOP_PROBE_INTERVAL)
+            lag = (time.perf_counter() - expected) * 1000
+            self._generator["max_loop_lag_ms"] = max(self._generator["max_loop_lag_ms"], lag)
+
+    def take_results(self):
+        """
+        Retourne les résultats enregistrés jusqu'ici et repart de résultats vides (même origine).
+
+        Returns:
+            LoadResults: Résultats depuis le précédent appel (delta)
+        """
+        results, self.results = self.results, LoadResults(self.results.origin)
+        return results
+
+    def take_step_results(self):
+        """
+        Returns:
+            dict: Étape -> résultats (LoadResults) depuis le précédent appel (delta)
+        """
+        step_results = self.step_results
+        self.step_results = {key: LoadResults(results.origin) for key, results in step_results.items()}
+        return step_results
+
+    def generator_stats(self):
+        """
+        Returns:
+            dict: Retard du générateur sur son planning, latence de sa boucle et requêtes en vol au maximum
+        """
+        return {key: round(value, 2) for key, value in self._generator.items()}
+
+    async def run(self, mode="closed", users=10, rate=None, duration=30, max_in_flight=MAX_IN_FLIGHT,
+                  phase=0.0, start_at=None):
+        """
+        Exécute le test.
+
+        Args:
+            mode (str, optional): "closed" (utilisateurs virtuels) ou "open" (débit cible)
+            users (int, optional): Utilisateurs virtuels (modèle fermé)
+            rate (float, optional): Requêtes par seconde visées (modèle ouvert)
+            duration (float, optional): Durée d'envoi des requêtes, en secondes
+            max_in_flight (int, optional): Requêtes en vol au maximum (modèle ouvert)
+            phase (float, optional): Décalage du planning d'envoi, en secondes (modèle ouvert, générateurs
+                multiples entrelacés)
+            start_at (float, optional): Début du test (time.perf_counter), pour démarrer en même temps que
+                d'autres générateurs (défaut: immédiatement)
+
+        Returns:
+            dict: Résumé des résultats (LoadResults.summary), état du générateur et,
+                sous "raw", l'état sérialisé des résultats (LoadResults.to_dict)
+        """
+        if mode not in MODES:
+            raise ValueError(f"Mode de test inconnu: {mode}")
+        if mode == "open" and not rate:
+            raise ValueError("Le modèle ouvert demande un débit cible")
+
+        connections = users if mode == "closed" else max_in_flight
+        self.pool = ConnectionPool(connections)
+        if start_at is not None:
+            await asyncio.sleep(max(start_at - time.perf_counter(), 0))
+        stop = asyncio.Event()
+        probe = asyncio.ensure_future(self._probe_loop(stop))
+        start = time.perf_counter()
+        for results in [self.results, *self.step_results.values()]:
+            results.origin = start
+        deadline = self.deadline = start + duration
+        try:
+            if mode == "closed":
+                await self._closed(users, deadline)
+            else:
+                await self._open(rate, start, deadline, max_in_flight, phase)
+        finally:
+            stop.set()
+            await probe
+            self.pool.close()
+
+        report = self.results.summary()
+        report.update(
+            mode=mode,
+            target_rps=rate if mode == "open" else None,
+            concurrent_users=users if mode == "closed" else None,
+            duration_seconds=duration,
+            connections=dict(self.pool.stats),
+            generator=self.generator_stats(),
+            raw=self.results.to_dict(),
+        )
+        if self.step_results:
+            report.update(
+                steps=steps_summary(self.step_results),
+                iterations=dict(self.iterations),
+                raw_steps={key: results.to_dict() for key, results in self.step_results.items()},
+            )
+        return report
@@ -0,0 +1,463 @@
+"""
+Scénarios de test de charge en plusieurs étapes (parcours utilisateurs).
+
+``/stress_test`` ne savait envoyer que des GET vers une seule URL, alors que le
+trafic réel est un parcours: connexion, recherche, dépôt d'une annonce. Un
+scénario (YAML ou JSON) décrit ces parcours; ``ScenarioLoadTest`` les exécute
+avec le moteur de ``shared/load_engine.py`` (modèles fermé et ouvert, workers
+répartis), chaque itération d'un utilisateur virtuel étant un parcours complet:
+
+    base_url: https://annonces.example.com
+    defaults:
+      headers: {Accept: application/json}
+      think_time: {distribution: uniform, min_ms: 500, max_ms: 2000}
+    feeders:
+      comptes: {file: comptes.csv, mode: circular}
+    scenarios:
+      - name: depot_annonce
+        weight: 3
+        feeder: comptes
+        steps:
+          - name: connexion
+            method: POST
+            url: /api/login
+            json: {email: "${email}", password: "${password}"}
+            expect: [200]
+            extract:
+              token: {json: "$.token"}
+          - name: depot
+            method: POST
+            url: /api/annonces
+            headers: {Authorization: "Bearer ${token}"}
+            json: {titre: "Vélo", prix: 120}
+            extract:
+              annonce_id: {json: "$.id"}
+          - name: consultation
+            url: /api/annonces/${annonce_id}
+            think_time: {distribution: exponential, mean_ms: 3000}
+      - name: recherche
+        weight: 7
+        steps:
+          - {name: recherche, url: "/api/annonces?q=velo"}
+
+- ``weight``: part des parcours tirés pour chaque scénario;
+- ``feeder``: chaque parcours reçoit une ligne du fichier CSV (colonnes =
+  variables); ``mode`` ``circular`` (lignes dans l'ordre, en boucle) ou
+  ``random``; les lignes peuvent aussi être données en ligne (``rows``);
+- ``${variable}`` est remplacé dans l'URL, les en-têtes et le corps (``json``,
+  ``form`` ou ``body``);
+- ``extract``: variables lues dans la réponse (``json``: chemin ``$.a.b[0]``,
+  ``regex``: premier groupe, ``header``, ``cookie``); les cookies reçus sont
+  renvoyés automatiquement pendant tout le parcours;
+- ``expect``: codes HTTP attendus (défaut: 2xx ou 3xx); un échec (code
+  inattendu, extraction impossible) interrompt le parcours;
+- ``think_time``: pause après l'étape, en millisecondes (``think_time: 500``)
+  ou tirée d'une distribution de ``shared/bedrock_standin.py`` (constant,
+  uniform, normal, lognormal, exponential).
+
+Les résultats sont détaillés par étape (``steps``: requêtes, échecs,
+percentiles). En modèle ouvert, le débit cible est un débit d'arrivée de
+parcours, et la latence corrigée porte sur la première étape.
+
+Variables d'environnement:
+    LOAD_SCENARIO_DIR: Répertoire des scénarios et des fichiers CSV des feeders (défaut: scenarios/ à la racine)
+"""
+
+import asyncio
+import csv
+import json
+import os
+import random
+import re
+import time
+from urllib.parse import urlencode, urljoin
+
+try:
+    import yaml
+except ImportError:
+    yaml = None  # Scénarios JSON uniquement
+
+from shared.bedrock_standin import sample_latency
+from shared.load_engine import REQUEST_TIMEOUT, LoadResults, LoadTest
+
+SCENARIO_DIR = os.getenv("LOAD_SCENARIO_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scenarios"))
+
+FEEDER_MODES = ("circular", "random")
+
+_VARIABLE = re.compile(r"\$\{(\w+)\}")
+_PATH_TOKEN = re.compile(r"[^.\[\]]+")
+
+# Messages d'erreur de parcours distincts conservés au plus (statistiques)
+MAX_ERROR_KINDS = 20
+
+
+class ScenarioError(ValueError):
+    """Scénario invalide, ou parcours impossible à poursuivre (variable manquante, extraction)."""
+
+
+class Feeder:
+    """Lignes de données distribuées aux parcours (une ligne par parcours)."""
+
+    def __init__(self, name, rows, mode="circular"):
+        if mode not in FEEDER_MODES:
+            raise ScenarioError(f"Feeder {name}: mode inconnu {mode}")
+        if not rows:
+            raise ScenarioError(f"Feeder {name}: aucune ligne")
+        self.name = name
+        self.rows = rows
+        self.mode = mode
+        self._position = 0
+
+    def next(self):
+        if self.mode == "random":
+            return random.choice(self.rows)
+        row = self.rows[self._position % len(self.rows)]
+        self._position += 1
+        return row
+
+    def to_dict(self, partition=None):
+        """
+        Args:
+            partition (tuple, optional): (index, nombre) du worker: en mode circular, chaque worker
+                reçoit une part distincte des lignes
+        """
+        rows = self.rows
+        if partition and self.mode == "circular" and len(rows) >= partition[1]:
+            rows = rows[partition[0]::partition[1]]
+        return {"rows": rows, "mode": self.mode}
+
+
+def _render(value, variables):
+    """Remplace les ``${variable}`` d'une valeur (chaînes, listes et dictionnaires imbriqués)."""
+    if isinstance(value, str):
+        def replace(match):
+            name = match.group(1)
+            if name not in variables:
+                raise ScenarioError(f"Variable inconnue: {name}")
+            return str(variables[name])
+        return _VARIABLE.sub(replace, value)
+    if isinstance(value, dict):
+        return {key: _render(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_render(item, variables) for item in value]
+    return value
+
+
+def _json_path(document, path):
+    value = document
+    for token in _PATH_TOKEN.findall(path.lstrip("$")):
+        if isinstance(value, list) and token.lstrip("-").isdigit():
+            value = value[int(token)]
+        elif isinstance(value, dict):
+            value = value[token]
+        else:
+            raise KeyError(token)
+    return value
+
+
+class Step:
+    """Requête d'un parcours, avec ses extractions et sa pause."""
+
+    def __init__(self, data, defaults, index):
+        if not isinstance(data, dict) or not data.get("url"):
+            raise ScenarioError(f"Étape {index + 1}: 'url' est requis")
+        self.name = str(data.get("name") or f"etape_{index + 1}")
+        self.method = str(data.get("method", "GET")).upper()
+        self.url = data["url"]
+        self.headers = dict(defaults.get("headers") or {}, **(data.get("headers") or {}))
+        self.json = data.get("json")
+        self.form = data.get("form")
+        self.body = data.get("body")
+        expect = data.get("expect")
+        if isinstance(expect, dict):
+            expect = expect.get("status")
+        if isinstance(expect, int):
+            expect = [expect]
+        self.expect = frozenset(int(status) for status in expect) if expect else None
+        self.extract = data.get("extract") or {}
+        for variable, rule in self.extract.items():
+            if not isinstance(rule, dict) or len(rule) != 1 or next(iter(rule)) not in ("json", "regex", "header", "cookie"):
+                raise ScenarioError(f"Étape {self.name}: extraction invalide pour {variable}")
+        self.think_time = data.get("think_time", defaults.get("think_time"))
+        if isinstance(self.think_time, (int, float)) and not isinstance(self.think_time, bool):
+            # Nombre seul: pause constante, en millisecondes
+            self.think_time = {"distribution": "constant", "ms": self.think_time}
+        if self.think_time:
+            if not isinstance(self.think_time, dict):
+                raise ScenarioError(f"Étape {self.name}: think_time doit être un nombre de millisecondes ou une distribution")
+            try:
+                sample_latency(self.think_time)
+            except (ValueError, TypeError, ZeroDivisionError) as e:
+                raise ScenarioError(f"Étape {self.name}: think_time invalide ({str(e)})")
+        self.keep_body = any(next(iter(rule)) in ("json", "regex") for rule in self.extract.values())
+
+    def to_dict(self):
+        data = {"name": self.name, "method": self.method, "url": self.url, "headers": self.headers,
+                "extract": self.extract, "think_time": self.think_time}
+        for key in ("json", "form", "body"):
+            if getattr(self, key) is not None:
+                data[key] = getattr(self, key)
+        if self.expect:
+            data["expect"] = sorted(self.expect)
+        return data
+
+    def build(self, base_url, variables, cookies):
+        """
+        Prépare la requête de l'étape pour un parcours.
+
+        Returns:
+            tuple: (méthode, URL absolue, en-têtes, corps)
+
+        Raises:
+            ScenarioError: Si une variable utilisée n'est pas définie
+        """
+        url = urljoin(base_url or "", _render(self.url, variables))
+        headers = _render(self.headers, variables)
+        body = None
+        if self.json is not None:
+            body = json.dumps(_render(self.json, variables))
+            headers.setdefault("Content-Type", "application/json")
+        elif self.form is not None:
+            body = urlencode(_render(self.form, variables))
+            headers.setdefault("Content-Type", "application/x-www-form-urlencoded")
+        elif self.body is not None:
+            body = _render(str(self.body), variables)
+        if cookies:
+            headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in cookies.items())
+        return self.method, url, headers, body
+
+    def extract_variables(self, response, variables, cookies):
+        """
+        Lit les variables de l'étape dans la réponse.
+
+        Raises:
+            ScenarioError: Si une variable est introuvable
+        """
+        document = None
+        for variable, rule in self.extract.items():
+            kind, expression = next(iter(rule.items()))
+            try:
+                if kind == "json":
+                    if document is None:
+                        document = json.loads(response.body or b"null")
+                    value = _json_path(document, expression)
+                elif kind == "regex":
+                    match = re.search(expression, (response.body or b"").decode("utf-8", errors="replace"))
+                    if match is None:
+                        raise KeyError(expression)
+                    value = match.group(1) if match.groups() else match.group(0)
+                elif kind == "header":
+                    value = response.header(expression)
+                    if value is None:
+                        raise KeyError(expression)
+                else:
+                    value = cookies[expression]
+            except (KeyError, IndexError, TypeError, ValueError):
+                raise ScenarioError(f"Étape {self.name}: {variable} introuvable ({kind}: {expression})")
+            variables[variable] = value
+
+
+class Scenario:
+    """Parcours pondéré: suite d'étapes, avec un feeder optionnel."""
+
+    def __init__(self, data, defaults, feeders, index):
+        if not isinstance(data, dict) or not data.get("steps"):
+            raise ScenarioError(f"Scénario {index + 1}: 'steps' est requis")
+        self.name = str(data.get("name") or f"scenario_{index + 1}")
+        self.weight = float(data.get("weight", 1))
+        if self.weight <= 0:
+            raise ScenarioError(f"Scénario {self.name}: le poids doit être positif")
+        self.feeder = data.get("feeder")
+        if self.feeder is not None and self.feeder not in feeders:
+            raise ScenarioError(f"Scénario {self.name}: feeder inconnu {self.feeder}")
+        self.steps = [Step(step, defaults, step_index) for step_index, step in enumerate(data["steps"])]
+
+    def to_dict(self):
+        return {"name": self.name, "weight": self.weight, "feeder": self.feeder,
+                "steps": [step.to_dict() for step in self.steps]}
+
+
+class ScenarioSet:
+    """Ensemble de scénarios d'un test: URL de base, feeders et mélange pondéré."""
+
+    def __init__(self, data, base_dir=SCENARIO_DIR, base_url=None):
+        """
+        Args:
+            data (dict): Définition (voir l'en-tête du module)
+            base_dir (str, optional): Répertoire des fichiers CSV des feeders
+            base_url (str, optional): URL de base si la définition n'en donne pas
+        """
+        if not isinstance(data, dict):
+            raise ScenarioError("Le scénario doit être un objet")
+        if "steps" in data and "scenarios" not in data:
+            # Forme courte: un seul scénario
+            data = dict(data, scenarios=[{"name": data.get("name", "scenario"), "steps": data["steps"]}])
+        defaults = data.get("defaults") or {}
+        self.base_url = data.get("base_url") or base_url
+        self.feeders = {}
+        for name, spec in (data.get("feeders") or {}).items():
+            rows = spec.get("rows")
+            if rows is None:
+                rows = _read_csv(spec.get("file", ""), base_dir)
+            self.feeders[name] = Feeder(name, rows, spec.get("mode", "circular"))
+        self.scenarios = [Scenario(scenario, defaults, self.feeders, index)
+                          for index, scenario in enumerate(data.get("scenarios") or [])]
+        if not self.scenarios:
+            raise ScenarioError("Aucun scénario défini")
+        if not self.base_url and any(not step.url.startswith(("http://", "https://"))
+                                     for scenario in self.scenarios for step in scenario.steps):
+            raise ScenarioError("'base_url' est requis pour les URL relatives")
+        self._weights = [scenario.weight for scenario in self.scenarios]
+
+    def pick(self):
+        """Tire le scénario d'un nouveau parcours selon les poids."""
+        return random.choices(self.scenarios, weights=self._weights)[0]
+
+    def step_keys(self):
+        return [f"{scenario.name}/{step.name}" for scenario in self.scenarios for step in scenario.steps]
+
+    def to_dict(self, partition=None):
+        """
+        Définition autonome (lignes des feeders incluses), transmise aux workers.
+
+        Args:
+            partition (tuple, optional): (index, nombre) du worker, pour répartir les lignes des feeders
+        """
+        return {
+            "base_url": self.base_url,
+            "feeders": {name: feeder.to_dict(partition) for name, feeder in self.feeders.items()},
+            "scenarios": [scenario.to_dict() for scenario in self.scenarios],
+        }
+
+
+def _read_csv(name, base_dir):
+    path = os.path.realpath(os.path.join(base_dir, name))
+    if not name or not path.startswith(os.path.realpath(base_dir) + os.sep):
+        raise ScenarioError(f"Fichier de feeder invalide: {name!r} (attendu dans {base_dir})")
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    except OSError as e:
+        raise ScenarioError(f"Fichier de feeder illisible: {name} ({str(e)})")
+
+
+def load_scenarios(source, base_url=None, base_dir=SCENARIO_DIR):
+    """
+    Charge une définition de scénarios.
+
+    Args:
+        source (dict | str): Définition déjà décodée, ou texte YAML/JSON
+        base_url (str, optional): URL de base si la définition n'en donne pas
+        base_dir (str, optional): Répertoire des fichiers CSV des feeders
+
+    Returns:
+        ScenarioSet: Scénarios validés
+
+    Raises:
+        ScenarioError: Si la définition est invalide
+    """
+    if isinstance(source, str):
+        try:
+            source = yaml.safe_load(source) if yaml is not None else json.loads(source)
+        except ValueError as e:
+            hint = "" if yaml is not None else " (PyYAML non installé: seul le JSON est accepté)"
+            raise ScenarioError(f"Scénario illisible{hint}: {str(e)}")
+        except yaml.YAMLError as e:
+            raise ScenarioError(f"Scénario YAML illisible: {str(e)}")
+    try:
+        return ScenarioSet(source, base_dir=base_dir, base_url=base_url)
+    except ScenarioError:
+        raise
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        # Champ de type inattendu (poids non numérique, feeder qui n'est pas un objet...)
+        raise ScenarioError(f"valeur de type inattendu ({type(e).__name__}: {str(e)})")
+
+
+def load_scenario_file(name, base_url=None, base_dir=SCENARIO_DIR):
+    """
+    Charge un fichier de scénarios (YAML ou JSON) du répertoire des scénarios.
+
+    Args:
+        name (str): Nom du fichier, relatif à ``base_dir``
+    """
+    path = os.path.realpath(os.path.join(base_dir, name))
+    if not path.startswith(os.path.realpath(base_dir) + os.sep):
+        raise ScenarioError(f"Fichier de scénario invalide: {name!r} (attendu dans {base_dir})")
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except OSError as e:
+        raise ScenarioError(f"Fichier de scénario illisible: {name} ({str(e)})")
+    return load_scenarios(text, base_url=base_url, base_dir=os.path.dirname(path))
+
+
+class ScenarioLoadTest(LoadTest):
+    """Test de charge dont chaque itération est un parcours tiré parmi les scénarios."""
+
+    def __init__(self, scenarios, timeout=REQUEST_TIMEOUT):
+        """
+        Args:
+            scenarios (ScenarioSet): Scénarios à exécuter
+            timeout (float, optional): Délai maximum d'une requête, en secondes
+        """
+        super().__init__(scenarios.base_url, timeout=timeout)
+        self.scenarios = scenarios
+        self.step_results = {key: LoadResults() for key in scenarios.step_keys()}
+        self.scenario_errors = {}
+
+    def _fail(self, message):
+        self.iterations["failed"] += 1
+        if message in self.scenario_errors or len(self.scenario_errors) < MAX_ERROR_KINDS:
+            self.scenario_errors[message] = self.scenario_errors.get(message, 0) + 1
+
+    async def iteration(self, scheduled=None):
+        """Un parcours: les étapes d'un scénario tiré au sort, avec ses variables et ses cookies."""
+        scenario = self.scenarios.pick()
+        variables = {}
+        if scenario.feeder:
+            variables.update(self.scenarios.feeders[scenario.feeder].next())
+        cookies = {}
+        for index, step in enumerate(scenario.steps):
+            if index and self.deadline is not None and time.perf_counter() >= self.deadline:
+                self.iterations["interrupted"] += 1
+                return
+            try:
+                method, url, headers, body = step.build(self.scenarios.base_url, variables, cookies)
+            except ScenarioError as e:
+                self._fail(str(e))
+                return
+            response = await self.request(
+                method, url, headers, body,
+                # Seule la première étape a une heure d'envoi prévue (arrivée du parcours)
+                scheduled=scheduled if index == 0 else None,
+                keep_body=step.keep_body, expect=step.expect,
+                step=f"{scenario.name}/{step.name}",
+            )
+            if response is None:
+                self._fail(f"Étape {step.name}: pas de réponse")
+                return
+            ok = response.status in step.expect if step.expect else 200 <= response.status < 400
+            if not ok:
+                self._fail(f"Étape {step.name}: code HTTP {response.status}")
+                return
+            for name, value in response.headers:
+                if name == "set-cookie":
+                    cookie_name, _, cookie_value = value.split(";", 1)[0].partition("=")
+                    cookies[cookie_name.strip()] = cookie_value.strip()
+            try:
+                step.extract_variables(response, variables, cookies)
+            except ScenarioError as e:
+                self._fail(str(e))
+                return
+            if step.think_time:
+                pause = sample_latency(step.think_time)
+                if self.deadline is not None:
+                    # Pas de pause au-delà de la fin du test
+                    pause = min(pause, max(self.deadline - time.perf_counter(), 0))
+                await asyncio.sleep(pause)
+        self.iterations["completed"] += 1
+
+    async def run(self, *args, **kwargs):
+        report = await super().run(*args, **kwargs)
+        report["scenario_errors"] = dict(self.scenario_errors)
+        return report
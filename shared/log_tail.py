@@ -0,0 +1,141 @@
+"""
+Lecture de la fin des fichiers de log, avec reprise par position.
+
+Le gestionnaire ``request_logs`` de chaque agent lisait tout le fichier de log
+(``readlines()``) pour n'en garder que les 50 dernières lignes, puis émettait
+chaque ligne séparément avec une pause de 10 ms: de plus en plus lent à chaque
+reconnexion, à mesure que le fichier grossit. Ici:
+
+- ``tail_lines`` lit le fichier à reculons par blocs depuis la fin, jusqu'à avoir
+  le nombre de lignes voulu: le coût ne dépend plus de la taille du fichier;
+- chaque lecture retourne un curseur (position en octets après la dernière
+  ligne complète lue); ``read_log_entries`` avec ce curseur ne retourne que les
+  lignes écrites depuis; un curseur au-delà de la fin (fichier tronqué ou
+  remplacé) repart de la fin du fichier;
+- les lignes sont converties en entrées ``{'type', 'message'}`` prêtes à être
+  envoyées en un seul événement.
+
+Variables d'environnement:
+    LOG_TAIL_LINES: Lignes renvoyées au plus par demande (défaut: 50)
+    LOG_TAIL_MAX_BYTES: Octets lus au plus lors d'une reprise (défaut: 262144)
+"""
+
+import os
+import re
+
+LOG_TAIL_LINES = int(os.getenv("LOG_TAIL_LINES", "50"))
+LOG_TAIL_MAX_BYTES = int(os.getenv("LOG_TAIL_MAX_BYTES", "262144"))
+
+BLOCK_SIZE = 8192
+
+_LEVEL = re.compile(r'\[(INFO|ERROR|WARNING)\]\s*(.*)')
+
+
+def tail_lines(path, count=LOG_TAIL_LINES, block_size=BLOCK_SIZE):
+    """
+    Dernières lignes complètes d'un fichier, lu à reculons depuis la fin.
+
+    Args:
+        path (str): Chemin du fichier
+        count (int, optional): Nombre de lignes voulu
+        block_size (int, optional): Taille des blocs lus
+
+    Returns:
+        tuple: (lignes décodées sans fin de ligne, curseur après la dernière ligne complète)
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        position = end
+        data = b""
+        # Une ligne en cours d'écriture (sans fin de ligne) est laissée pour la prochaine lecture
+        while position > 0 and data.count(b"\n") <= count:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            data = f.read(size) + data
+
+    complete = data.rfind(b"\n") + 1
+    cursor = end - (len(data) - complete)
+    lines = data[:complete].split(b"\n")[:-1]
+    if position > 0:
+        # Première ligne probablement coupée par le début du bloc
+        lines = lines[1:]
+    return [line.decode('utf-8', errors='replace').rstrip("\r") for line in lines[-count:]], cursor
+
+
+def read_from(path, cursor, max_bytes=LOG_TAIL_MAX_BYTES):
+    """
+    Lignes complètes écrites après une position.
+
+    Args:
+        path (str): Chemin du fichier
+        cursor (int): Position en octets (curseur d'une lecture précédente)
+        max_bytes (int, optional): Octets lus au plus; au-delà, seule la fin est lue
+
+    Returns:
+        tuple: (lignes décodées, nouveau curseur), ou None si le curseur est au-delà de la fin du fichier
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        if cursor > end:
+            return None
+        start = max(cursor, end - max_bytes)
+        f.seek(start)
+        data = f.read(end - start)
+
+    complete = data.rfind(b"\n") + 1
+    lines = data[:complete].split(b"\n")[:-1]
+    if start > cursor and lines:
+        # Lecture tronquée par max_bytes: la première ligne est incomplète
+        lines = lines[1:]
+    return [line.decode('utf-8', errors='replace').rstrip("\r") for line in lines], start + complete
+
+
+def parse_log_line(line):
+    """
+    Convertit une ligne du fichier de log en entrée affichable.
+
+    Returns:
+        dict: {'type': info|error|warning|success, 'message': texte après le niveau}
+    """
+    log_type = 'info'
+    if '[ERROR]' in line:
+        log_type = 'error'
+    elif '[WARNING]' in line:
+        log_type = 'warning'
+    elif 'SUCCESS' in line:
+        log_type = 'success'
+    match = _LEVEL.search(line)
+    return {'type': log_type, 'message': match.group(2) if match else line.strip()}
+
+
+def read_log_entries(path, cursor=None, count=LOG_TAIL_LINES):
+    """
+    Entrées à renvoyer à un client: fin du fichier, ou nouvelles lignes depuis son curseur.
+
+    Args:
+        path (str): Chemin du fichier de log
+        cursor (int, optional): Curseur de la dernière lecture du client
+        count (int, optional): Nombre maximum d'entrées
+
+    Returns:
+        dict: {'entries': [...], 'cursor': int, 'resumed': bool (reprise depuis le curseur)}
+    """
+    if not os.path.exists(path):
+        return {'entries': [], 'cursor': 0, 'resumed': False}
+
+    resumed = None
+    if isinstance(cursor, int) and cursor >= 0:
+        resumed = read_from(path, cursor)
+    if resumed is not None:
+        lines, cursor = resumed
+        lines = lines[-count:]
+    else:
+        lines, cursor = tail_lines(path, count)
+    return {
+        'entries': [parse_log_line(line) for line in lines if line.strip()],
+        'cursor': cursor,
+        'resumed': resumed is not None,
+    }
@@ -0,0 +1,196 @@
+"""
+Routage des appels LLM vers un modèle adapté à la tâche.
+
+Tous les appels utilisaient le même grand modèle, y compris les appels courts de
+classification ou de résumé (``determine_relevant_agents``,
+``analyze_and_suggest_improvements``, ``extract_task_description``) qui sont sur
+le chemin interactif. Chaque fonction appelante est associée à une classe de
+tâche, et chaque classe à un modèle, un plafond de tokens et un objectif de
+latence (SLO):
+
+- ``classification`` et ``summarization``: modèle rapide;
+- ``code_generation`` (``generate_go_code``, ``analyze_android_problem``): grand modèle;
+- ``default``: grand modèle, pour toute fonction absente de la table.
+
+Une réponse du modèle rapide qui échoue à la validation fournie par l'appelant
+(réponse non conforme au schéma, réponse vide...) est redemandée au grand modèle. Le repli
+n'a lieu que dans ce cas.
+
+Variables d'environnement:
+    LLM_ROUTING_ENABLED: Active le routage; sinon tout passe par le grand modèle (défaut: 1)
+    LLM_FAST_MODEL_ID: Modèle rapide (défaut: anthropic.claude-3-haiku-20240307-v1:0)
+    LLM_LARGE_MODEL_ID: Grand modèle (défaut: MODEL_ID)
+    LLM_ROUTING_PATH: Fichier JSON qui complète ou remplace la table, au format
+        {"task_classes": {...}, "call_sites": {...}} (optionnel)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from shared.stats import register_stats_provider
+from shared.telemetry import call_site
+
+logger = logging.getLogger(__name__)
+
+ROUTING_ENABLED = os.getenv("LLM_ROUTING_ENABLED", "1").lower() not in ("0", "false", "no")
+LARGE_MODEL_ID = os.getenv("LLM_LARGE_MODEL_ID") or os.getenv("MODEL_ID", "anthropic.claude-3-sonnet-20240229-v1:0")
+FAST_MODEL_ID = os.getenv("LLM_FAST_MODEL_ID", "anthropic.claude-3-haiku-20240307-v1:0")
+ROUTING_PATH = os.getenv("LLM_ROUTING_PATH")
+
+# Classe de tâche -> niveau de modèle, plafond de tokens, objectif de latence
+TASK_CLASSES = {
+    "classification": {"tier": "fast", "max_tokens": 2048, "slo_ms": 8000},
+    "summarization": {"tier": "fast", "max_tokens": 4096, "slo_ms": 15000},
+    "code_generation": {"tier": "large", "max_tokens": 8000, "slo_ms": 180000},
+    "default": {"tier": "large", "max_tokens": 4096, "slo_ms": 60000},
+}
+
+# Fonction appelante -> classe de tâche
+CALL_SITES = {
+    "determine_relevant_agents": "classification",
+    "analyze_and_suggest_improvements": "summarization",
+    "extract_task_description": "summarization",
+    "generate_go_code": "code_generation",
+    "analyze_android_problem": "code_generation",
+}
+
+
+def _load_overrides(path):
+    """Complète les tables avec le fichier JSON de LLM_ROUTING_PATH."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Routage LLM: fichier {path} ignoré ({str(e)})")
+        return
+    for name, settings in overrides.get("task_classes", {}).items():
+        TASK_CLASSES[name] = {**TASK_CLASSES.get(name, TASK_CLASSES["default"]), **settings}
+    CALL_SITES.update(overrides.get("call_sites", {}))
+
+
+if ROUTING_PATH:
+    _load_overrides(ROUTING_PATH)
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _count(site, task_class, model_id, **values):
+    with _stats_lock:
+        entry = _stats.setdefault(site, {
+            "task_class": task_class,
+            "calls": 0,
+            "fast_calls": 0,
+            "fallbacks": 0,
+            "slo_violations": 0,
+            "wall_time_s": 0.0,
+            "models": {},
+        })
+        for name, value in values.items():
+            entry[name] += value
+        if model_id:
+            entry["models"][model_id] = entry["models"].get(model_id, 0) + 1
+
+
+def get_route(site):
+    """
+    Retourne la route d'une fonction appelante.
+
+    Args:
+        site (str): Nom de la fonction appelante (ex: "determine_relevant_agents")
+
+    Returns:
+        dict: Classe de tâche, modèle, plafond de tokens, SLO et modèle de repli
+    """
+    task_class = CALL_SITES.get(site, "default")
+    settings = TASK_CLASSES.get(task_class, TASK_CLASSES["default"])
+    fast = ROUTING_ENABLED and settings.get("tier") == "fast"
+    model_id = settings.get("model_id") or (FAST_MODEL_ID if fast else LARGE_MODEL_ID)
+    return {
+        "call_site": site,
+        "task_class": task_class,
+        "model_id": model_id,
+        "max_tokens": int(settings.get("max_tokens", 4096)),
+        "slo_ms": settings.get("slo_ms"),
+        "fallback_model_id": LARGE_MODEL_ID if model_id != LARGE_MODEL_ID else None,
+    }
+
+
+def invoke_routed(site, invoke, *args, validate=None, **kwargs):
+    """
+    Appelle le modèle de la route, puis le grand modèle si la réponse est invalide.
+
+    Args:
+        site (str): Nom de la fonction appelante, clé de la table de routage
+        invoke (callable): invoke_claude de l'agent; reçoit model_id et max_tokens en plus des arguments
+        *args: Arguments positionnels de invoke (prompt, system_prompt...)
+        validate (callable, optional): Retourne True si la réponse est exploitable
+        **kwargs: Autres arguments nommés de invoke
+
+    Returns:
+        Le résultat de invoke
+    """
+    route = get_route(site)
+    kwargs.setdefault("max_tokens", route["max_tokens"])
+    start = time.time()
+
+    # La fonction appelante est transmise à la télémétrie même depuis un pool de threads
+    with call_site(site):
+        result = invoke(*args, model_id=route["model_id"], **kwargs)
+        fallbacks = 0
+        if route["fallback_model_id"] and validate is not None and not _is_valid(validate, result):
+            logger.warning(f"Routage LLM: réponse de {route['model_id']} invalide pour {site}, "
+                           f"nouvel essai avec {route['fallback_model_id']}")
+            fallbacks = 1
+            result = invoke(*args, model_id=route["fallback_model_id"], **kwargs)
+
+    elapsed_ms = (time.time() - start) * 1000
+    slo_violation = bool(route["slo_ms"]) and elapsed_ms > route["slo_ms"]
+    if slo_violation:
+        logger.info(f"Routage LLM: {site} a pris {elapsed_ms:.0f} ms (SLO {route['slo_ms']} ms)")
+    _count(
+        site,
+        route["task_class"],
+        route["fallback_model_id"] if fallbacks else route["model_id"],
+        calls=1,
+        fast_calls=1 if route["fallback_model_id"] else 0,
+        fallbacks=fallbacks,
+        slo_violations=1 if slo_violation else 0,
+        wall_time_s=elapsed_ms / 1000,
+    )
+    return result
+
+
+def _is_valid(validate, result):
+    try:
+        return bool(validate(result))
+    except Exception as e:
+        logger.warning(f"Routage LLM: erreur du validateur ({str(e)})")
+        return False
+
+
+def get_routing_stats():
+    """
+    Retourne la configuration du routage et les compteurs par fonction appelante.
+
+    Returns:
+        dict: Modèles, table des classes de tâche et compteurs (appels, replis, dépassements de SLO)
+    """
+    with _stats_lock:
+        call_sites = {
+            site: {**entry, "models": dict(entry["models"]), "wall_time_s": round(entry["wall_time_s"], 3)}
+            for site, entry in _stats.items()
+        }
+    return {
+        "enabled": ROUTING_ENABLED,
+        "fast_model_id": FAST_MODEL_ID,
+        "large_model_id": LARGE_MODEL_ID,
+        "task_classes": TASK_CLASSES,
+        "call_sites": call_sites,
+    }
+
+
+register_stats_provider("model_routing", get_routing_stats)
@@ -0,0 +1,363 @@
+"""
+Limiteur de débit Bedrock partagé par tous les agents.
+
+Chaque agent tourne dans son propre processus: sans coordination, leurs boucles
+de nouvelles tentatives s'amplifient mutuellement dès que Bedrock commence à
+limiter (ThrottlingException). Ce module maintient, dans une base SQLite
+commune, deux seaux à jetons:
+
+- ``requests``: nombre de requêtes par minute;
+- ``tokens``: nombre de tokens par minute (entrée + sortie).
+
+Chaque appel réserve une requête et une estimation de ses tokens avant d'être
+envoyé, puis la réservation est corrigée avec l'usage réel renvoyé par Bedrock.
+
+Classes de priorité: un appel ``background`` (publications de l'agent
+Communication...) ne peut consommer que si le seau reste rempli au-delà d'une
+réserve, laissée aux appels ``interactive`` (flux du Chef de Projet).
+
+Ajustement AIMD: à chaque ThrottlingException, le débit de remplissage est
+divisé par deux (au plus une fois par ``LLM_RATE_LIMIT_COOLDOWN`` secondes pour
+tous les processus), puis il remonte d'un pas fixe à chaque appel réussi.
+
+Variables d'environnement:
+    LLM_RATE_LIMIT_ENABLED: Active le limiteur (défaut: 1)
+    LLM_RATE_LIMIT_PATH: Fichier SQLite (défaut: <racine>/cache/rate_limiter.sqlite3)
+    LLM_RATE_LIMIT_RPM: Requêtes par minute (défaut: 50)
+    LLM_RATE_LIMIT_TPM: Tokens par minute (défaut: 200000)
+    LLM_RATE_LIMIT_MAX_WAIT: Attente maximum avant d'abandonner, en secondes (défaut: 300)
+    LLM_RATE_LIMIT_MIN_FACTOR: Débit minimum après réduction AIMD (défaut: 0.1)
+    LLM_RATE_LIMIT_AIMD_STEP: Remontée du débit après chaque succès (défaut: 0.05)
+    LLM_RATE_LIMIT_COOLDOWN: Intervalle minimum entre deux réductions (défaut: 5)
+"""
+
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "1").lower() not in ("0", "false", "no")
+RATE_LIMIT_PATH = os.getenv("LLM_RATE_LIMIT_PATH", os.path.join(ROOT_DIR, "cache", "rate_limiter.sqlite3"))
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_RATE_LIMIT_RPM", "50"))
+TOKENS_PER_MINUTE = float(os.getenv("LLM_RATE_LIMIT_TPM", "200000"))
+MAX_WAIT = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT", "300"))
+MIN_FACTOR = float(os.getenv("LLM_RATE_LIMIT_MIN_FACTOR", "0.1"))
+AIMD_STEP = float(os.getenv("LLM_RATE_LIMIT_AIMD_STEP", "0.05"))
+DECREASE_COOLDOWN = float(os.getenv("LLM_RATE_LIMIT_COOLDOWN", "5"))
+
+# Part de chaque seau réservée aux classes plus prioritaires
+PRIORITY_RESERVES = {
+    "interactive": 0.0,
+    "normal": 0.1,
+    "background": 0.25,
+}
+DEFAULT_PRIORITY = "normal"
+
+# Fragments de messages indiquant que Bedrock limite le débit
+THROTTLE_MARKERS = (
+    "ThrottlingException",
+    "throttlingException",
+    "Too many requests",
+    "Rate exceeded",
+    "TooManyRequestsException",
+)
+
+
+class RateLimitTimeout(RuntimeError):
+    """Levée quand un appel attend son tour plus longtemps que ``max_wait``."""
+
+
+def is_throttling_error(error):
+    """
+    Indique si une erreur Bedrock correspond à une limitation de débit.
+
+    Args:
+        error (Exception): Erreur levée lors de l'appel à Bedrock
+
+    Returns:
+        bool: True s'il s'agit d'une limitation de débit
+    """
+    description = f"{type(error).__name__}: {str(error)}"
+    return any(marker in description for marker in THROTTLE_MARKERS)
+
+
+def estimate_tokens(prompt, system_prompt=None, max_tokens=4096):
+    """
+    Estime le nombre de tokens réservés pour un appel (environ 4 caractères par
+    token en entrée, plus le maximum demandé en sortie).
+
+    Returns:
+        int: Nombre de tokens à réserver
+    """
+    characters = len(prompt or "") + len(system_prompt or "")
+    return characters // 4 + int(max_tokens)
+
+
+class RateLimiter:
+    """Seaux à jetons requêtes/min et tokens/min partagés via SQLite."""
+
+    def __init__(self, path=RATE_LIMIT_PATH, requests_per_minute=REQUESTS_PER_MINUTE,
+                 tokens_per_minute=TOKENS_PER_MINUTE, max_wait=MAX_WAIT):
+        self.path = path
+        self.capacities = {"requests": requests_per_minute, "tokens": tokens_per_minute}
+        self.max_wait = max_wait
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._disk_available = True
+        self._stats = {
+            "acquired": 0,
+            "waited": 0,
+            "wait_time_total_s": 0.0,
+            "wait_time_max_s": 0.0,
+            "timeouts": 0,
+            "throttles": 0,
+            "decreases": 0,
+            "errors": 0,
+        }
+
+    def _connection(self):
+        """Retourne la connexion SQLite du thread courant (une connexion par thread)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rate_limiter (
+                    name TEXT PRIMARY KEY,
+                    level REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, operation, default=None):
+        """
+        Exécute une opération dans une transaction exclusive entre processus.
+        En cas d'erreur SQLite, l'appel n'est jamais bloqué.
+        """
+        if not self._disk_available:
+            return default
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = operation(conn, time.time())
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"Limiteur de débit: erreur SQLite ({self.path}): {str(e)}")
+            return default
+        except OSError as e:
+            self._disk_available = False
+            logger.warning(f"Limiteur de débit désactivé ({str(e)})")
+            return default
+
+    @staticmethod
+    def _read(conn, name, default_level, now):
+        row = conn.execute("SELECT level, updated_at FROM rate_limiter WHERE name = ?", (name,)).fetchone()
+        return (default_level, now) if row is None else row
+
+    @staticmethod
+    def _write(conn, name, level, now):
+        conn.execute(
+            "INSERT OR REPLACE INTO rate_limiter (name, level, updated_at) VALUES (?, ?, ?)",
+            (name, level, now),
+        )
+
+    def _levels(self, conn, now):
+        """Niveaux actuels des seaux après remplissage, et facteur AIMD."""
+        factor, _ = self._read(conn, "aimd_factor", 1.0, now)
+        levels = {}
+        for name, capacity in self.capacities.items():
+            level, updated_at = self._read(conn, name, capacity, now)
+            refill = max(now - updated_at, 0.0) * capacity / 60.0 * factor
+            levels[name] = min(capacity, level + refill)
+        return levels, factor
+
+    def _try_acquire(self, costs, reserve):
+        """
+        Tente de consommer les coûts demandés.
+
+        Returns:
+            float: 0 si l'appel peut partir, sinon l'attente estimée en secondes
+        """
+        # Un appel plus gros que le seau ne doit pas attendre indéfiniment
+        costs = {name: min(cost, self.capacities[name] * (1 - reserve)) for name, cost in costs.items()}
+
+        def operation(conn, now):
+            levels, factor = self._levels(conn, now)
+            wait = 0.0
+            for name, cost in costs.items():
+                capacity = self.capacities[name]
+                missing = cost + capacity * reserve - levels[name]
+                if missing > 0:
+                    wait = max(wait, missing / (capacity / 60.0 * factor))
+            for name, level in levels.items():
+                self._write(conn, name, level - costs[name] if wait == 0 else level, now)
+            return wait
+        return self._transaction(operation, default=0.0)
+
+    def acquire(self, estimated_tokens, priority=DEFAULT_PRIORITY, max_wait=None):
+        """
+        Attend qu'un appel puisse partir sans dépasser les budgets.
+
+        Args:
+            estimated_tokens (int): Tokens réservés pour l'appel (voir estimate_tokens)
+            priority (str, optional): interactive, normal ou background
+            max_wait (float, optional): Attente maximum (défaut: LLM_RATE_LIMIT_MAX_WAIT)
+
+        Returns:
+            float: Temps d'attente en secondes
+
+        Raises:
+            RateLimitTimeout: Si l'attente dépasse max_wait
+        """
+        reserve = PRIORITY_RESERVES.get(priority, PRIORITY_RESERVES[DEFAULT_PRIORITY])
+        max_wait = self.max_wait if max_wait is None else max_wait
+        costs = {"requests": 1, "tokens": estimated_tokens}
+
+        start = time.time()
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(costs, reserve)
+            if wait <= 0:
+                break
+            waited = time.time() - start
+            if waited + wait > max_wait:
+                self._count("timeouts")
+                raise RateLimitTimeout(
+                    f"Limite de débit Bedrock: attente estimée {wait:.1f}s au-delà de {max_wait:.0f}s (priorité {priority})"
+                )
+            # Réveils désynchronisés entre processus pour éviter les rafales
+            time.sleep(min(wait, 2.0) * random.uniform(0.8, 1.2))
+            waited = time.time() - start
+
+        with self._lock:
+            self._stats["acquired"] += 1
+            if waited > 0:
+                self._stats["waited"] += 1
+                self._stats["wait_time_total_s"] += waited
+                self._stats["wait_time_max_s"] = max(self._stats["wait_time_max_s"], waited)
+        if waited > 1:
+            logger.info(f"Limiteur de débit: appel {priority} retardé de {waited:.1f}s")
+        return waited
+
+    def settle(self, reserved_tokens, used_tokens):
+        """
+        Corrige la réservation de tokens avec l'usage réel.
+
+        Args:
+            reserved_tokens (int): Tokens réservés par acquire
+            used_tokens (int): Tokens réellement consommés (0 si l'appel a échoué)
+        """
+        difference = reserved_tokens - used_tokens
+        if difference == 0:
+            return
+
+        def operation(conn, now):
+            levels, _ = self._levels(conn, now)
+            capacity = self.capacities["tokens"]
+            self._write(conn, "tokens", max(min(capacity, levels["tokens"] + difference), -capacity), now)
+        self._transaction(operation)
+
+    def on_success(self):
+        """Augmentation additive du débit après un appel réussi."""
+        def operation(conn, now):
+            factor, last_decrease = self._read(conn, "aimd_factor", 1.0, now)
+            if factor < 1.0:
+                self._write(conn, "aimd_factor", min(1.0, factor + AIMD_STEP), last_decrease)
+        self._transaction(operation)
+
+    def on_throttle(self):
+        """Diminution multiplicative du débit après une ThrottlingException."""
+        self._count("throttles")
+
+        def operation(conn, now):
+            factor, last_decrease = self._read(conn, "aimd_factor", 1.0, 0.0)
+            if now - last_decrease < DECREASE_COOLDOWN:
+                # Une autre requête (ou un autre agent) vient déjà de réduire le débit
+                return None
+            levels, _ = self._levels(conn, now)
+            factor = max(MIN_FACTOR, factor / 2)
+            self._write(conn, "aimd_factor", factor, now)
+            # Réduire aussi le seau de requêtes pour espacer immédiatement les appels
+            self._write(conn, "requests", levels["requests"] / 2, now)
+            return factor
+
+        factor = self._transaction(operation)
+        if factor is not None:
+            self._count("decreases")
+            logger.warning(f"Limitation Bedrock détectée: débit réduit à {factor:.0%} du nominal")
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def stats(self):
+        """
+        Retourne les compteurs du limiteur et l'état des seaux.
+
+        Returns:
+            dict: Attentes, limitations, facteur AIMD et niveaux des seaux
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["wait_time_total_s"] = round(stats["wait_time_total_s"], 3)
+        stats["wait_time_max_s"] = round(stats["wait_time_max_s"], 3)
+        stats["requests_per_minute"] = self.capacities["requests"]
+        stats["tokens_per_minute"] = self.capacities["tokens"]
+
+        state = self._transaction(lambda conn, now: self._levels(conn, now))
+        if state is not None:
+            levels, factor = state
+            stats["aimd_factor"] = round(factor, 3)
+            stats["requests_available"] = round(levels["requests"], 2)
+            stats["tokens_available"] = int(levels["tokens"])
+        return stats
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    Retourne le limiteur de débit du processus, ou None s'il est désactivé.
+
+    Returns:
+        RateLimiter: Instance partagée du processus
+    """
+    global _limiter
+    if not RATE_LIMIT_ENABLED:
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
+
+
+def _limiter_stats():
+    limiter = get_rate_limiter()
+    return limiter.stats() if limiter else {"enabled": False}
+
+
+register_stats_provider("rate_limiter", _limiter_stats)
@@ -0,0 +1,384 @@
+"""
+Registre des services: adresses et disponibilité des agents, tenues à jour par battements de cœur.
+
+Le ChefProjet codait en dur l'URL de chaque agent (certaines fausses), et le
+serveur d'administration ouvrait un socket puis envoyait un GET de santé avant
+chaque transfert. Ici, chaque agent s'enregistre au démarrage
+(``register_service``) et envoie un battement de cœur toutes les
+``SERVICE_HEARTBEAT_INTERVAL`` secondes dans une base SQLite commune. Une
+instance sans battement depuis ``SERVICE_TTL`` secondes est considérée hors
+service.
+
+Les appelants résolvent l'adresse d'un service avec ``resolve_url``. Les
+instances disponibles sont gardées en mémoire ``SERVICE_CACHE_TTL`` secondes:
+la résolution ne coûte ni aller-retour réseau ni lecture SQLite à chaque
+requête. Un service jamais enregistré (agent lancé sans le registre) est
+résolu vers son adresse par défaut (``DEFAULT_URLS``, ports du Makefile).
+
+Plusieurs instances (réplicas) d'un même service peuvent être enregistrées;
+``resolve_urls`` les retourne toutes, ``shared.agent_client`` répartit les
+appels entre elles.
+
+Variables d'environnement:
+    SERVICE_REGISTRY_ENABLED: Active le registre (défaut: 1)
+    SERVICE_REGISTRY_PATH: Fichier SQLite (défaut: <racine>/cache/service_registry.sqlite3)
+    SERVICE_HEARTBEAT_INTERVAL: Intervalle des battements de cœur, en secondes (défaut: 5)
+    SERVICE_TTL: Délai sans battement au-delà duquel une instance est hors service (défaut: 15)
+    SERVICE_CACHE_TTL: Durée de conservation en mémoire d'une résolution, en secondes (défaut: 2)
+    SERVICE_HOST: Nom d'hôte annoncé par les agents de cette machine (défaut: localhost)
+    SERVICE_DEFAULT_URLS: Adresses par défaut, en JSON, qui complètent ou remplacent DEFAULT_URLS
+"""
+
+import atexit
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REGISTRY_ENABLED = os.getenv("SERVICE_REGISTRY_ENABLED", "1").lower() not in ("0", "false", "no")
+REGISTRY_PATH = os.getenv("SERVICE_REGISTRY_PATH", os.path.join(ROOT_DIR, "cache", "service_registry.sqlite3"))
+HEARTBEAT_INTERVAL = float(os.getenv("SERVICE_HEARTBEAT_INTERVAL", "5"))
+SERVICE_TTL = float(os.getenv("SERVICE_TTL", "15"))
+CACHE_TTL = float(os.getenv("SERVICE_CACHE_TTL", "2"))
+SERVICE_HOST = os.getenv("SERVICE_HOST", "localhost")
+
+HOSTNAME = socket.gethostname()
+
+# Instances arrêtées ou silencieuses conservées dans la base avant élagage
+PRUNE_AFTER = 86400
+
+# Adresse de chaque service tant qu'aucune instance ne s'est enregistrée (ports du Makefile)
+DEFAULT_URLS = {
+    "chef-projet": "http://localhost:5000",
+    "dev-python": "http://localhost:5001",
+    "qa": "http://localhost:5002",
+    "dev-frontend": "http://localhost:5003",
+    "dev-go": "http://localhost:5004",
+    "devops": "http://localhost:5005",
+    "perf": "http://localhost:5006",
+    "ml": "http://localhost:5007",
+    "analytics": "http://localhost:5008",
+    "product-owner": "http://localhost:5009",
+    "ux-designer": "http://localhost:5010",
+    "dev-ios": "http://localhost:5013",
+    "dev-android": "http://localhost:5014",
+    "communication": "http://localhost:5015",
+}
+
+try:
+    DEFAULT_URLS.update(json.loads(os.getenv("SERVICE_DEFAULT_URLS") or "{}"))
+except ValueError:
+    logger.warning("SERVICE_DEFAULT_URLS ignoré: JSON invalide")
+
+_COLUMNS = ("instance_id", "service", "base_url", "host", "pid", "ready", "started_at", "last_heartbeat", "metadata")
+
+
+class ServiceRegistry:
+    """Instances des services, enregistrées dans une base SQLite partagée par les agents."""
+
+    def __init__(self, path=REGISTRY_PATH, ttl=SERVICE_TTL, cache_ttl=CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._stats = {
+            "registrations": 0,
+            "heartbeats": 0,
+            "lookups": 0,
+            "cache_hits": 0,
+            "default_urls": 0,
+            "unavailable": 0,
+            "errors": 0,
+        }
+
+    def _connection(self):
+        """Retourne la connexion SQLite du thread courant (une connexion par thread)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS instances (
+                    instance_id TEXT PRIMARY KEY,
+                    service TEXT NOT NULL,
+                    base_url TEXT NOT NULL,
+                    host TEXT NOT NULL,
+                    pid INTEGER NOT NULL,
+                    ready INTEGER NOT NULL DEFAULT 1,
+                    started_at REAL NOT NULL,
+                    last_heartbeat REAL NOT NULL,
+                    metadata TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS instances_service ON instances (service)")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, operation, default=None):
+        """Exécute une opération dans une transaction exclusive; une erreur SQLite retourne default."""
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = operation(conn, time.time())
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        except (sqlite3.Error, OSError) as e:
+            self._count("errors")
+            logger.warning(f"Registre des services: erreur SQLite ({self.path}): {str(e)}")
+            return default
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    # ------------------------------------------------------------------
+    # Côté agent
+    # ------------------------------------------------------------------
+
+    def register(self, instance_id, service, base_url, ready=True, metadata=None):
+        """
+        Enregistre (ou réenregistre) une instance de service.
+
+        Args:
+            instance_id (str): Identifiant unique de l'instance
+            service (str): Nom du service (ex: "dev-go")
+            base_url (str): Adresse de base de l'instance (ex: "http://localhost:5004")
+            ready (bool, optional): Instance prête à recevoir des requêtes
+            metadata (dict, optional): Informations complémentaires (sérialisables en JSON)
+        """
+        def operation(conn, now):
+            conn.execute("DELETE FROM instances WHERE last_heartbeat < ?", (now - PRUNE_AFTER,))
+            conn.execute(
+                "INSERT OR REPLACE INTO instances "
+                "(instance_id, service, base_url, host, pid, ready, started_at, last_heartbeat, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (instance_id, service, base_url, HOSTNAME, os.getpid(), int(ready), now, now,
+                 json.dumps(metadata or {})),
+            )
+            return True
+        if self._transaction(operation, default=False):
+            self._count("registrations")
+            logger.info(f"Registre des services: {service} enregistré sur {base_url}")
+
+    def heartbeat(self, instance_id, ready=True):
+        """
+        Signale qu'une instance est toujours active.
+
+        Returns:
+            bool: False si l'instance est inconnue (elle doit se réenregistrer)
+        """
+        def operation(conn, now):
+            cursor = conn.execute(
+                "UPDATE instances SET last_heartbeat = ?, ready = ? WHERE instance_id = ?",
+                (now, int(ready), instance_id),
+            )
+            return cursor.rowcount == 1
+        known = self._transaction(operation, default=True)
+        self._count("heartbeats")
+        return known
+
+    def deregister(self, instance_id):
+        """Marque une instance arrêtée: ses appelants échouent aussitôt au lieu d'attendre un délai."""
+        self._transaction(lambda conn, now: conn.execute(
+            "UPDATE instances SET ready = 0 WHERE instance_id = ?", (instance_id,)
+        ))
+
+    # ------------------------------------------------------------------
+    # Côté appelant
+    # ------------------------------------------------------------------
+
+    def instances(self, service=None):
+        """
+        Liste les instances enregistrées, avec leur disponibilité.
+
+        Args:
+            service (str, optional): Restreindre à un service
+
+        Returns:
+            list: Instances (dict), avec "alive" (battement récent et instance prête)
+        """
+        def operation(conn, now):
+            where, params = ("WHERE service = ?", (service,)) if service else ("", ())
+            rows = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM instances {where} ORDER BY service, started_at", params
+            ).fetchall()
+            instances = []
+            for row in rows:
+                instance = dict(zip(_COLUMNS, row))
+                instance["metadata"] = json.loads(instance["metadata"] or "{}")
+                instance["ready"] = bool(instance["ready"])
+                instance["heartbeat_age_s"] = round(now - instance["last_heartbeat"], 1)
+                instance["alive"] = instance["ready"] and now - instance["last_heartbeat"] <= self.ttl
+                instances.append(instance)
+            return instances
+        return self._transaction(operation, default=[])
+
+    def resolve(self, service):
+        """
+        Retourne les instances disponibles d'un service (résultat conservé CACHE_TTL secondes).
+
+        Returns:
+            tuple: (liste des instances disponibles, True si le service a déjà été enregistré)
+        """
+        self._count("lookups")
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(service)
+        if cached is not None and now - cached[0] < self.cache_ttl:
+            self._count("cache_hits")
+            return cached[1], cached[2]
+
+        instances = self.instances(service)
+        entry = (now, [instance for instance in instances if instance["alive"]], bool(instances))
+        with self._lock:
+            self._cache[service] = entry
+        return entry[1], entry[2]
+
+    def invalidate(self, service):
+        """Oublie la résolution en mémoire d'un service (ex: après un échec de connexion)."""
+        with self._lock:
+            self._cache.pop(service, None)
+
+    def stats(self):
+        """
+        Retourne les compteurs du registre et les instances de chaque service.
+
+        Returns:
+            dict: Enregistrements, résolutions (et hits du cache), instances disponibles par service
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        services = {}
+        for instance in self.instances():
+            entry = services.setdefault(instance["service"], {"instances": 0, "alive": 0})
+            entry["instances"] += 1
+            entry["alive"] += int(instance["alive"])
+        stats["services"] = services
+        return stats
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_service_registry():
+    """
+    Retourne le registre des services du processus, ou None s'il est désactivé.
+
+    Returns:
+        ServiceRegistry: Registre partagé du processus
+    """
+    global _registry
+    if not REGISTRY_ENABLED:
+        return None
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ServiceRegistry()
+    return _registry
+
+
+def register_service(service, port, ready=None, metadata=None):
+    """
+    Enregistre l'agent courant et démarre ses battements de cœur en arrière-plan.
+
+    Args:
+        service (str): Nom du service (ex: "dev-go")
+        port (int): Port d'écoute de l'agent
+        ready (callable, optional): ready() -> bool, disponibilité annoncée à chaque battement
+        metadata (dict, optional): Informations complémentaires sur l'instance
+
+    Returns:
+        str: Identifiant de l'instance, ou None si le registre est désactivé
+    """
+    registry = get_service_registry()
+    if registry is None:
+        return None
+    instance_id = f"{HOSTNAME}:{os.getpid()}:{port}"
+    base_url = f"http://{SERVICE_HOST}:{port}"
+
+    def is_ready():
+        try:
+            return ready() if ready is not None else True
+        except Exception as e:
+            logger.warning(f"Registre des services: erreur de la sonde de disponibilité ({str(e)})")
+            return False
+
+    registry.register(instance_id, service, base_url, is_ready(), metadata)
+
+    def beat():
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            if not registry.heartbeat(instance_id, is_ready()):
+                registry.register(instance_id, service, base_url, is_ready(), metadata)
+
+    threading.Thread(target=beat, name=f"heartbeat-{service}", daemon=True).start()
+    atexit.register(registry.deregister, instance_id)
+    return instance_id
+
+
+def resolve_urls(service):
+    """
+    Résout les adresses de base des instances disponibles d'un service.
+
+    Args:
+        service (str): Nom du service (ex: "dev-go")
+
+    Returns:
+        list: Adresses de base (ex: ["http://localhost:5004"]); l'adresse par défaut si le
+            service n'a jamais été enregistré; vide si aucune instance enregistrée n'est disponible
+    """
+    registry = get_service_registry()
+    if registry is not None:
+        instances, known = registry.resolve(service)
+        if instances:
+            return [instance["base_url"] for instance in instances]
+        if known:
+            registry._count("unavailable")
+            return []
+        registry._count("default_urls")
+    base_url = DEFAULT_URLS.get(service)
+    return [base_url] if base_url else []
+
+
+def resolve_url(service, path=""):
+    """
+    Résout l'URL d'un endpoint de service (première instance disponible).
+
+    Args:
+        service (str): Nom du service (ex: "dev-go")
+        path (str, optional): Chemin de l'endpoint (ex: "/go_code_request")
+
+    Returns:
+        str: URL complète, ou None si le service est enregistré mais qu'aucune instance n'est disponible
+    """
+    base_urls = resolve_urls(service)
+    return base_urls[0] + path if base_urls else None
+
+
+def _registry_stats():
+    registry = get_service_registry()
+    return registry.stats() if registry else {"enabled": False}
+
+
+register_stats_provider("service_registry", _registry_stats)
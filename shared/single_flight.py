@@ -0,0 +1,290 @@
+"""
+Regroupement des appels LLM identiques en cours (« single-flight »).
+
+Quand l'interface d'administration renvoie une requête, ou que plusieurs agents
+demandent la même analyse au même moment, chacun lançait son propre appel
+Bedrock. Ici, le premier appel pour une clé donnée (la clé du cache des
+réponses) est exécuté; les appels identiques qui arrivent pendant ce temps
+attendent son résultat au lieu de lancer un doublon.
+
+- Entre threads d'un même agent: un ``threading.Event`` par clé.
+- Entre agents: un bail (« lease ») dans une base SQLite commune. Le processus
+  qui détient le bail y dépose le résultat; les autres l'interrogent jusqu'à la
+  fin de l'appel. Un bail expiré, ou détenu par un processus mort, est repris.
+
+Variables d'environnement:
+    LLM_SINGLE_FLIGHT_ENABLED: Active le regroupement (défaut: 1)
+    LLM_SINGLE_FLIGHT_PATH: Fichier SQLite (défaut: <racine>/cache/single_flight.sqlite3)
+    LLM_SINGLE_FLIGHT_LEASE: Durée maximum d'un bail en secondes (défaut: 330)
+    LLM_SINGLE_FLIGHT_RESULT_TTL: Conservation d'un résultat pour les agents en attente (défaut: 30)
+"""
+
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SINGLE_FLIGHT_ENABLED = os.getenv("LLM_SINGLE_FLIGHT_ENABLED", "1").lower() not in ("0", "false", "no")
+SINGLE_FLIGHT_PATH = os.getenv("LLM_SINGLE_FLIGHT_PATH", os.path.join(ROOT_DIR, "cache", "single_flight.sqlite3"))
+LEASE_DURATION = float(os.getenv("LLM_SINGLE_FLIGHT_LEASE", "330"))
+RESULT_TTL = float(os.getenv("LLM_SINGLE_FLIGHT_RESULT_TTL", "30"))
+POLL_INTERVAL = 0.2
+
+HOSTNAME = socket.gethostname()
+
+
+class _Call:
+    """Appel en cours dans le processus, partagé entre les threads."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _owner_alive(owner):
+    """Vérifie si le processus détenteur d'un bail existe encore (même machine uniquement)."""
+    host, _, pid = owner.rpartition(":")
+    if host != HOSTNAME or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Processus existant mais appartenant à un autre utilisateur
+        return True
+    return True
+
+
+class SingleFlight:
+    """Exécute au plus un appel à la fois par clé, dans le processus et entre agents."""
+
+    def __init__(self, path=SINGLE_FLIGHT_PATH, lease_duration=LEASE_DURATION, result_ttl=RESULT_TTL):
+        self.path = path
+        self.lease_duration = lease_duration
+        self.result_ttl = result_ttl
+        self.owner = f"{HOSTNAME}:{os.getpid()}"
+
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._disk_available = True
+        self._stats = {
+            "executed": 0,
+            "coalesced_local": 0,
+            "coalesced_remote": 0,
+            "remote_wait_time_s": 0.0,
+            "stale_leases": 0,
+            "errors": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Baux partagés entre processus
+    # ------------------------------------------------------------------
+
+    def _connection(self):
+        """Retourne la connexion SQLite du thread courant (une connexion par thread)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS single_flight (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    finished_at REAL
+                )
+                """
+            )
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, operation, default=None):
+        """Exécute une opération dans une transaction exclusive, sans jamais bloquer l'appel LLM."""
+        if not self._disk_available:
+            return default
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = operation(conn, time.time())
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"Single-flight: erreur SQLite ({self.path}): {str(e)}")
+            return default
+        except OSError as e:
+            self._disk_available = False
+            logger.warning(f"Single-flight: regroupement entre agents désactivé ({str(e)})")
+            return default
+
+    def _acquire_lease(self, key):
+        """
+        Tente de prendre le bail d'une clé.
+
+        Returns:
+            tuple: ("leader", None), ("done", résultat) ou ("wait", None)
+        """
+        def operation(conn, now):
+            conn.execute("DELETE FROM single_flight WHERE done = 1 AND finished_at < ?", (now - self.result_ttl,))
+            row = conn.execute("SELECT owner, expires_at, done, result FROM single_flight WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                owner, expires_at, done, result = row
+                if done:
+                    return ("done", result)
+                if expires_at > now and _owner_alive(owner):
+                    return ("wait", None)
+                self._count("stale_leases")
+            conn.execute(
+                "INSERT OR REPLACE INTO single_flight (key, owner, expires_at, done, result, finished_at) "
+                "VALUES (?, ?, ?, 0, NULL, NULL)",
+                (key, self.owner, now + self.lease_duration),
+            )
+            return ("leader", None)
+        return self._transaction(operation, default=("leader", None))
+
+    def _release_lease(self, key, result=None, failed=False):
+        def operation(conn, now):
+            if failed:
+                # Les agents en attente reprendront le bail et relanceront l'appel
+                conn.execute("DELETE FROM single_flight WHERE key = ? AND owner = ?", (key, self.owner))
+            else:
+                conn.execute(
+                    "UPDATE single_flight SET done = 1, result = ?, finished_at = ? WHERE key = ? AND owner = ?",
+                    (result, now, key, self.owner),
+                )
+        self._transaction(operation)
+
+    def _run_with_lease(self, key, func):
+        """Exécute func en tant que détenteur du bail, ou attend le résultat d'un autre agent."""
+        start = time.time()
+        while True:
+            state, result = self._acquire_lease(key)
+            if state == "done":
+                self._count("coalesced_remote")
+                self._count("remote_wait_time_s", time.time() - start)
+                logger.info(f"Appel LLM identique déjà traité par un autre agent ({key[:12]})")
+                return result, False
+            if state == "leader":
+                break
+            if time.time() - start > self.lease_duration:
+                # Ne jamais attendre plus longtemps qu'un bail: exécuter nous-mêmes
+                break
+            time.sleep(POLL_INTERVAL)
+
+        self._count("executed")
+        try:
+            result = func()
+        except Exception:
+            self._release_lease(key, failed=True)
+            raise
+        # Une réponse vide n'est pas partagée: les agents en attente relanceront l'appel
+        self._release_lease(key, result=result, failed=not result)
+        return result, True
+
+    # ------------------------------------------------------------------
+    # API publique
+    # ------------------------------------------------------------------
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def do(self, key, func):
+        """
+        Exécute func, sauf si un appel de même clé est déjà en cours.
+
+        Args:
+            key (str): Clé de l'appel (clé du cache des réponses)
+            func (callable): Fonction sans argument qui effectue l'appel et retourne un str
+
+        Returns:
+            tuple: (résultat, True si cet appel a été exécuté ici, False s'il a été partagé)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            self._count("coalesced_local")
+            if not call.done.wait(self.lease_duration):
+                return func(), True
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        try:
+            call.result, executed = self._run_with_lease(key, func)
+            return call.result, executed
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self):
+        """
+        Retourne les compteurs du regroupement.
+
+        Returns:
+            dict: Appels exécutés, appels économisés (par thread et par agent) et attentes
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        stats["saved_calls"] = stats["coalesced_local"] + stats["coalesced_remote"]
+        stats["remote_wait_time_s"] = round(stats["remote_wait_time_s"], 3)
+        return stats
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """
+    Retourne l'instance single-flight du processus, ou None si elle est désactivée.
+
+    Returns:
+        SingleFlight: Instance partagée du processus
+    """
+    global _single_flight
+    if not SINGLE_FLIGHT_ENABLED:
+        return None
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
+
+
+def _single_flight_stats():
+    flight = get_single_flight()
+    return flight.stats() if flight else {"enabled": False}
+
+
+register_stats_provider("single_flight", _single_flight_stats)
@@ -0,0 +1,64 @@
+"""
+Registre des statistiques exposées par les modules partagés.
+
+Chaque module (client Bedrock, cache, limiteur...) enregistre une fonction qui
+retourne un dictionnaire de compteurs. Les agents exposent l'ensemble via la
+route ``/api/llm_stats`` ajoutée par ``register_stats_route``.
+"""
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def register_stats_provider(name, provider):
+    """
+    Enregistre une source de statistiques.
+
+    Args:
+        name (str): Clé sous laquelle les statistiques sont publiées
+        provider (callable): Fonction sans argument retournant un dict
+    """
+    with _providers_lock:
+        _providers[name] = provider
+
+
+def collect_stats():
+    """
+    Collecte les statistiques de toutes les sources enregistrées.
+
+    Returns:
+        dict: Statistiques indexées par nom de source
+    """
+    with _providers_lock:
+        providers = dict(_providers)
+
+    stats = {}
+    for name, provider in providers.items():
+        try:
+            stats[name] = provider()
+        except Exception as e:
+            logger.warning(f"Impossible de collecter les statistiques '{name}': {str(e)}")
+            stats[name] = {"error": str(e)}
+    return stats
+
+
+def register_stats_route(app, agent_name=None):
+    """
+    Ajoute la route ``GET /api/llm_stats`` à une application Flask.
+
+    Args:
+        app (Flask): Application de l'agent
+        agent_name (str, optional): Nom de l'agent inclus dans la réponse
+    """
+    from flask import jsonify
+
+    def llm_stats():
+        """Retourne les statistiques des appels LLM de l'agent."""
+        return jsonify({'agent': agent_name, 'stats': collect_stats()})
+
+    app.add_url_rule('/api/llm_stats', 'llm_stats', llm_stats, methods=['GET'])
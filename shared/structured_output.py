@@ -0,0 +1,277 @@
+"""
+Sorties structurées validées par un schéma JSON.
+
+Les fonctions de planification demandaient du JSON en texte libre, puis le
+cherchaient avec une expression ```json```, puis avec ``({.*})`` en mode
+DOTALL (quadratique sur les longues réponses), et finissaient souvent par
+« Format JSON non trouvé » et une régénération complète.
+
+Ici, le schéma est transmis au modèle comme outil imposé (``tool_choice``): la
+réponse est directement un objet JSON. Elle est validée contre le schéma; en
+cas d'écart seulement, un appel de réparation ciblé renvoie au modèle sa
+réponse et la liste des erreurs, au lieu de tout redemander.
+
+Le validateur couvre le sous-ensemble de JSON Schema utilisé par les agents:
+``type``, ``properties``, ``required``, ``additionalProperties`` (booléen),
+``items``, ``enum``, ``minimum``/``maximum``, ``minItems``/``maxItems``,
+``minLength``.
+
+Variables d'environnement:
+    LLM_STRUCTURED_MAX_REPAIRS: Nombre maximum d'appels de réparation par réponse (défaut: 1)
+"""
+
+import json
+import logging
+import os
+import threading
+
+from shared.stats import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+MAX_REPAIRS = int(os.getenv("LLM_STRUCTURED_MAX_REPAIRS", "1"))
+
+# Nombre maximum d'erreurs rapportées au modèle lors d'une réparation
+MAX_REPORTED_ERRORS = 20
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "null": type(None),
+}
+
+_stats_lock = threading.Lock()
+_stats = {
+    "calls": 0,
+    "valid_first_try": 0,
+    "repair_calls": 0,
+    "repaired": 0,
+    "failed": 0,
+    "text_fallbacks": 0,
+}
+
+
+class StructuredOutputError(ValueError):
+    """Réponse toujours non conforme au schéma après les appels de réparation."""
+
+    def __init__(self, errors, raw):
+        super().__init__(f"Réponse non conforme au schéma: {'; '.join(errors[:5])}")
+        self.errors = errors
+        self.raw = raw
+
+
+def _count(name, value=1):
+    with _stats_lock:
+        _stats[name] += value
+
+
+def make_tool(name, schema, description=None):
+    """
+    Construit la définition d'outil transmise à Bedrock.
+
+    Args:
+        name (str): Nom de l'outil (lettres, chiffres, _ et -)
+        schema (dict): Schéma JSON de l'argument attendu
+        description (str, optional): Description de l'outil pour le modèle
+
+    Returns:
+        dict: Outil au format Anthropic Messages
+    """
+    return {
+        "name": name,
+        "description": description or f"Enregistre le résultat au format {name}.",
+        "input_schema": schema,
+    }
+
+
+def _type_matches(value, expected):
+    if expected == "integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if expected == "number":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    python_type = _JSON_TYPES.get(expected)
+    return python_type is None or isinstance(value, python_type)
+
+
+def validate_schema(value, schema, path="$"):
+    """
+    Valide une valeur contre un schéma JSON (sous-ensemble décrit en tête de module).
+
+    Args:
+        value: Valeur décodée
+        schema (dict): Schéma JSON
+        path (str, optional): Chemin de la valeur, utilisé dans les messages
+
+    Returns:
+        list: Messages d'erreur, vide si la valeur est conforme
+    """
+    errors = []
+    expected = schema.get("type")
+    if expected is not None:
+        types = expected if isinstance(expected, list) else [expected]
+        if not any(_type_matches(value, t) for t in types):
+            return [f"{path}: type {type(value).__name__} au lieu de {'/'.join(types)}"]
+
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: valeur {value!r} hors de {schema['enum']}")
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if "minimum" in schema and value < schema["minimum"]:
+            errors.append(f"{path}: {value} inférieur au minimum {schema['minimum']}")
+        if "maximum" in schema and value > schema["maximum"]:
+            errors.append(f"{path}: {value} supérieur au maximum {schema['maximum']}")
+
+    if isinstance(value, str) and len(value) < schema.get("minLength", 0):
+        errors.append(f"{path}: chaîne trop courte (minimum {schema['minLength']} caractères)")
+
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}.{key}: champ obligatoire manquant")
+        for key, item in value.items():
+            if key in properties:
+                errors.extend(validate_schema(item, properties[key], f"{path}.{key}"))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}.{key}: champ non prévu par le schéma")
+
+    if isinstance(value, list):
+        if len(value) < schema.get("minItems", 0):
+            errors.append(f"{path}: {len(value)} éléments, minimum {schema['minItems']}")
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            errors.append(f"{path}: {len(value)} éléments, maximum {schema['maxItems']}")
+        if isinstance(schema.get("items"), dict):
+            for index, item in enumerate(value):
+                errors.extend(validate_schema(item, schema["items"], f"{path}[{index}]"))
+
+    return errors
+
+
+def _decode_json(text):
+    """
+    Décode la réponse: JSON direct (appel d'outil), sinon premier objet JSON du texte.
+
+    Le repli parcourt le texte une seule fois avec ``raw_decode`` au lieu d'une
+    expression régulière gourmande.
+    """
+    stripped = text.strip()
+    try:
+        return json.loads(stripped)
+    except ValueError:
+        pass
+
+    _count("text_fallbacks")
+    decoder = json.JSONDecoder()
+    fence = stripped.find("```json")
+    start = stripped.find("{", fence if fence >= 0 else 0)
+    while start >= 0:
+        try:
+            value, _ = decoder.raw_decode(stripped, start)
+            return value
+        except ValueError:
+            start = stripped.find("{", start + 1)
+    raise ValueError("aucun objet JSON décodable dans la réponse")
+
+
+def parse_structured(text, schema):
+    """
+    Décode et valide une réponse structurée.
+
+    Args:
+        text (str): Réponse du modèle (argument JSON de l'outil, ou texte)
+        schema (dict): Schéma JSON attendu
+
+    Returns:
+        tuple: (valeur décodée ou None, liste des erreurs)
+    """
+    if not text or not text.strip():
+        return None, ["$: réponse vide"]
+    try:
+        value = _decode_json(text)
+    except ValueError as e:
+        return None, [f"$: JSON invalide ({str(e)})"]
+    return value, validate_schema(value, schema)
+
+
+def build_repair_prompt(prompt, raw, errors):
+    """
+    Construit la demande de réparation: la réponse précédente et ses erreurs de schéma.
+
+    Args:
+        prompt (str): Demande initiale, rappelée pour le contexte
+        raw (str): Réponse non conforme
+        errors (list): Erreurs de validation
+
+    Returns:
+        str: Prompt de réparation
+    """
+    reported = "\n".join(f"- {error}" for error in errors[:MAX_REPORTED_ERRORS])
+    return f"""
+    Demande initiale:
+
+    {prompt}
+
+    Votre réponse précédente ne respecte pas le schéma de l'outil:
+
+    {raw}
+
+    Erreurs détectées:
+    {reported}
+
+    Corrigez uniquement ces erreurs, en conservant le reste du contenu, et appelez
+    de nouveau l'outil avec l'objet complet corrigé.
+    """
+
+
+def invoke_structured(call, prompt, schema, max_repairs=None):
+    """
+    Obtient une réponse conforme au schéma, avec réparation ciblée si nécessaire.
+
+    Args:
+        call (callable): call(prompt) -> str; effectue l'appel LLM avec l'outil imposé
+            (les exceptions d'appel sont propagées telles quelles)
+        prompt (str): Demande initiale
+        schema (dict): Schéma JSON attendu
+        max_repairs (int, optional): Nombre d'appels de réparation (défaut: LLM_STRUCTURED_MAX_REPAIRS)
+
+    Returns:
+        Valeur décodée et conforme au schéma
+
+    Raises:
+        StructuredOutputError: Si la réponse reste non conforme après les réparations
+    """
+    max_repairs = MAX_REPAIRS if max_repairs is None else max_repairs
+    _count("calls")
+    raw = call(prompt)
+    value, errors = parse_structured(raw, schema)
+    if not errors:
+        _count("valid_first_try")
+        return value
+
+    for attempt in range(1, max_repairs + 1):
+        logger.warning(f"Sortie structurée non conforme ({len(errors)} erreurs), réparation {attempt}/{max_repairs}")
+        _count("repair_calls")
+        raw = call(build_repair_prompt(prompt, raw, errors))
+        value, errors = parse_structured(raw, schema)
+        if not errors:
+            _count("repaired")
+            return value
+
+    _count("failed")
+    raise StructuredOutputError(errors, raw)
+
+
+def get_structured_output_stats():
+    """
+    Retourne les compteurs des sorties structurées.
+
+    Returns:
+        dict: Appels, réponses valides du premier coup, réparations et échecs
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+register_stats_provider("structured_output", get_structured_output_stats)
@@ -0,0 +1,373 @@
+"""
+Télémétrie des appels LLM: latences, tokens, coût, nouvelles tentatives.
+
+Chaque appel à ``invoke_claude`` (décoré par ``instrument_llm_call``) produit un
+enregistrement avec:
+
+- la durée totale et le délai avant le premier octet/token (TTFB);
+- les tokens d'entrée et de sortie lus dans le champ ``usage`` de Bedrock;
+- le nombre de tentatives, les réponses servies par le cache;
+- l'agent, la fonction appelante (``create_coding_tasks``...) et le modèle.
+
+Les enregistrements sont agrégés par agent dans des histogrammes HDR et des
+compteurs par fonction, exposés au format Prometheus sur ``GET /metrics``, et
+ajoutés à un fichier JSONL pour les analyses ultérieures.
+
+Variables d'environnement:
+    LLM_TELEMETRY_ENABLED: Active l'écriture du fichier JSONL (défaut: 1)
+    LLM_TELEMETRY_PATH: Fichier JSONL (défaut: <racine>/logs/llm_calls.jsonl)
+    LLM_PRICE_INPUT_PER_MTOK: Prix en USD par million de tokens d'entrée (défaut: 3)
+    LLM_PRICE_OUTPUT_PER_MTOK: Prix en USD par million de tokens de sortie (défaut: 15)
+"""
+
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from shared.histogram import Histogram
+from shared.stats import collect_stats, register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHARED_DIR = os.path.dirname(os.path.abspath(__file__))
+STDLIB_DIR = os.path.dirname(os.__file__)
+
+TELEMETRY_ENABLED = os.getenv("LLM_TELEMETRY_ENABLED", "1").lower() not in ("0", "false", "no")
+TELEMETRY_PATH = os.getenv("LLM_TELEMETRY_PATH", os.path.join(ROOT_DIR, "logs", "llm_calls.jsonl"))
+PRICE_INPUT_PER_MTOK = float(os.getenv("LLM_PRICE_INPUT_PER_MTOK", "3"))
+PRICE_OUTPUT_PER_MTOK = float(os.getenv("LLM_PRICE_OUTPUT_PER_MTOK", "15"))
+
+# Bornes (en secondes) des histogrammes Prometheus
+PROMETHEUS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+# Fonctions d'enveloppe ignorées pour retrouver la fonction appelante
+WRAPPER_FUNCTIONS = {"invoke_claude", "invoke_claude_async", "wrapper", "<lambda>"}
+
+_agent_name = os.getenv("AGENT_NAME", "agent")
+_current = threading.local()
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_histograms = {}  # agent -> {"wall_ms": Histogram, "ttfb_ms": Histogram}
+_counters = {}    # (agent, function) -> compteurs
+
+
+def set_agent_name(name):
+    """Définit le nom d'agent associé aux appels du processus."""
+    global _agent_name
+    _agent_name = name
+
+
+def find_call_site():
+    """
+    Retourne le nom de la première fonction de l'agent dans la pile d'appels,
+    en ignorant les modules partagés, la bibliothèque standard et les enveloppes.
+
+    Returns:
+        str: Nom de la fonction appelante, ou "unknown"
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        filename = code.co_filename
+        if (code.co_name not in WRAPPER_FUNCTIONS
+                and not filename.startswith(SHARED_DIR)
+                and not filename.startswith(STDLIB_DIR)
+                and "site-packages" not in filename):
+            return code.co_name
+        frame = frame.f_back
+    return "unknown"
+
+
+@contextmanager
+def call_site(name):
+    """Fixe la fonction appelante pour un appel exécuté dans un autre thread."""
+    previous = getattr(_current, "call_site", None)
+    _current.call_site = name
+    try:
+        yield
+    finally:
+        _current.call_site = previous
+
+
+def current_call():
+    """
+    Retourne l'enregistrement de l'appel LLM en cours dans ce thread.
+
+    Returns:
+        dict: Enregistrement modifiable, ou None hors d'un appel instrumenté
+    """
+    return getattr(_current, "record", None)
+
+
+@contextmanager
+def llm_call(function=None):
+    """
+    Contexte d'un appel LLM. Les contextes imbriqués partagent l'enregistrement
+    du plus externe, qui est le seul à être publié.
+
+    Yields:
+        dict: Enregistrement de l'appel
+    """
+    record = current_call()
+    if record is not None:
+        yield record
+        return
+
+    record = {
+        "agent": _agent_name,
+        "function": function or getattr(_current, "call_site", None) or find_call_site(),
+        "model_id": None,
+        "attempts": 0,
+        "cache_hit": False,
+        "coalesced": False,
+        "ttfb_ms": None,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "success": False,
+        "error": None,
+    }
+    _current.record = record
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {str(e)[:200]}"
+        raise
+    finally:
+        _current.record = None
+        record["wall_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        _publish(record)
+
+
+def instrument_llm_call(func):
+    """
+    Décorateur pour ``invoke_claude``: publie un enregistrement par appel,
+    en comptant les tentatives faites par la boucle de l'agent.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with llm_call():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def note_attempt(model_id):
+    """Signale une tentative d'appel au modèle (appelé par invoke_bedrock)."""
+    record = current_call()
+    if record is not None:
+        record["attempts"] += 1
+        record["model_id"] = model_id
+        record["error"] = None
+        record["_attempt_start"] = time.perf_counter()
+        record["_ttfb_pending"] = True
+
+
+def note_first_byte():
+    """Signale l'arrivée du premier octet (ou du premier token en streaming)."""
+    record = current_call()
+    if record is not None and record.get("_ttfb_pending"):
+        record["ttfb_ms"] = round((time.perf_counter() - record["_attempt_start"]) * 1000, 1)
+        record["_ttfb_pending"] = False
+
+
+def note_error(error):
+    """Enregistre l'erreur d'une tentative (la boucle de l'agent peut encore réessayer)."""
+    record = current_call()
+    if record is not None:
+        record["success"] = False
+        record["error"] = f"{type(error).__name__}: {str(error)[:200]}"
+
+
+def note_result(usage=None, cache_hit=False, coalesced=False):
+    """
+    Enregistre le résultat d'une tentative réussie.
+
+    Args:
+        usage (dict, optional): Champ ``usage`` de la réponse Bedrock
+        cache_hit (bool, optional): Réponse servie par le cache
+        coalesced (bool, optional): Réponse partagée par un appel identique en cours
+    """
+    record = current_call()
+    if record is None:
+        return
+    usage = usage or {}
+    record["input_tokens"] += usage.get("input_tokens", 0)
+    record["output_tokens"] += usage.get("output_tokens", 0)
+    record["cache_hit"] = record["cache_hit"] or cache_hit
+    record["coalesced"] = record["coalesced"] or coalesced
+    record["success"] = True
+    record["error"] = None
+
+
+def _publish(record):
+    record = {key: value for key, value in record.items() if not key.startswith("_")}
+    record["timestamp"] = time.time()
+    record["retries"] = max(record["attempts"] - 1, 0)
+    record["cost_usd"] = round(
+        record["input_tokens"] * PRICE_INPUT_PER_MTOK / 1e6 + record["output_tokens"] * PRICE_OUTPUT_PER_MTOK / 1e6, 6
+    )
+
+    with _lock:
+        histograms = _histograms.setdefault(record["agent"], {"wall_ms": Histogram(), "ttfb_ms": Histogram()})
+        histograms["wall_ms"].record(record["wall_ms"])
+        if record["ttfb_ms"] is not None:
+            histograms["ttfb_ms"].record(record["ttfb_ms"])
+        counters = _counters.setdefault((record["agent"], record["function"]), {
+            "calls": 0, "errors": 0, "retries": 0, "cache_hits": 0,
+            "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0,
+        })
+        counters["calls"] += 1
+        counters["errors"] += 0 if record["success"] else 1
+        counters["retries"] += record["retries"]
+        counters["cache_hits"] += 1 if record["cache_hit"] else 0
+        counters["input_tokens"] += record["input_tokens"]
+        counters["output_tokens"] += record["output_tokens"]
+        counters["cost_usd"] += record["cost_usd"]
+
+    if TELEMETRY_ENABLED:
+        _append(record)
+
+
+def _append(record):
+    """Ajoute l'enregistrement au fichier JSONL (une ligne compacte par appel)."""
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(TELEMETRY_PATH), exist_ok=True)
+            with open(TELEMETRY_PATH, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        logger.warning(f"Télémétrie LLM: écriture impossible dans {TELEMETRY_PATH}: {str(e)}")
+
+
+def get_telemetry_stats():
+    """
+    Retourne les agrégats de télémétrie du processus.
+
+    Returns:
+        dict: Percentiles de latence par agent et compteurs par fonction
+    """
+    with _lock:
+        latency = {
+            agent: {name: histogram.summary() for name, histogram in histograms.items()}
+            for agent, histograms in _histograms.items()
+        }
+        functions = {
+            f"{agent}.{function}": dict(counters, cost_usd=round(counters["cost_usd"], 6))
+            for (agent, function), counters in _counters.items()
+        }
+    return {"latency_ms": latency, "functions": functions}
+
+
+# ----------------------------------------------------------------------
+# Export Prometheus
+# ----------------------------------------------------------------------
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _flatten(prefix, value, out):
+    """Aplatit les statistiques numériques du registre en couples (chemin, valeur)."""
+    if isinstance(value, bool):
+        out.append((prefix, int(value)))
+    elif isinstance(value, (int, float)):
+        out.append((prefix, value))
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else str(key), item, out)
+
+
+def render_prometheus():
+    """
+    Produit les métriques du processus au format texte de Prometheus.
+
+    Returns:
+        str: Exposition Prometheus (version 0.0.4)
+    """
+    lines = []
+    with _lock:
+        histograms = {agent: {name: h.copy() for name, h in items.items()} for agent, items in _histograms.items()}
+        counters = {key: dict(value) for key, value in _counters.items()}
+
+    for metric, name, help_text in (
+        ("llm_call_duration_seconds", "wall_ms", "Durée totale des appels invoke_claude"),
+        ("llm_call_ttfb_seconds", "ttfb_ms", "Délai avant le premier octet ou token de la réponse"),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for agent, items in sorted(histograms.items()):
+            histogram = items[name]
+            for bound in PROMETHEUS_BUCKETS:
+                lines.append(f"{metric}_bucket{_labels(agent=agent, le=bound)} {histogram.count_at_or_below(bound * 1000)}")
+            lines.append(f"{metric}_bucket{_labels(agent=agent, le='+Inf')} {histogram.total}")
+            lines.append(f"{metric}_sum{_labels(agent=agent)} {histogram.sum / 1000:.3f}")
+            lines.append(f"{metric}_count{_labels(agent=agent)} {histogram.total}")
+
+        lines.append(f"# HELP {metric}_quantile Percentiles calculés par l'histogramme HDR")
+        lines.append(f"# TYPE {metric}_quantile gauge")
+        for agent, items in sorted(histograms.items()):
+            for quantile in (0.5, 0.9, 0.99):
+                value = items[name].percentile(quantile * 100) / 1000
+                lines.append(f"{metric}_quantile{_labels(agent=agent, quantile=quantile)} {value:.3f}")
+
+    for metric, key, help_text in (
+        ("llm_calls_total", "calls", "Nombre d'appels invoke_claude"),
+        ("llm_call_errors_total", "errors", "Appels terminés en erreur"),
+        ("llm_retries_total", "retries", "Nouvelles tentatives"),
+        ("llm_cache_hits_total", "cache_hits", "Appels servis par le cache"),
+        ("llm_input_tokens_total", "input_tokens", "Tokens d'entrée"),
+        ("llm_output_tokens_total", "output_tokens", "Tokens de sortie"),
+        ("llm_cost_usd_total", "cost_usd", "Coût estimé en USD"),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for (agent, function), values in sorted(counters.items()):
+            lines.append(f"{metric}{_labels(agent=agent, function=function)} {values[key]}")
+
+    # Statistiques des modules partagés (cache, pool, limiteur...) sous forme de jauges
+    lines.append("# HELP agent_stat Statistiques des modules partagés (voir /api/llm_stats)")
+    lines.append("# TYPE agent_stat gauge")
+    for source, values in collect_stats().items():
+        if source == "telemetry":
+            continue
+        flattened = []
+        _flatten("", values, flattened)
+        for path, value in flattened:
+            lines.append(f"agent_stat{_labels(agent=_agent_name, source=source, name=path)} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def register_metrics_route(app, agent_name=None):
+    """
+    Ajoute la route ``GET /metrics`` (format Prometheus) à une application Flask
+    et associe le nom de l'agent aux appels du processus.
+
+    Args:
+        app (Flask): Application de l'agent
+        agent_name (str, optional): Nom de l'agent dans les étiquettes
+    """
+    from flask import Response
+
+    if agent_name:
+        set_agent_name(agent_name)
+
+    def metrics():
+        """Expose les métriques de l'agent au format Prometheus."""
+        return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
+
+
+register_stats_provider("telemetry", get_telemetry_stats)
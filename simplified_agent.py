@@ -18,7 +18,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Configuration
-GO_BACKEND_URL = "http://localhost:5001/go_code_request"
+GO_BACKEND_URL = "http://localhost:5004/go_code_request"
 
 app = Flask(__name__)
 
@@ -5,7 +5,7 @@ import json
 import sys
 
 # URL de l'agent développeur Go Backend
-GO_BACKEND_URL = "http://localhost:5001/go_code_request"
+GO_BACKEND_URL = "http://localhost:5004/go_code_request"
 
 # Exemple de demande simple pour tester directement l'agent Go
 test_request = {
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Script pour tester le détail par étape des tests de charge par scénarios.
+
+Un serveur HTTP local répond lentement (/slow); le test de charge est réparti
+entre deux workers locaux qui envoient leurs résultats partiels souvent, pour
+que des requêtes soient en cours à chaque envoi. Chaque requête doit être
+comptée dans son étape: la somme des étapes est égale à total_requests.
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from shared import load_cluster
+from shared.load_scenario import load_scenarios
+
+# Durée de réponse de /slow, en secondes
+SLOW_SECONDS = 0.2
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(SLOW_SECONDS)
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def test_distributed_step_counts():
+    """Vérifie que le détail par étape compte toutes les requêtes d'un test réparti."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    scenario = load_scenarios({"base_url": base_url, "steps": [{"name": "slow", "url": "/slow"}]})
+    report_interval = load_cluster.REPORT_INTERVAL
+    load_cluster.REPORT_INTERVAL = 0.1
+    try:
+        results = load_cluster.run_distributed(base_url, "closed", users=8, duration=3, local_workers=2,
+                                               scenario=scenario)
+    finally:
+        load_cluster.REPORT_INTERVAL = report_interval
+        server.shutdown()
+
+    steps = {step["step"]: step["requests"] for step in results["steps"]}
+    print(json.dumps({"total_requests": results["total_requests"], "steps": steps,
+                      "iterations": results["iterations"]}, indent=2))
+    assert results["total_requests"] > 0
+    assert sum(steps.values()) == results["total_requests"], \
+        f"{sum(steps.values())} requêtes dans les étapes pour {results['total_requests']} au total"
+    assert results["iterations"]["completed"] == steps["scenario/slow"]
+
+
+if __name__ == "__main__":
+    try:
+        test_distributed_step_counts()
+        success = True
+    except AssertionError as e:
+        print(f"Échec: {str(e)}")
+        success = False
+    sys.exit(0 if success else 1)